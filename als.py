@@ -0,0 +1,349 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from als_config import (ALS_MODEL_PATH, ALS_FACTORS, ALS_ITERATIONS, ALS_REGULARISATION, ALS_ALPHA, ALS_QUIZ_WEIGHT,
+                        ALS_CG_STEPS, ALS_WORKERS, ALS_BLOCK_SIZE)
+from db_utils import db_get_user_movie_top_5_batches, db_get_user_quiz_response_batches
+from embedding_store import EmbeddingStore
+from embedding_store_config import EMBEDDING_STORE_INDEX_MIN_ROWS
+from tmdb_catalog import tmdb_normalise_movie_name
+
+# Define largest number of columns a row may hold to be solved with other rows of its block in one batched solve,
+# padded to same number of columns. Rows with more columns, such as popular movies, are solved one at a time
+ALS_PADDED_WIDTH = 64
+# Define name of file in model folder naming current model version, names of arrays saved for each version, and name
+# of embedding store saved for each version holding movie embeddings by movie name key
+ALS_MANIFEST_NAME = "model.json"
+ALS_ARRAY_NAMES = ("user_ids", "user_factors", "movie_names", "quiz_prompt_option_ids", "quiz_factors")
+ALS_MOVIE_STORE_NAME = "movies"
+
+# Initialise model loaded for each model path, with manifest version it was loaded from
+als_models = {}
+als_models_lock = threading.Lock()
+
+
+# Define function to build user by column interaction matrix from batches of (user_id, movie_name) rows and batches of
+# (user_id, quiz_prompt_option_id) rows, as yielded by db_get_user_movie_top_5_batches and
+# db_get_user_quiz_response_batches. Columns are movies, numbered by normalised movie name so variants of a name are
+# one movie, followed by quiz prompt options. Returns dictionary item holding user_ids in ascending order, movie name
+# keys and first movie name seen for each movie, quiz_prompt_option_ids in ascending order, and matrix in CSR form,
+# where indices[indptr[row]:indptr[row + 1]] are columns of user row in ascending order
+def als_build_interactions(user_movie_batches, user_quiz_response_batches):
+    movie_numbers_by_key = {}
+    # Initialise movie number of each movie name seen, so each spelling is normalised once
+    movie_numbers_by_name = {}
+    movie_names = []
+    movie_rows = []
+    for user_movie_rows in user_movie_batches:
+        batch_movie_rows = []
+        for user_id, movie_name in user_movie_rows:
+            if movie_name not in movie_numbers_by_name:
+                movie_name_key = tmdb_normalise_movie_name(movie_name)
+                if movie_name_key not in movie_numbers_by_key:
+                    movie_numbers_by_key[movie_name_key] = len(movie_names)
+                    movie_names.append(movie_name)
+                movie_numbers_by_name[movie_name] = movie_numbers_by_key[movie_name_key]
+            batch_movie_rows.append((user_id, movie_numbers_by_name[movie_name]))
+        movie_rows.append(np.array(batch_movie_rows, dtype=np.int64).reshape(-1, 2))
+    # Convert each batch of quiz responses to array as read, so rows are not all held as tuples
+    response_rows = [np.array(user_response_rows, dtype=np.int64).reshape(-1, 2)
+                     for user_response_rows in user_quiz_response_batches]
+    movie_rows = np.concatenate(movie_rows) if movie_rows else np.empty((0, 2), dtype=np.int64)
+    response_rows = np.concatenate(response_rows) if response_rows else np.empty((0, 2), dtype=np.int64)
+    # Number users and quiz prompt options in ascending order, placing quiz prompt option columns after movie columns
+    quiz_prompt_option_ids, option_numbers = np.unique(response_rows[:, 1], return_inverse=True)
+    user_ids, user_numbers = np.unique(np.concatenate([movie_rows[:, 0], response_rows[:, 0]]), return_inverse=True)
+    column_count = len(movie_names) + len(quiz_prompt_option_ids)
+    columns = np.concatenate([movie_rows[:, 1], len(movie_names) + option_numbers.reshape(-1)])
+    # Remove duplicate columns of each user, sorting by user then column
+    codes = np.unique(user_numbers.reshape(-1) * column_count + columns)
+    return {"user_ids": user_ids,
+            "movie_name_keys": list(movie_numbers_by_key),
+            "movie_names": movie_names,
+            "quiz_prompt_option_ids": quiz_prompt_option_ids,
+            "indptr": np.concatenate([[0], np.cumsum(np.bincount(codes // column_count, minlength=len(user_ids)))]),
+            "indices": codes % column_count}
+
+
+# Define helper function to transpose matrix in CSR form with column_count columns, returning (indptr, indices) of
+# column by row matrix, where rows of each column are in ascending order
+def als_transpose(indptr, indices, column_count):
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    return (np.concatenate([[0], np.cumsum(np.bincount(indices, minlength=column_count))]),
+            rows[np.argsort(indices, kind="stable")])
+
+
+# Define helper function to improve solutions x of (gram + Y^T C Y) x = b for rows, where Y and C are each row's padded
+# column embeddings and confidences, with cg_steps conjugate gradient steps. Each step costs one pass over each row's
+# columns, rather than forming and solving each row's matrix
+def als_conjugate_gradient(gram, padded_factors, padded_confidences, b, x, cg_steps):
+    # Define helper function to multiply each row's vector by row's matrix without forming it
+    def multiply(vectors):
+        weights = padded_confidences * np.einsum("rwf,rf->rw", padded_factors, vectors)
+        return vectors @ gram + np.einsum("rw,rwf->rf", weights, padded_factors)
+
+    tiny = np.finfo(x.dtype).tiny
+    residuals = b - multiply(x)
+    directions = residuals.copy()
+    residual_norms = (residuals * residuals).sum(axis=1)
+    for _ in range(cg_steps):
+        products = multiply(directions)
+        steps = residual_norms / np.maximum((directions * products).sum(axis=1), tiny)
+        x = x + steps[:, None] * directions
+        residuals -= steps[:, None] * products
+        new_residual_norms = (residuals * residuals).sum(axis=1)
+        directions = residuals + (new_residual_norms / np.maximum(residual_norms, tiny))[:, None] * directions
+        residual_norms = new_residual_norms
+    return x
+
+
+# Define function to solve embeddings of rows, supplied as array of row numbers, from embeddings of their columns,
+# minimising implicit feedback loss where each row prefers its own columns with confidence 1 plus their confidences
+# and all other columns with confidence 1. gram is column embeddings' Gram matrix plus regularisation, shared by all
+# rows, so each row adds only its own columns. Rows with few columns are solved together, exactly or, if cg_steps and
+# previous row_factors supplied, with cg_steps conjugate gradient steps from previous embeddings
+def als_solve_rows(rows, indptr, indices, confidences, column_factors, gram, row_factors=None, cg_steps=0):
+    previous_row_factors = row_factors
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    row_factors = np.zeros((len(rows), column_factors.shape[1]), dtype=column_factors.dtype)
+    # Solve rows with few columns together, padding each with columns of zero confidence
+    narrow_indexes = np.flatnonzero(lengths <= ALS_PADDED_WIDTH)
+    if len(narrow_indexes):
+        width = lengths[narrow_indexes].max()
+        mask = np.arange(width) < lengths[narrow_indexes, None]
+        offsets = np.where(mask, starts[narrow_indexes, None] + np.arange(width), 0)
+        padded_factors = column_factors[indices[offsets]]
+        padded_confidences = np.where(mask, confidences[offsets], 0).astype(column_factors.dtype)
+        b = np.einsum("rw,rwf->rf", np.where(mask, 1 + padded_confidences, 0), padded_factors)
+        if cg_steps and previous_row_factors is not None:
+            row_factors[narrow_indexes] = als_conjugate_gradient(gram, padded_factors, padded_confidences, b,
+                                                                 previous_row_factors[rows[narrow_indexes]], cg_steps)
+        else:
+            a = gram + np.matmul(padded_factors.transpose(0, 2, 1) * padded_confidences[:, None, :], padded_factors)
+            row_factors[narrow_indexes] = np.linalg.solve(a, b[:, :, None])[:, :, 0]
+    # Solve rows with many columns one at a time
+    for row_index in np.flatnonzero(lengths > ALS_PADDED_WIDTH):
+        span = slice(starts[row_index], starts[row_index] + lengths[row_index])
+        span_factors = column_factors[indices[span]]
+        a = gram + (span_factors.T * confidences[span]) @ span_factors
+        row_factors[row_index] = np.linalg.solve(a, (1 + confidences[span]) @ span_factors)
+    return row_factors
+
+
+# Define function to solve embeddings of all rows from embeddings of their columns, improving previous row_factors with
+# cg_steps conjugate gradient steps if supplied, block_size rows at a time, with blocks solved concurrently by executor
+# if supplied. NumPy releases GIL while multiplying and solving, so blocks use as many cores as executor has threads
+def als_solve_all(indptr, indices, confidences, column_factors, regularisation, block_size, executor=None,
+                  row_factors=None, cg_steps=0):
+    factor_count = column_factors.shape[1]
+    gram = column_factors.T @ column_factors + regularisation * np.eye(factor_count, dtype=column_factors.dtype)
+    blocks = [np.arange(start, min(start + block_size, len(indptr) - 1))
+              for start in range(0, len(indptr) - 1, block_size)]
+    map_function = executor.map if executor else map
+    solved_row_factors = list(map_function(lambda rows: als_solve_rows(rows, indptr, indices, confidences,
+                                                                       column_factors, gram, row_factors, cg_steps),
+                                           blocks))
+    return np.concatenate(solved_row_factors) if solved_row_factors else np.zeros((0, factor_count),
+                                                                                  dtype=column_factors.dtype)
+
+
+# Define function to train embeddings of users and columns of interactions, as built by als_build_interactions, by
+# alternating least squares for implicit feedback. Each top 5 movie adds alpha to confidence, and each quiz response
+# adds alpha times quiz_weight, so quiz responses place users with few top 5 movies near users with same responses.
+# Embeddings of users and of columns with few users are improved with cg_steps conjugate gradient steps each
+# iteration, or solved exactly if 0. Returns (user_factors, column_factors) tuple of float32 arrays, with movie columns
+# first
+def als_train(interactions, factor_count, iterations, regularisation, alpha, quiz_weight, workers=1,
+              block_size=ALS_BLOCK_SIZE, seed=0, cg_steps=ALS_CG_STEPS):
+    movie_count = len(interactions["movie_names"])
+    column_count = movie_count + len(interactions["quiz_prompt_option_ids"])
+    indptr, indices = interactions["indptr"], interactions["indices"]
+    column_indptr, column_indices = als_transpose(indptr, indices, column_count)
+    # Set confidence of each column, then of each entry of user and column matrices
+    column_confidences = np.where(np.arange(column_count) < movie_count, alpha, alpha * quiz_weight).astype(np.float32)
+    user_confidences = column_confidences[indices]
+    column_user_confidences = np.repeat(column_confidences, np.diff(column_indptr))
+    # Initialise column embeddings randomly, so users solved first differ
+    column_factors = (np.random.default_rng(seed).standard_normal((column_count, factor_count)) * 0.01).astype(
+        np.float32)
+    user_factors = np.zeros((len(indptr) - 1, factor_count), dtype=np.float32)
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for _ in range(iterations):
+            user_factors = als_solve_all(indptr, indices, user_confidences, column_factors, regularisation, block_size,
+                                         executor, user_factors, cg_steps)
+            column_factors = als_solve_all(column_indptr, column_indices, column_user_confidences, user_factors,
+                                           regularisation, block_size, executor, column_factors, cg_steps)
+    finally:
+        if executor:
+            executor.shutdown()
+    return user_factors, column_factors
+
+
+# Define helper function to get path of file in model folder holding array for model version
+def als_get_array_path(model_path, version, array_name):
+    return os.path.join(model_path, f"{version}.{array_name}.npy")
+
+
+# Define helper function to get path of folder in model folder holding movie embedding store for model version
+def als_get_movie_store_path(model_path, version):
+    return os.path.join(model_path, f"{version}.{ALS_MOVIE_STORE_NAME}")
+
+
+# Define function to save trained model to model_path as .npy files and movie embedding store named by new version,
+# then point manifest at them in one step, so app.py never loads a partly saved model. Movie embedding stores of at
+# least EMBEDDING_STORE_INDEX_MIN_ROWS movies are indexed for approximate search. Files of versions older than the
+# version replaced are removed, unless still open, e.g. on Windows. Returns new version
+def als_save_model(model_path, interactions, user_factors, column_factors, regularisation, alpha, quiz_weight):
+    os.makedirs(model_path, exist_ok=True)
+    manifest_path = os.path.join(model_path, ALS_MANIFEST_NAME)
+    # Set version replaced, if any, so app.py processes still loading it can finish
+    try:
+        with open(manifest_path) as manifest_file:
+            previous_version = json.load(manifest_file)["version"]
+    except FileNotFoundError:
+        previous_version = None
+    version = str(time.time_ns())
+    movie_count = len(interactions["movie_names"])
+    arrays = {"user_ids": interactions["user_ids"],
+              "user_factors": user_factors,
+              "movie_names": np.array(interactions["movie_names"], dtype=str),
+              "quiz_prompt_option_ids": interactions["quiz_prompt_option_ids"],
+              "quiz_factors": column_factors[movie_count:]}
+    for array_name, array in arrays.items():
+        np.save(als_get_array_path(model_path, version, array_name), array)
+    movie_name_keys = np.array(interactions["movie_name_keys"], dtype=str)
+    movie_store = EmbeddingStore.create(als_get_movie_store_path(model_path, version), column_factors.shape[1],
+                                        movie_name_keys.dtype)
+    movie_store = movie_store.append(movie_name_keys, column_factors[:movie_count])
+    if movie_count and movie_count >= EMBEDDING_STORE_INDEX_MIN_ROWS:
+        movie_store.build_index()
+    # Write manifest to temporary file, then replace current manifest with it
+    manifest = {"version": version, "factors": user_factors.shape[1], "regularisation": regularisation,
+                "alpha": alpha, "quiz_weight": quiz_weight}
+    with open(f"{manifest_path}.tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    # Remove files of older versions
+    for file_name in os.listdir(model_path):
+        if file_name.split(".")[0] not in (version, previous_version):
+            if file_name.endswith(".npy"):
+                try:
+                    os.remove(os.path.join(model_path, file_name))
+                except OSError:
+                    pass
+            elif file_name.endswith(f".{ALS_MOVIE_STORE_NAME}"):
+                shutil.rmtree(os.path.join(model_path, file_name), ignore_errors=True)
+    return version
+
+
+# Define function to load model saved at model_path, memory-mapping arrays so they are shared between processes
+# through page cache rather than copied into each
+def als_load_model(model_path):
+    with open(os.path.join(model_path, ALS_MANIFEST_NAME)) as manifest_file:
+        model = json.load(manifest_file)
+    for array_name in ALS_ARRAY_NAMES:
+        model[array_name] = np.load(als_get_array_path(model_path, model["version"], array_name), mmap_mode="r")
+    model["movie_store"] = EmbeddingStore(als_get_movie_store_path(model_path, model["version"]))
+    model["movie_factors"] = model["movie_store"].vectors
+    # Index quiz prompt option columns, and set Gram matrix of all column embeddings plus regularisation, used to
+    # solve embeddings of users not trained on
+    model["quiz_numbers_by_id"] = {quiz_prompt_option_id: quiz_number for quiz_number, quiz_prompt_option_id
+                                   in enumerate(model["quiz_prompt_option_ids"].tolist())}
+    model["gram"] = (model["movie_factors"].T @ model["movie_factors"] + model["quiz_factors"].T @ model["quiz_factors"]
+                     + model["regularisation"] * np.eye(model["factors"], dtype=np.float32))
+    return model
+
+
+# Define helper function to get model version, identifying manifest by inode and modification time, which change when
+# new model saved
+def als_get_version(model_path):
+    manifest_stat = os.stat(os.path.join(model_path, ALS_MANIFEST_NAME))
+    return manifest_stat.st_ino, manifest_stat.st_mtime_ns
+
+
+# Define function to get model saved at model_path, loading it on first use and again whenever new model saved.
+# Returns None if no model saved
+def als_get_model(model_path=None):
+    model_path = model_path or ALS_MODEL_PATH
+    try:
+        model_version = als_get_version(model_path)
+    except FileNotFoundError:
+        return None
+    with als_models_lock:
+        version, model = als_models.get(model_path, (None, None))
+        if version != model_version:
+            model = als_load_model(model_path)
+            als_models[model_path] = (model_version, model)
+    return model
+
+
+# Define function to get embedding of user from model if trained on, otherwise solved from movie name keys of user's
+# top 5 movies and quiz_prompt_option_ids of user's quiz responses, as training solves each user. Returns None if user
+# not trained on and has no movies or quiz responses known to model
+def als_get_user_factor(model, user_id, movie_name_keys, quiz_prompt_option_ids):
+    user_number = int(np.searchsorted(model["user_ids"], user_id))
+    if user_number < len(model["user_ids"]) and model["user_ids"][user_number] == user_id:
+        return np.asarray(model["user_factors"][user_number])
+    movie_numbers = list(dict.fromkeys(movie_number for movie_number
+                                       in model["movie_store"].get_rows(movie_name_keys).tolist() if movie_number >= 0))
+    quiz_numbers = list(dict.fromkeys(model["quiz_numbers_by_id"][quiz_prompt_option_id]
+                                      for quiz_prompt_option_id in quiz_prompt_option_ids
+                                      if quiz_prompt_option_id in model["quiz_numbers_by_id"]))
+    if not movie_numbers and not quiz_numbers:
+        return None
+    # Solve user as single row whose columns are user's movies and quiz prompt options
+    column_factors = np.concatenate([model["movie_factors"][movie_numbers], model["quiz_factors"][quiz_numbers]])
+    confidences = np.array([model["alpha"]] * len(movie_numbers)
+                           + [model["alpha"] * model["quiz_weight"]] * len(quiz_numbers), dtype=np.float32)
+    return als_solve_rows(np.array([0]), np.array([0, len(column_factors)]), np.arange(len(column_factors)),
+                          confidences, column_factors, model["gram"])[0]
+
+
+# Define function to get names of top count movies for user embedding, highest score first, skipping movies with
+# movie name keys excluded, searched in model's movie embedding store
+def als_get_top_movie_names(model, user_factor, count, excluded_movie_name_keys=()):
+    excluded_movie_numbers = model["movie_store"].get_rows(list(excluded_movie_name_keys))
+    movie_numbers, _ = model["movie_store"].search_rows(user_factor, count,
+                                                        excluded_movie_numbers[excluded_movie_numbers >= 0])
+    return [str(model["movie_names"][movie_number]) for movie_number in movie_numbers.tolist()]
+
+
+# Define main function to train model on all users' top 5 movies and quiz responses from command line
+def run():
+    parser = argparse.ArgumentParser(description="Train matrix factorisation model on users' top 5 movies and quiz "
+                                                 "responses")
+    parser.add_argument("--model-path", default=ALS_MODEL_PATH, help="folder to save model to")
+    parser.add_argument("--factors", type=int, default=ALS_FACTORS)
+    parser.add_argument("--iterations", type=int, default=ALS_ITERATIONS)
+    parser.add_argument("--regularisation", type=float, default=ALS_REGULARISATION)
+    parser.add_argument("--alpha", type=float, default=ALS_ALPHA)
+    parser.add_argument("--quiz-weight", type=float, default=ALS_QUIZ_WEIGHT)
+    parser.add_argument("--cg-steps", type=int, default=ALS_CG_STEPS, help="0 solves each user and movie exactly")
+    parser.add_argument("--workers", type=int, default=ALS_WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="train model without saving it")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    interactions = als_build_interactions(db_get_user_movie_top_5_batches(), db_get_user_quiz_response_batches())
+    read_time = time.perf_counter() - start
+    user_factors, column_factors = als_train(interactions, args.factors, args.iterations, args.regularisation,
+                                             args.alpha, args.quiz_weight, args.workers, cg_steps=args.cg_steps)
+    train_time = time.perf_counter() - start - read_time
+    if not args.dry_run:
+        als_save_model(args.model_path, interactions, user_factors, column_factors, args.regularisation, args.alpha,
+                       args.quiz_weight)
+    print(f"Trained {args.factors} factors for {len(interactions['user_ids'])} users, "
+          f"{len(interactions['movie_names'])} movies and {len(interactions['quiz_prompt_option_ids'])} quiz "
+          f"options in {train_time:.1f}s, after reading in {read_time:.1f}s")
+
+
+if __name__ == "__main__":
+    run()
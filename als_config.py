@@ -0,0 +1,23 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Path to folder holding trained matrix factorisation model, memory-mapped by app.py
+ALS_MODEL_PATH = os.getenv("ENV_ALS_MODEL_PATH", "als_model")
+# Number of factors in each user and movie embedding, and number of training iterations, each solving all users then
+# all movies
+ALS_FACTORS = int(os.getenv("ENV_ALS_FACTORS", "32"))
+ALS_ITERATIONS = int(os.getenv("ENV_ALS_ITERATIONS", "15"))
+# Regularisation of embeddings, confidence added to each top 5 movie, and fraction of that confidence added to each
+# quiz response
+ALS_REGULARISATION = float(os.getenv("ENV_ALS_REGULARISATION", "0.1"))
+ALS_ALPHA = float(os.getenv("ENV_ALS_ALPHA", "10"))
+ALS_QUIZ_WEIGHT = float(os.getenv("ENV_ALS_QUIZ_WEIGHT", "0.5"))
+# Number of conjugate gradient steps improving each embedding every iteration (0 solves each embedding exactly)
+ALS_CG_STEPS = int(os.getenv("ENV_ALS_CG_STEPS", "3"))
+# Number of threads solving blocks of users or movies at once (empty uses one per core), and number of users or movies
+# in each block
+ALS_WORKERS = int(os.getenv("ENV_ALS_WORKERS") or os.cpu_count() or 1)
+ALS_BLOCK_SIZE = int(os.getenv("ENV_ALS_BLOCK_SIZE", "4096"))
@@ -5,3 +5,14 @@ from dotenv import load_dotenv
 load_dotenv()
 
 API_BASE_URL = os.getenv("ENV_API_BASE_URL")
+# Number of hosts and connections per host kept alive in shared Movie Recommender API session
+API_POOL_CONNECTIONS = int(os.getenv("ENV_API_POOL_CONNECTIONS", "1"))
+API_POOL_MAXSIZE = int(os.getenv("ENV_API_POOL_MAXSIZE", "2"))
+# Seconds to wait for Movie Recommender API to accept connection and to send response
+API_CONNECT_TIMEOUT = float(os.getenv("ENV_API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.getenv("ENV_API_READ_TIMEOUT", "60"))
+# Number of retries and backoff factor in seconds for GET calls failing with 429 or 5xx responses
+API_MAX_RETRIES = int(os.getenv("ENV_API_MAX_RETRIES", "2"))
+API_RETRY_BACKOFF = float(os.getenv("ENV_API_RETRY_BACKOFF", "0.5"))
+# Set to 1 to show connection reuse and retry counters for calls to Movie Recommender API when main.py exits
+API_SHOW_METRICS = os.getenv("ENV_API_SHOW_METRICS", "0") == "1"
@@ -2,7 +2,16 @@ import json
 
 import requests
 
-from api_config import API_BASE_URL
+from api_config import (API_BASE_URL, API_POOL_CONNECTIONS, API_POOL_MAXSIZE, API_CONNECT_TIMEOUT, API_READ_TIMEOUT,
+                        API_MAX_RETRIES, API_RETRY_BACKOFF)
+from http_utils import http_create_session, http_get_session_metrics
+
+
+# Initialise shared session so calls to Movie Recommender API reuse kept-alive connections
+api_session = http_create_session(API_POOL_CONNECTIONS, API_POOL_MAXSIZE, API_MAX_RETRIES, API_RETRY_BACKOFF)
+api_timeout = (API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
+# Initialise client copy of quizzes, checked against API with its ETag on every call
+api_quizzes_cache = {"etag": None, "quizzes": None}
 
 
 # Define function to call API endpoint to add user
@@ -19,10 +28,11 @@ def api_add_user(user_first_name, user_last_name, user_email, user_password):
     # Try to call API endpoint to post user data
     try:
         # Send POST request to /user endpoint, passing user_data in JSON format
-        api_response = requests.post(
+        api_response = api_session.post(
             f"{API_BASE_URL}/user",
             data=json.dumps(user_data),
-            headers={"content-type": "application/json"}
+            headers={"content-type": "application/json"},
+            timeout=api_timeout
         )
         # Test if call to endpoint successful
         if api_response.status_code == 200:
@@ -50,10 +60,11 @@ def api_get_user(user_email, user_password):
     # Try to call API endpoint to get user data
     try:
         # Send GET request to /user endpoint, passing user_data in JSON format
-        api_response = requests.get(
+        api_response = api_session.get(
             f"{API_BASE_URL}/user",
             data=json.dumps(user_data),
-            headers={"content-type": "application/json"}
+            headers={"content-type": "application/json"},
+            timeout=api_timeout
         )
         # Test if call to endpoint successful
         if api_response.status_code == 200:
@@ -80,10 +91,11 @@ def api_add_user_movie_top_5(user_id, movie_names):
     # Try to call API endpoint to post movie data
     try:
         # Send POST request to /user/{user_id}/movie/top_5 endpoint, passing movie_data in JSON format
-        api_response = requests.post(
+        api_response = api_session.post(
             f"{API_BASE_URL}/user/{user_id}/movie/top_5",
             data=json.dumps(movie_data),
-            headers={"content-type": "application/json"}
+            headers={"content-type": "application/json"},
+            timeout=api_timeout
         )
         # Test if call to endpoint successful
         if api_response.status_code == 200:
@@ -103,16 +115,26 @@ def api_add_user_movie_top_5(user_id, movie_names):
 def api_get_quizzes():
     # Initialise quizzes to return
     quizzes = None
+    # Set headers to send ETag of cached quizzes if held, so API does not resend quizzes if unchanged
+    headers = {}
+    if api_quizzes_cache["etag"]:
+        headers["If-None-Match"] = api_quizzes_cache["etag"]
     # Try to call API endpoint to get quizzes data
     try:
         # Send GET request to /quizzes endpoint
-        api_response = requests.get(
-            f"{API_BASE_URL}/quizzes"
+        api_response = api_session.get(
+            f"{API_BASE_URL}/quizzes",
+            headers=headers,
+            timeout=api_timeout
         )
         # Test if call to endpoint successful
         if api_response.status_code == 200:
-            # Extract quizzes from JSON response
+            # Extract quizzes from JSON response and cache them with their ETag
             quizzes = api_response.json().get("quizzes", None)
+            api_quizzes_cache.update(etag=api_response.headers.get("ETag"), quizzes=quizzes)
+        # Test if cached quizzes still current
+        elif api_response.status_code == 304:
+            quizzes = api_quizzes_cache["quizzes"]
     # Raise exception in event of requests error
     except requests.exceptions.RequestException as e:
         print(f"An error occurred with the Movie Recommender API: {e}")
@@ -150,10 +172,11 @@ def api_add_user_quiz_responses(user_id, quiz_id, quiz_responses):
     # Try to call API endpoint to post quiz response data
     try:
         # Send POST request to /user/{user_id}/quiz/{quiz_id} endpoint, passing quiz_response_data in JSON format
-        api_response = requests.post(
+        api_response = api_session.post(
             f"{API_BASE_URL}/user/{user_id}/quiz/{quiz_id}",
             data=json.dumps(quiz_response_data),
-            headers={"content-type": "application/json"}
+            headers={"content-type": "application/json"},
+            timeout=api_timeout
         )
         # Test if call to endpoint successful
         if api_response.status_code == 200:
@@ -176,8 +199,9 @@ def api_get_user_movie_recommendations(user_id):
     # Try to call API endpoint to get movie recommendations
     try:
         # Send GET request to /user/{user_id}/movie/recommendations endpoint
-        api_response = requests.get(
-            f"{API_BASE_URL}/user/{user_id}/movie/recommendations"
+        api_response = api_session.get(
+            f"{API_BASE_URL}/user/{user_id}/movie/recommendations",
+            timeout=api_timeout
         )
         # Test if call to endpoint successful
         if api_response.status_code == 200:
@@ -191,3 +215,8 @@ def api_get_user_movie_recommendations(user_id):
         print(f"An unexpected error occurred: {e}")
     # Return movies or None if call to endpoint unsuccessful
     return movies
+
+
+# Define function to get connection reuse and retry counters for calls to Movie Recommender API
+def api_get_metrics():
+    return {"http": http_get_session_metrics(api_session)}
@@ -1,16 +1,47 @@
+import hashlib
+import heapq
 import itertools
-from flask import Flask, jsonify, request
+import threading
+from collections import Counter
 from operator import itemgetter
 
-from db_utils import (db_add_user, db_get_user, db_add_user_movie_top_5, db_get_quizzes, db_add_user_quiz_responses,
-                      db_get_movie_top_5_for_similar_users)
-from tmdb_utils import (tmdb_get_movie_for_movie_name, tmdb_get_unique_movies, tmdb_get_filtered_movies,
-                        tmdb_get_movie_recommendations_for_movie_id)
+from flask import Flask, jsonify, request, stream_with_context
+
+from als import als_get_model, als_get_user_factor, als_get_top_movie_names
+from db_config import DB_BATCH_SIZE
+from db_utils import (db_add_user, db_get_user, db_add_user_movie_top_5, db_add_user_movie_top_5_batch,
+                      db_get_quizzes, db_get_quiz_catalog_version, db_add_user_quiz_responses,
+                      db_get_movie_top_5_for_similar_users, db_get_movie_top_5_for_similar_users_batch,
+                      db_get_movie_top_5_for_users,
+                      db_get_tmdb_movies_for_movie_names,
+                      db_add_tmdb_movies_for_movie_names, db_get_user_movie_recommendations,
+                      db_add_user_movie_recommendations, db_get_movie_neighbours,
+                      db_get_user_movie_top_5_and_quiz_responses, db_get_pool_metrics, DbConnectionError)
+from scoring import scoring_is_popularity_only, scoring_is_cooccurrence_weighted, scoring_get_top_movies
+from scoring_config import SCORING_TOP_K, SCORING_MAX_LIMIT
+from similar_users import similar_users_get_index, similar_users_get_cached_similar_users, similar_users_cache
+from similar_users_config import SIMILAR_USERS_K
+from tmdb_catalog import tmdb_normalise_movie_name
+from tmdb_config import TMDB_MOVIE_NAME_TTL
+from tmdb_utils import (tmdb_get_movie_for_movie_name, tmdb_add_unique_movies, tmdb_get_filtered_movies,
+                        tmdb_get_movie_recommendations_for_movie_id, tmdb_map_concurrently,
+                        tmdb_map_as_completed, tmdb_is_circuit_open, tmdb_get_catalog_movie_for_movie_name,
+                        tmdb_get_degraded_count, tmdb_get_metrics)
 
 
 # Create instance of Flask class to host API endpoints
 app = Flask(__name__)
 
+# Define recommendation modes, where vibes builds recommendations from TMDB recommendations for top 5 movies of users
+# with same vibe, nearest from top 5 movies of users with most similar quiz responses, and als from matrix
+# factorisation model trained by als.py
+APP_RECOMMENDATION_MODES = ("vibes", "nearest", "als")
+
+# Initialise in-process quiz catalog cache, holding /quizzes response body and ETag for one quiz catalog version
+app_quiz_catalog = {"version": None, "body": None, "etag": None}
+app_quiz_catalog_lock = threading.Lock()
+app_quiz_catalog_metrics = {"hits": 0, "misses": 0, "not_modified": 0}
+
 
 # Define route to post user details and bind to function
 @app.route("/user", methods=["POST"])
@@ -90,17 +121,78 @@ def app_post_user_movie_top_5(user_id):
     return jsonify(api_response), status_code
 
 
+# Define helper function to get dictionary of comma-separated lists of movie names keyed by user_id from batch request
+# data, or None if not a list of users each with integer user_id and movie_names string. Where a user_id is repeated,
+# last movie_names supplied are kept
+def app_get_batch_movie_top_5(user_data):
+    users = user_data.get("users") if isinstance(user_data, dict) else None
+    if not isinstance(users, list) or not all(isinstance(user, dict) and type(user.get("user_id")) is int
+                                              and isinstance(user.get("movie_names"), str) for user in users):
+        return None
+    return {user["user_id"]: user["movie_names"] for user in users}
+
+
+# Define route to post top 5 movies for many users and bind to function, so bulk imports add DB_BATCH_SIZE users in each
+# transaction rather than one request and transaction per user
+@app.route("/users/movie/top_5", methods=["POST"])
+def app_post_users_movie_top_5():
+    # Extract movie names for each user from request body in JSON format
+    movie_top_5_by_user_id = app_get_batch_movie_top_5(request.get_json(silent=True))
+    # Test if users missing or invalid
+    if movie_top_5_by_user_id is None:
+        # Return empty list of users, along with status code 400 to indicate bad request
+        return jsonify({"users": []}), 400
+    # Set update_counts to return value of db_add_user_movie_top_5_batch called with movie names for each user
+    update_counts = db_add_user_movie_top_5_batch(movie_top_5_by_user_id)
+    # Create dictionary item to return update_count for each user, in order users first supplied
+    api_response = {"users": [{"user_id": user_id, "update_count": update_counts[user_id]}
+                              for user_id in movie_top_5_by_user_id]}
+    # Return update_counts as JSON response object, along with status code 200 to indicate successful request
+    return jsonify(api_response), 200
+
+
+# Define helper function to get /quizzes response body and ETag, rebuilt from database only when quiz catalog version
+# changes
+def app_get_quiz_catalog():
+    # Set version to current quiz catalog version, or None to rebuild without caching if version unavailable
+    try:
+        version = db_get_quiz_catalog_version()
+    except DbConnectionError as e:
+        print(f"Failed to get quiz catalog version: {e}")
+        version = None
+    # Return cached body and ETag if built for current version
+    with app_quiz_catalog_lock:
+        if version is not None and app_quiz_catalog["version"] == version:
+            app_quiz_catalog_metrics["hits"] += 1
+            return app_quiz_catalog["body"], app_quiz_catalog["etag"]
+        app_quiz_catalog_metrics["misses"] += 1
+    # Build response body from quizzes, with strong ETag from hash of body so it changes whenever body does
+    body = app.json.dumps({"quizzes": db_get_quizzes()})
+    etag = hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+    if version is not None:
+        with app_quiz_catalog_lock:
+            app_quiz_catalog.update(version=version, body=body, etag=etag)
+    return body, etag
+
+
 # Define route to get quizzes and bind to function
 @app.route("/quizzes", methods=["GET"])
 def app_get_quizzes():
-    # Set quizzes to return value of db_get_quizzes
-    quizzes = db_get_quizzes()
-    # Set status code to 200 to indicate successful request
-    status_code = 200
-    # Create dictionary item to return quizzes
-    api_response = {"quizzes": quizzes}
-    # Return quizzes as JSON response object, along with status code
-    return jsonify(api_response), status_code
+    # Set body and etag to cached quiz catalog
+    body, etag = app_get_quiz_catalog()
+    # Test if client already holds current quiz catalog
+    if etag in request.if_none_match:
+        with app_quiz_catalog_lock:
+            app_quiz_catalog_metrics["not_modified"] += 1
+        # Create empty response with status code 304 to indicate client copy not modified
+        response = app.response_class(status=304)
+    else:
+        # Create response with quizzes in JSON format, along with status code 200 to indicate successful request
+        response = app.response_class(body, status=200, mimetype="application/json")
+    # Set ETag and ask clients to check it on every request, as quizzes can change at any time
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 # Define route to post user quiz responses and bind to function, passing user_id and quiz_id
@@ -123,6 +215,8 @@ def app_post_user_quiz(user_id, quiz_id):
         # Set update_count to return value of db_add_user_quiz_responses called with user_id, quiz_id and
         # quiz_responses_str
         update_count = db_add_user_quiz_responses(user_id, quiz_id, quiz_responses_str)
+        # Find users with most similar quiz responses again on next use, as user's quiz responses have changed
+        similar_users_cache.invalidate(user_id)
         # Set status code to 200 to indicate successful request
         status_code = 200
     else:
@@ -134,34 +228,459 @@ def app_post_user_quiz(user_id, quiz_id):
     return jsonify(api_response), status_code
 
 
-# Define route to get user's movie recommendations and bind to function, passing user_id
-@app.route("/user/<int:user_id>/movie/recommendations", methods=["GET"])
-def app_get_user_movie_recommendations(user_id):
-    # Initialise list of movies to return
-    movies = []
-    # Initialise list to track movie_ids of specified user's top 5 movies
-    user_movie_top_5_ids = []
+# Define helper function to resolve movie names to movie dictionary items, from cache, then local catalog, searching
+# TMDB only for names in neither. Only movies resolved by TMDB search are cached
+def app_get_movies_for_movie_names(movie_names):
+    # Normalise movie names into cache keys
+    movie_name_keys = [tmdb_normalise_movie_name(movie_name) for movie_name in movie_names]
+    # Retrieve cached movie details for all keys in one query
+    movies = db_get_tmdb_movies_for_movie_names(set(movie_name_keys), TMDB_MOVIE_NAME_TTL)
+    # Collect movie names not cached, keeping first spelling seen for each key
+    unresolved_movie_names = {}
+    for movie_name_key, movie_name in zip(movie_name_keys, movie_names):
+        if movie_name_key not in movies and movie_name_key not in unresolved_movie_names:
+            unresolved_movie_names[movie_name_key] = movie_name
+    # Resolve uncached movie names from local catalog without caching them, as catalog movies have no overview and
+    # are found again in catalog without calling TMDB
+    catalog_movies = {}
+    for movie_name_key, movie_name in unresolved_movie_names.items():
+        movie = tmdb_get_catalog_movie_for_movie_name(movie_name)
+        if movie:
+            catalog_movies[movie_name_key] = movie
+    movies.update(catalog_movies)
+    search_movie_names = {movie_name_key: movie_name for movie_name_key, movie_name in unresolved_movie_names.items()
+                          if movie_name_key not in catalog_movies}
+    # Search TMDB for movie names neither cached nor in catalog, concurrently if configured
+    resolved_movies = tmdb_map_concurrently(tmdb_get_movie_for_movie_name, search_movie_names.values())
+    # Keep movie names that TMDB resolved
+    new_movies = {movie_name_key: movie for movie_name_key, movie in zip(search_movie_names, resolved_movies)
+                  if movie}
+    # Use expired cached movie details for movie names not resolved while TMDB unavailable
+    stale_movie_name_keys = {movie_name_key for movie_name_key in search_movie_names
+                             if movie_name_key not in new_movies}
+    if TMDB_MOVIE_NAME_TTL > 0 and stale_movie_name_keys and tmdb_is_circuit_open():
+        movies.update(db_get_tmdb_movies_for_movie_names(stale_movie_name_keys))
+    # Try to cache newly resolved movie names, continuing without caching in event of DB error
+    if new_movies:
+        try:
+            db_add_tmdb_movies_for_movie_names(new_movies)
+        except DbConnectionError as e:
+            print(f"Unable to cache resolved movie names: {e}")
+        movies.update(new_movies)
+    # Return movie dictionary item, or None if unresolved, for every movie name supplied
+    return [movies.get(movie_name_key) for movie_name_key in movie_name_keys]
+
+
+# Define helper function to resolve movie names to movie dictionary items from cached resolutions, however old, and
+# local catalog only, without calling TMDB. Movie names not found, and all movie names in event of DB error, are None
+def app_get_cached_movies_for_movie_names(movie_names):
+    movie_name_keys = [tmdb_normalise_movie_name(movie_name) for movie_name in movie_names]
+    try:
+        movies = db_get_tmdb_movies_for_movie_names(set(movie_name_keys))
+    except DbConnectionError as e:
+        print(f"Unable to read cached movie names: {e}")
+        return [None] * len(movie_names)
+    for movie_name_key, movie_name in zip(movie_name_keys, movie_names):
+        if movie_name_key not in movies:
+            movie = tmdb_get_catalog_movie_for_movie_name(movie_name)
+            if movie:
+                movies[movie_name_key] = movie
+    return [movies.get(movie_name_key) for movie_name_key in movie_name_keys]
+
+
+# Define helper function to resolve top 5 movie names and neighbour movie names to movie dictionary items, keyed by
+# movie name. Top 5 movie names are searched on TMDB if not cached, while neighbours not already resolved as top 5
+# movies are only resolved from cache and local catalog, as there can be 20 for every top 5 movie, and neighbours
+# not found are skipped
+def app_get_movies_by_movie_name(top_5_movie_names, movie_neighbours):
+    movies_by_movie_name = dict(zip(top_5_movie_names, app_get_movies_for_movie_names(top_5_movie_names)))
+    neighbour_movie_names = list(dict.fromkeys(neighbour["movie_name"] for neighbours in movie_neighbours.values()
+                                               for neighbour in neighbours
+                                               if neighbour["movie_name"] not in movies_by_movie_name))
+    movies_by_movie_name.update(zip(neighbour_movie_names,
+                                    app_get_cached_movies_for_movie_names(neighbour_movie_names)))
+    return movies_by_movie_name
+
+
+# Define helper function to add support of a movie, the number of top 5 places it holds among user and similar users,
+# to support count of each movie it recommends, and count it as recommending each
+def app_add_recommendations_support(support_counts, recommender_counts, support, recommendations):
+    for recommendation in recommendations:
+        support_counts[recommendation["movie_id"]] += support
+        recommender_counts[recommendation["movie_id"]] += 1
+
+
+# Define helper function to get neighbours of users' top 5 movies, keyed by movie name key, from top 5 movies keyed by
+# user_id. No neighbours are read unless co-occurrence similarities are weighted, and recommendations are built without
+# neighbours in event of DB error
+def app_get_movie_neighbours(top_5_movies_by_user_id):
+    if not scoring_is_cooccurrence_weighted():
+        return {}
+    movie_name_keys = {tmdb_normalise_movie_name(top_5_movie["movie_name"])
+                       for top_5_movies in top_5_movies_by_user_id.values() for top_5_movie in top_5_movies
+                       if top_5_movie["user_top_5"] == 1}
+    try:
+        return db_get_movie_neighbours(movie_name_keys)
+    except DbConnectionError as e:
+        print(f"Unable to read movie neighbours: {e}")
+        return {}
+
+
+# Define helper function to get (movie, similarity) tuples for resolved neighbours of user's top 5 movies, in order of
+# user's top 5 movies then neighbour rank. Each of user's top 5 movie names is counted once
+def app_get_user_movie_neighbours(top_5_movies, movie_neighbours, movies_by_movie_name):
+    movie_name_keys = dict.fromkeys(tmdb_normalise_movie_name(top_5_movie["movie_name"])
+                                    for top_5_movie in top_5_movies if top_5_movie["user_top_5"] == 1)
+    return [(movies_by_movie_name[neighbour["movie_name"]], neighbour["similarity"])
+            for movie_name_key in movie_name_keys for neighbour in movie_neighbours.get(movie_name_key, [])
+            if movies_by_movie_name.get(neighbour["movie_name"])]
+
+
+# Define function to build movie recommendations for each user from top 5 movies of user and similar users, keyed by
+# user_id as returned by db_get_movie_top_5_for_similar_users_batch. Each movie name is resolved, and each movie's
+# recommendations retrieved, once for all users, then merged for each user as for a single user. Neighbours of user's
+# top 5 movies are merged after recommendations when co-occurrence similarities are weighted. Returns top count movies
+# for each user
+def app_build_movie_recommendations(top_5_movies_by_user_id, count=SCORING_TOP_K):
+    # Resolve distinct movie names and neighbour movie names across all users to movie dictionary items, using cached
+    # resolutions where available
+    movie_neighbours = app_get_movie_neighbours(top_5_movies_by_user_id)
+    top_5_movie_names = list(dict.fromkeys(top_5_movie["movie_name"]
+                                           for top_5_movies in top_5_movies_by_user_id.values()
+                                           for top_5_movie in top_5_movies))
+    movies_by_movie_name = app_get_movies_by_movie_name(top_5_movie_names, movie_neighbours)
+    # Retrieve recommendations for distinct resolved movie_ids of top 5 movies across all users, concurrently if
+    # configured
+    movie_ids = list(dict.fromkeys(movies_by_movie_name[movie_name]["movie_id"] for movie_name in top_5_movie_names
+                                   if movies_by_movie_name[movie_name]))
+    recommendations_by_movie_id = dict(zip(movie_ids, tmdb_map_concurrently(tmdb_get_movie_recommendations_for_movie_id,
+                                                                            movie_ids)))
+    # Initialise dictionary of lists of movie dictionary items to return, keyed by user_id
+    movies_by_user_id = {}
+    for user_id, top_5_movies in top_5_movies_by_user_id.items():
+        # Initialise dictionary of unique movies to return, keyed by movie_id in order first seen
+        movies = {}
+        # Initialise set to track movie_ids of user's top 5 movies
+        user_movie_top_5_ids = set()
+        # Initialise number of top 5 places held by each movie among user and similar users
+        movie_supports = Counter()
+        # Iterate over list of top 5 movies for user and all similar users in original order, so merged output
+        # matches serial processing
+        for top_5_movie in top_5_movies:
+            movie = movies_by_movie_name[top_5_movie["movie_name"]]
+            # Skip movie names not resolved, e.g. names that are not movies
+            if not movie:
+                continue
+            movie_supports[movie["movie_id"]] += top_5_movie["user_top_5"] + top_5_movie["others_top_5"]
+            # Test if movie in user's top 5
+            if top_5_movie["user_top_5"] == 1:
+                # Add movie_id to set for tracking user's top 5
+                user_movie_top_5_ids.add(movie["movie_id"])
+            else:
+                # Add movie dictionary item to unique movies to return
+                tmdb_add_unique_movies(movies, [movie])
+            # Add recommendations to unique movies to return
+            tmdb_add_unique_movies(movies, recommendations_by_movie_id[movie["movie_id"]])
+        # Add support of each movie to itself and to movies it recommends
+        support_counts = Counter(movie_supports)
+        recommender_counts = Counter()
+        for movie_id, support in movie_supports.items():
+            app_add_recommendations_support(support_counts, recommender_counts, support,
+                                            recommendations_by_movie_id[movie_id])
+        # Add neighbours of user's top 5 movies to unique movies to return, summing similarity of each
+        similarities = Counter()
+        for movie, similarity in app_get_user_movie_neighbours(top_5_movies, movie_neighbours, movies_by_movie_name):
+            tmdb_add_unique_movies(movies, [movie])
+            similarities[movie["movie_id"]] += similarity
+        # Exclude from movies any of user's top 5, and select top count movies by descending ranking score
+        movies = tmdb_get_filtered_movies(movies.values(), user_movie_top_5_ids)
+        movies_by_user_id[user_id] = scoring_get_top_movies(movies, support_counts, recommender_counts, count,
+                                                            similarities)
+    # Return dictionary of lists of movie dictionary items
+    return movies_by_user_id
+
+
+# Define function to build user's top count movie recommendations from top 5 movies of user and similar users
+def app_build_user_movie_recommendations(user_id, count=SCORING_TOP_K):
     # Set top_5_movies to return value of db_get_movie_top_5_for_similar_users called with user_id
     top_5_movies = db_get_movie_top_5_for_similar_users(user_id)
-    # Iterate over list of top 5 movies for specified user and all similar users
-    for top_5_movie in top_5_movies:
-        # Create movie dictionary item with result of calling tmdb_get_movie_for_movie_name with current movie name
-        movie = tmdb_get_movie_for_movie_name(top_5_movie["movie_name"])
-        # Test if movie in specified user's top 5
-        if top_5_movie["user_top_5"] == 1:
-            # Append movie_id to list for tracking specified user's top 5
-            user_movie_top_5_ids.append(movie["movie_id"])
+    # Return list of movie dictionary items
+    return app_build_movie_recommendations({user_id: top_5_movies}, count)[user_id]
+
+
+# Define function to build user's movie recommendations to store, returning movies and whether any TMDB call failed
+# while building them, in which case movies may be missing or partial and should not be stored as fresh. Calls failed
+# for other requests at the same time are also counted, so recommendations are at worst built again later
+def app_build_user_movie_recommendations_to_store(user_id):
+    degraded_count = tmdb_get_degraded_count()
+    movies = app_build_user_movie_recommendations(user_id)
+    return movies, tmdb_get_degraded_count() != degraded_count
+
+
+# Define helper function to add movie to heap of top count (popularity, -index, -position, movie) entries, where
+# (index, position) is where movie is seen when merging top 5 movies and their recommendations in order, so movies
+# with equal popularity rank as in app_build_movie_recommendations whatever order recommendations arrive in. A movie
+# seen more than once keeps its highest ranked entry, which is its first entry unless TMDB returned differing
+# popularities for it, and movie_keys holds that entry's key for each movie_id
+def app_add_top_movie(top_movies, movie_keys, count, index, position, movie):
+    # Skip movie if already seen with same or higher rank
+    key = (movie["movie_popularity"], -index, -position)
+    movie_id = movie["movie_id"]
+    if movie_id in movie_keys and movie_keys[movie_id] >= key:
+        return
+    # Remove lower ranked entry for movie, so heap still holds top count movies
+    if movie_id in movie_keys:
+        top_movies[:] = [entry for entry in top_movies if entry[3]["movie_id"] != movie_id]
+        heapq.heapify(top_movies)
+    movie_keys[movie_id] = key
+    entry = key + (movie,)
+    if len(top_movies) < count:
+        heapq.heappush(top_movies, entry)
+    elif entry > top_movies[0]:
+        heapq.heapreplace(top_movies, entry)
+
+
+# Define helper function to add movie to candidate movies, keyed by movie_id, with (index, position) where movie is
+# first seen when merging top 5 movies and their recommendations in order
+def app_add_candidate_movie(candidate_movies, index, position, movie):
+    if movie["movie_id"] not in candidate_movies or (index, position) < candidate_movies[movie["movie_id"]][0]:
+        candidate_movies[movie["movie_id"]] = ((index, position), movie)
+
+
+# Define function to build user's top count movie recommendations from top 5 movies of user and similar users, as
+# app_build_movie_recommendations does, yielding a progress dictionary item as each movie's recommendations arrive,
+# then a dictionary item for each movie in rank order. When ranking by popularity alone only the top count movies are
+# held, otherwise all candidate movies are, as a movie's score rises with each movie recommending it. As TMDB gives no
+# bound on popularity of recommendations not yet retrieved, ranks are certain only once all recommendations arrive
+def app_stream_movie_recommendations(top_5_movies, count):
+    # Resolve distinct movie names and neighbour movie names to movie dictionary items, skipping movie names not
+    # resolved
+    movie_neighbours = app_get_movie_neighbours({None: top_5_movies})
+    movies_by_movie_name = app_get_movies_by_movie_name(
+        list(dict.fromkeys(top_5_movie["movie_name"] for top_5_movie in top_5_movies)), movie_neighbours)
+    resolved_top_5_movies = [(top_5_movie, movies_by_movie_name[top_5_movie["movie_name"]])
+                             for top_5_movie in top_5_movies if movies_by_movie_name[top_5_movie["movie_name"]]]
+    # Set movie_ids of user's top 5 movies to exclude
+    user_movie_top_5_ids = {movie["movie_id"] for top_5_movie, movie in resolved_top_5_movies
+                            if top_5_movie["user_top_5"] == 1}
+    # Initialise heap of top movies and key of each movie_id seen when ranking by popularity alone, otherwise
+    # candidate movies
+    popularity_only = scoring_is_popularity_only()
+    top_movies = []
+    movie_keys = {}
+    candidate_movies = {}
+    # Add movies not in user's top 5, each ahead of its recommendations in merge order
+    for index, (top_5_movie, movie) in enumerate(resolved_top_5_movies):
+        if top_5_movie["user_top_5"] != 1 and movie["movie_id"] not in user_movie_top_5_ids:
+            if popularity_only:
+                app_add_top_movie(top_movies, movie_keys, count, index, 0, movie)
+            else:
+                app_add_candidate_movie(candidate_movies, index, 0, movie)
+    # Add neighbours of user's top 5 movies after all recommendations in merge order, summing similarity of each.
+    # Neighbours are only read when co-occurrence similarities are weighted, so never ranked by popularity alone
+    similarities = Counter()
+    for position, (movie, similarity) in enumerate(
+            app_get_user_movie_neighbours(top_5_movies, movie_neighbours, movies_by_movie_name)):
+        if movie["movie_id"] not in user_movie_top_5_ids:
+            app_add_candidate_movie(candidate_movies, len(resolved_top_5_movies), position, movie)
+            similarities[movie["movie_id"]] += similarity
+    # Set index of first position of each distinct movie_id, which all later recommendations for movie_id follow, and
+    # number of top 5 places held by each movie among user and similar users
+    movie_indexes = {}
+    movie_supports = Counter()
+    for index, (top_5_movie, movie) in enumerate(resolved_top_5_movies):
+        movie_indexes.setdefault(movie["movie_id"], index)
+        movie_supports[movie["movie_id"]] += top_5_movie["user_top_5"] + top_5_movie["others_top_5"]
+    support_counts = Counter(movie_supports)
+    recommender_counts = Counter()
+    movie_ids = list(movie_indexes)
+    yield {"fetched": 0, "total": len(movie_ids)}
+    # Add recommendations for each movie_id in order they arrive, concurrently if configured
+    for fetched, (movie_id_index, recommendations) in enumerate(
+            tmdb_map_as_completed(tmdb_get_movie_recommendations_for_movie_id, movie_ids), 1):
+        movie_id = movie_ids[movie_id_index]
+        for position, movie in enumerate(recommendations, 1):
+            if movie["movie_id"] in user_movie_top_5_ids:
+                continue
+            if popularity_only:
+                app_add_top_movie(top_movies, movie_keys, count, movie_indexes[movie_id], position, movie)
+            else:
+                app_add_candidate_movie(candidate_movies, movie_indexes[movie_id], position, movie)
+        app_add_recommendations_support(support_counts, recommender_counts, movie_supports[movie_id], recommendations)
+        yield {"fetched": fetched, "total": len(movie_ids)}
+    # Rank movies by popularity, or by ranking score of candidate movies in merge order
+    if popularity_only:
+        movies = [entry[3] for entry in sorted(top_movies, reverse=True)]
+    else:
+        movies = scoring_get_top_movies([movie for _, movie in sorted(candidate_movies.values(), key=itemgetter(0))],
+                                        support_counts, recommender_counts, count, similarities)
+    # Yield movies in rank order
+    for rank, movie in enumerate(movies, 1):
+        yield {"rank": rank, "movie": movie}
+
+
+# Define function to build user's top count movie recommendations from matrix factorisation model trained by als.py,
+# scoring every movie in model for user, most similar first, and resolving top movie names. Returns None if no model
+# trained or model knows none of user's top 5 movies or quiz responses
+def app_build_als_movie_recommendations(user_id, count):
+    model = als_get_model()
+    if model is None:
+        return None
+    # Read user's top 5 movies, to exclude, and quiz responses, to place user in model if not trained on
+    movie_names, quiz_prompt_option_ids = db_get_user_movie_top_5_and_quiz_responses(user_id)
+    movie_name_keys = [tmdb_normalise_movie_name(movie_name) for movie_name in movie_names]
+    user_factor = als_get_user_factor(model, user_id, movie_name_keys, quiz_prompt_option_ids)
+    if user_factor is None:
+        return None
+    # Resolve twice as many movie names as needed, as some may not resolve or may resolve to same movie
+    movies = {}
+    tmdb_add_unique_movies(movies, [movie for movie in app_get_movies_for_movie_names(
+        als_get_top_movie_names(model, user_factor, 2 * count, movie_name_keys)) if movie])
+    return list(movies.values())[:count]
+
+
+# Define helper function to get quiz_prompt_option_ids of user's quiz responses
+def app_get_user_quiz_responses(user_id):
+    return db_get_user_movie_top_5_and_quiz_responses(user_id)[1]
+
+
+# Define function to get top 5 movies of user and up to SIMILAR_USERS_K users with most similar quiz responses, in
+# same format as db_get_movie_top_5_for_similar_users, where similar users are found with index built by
+# similar_users.py and cached for each user. Returns None if no index built or no users have similar quiz responses
+def app_get_movie_top_5_for_nearest_users(user_id):
+    index = similar_users_get_index()
+    if index is None:
+        return None
+    similar_users = similar_users_get_cached_similar_users(index, user_id, app_get_user_quiz_responses,
+                                                           SIMILAR_USERS_K)
+    if not similar_users:
+        return None
+    return db_get_movie_top_5_for_users(user_id, [similar_user_id for similar_user_id, _ in similar_users])
+
+
+# Define helper function to test if streamed response requested, with stream=1 or by accepting only NDJSON
+def app_is_stream_requested():
+    return request.args.get("stream") == "1" or \
+        request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+
+
+# Define helper function to get limit on number of movies from request, SCORING_TOP_K if not supplied, or
+# None if not a positive integer up to SCORING_MAX_LIMIT
+def app_get_limit():
+    limit = request.args.get("limit", str(SCORING_TOP_K))
+    return int(limit) if limit.isdecimal() and 0 < int(limit) <= SCORING_MAX_LIMIT else None
+
+
+# Define helper function to get recommendation mode from request, "vibes" if not supplied, or None if not known
+def app_get_mode():
+    mode = request.args.get("mode", "vibes")
+    return mode if mode in APP_RECOMMENDATION_MODES else None
+
+
+# Define helper function to create NDJSON response streaming one line for each dictionary item
+def app_stream_lines(items):
+    lines = (app.json.dumps(item) + "\n" for item in items)
+    return app.response_class(stream_with_context(lines), status=200, mimetype="application/x-ndjson")
+
+
+# Define helper function to get user_ids from batch request data, or None if not a list of integer user_ids
+def app_get_batch_user_ids(user_data):
+    user_ids = user_data.get("user_ids") if isinstance(user_data, dict) else None
+    if not isinstance(user_ids, list) or not all(type(user_id) is int for user_id in user_ids):
+        return None
+    # Remove duplicate user_ids, keeping first occurrence
+    return list(dict.fromkeys(user_ids))
+
+
+# Define helper function to build movie recommendations for user_ids DB_BATCH_SIZE users at a time, yielding
+# (user_id, movies) tuples in order of user_ids, so a batch of users is read with one query and its movies fetched once
+def app_build_batch_movie_recommendations(user_ids):
+    for start in range(0, len(user_ids), DB_BATCH_SIZE):
+        top_5_movies_by_user_id = db_get_movie_top_5_for_similar_users_batch(user_ids[start:start + DB_BATCH_SIZE])
+        yield from app_build_movie_recommendations(top_5_movies_by_user_id).items()
+
+
+# Define route to get movie recommendations for many users and bind to function. Recommendations are always built
+# fresh and not stored. With stream=1, each user's recommendations are streamed as one JSON line as soon as their batch
+# is built
+@app.route("/users/movie/recommendations", methods=["POST"])
+def app_post_users_movie_recommendations():
+    # Extract user_ids from request body in JSON format
+    user_ids = app_get_batch_user_ids(request.get_json(silent=True))
+    # Test if user_ids missing or invalid
+    if user_ids is None:
+        # Return empty list of users, along with status code 400 to indicate bad request
+        return jsonify({"users": []}), 400
+    # Test if streaming requested
+    if app_is_stream_requested():
+        # Stream one JSON line per user, built one batch at a time
+        return app_stream_lines({"user_id": user_id, "movies": movies}
+                                for user_id, movies in app_build_batch_movie_recommendations(user_ids))
+    # Create dictionary item to return movies for each user
+    api_response = {"users": [{"user_id": user_id, "movies": movies}
+                              for user_id, movies in app_build_batch_movie_recommendations(user_ids)]}
+    # Return movies as JSON response object, along with status code 200 to indicate successful request
+    return jsonify(api_response), 200
+
+
+# Define route to get user's movie recommendations and bind to function, passing user_id. Up to limit movies are
+# returned, built fresh if limit is above number stored. When streaming requested, a header line is returned first,
+# then progress lines as movies' recommendations arrive, then one line for each movie in rank order
+@app.route("/user/<int:user_id>/movie/recommendations", methods=["GET"])
+def app_get_user_movie_recommendations(user_id):
+    # Set limit on number of movies to return and recommendation mode, returning status code 400 to indicate bad
+    # request if invalid
+    limit = app_get_limit()
+    mode = app_get_mode()
+    if limit is None or mode is None:
+        return jsonify({"movies": []}), 400
+    # Set model movies to recommendations from matrix factorisation model if requested, which are not stored, or None
+    # to build recommendations from users with same vibe if not requested or model unavailable
+    model_movies = app_build_als_movie_recommendations(user_id, limit) if mode == "als" else None
+    if mode == "als" and model_movies is None:
+        print(f"Unable to build movie recommendations from model for user {user_id}")
+    # Set nearest top 5 movies to top 5 movies of users with most similar quiz responses if requested, whose
+    # recommendations are built fresh and not stored, or None to use users with same vibe if not requested or none found
+    nearest_top_5_movies = app_get_movie_top_5_for_nearest_users(user_id) if mode == "nearest" else None
+    if mode == "nearest" and nearest_top_5_movies is None:
+        print(f"Unable to find users with similar quiz responses for user {user_id}")
+    # Test if fresh recommendations requested, or more than stored
+    fresh = request.args.get("fresh") == "1" or limit > SCORING_TOP_K
+    # Test if streaming requested
+    if app_is_stream_requested():
+        # Set movies to model movies, or precomputed recommendations if usable, otherwise stream recommendations built
+        # fresh and not stored, from users with most similar quiz responses if found
+        movies = model_movies
+        if movies is None and nearest_top_5_movies is None and not fresh:
+            movies = db_get_user_movie_recommendations(user_id)[0]
+        if movies is not None:
+            lines = [{"rank": rank, "movie": movie} for rank, movie in enumerate(movies[:limit], 1)]
+        elif nearest_top_5_movies is not None:
+            lines = app_stream_movie_recommendations(nearest_top_5_movies, limit)
         else:
-            # Add movie dictionary item to unique list of movies to return
-            movies = list(tmdb_get_unique_movies(itertools.chain(movies, [movie])))
-        # Retrieve recommendations for current movie_id
-        recommendations = tmdb_get_movie_recommendations_for_movie_id(movie["movie_id"])
-        # Add recommendations to unique list of movies to return
-        movies = list(tmdb_get_unique_movies(itertools.chain(movies, recommendations)))
-    # Exclude from list of movies any of specified user's top 5
-    movies = tmdb_get_filtered_movies(movies, user_movie_top_5_ids)
-    # Sort movies by descending popularity and slice top 25
-    movies = list(itertools.islice(sorted(movies, key=itemgetter("movie_popularity"), reverse=True), 25))
+            lines = app_stream_movie_recommendations(db_get_movie_top_5_for_similar_users(user_id), limit)
+        return app_stream_lines(itertools.chain([{"user_id": user_id, "limit": limit}], lines))
+    if model_movies is not None:
+        movies = model_movies
+    elif nearest_top_5_movies is not None:
+        movies = app_build_movie_recommendations({user_id: nearest_top_5_movies}, limit)[user_id]
+    elif fresh:
+        # Build recommendations without reading or updating precomputed recommendations
+        movies = app_build_user_movie_recommendations(user_id, limit)
+    else:
+        # Set movies to precomputed recommendations, or None if not yet computed or stale
+        movies, stale_version = db_get_user_movie_recommendations(user_id)
+        # Test if recommendations need computing
+        if movies is None:
+            # Build recommendations and try to store them, continuing without storing in event of DB error, and
+            # leaving them to be built again if any TMDB call failed
+            movies, is_degraded = app_build_user_movie_recommendations_to_store(user_id)
+            try:
+                if not is_degraded:
+                    db_add_user_movie_recommendations(user_id, movies, stale_version)
+            except DbConnectionError as e:
+                print(f"Unable to store movie recommendations: {e}")
+        movies = movies[:limit]
     # Set status code to 200 to indicate successful request
     status_code = 200
     # Create dictionary item to return movies
@@ -170,5 +689,19 @@ def app_get_user_movie_recommendations(user_id):
     return jsonify(api_response), status_code
 
 
+# Define route to get performance counters and bind to function
+@app.route("/metrics", methods=["GET"])
+def app_get_metrics():
+    # Create dictionary item to return counters for each component
+    with app_quiz_catalog_lock:
+        quiz_catalog_metrics = dict(app_quiz_catalog_metrics)
+    api_response = {"tmdb": tmdb_get_metrics(),
+                    "db": db_get_pool_metrics(),
+                    "quiz_catalog": quiz_catalog_metrics,
+                    "similar_users_cache": similar_users_cache.get_metrics()}
+    # Return counters as JSON response object, along with status code 200 to indicate successful request
+    return jsonify(api_response), 200
+
+
 if __name__ == "__main__":
     app.run(debug=True)
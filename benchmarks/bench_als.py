@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from als import als_train  # noqa: E402
+from als_config import ALS_WORKERS  # noqa: E402
+from scoring import scoring_get_top_indexes  # noqa: E402
+
+
+# Define function to build interactions, as als_build_interactions returns them, where each user lists 5 movies drawn
+# mostly from popular movies and answers one of 4 options for each of 10 quiz prompts
+def build_interactions(user_count, movie_count, seed=0):
+    random_generator = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, movie_count + 1)
+    movie_numbers = random_generator.choice(movie_count, size=(user_count, 5), p=weights / weights.sum())
+    option_numbers = movie_count + np.arange(10) * 4 + random_generator.integers(0, 4, size=(user_count, 10))
+    columns = np.concatenate([movie_numbers, option_numbers], axis=1)
+    column_count = movie_count + 40
+    # Remove duplicate movies of each user, sorting by user then column
+    codes = np.unique(np.arange(user_count)[:, None] * column_count + columns)
+    return {"user_ids": np.arange(user_count),
+            "movie_name_keys": [f"movie {number}" for number in range(movie_count)],
+            "movie_names": [f"Movie {number}" for number in range(movie_count)],
+            "quiz_prompt_option_ids": np.arange(40),
+            "indptr": np.concatenate([[0], np.cumsum(np.bincount(codes // column_count, minlength=user_count))]),
+            "indices": codes % column_count}
+
+
+# Define main function to time training iterations across numbers of users and workers, and scoring all movies for one
+# user with one matrix-vector product against a loop over movies in Python
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark training and scoring of matrix factorisation model")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="numbers of users")
+    parser.add_argument("--movies", type=int, default=20000, help="number of distinct movies")
+    parser.add_argument("--factors", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, ALS_WORKERS}))
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} cores, {args.movies} movies, {args.factors} factors")
+    for user_count in args.sizes:
+        interactions = build_interactions(user_count, args.movies)
+        timings = []
+        for workers in args.workers:
+            start = time.perf_counter()
+            user_factors, column_factors = als_train(interactions, args.factors, args.iterations, 0.1, 10, 0.5,
+                                                     workers)
+            timings.append(f"workers={workers}: {(time.perf_counter() - start) / args.iterations * 1000:8.1f}ms")
+        print(f"users={user_count:>8}  interactions={len(interactions['indices']):>9}  per iteration  "
+              + "  ".join(timings))
+    # Time scoring all movies for one user and selecting top 25, with NumPy and in Python
+    movie_factors = np.ascontiguousarray(column_factors[:args.movies])
+    user_factor = user_factors[0]
+    start = time.perf_counter()
+    for _ in range(100):
+        numpy_top = scoring_get_top_indexes(movie_factors @ user_factor, 25).tolist()
+    numpy_time = (time.perf_counter() - start) / 100
+    movie_rows = movie_factors.tolist()
+    user_row = user_factor.tolist()
+    start = time.perf_counter()
+    scores = [sum(movie_value * user_value for movie_value, user_value in zip(movie_row, user_row))
+              for movie_row in movie_rows]
+    python_top = sorted(range(len(scores)), key=lambda movie_number: -scores[movie_number])[:25]
+    python_time = time.perf_counter() - start
+    identical = "identical" if python_top == numpy_top else "DIFFERENT"
+    print(f"score {args.movies} movies for one user  numpy={numpy_time * 1000:.3f}ms  python={python_time * 1000:.1f}ms"
+          f"  top 25 {identical}")
+
+
+if __name__ == "__main__":
+    run()
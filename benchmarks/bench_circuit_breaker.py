@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tmdb_utils  # noqa: E402
+from app import app  # noqa: E402
+from http_utils import CircuitBreaker  # noqa: E402
+from tmdb_stub import TmdbStub, stub_movie_id_for_movie_name  # noqa: E402
+
+
+# Define helper function to return cached movie details for every movie name key, as tmdb_movie_names table would
+# once names resolved, so only recommendations calls reach TMDB stub
+def get_cached_movies(movie_name_keys, ttl_seconds=0):
+    return {movie_name_key: {"movie_id": stub_movie_id_for_movie_name(movie_name_key), "movie_name": movie_name_key,
+                             "movie_overview": None, "movie_popularity": 1.0, "movie_release_date": None}
+            for movie_name_key in movie_name_keys}
+
+
+# Define function to time requests to recommendations endpoint in each phase of TMDB brownout, returning list of
+# (phase, timings, movie count) tuples
+def time_brownout(client, stub, circuit_breaker, args):
+    results = []
+    for phase, latency in (("healthy", args.latency), ("brownout", args.brownout_latency),
+                           ("recovered", args.latency)):
+        stub.server.RequestHandlerClass.latency = latency
+        # Give background probe time to find TMDB recovered, allowing for probe already in flight in brownout
+        if phase == "recovered":
+            deadline = time.monotonic() + args.brownout_latency + args.reset_timeout * 2
+            while circuit_breaker.get_metrics()["state"] == "open" and time.monotonic() < deadline:
+                time.sleep(0.01)
+        timings = []
+        movie_count = 0
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            response = client.get("/user/1/movie/recommendations?fresh=1")
+            timings.append(time.perf_counter() - start)
+            movie_count = len(response.json["movies"])
+        results.append((phase, timings, movie_count))
+    return results
+
+
+# Define main function to compare endpoint latency through TMDB brownout with and without circuit breaker
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark recommendations endpoint through TMDB brownout")
+    parser.add_argument("--seed-movies", type=int, default=20, help="rows returned for similar users")
+    parser.add_argument("--requests", type=int, default=5, help="requests timed in each phase")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per TMDB call in seconds")
+    parser.add_argument("--brownout-latency", type=float, default=3, help="stub latency per TMDB call in brownout")
+    parser.add_argument("--latency-budget", type=float, default=0.5, help="seconds before call counts as failed")
+    parser.add_argument("--reset-timeout", type=float, default=1, help="seconds between probes while circuit open")
+    args = parser.parse_args()
+    top_5_movies = [{"movie_name": f"Seed Movie {number}", "user_top_5": 1 if number < 5 else 0}
+                    for number in range(args.seed_movies)]
+    print(f"{args.seed_movies} seed movies, {args.brownout_latency * 1000:.0f}ms stub latency per call in brownout,"
+          f" {args.latency_budget * 1000:.0f}ms latency budget")
+    for label, failure_threshold in (("without breaker", 0), ("with breaker", 5)):
+        circuit_breaker = CircuitBreaker(failure_threshold, args.latency_budget, args.reset_timeout,
+                                         tmdb_utils.tmdb_circuit_breaker.probe)
+        # Expire cached recommendations immediately, so every request calls TMDB while it is available and falls back
+        # to last recommendations retrieved while circuit open
+        with TmdbStub(latency=args.latency) as stub, \
+                patch("tmdb_utils.tmdb_base_url", stub.base_url), \
+                patch("tmdb_utils.tmdb_circuit_breaker", circuit_breaker), \
+                patch.object(tmdb_utils.tmdb_rate_limiter, "rate", 0), \
+                patch.object(tmdb_utils.tmdb_recommendations_cache, "ttl_seconds", 0), \
+                patch("tmdb_utils.TMDB_MAX_WORKERS", 8), \
+                patch("app.db_get_movie_top_5_for_similar_users", return_value=top_5_movies), \
+                patch("app.db_get_tmdb_movies_for_movie_names", side_effect=get_cached_movies):
+            tmdb_utils.tmdb_invalidate_movie_recommendations()
+            print(label)
+            for phase, timings, movie_count in time_brownout(app.test_client(), stub, circuit_breaker, args):
+                print(f"  {phase:<10} max={max(timings) * 1000:8.1f}ms"
+                      f"  median={sorted(timings)[len(timings) // 2] * 1000:8.1f}ms  movies={movie_count}")
+            print(f"  circuit breaker: {circuit_breaker.get_metrics()}")
+
+
+if __name__ == "__main__":
+    run()
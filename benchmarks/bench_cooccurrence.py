@@ -0,0 +1,69 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cooccurrence import cooccurrence_build_matrix, cooccurrence_get_neighbour_rows  # noqa: E402
+from db_config import DB_BATCH_SIZE  # noqa: E402
+
+
+# Define function to build batches of (user_id, movie_name) rows in user_id order, where each user lists 5 movies drawn
+# mostly from popular movies, as db_get_user_movie_top_5_batches yields them
+def build_batches(user_count, movie_count, batch_size):
+    random.seed(user_count)
+    weights = [1 / (movie_number + 1) for movie_number in range(movie_count)]
+    rows = []
+    for user_id in range(user_count):
+        movie_numbers = set()
+        while len(movie_numbers) < 5:
+            movie_numbers.update(random.choices(range(movie_count), weights, k=5 - len(movie_numbers)))
+        rows.extend((user_id, f"Movie {movie_number}") for movie_number in sorted(movie_numbers))
+    return [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+
+
+# Define function to count users listing each pair of movies in Python, as a dictionary of pair counts would
+def count_pairs_in_python(batches):
+    pair_counts = Counter()
+    for _, user_rows in itertools.groupby(itertools.chain.from_iterable(batches), key=lambda row: row[0]):
+        movie_names = sorted({movie_name.lower() for _, movie_name in user_rows})
+        pair_counts.update(itertools.permutations(movie_names, 2))
+    return pair_counts
+
+
+# Define main function to compare counting movie pairs in Python with building co-occurrence matrix in NumPy
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark building movie neighbours from users' top 5 movies")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000], help="numbers of users")
+    parser.add_argument("--movies", type=int, default=5000, help="number of distinct movies")
+    parser.add_argument("--neighbours", type=int, default=20)
+    args = parser.parse_args()
+    for user_count in args.sizes:
+        batches = build_batches(user_count, args.movies, DB_BATCH_SIZE)
+        start = time.perf_counter()
+        pair_counts = count_pairs_in_python(batches)
+        python_time = time.perf_counter() - start
+        start = time.perf_counter()
+        matrix = cooccurrence_build_matrix(batches)
+        numpy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        row_count = sum(1 for _ in cooccurrence_get_neighbour_rows(matrix, args.neighbours, 2, "cosine"))
+        neighbours_time = time.perf_counter() - start
+        # Check pair counts match
+        movie_name_keys = matrix["movie_name_keys"]
+        rows = [movie_number for movie_number in range(len(movie_name_keys))
+                for _ in range(matrix["indptr"][movie_number], matrix["indptr"][movie_number + 1])]
+        numpy_pair_counts = {(movie_name_keys[row], movie_name_keys[column]): count
+                             for row, column, count in zip(rows, matrix["indices"].tolist(), matrix["counts"].tolist())}
+        identical = "identical" if numpy_pair_counts == dict(pair_counts) else "DIFFERENT"
+        print(f"users={user_count:>7}  pairs={len(pair_counts):>8}  python={python_time * 1000:9.1f}ms"
+              f"  numpy={numpy_time * 1000:9.1f}ms  neighbours={neighbours_time * 1000:8.1f}ms ({row_count} rows)"
+              f"  counts {identical}")
+
+
+if __name__ == "__main__":
+    run()
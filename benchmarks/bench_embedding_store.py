@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_store import EmbeddingStore  # noqa: E402
+
+
+# Define function to build vectors drawn around cluster_count random centres, as embeddings of similar movies or users
+# gather together, and queries drawn the same way
+def build_vectors(row_count, query_count, dimension, cluster_count, seed=0):
+    random_generator = np.random.default_rng(seed)
+    centres = random_generator.standard_normal((cluster_count, dimension))
+    rows = centres[random_generator.integers(0, cluster_count, row_count + query_count)]
+    vectors = (rows + 0.5 * random_generator.standard_normal(rows.shape)).astype(np.float32)
+    return vectors[:row_count], vectors[row_count:]
+
+
+# Define main function to time building an inverted file index, and exact and indexed searches for top k rows across
+# numbers of rows and lists probed, reporting recall of indexed searches against exact searches
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark exact and inverted file index searches of embedding store")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000], help="numbers of rows")
+    parser.add_argument("--dimension", type=int, default=32)
+    parser.add_argument("--clusters", type=int, default=1000, help="number of clusters vectors are drawn around")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--lists", type=int, help="number of index lists (empty uses square root of rows)")
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} cores, {args.dimension} dimensions, top {args.k}, {args.queries} queries")
+    for row_count in args.sizes:
+        vectors, queries = build_vectors(row_count, args.queries, args.dimension, args.clusters)
+        with tempfile.TemporaryDirectory() as path:
+            store = EmbeddingStore.create(path, args.dimension, "<i8").append(np.arange(row_count), vectors)
+            start = time.perf_counter()
+            indexed_store = store.build_index(args.lists)
+            build_time = time.perf_counter() - start
+            print(f"rows={row_count:>8}  lists={len(indexed_store.centroids)}  index built in {build_time:.1f}s")
+            # Search exactly, keeping rows found as ground truth
+            start = time.perf_counter()
+            exact_rows = [set(store.search_rows(query, args.k)[0].tolist()) for query in queries]
+            exact_time = (time.perf_counter() - start) / args.queries
+            print(f"  exact            {exact_time * 1000:8.3f}ms  recall@{args.k}=1.000")
+            for probes in args.probes:
+                start = time.perf_counter()
+                indexed_rows = [indexed_store.search_rows(query, args.k, probes=probes)[0].tolist()
+                                for query in queries]
+                indexed_time = (time.perf_counter() - start) / args.queries
+                recall = np.mean([len(exact_rows[query_number].intersection(rows)) / args.k
+                                  for query_number, rows in enumerate(indexed_rows)])
+                print(f"  probes={probes:<8}  {indexed_time * 1000:8.3f}ms  recall@{args.k}={recall:.3f}  "
+                      f"speed-up {exact_time / indexed_time:.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,105 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_utils import db_connect, db_get_quizzes, db_movie_top_5_for_similar_users_query  # noqa: E402
+from explain_similar_users import SYNTHETIC_EMAIL_DOMAIN, seed_synthetic_users  # noqa: E402
+from migrate import migrate_create_migrations_table, migrate_get_applied_versions, migrate_run  # noqa: E402
+
+# Define query counting vibes in one user's responses to one quiz, as in sp_refresh_user_vibe
+VIBE_COUNT_QUERY = """
+    SELECT
+        qpo.quiz_prompt_option_vibe,
+        COUNT(*) AS vibe_count
+    FROM
+        user_quiz_responses uqr
+    INNER JOIN
+        quiz_prompt_options qpo
+        ON qpo.quiz_prompt_option_id = uqr.quiz_prompt_option_id
+    WHERE
+        uqr.user_id = %(user_id)s
+        AND uqr.quiz_id = 1
+    GROUP BY
+        qpo.quiz_prompt_option_vibe
+"""
+
+
+# Define function to add one response per quiz prompt for synthetic users without quiz responses
+def seed_synthetic_quiz_responses(db_connection):
+    cursor = db_connection.cursor()
+    cursor.execute(f"""
+        INSERT INTO
+            user_quiz_responses (user_id, quiz_id, quiz_prompt_option_id)
+        SELECT
+            u.user_id,
+            qp.quiz_id,
+            qpo.quiz_prompt_option_id
+        FROM
+            users u
+        INNER JOIN
+            quiz_prompts qp
+        INNER JOIN
+            quiz_prompt_options qpo
+            ON qpo.quiz_prompt_id = qp.quiz_prompt_id
+            AND qpo.quiz_prompt_option_order = 1 + (u.user_id + qp.quiz_prompt_order) % 3
+        WHERE
+            u.user_email LIKE '%@{SYNTHETIC_EMAIL_DOMAIN}'
+            AND NOT EXISTS (SELECT 1 FROM user_quiz_responses uqr WHERE uqr.user_id = u.user_id)
+    """)
+    db_connection.commit()
+    cursor.execute("ANALYZE TABLE user_quiz_responses")
+    cursor.fetchall()
+    cursor.close()
+
+
+# Define function to time hot queries, returning average milliseconds per query for each
+def time_queries(db_connection, user_ids):
+    timings = {}
+    cursor = db_connection.cursor()
+    for label, query in (("similar users' top 5 movies", db_movie_top_5_for_similar_users_query),
+                         ("vibe count for user's quiz", VIBE_COUNT_QUERY)):
+        start = time.perf_counter()
+        for user_id in user_ids:
+            cursor.execute(query, {"user_id": user_id})
+            cursor.fetchall()
+        timings[label] = (time.perf_counter() - start) * 1000 / len(user_ids)
+    cursor.close()
+    start = time.perf_counter()
+    for _ in user_ids:
+        db_get_quizzes()
+    timings["quizzes"] = (time.perf_counter() - start) * 1000 / len(user_ids)
+    return timings
+
+
+# Define main function to time hot queries on seeded dataset before and after applying migration 001
+def run():
+    parser = argparse.ArgumentParser(description="Time hot queries before and after covering index migration")
+    parser.add_argument("--users", type=int, default=100000, help="number of synthetic users to seed")
+    parser.add_argument("--samples", type=int, default=20, help="number of users to time queries for")
+    args = parser.parse_args()
+    db_connection = db_connect()
+    try:
+        cursor = db_connection.cursor()
+        migrate_create_migrations_table(cursor)
+        if 1 in migrate_get_applied_versions(cursor):
+            raise SystemExit("Migration 001 already applied - before timings need a database without it")
+        seed_synthetic_users(db_connection, args.users, 20000)
+        seed_synthetic_quiz_responses(db_connection)
+        cursor.execute("SELECT user_id FROM users WHERE user_email LIKE %s ORDER BY user_id LIMIT %s",
+                       (f"%@{SYNTHETIC_EMAIL_DOMAIN}", args.samples))
+        user_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        before = time_queries(db_connection, user_ids)
+        migrate_run(target_version=1)
+        after = time_queries(db_connection, user_ids)
+    finally:
+        db_connection.close()
+    for label in before:
+        print(f"{label:>28}  before={before[label]:8.2f}ms  after={after[label]:8.2f}ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tmdb_utils  # noqa: E402
+from tmdb_stub import TmdbStub  # noqa: E402
+
+
+# Define main function to compare recommendations lost to 429 responses with and without client-side rate limit
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark TMDB calls against throttling TMDB stub")
+    parser.add_argument("--calls", type=int, default=300, help="number of recommendations calls for distinct movies")
+    parser.add_argument("--threads", type=int, default=32, help="number of calls in flight at once")
+    parser.add_argument("--stub-rate-limit", type=int, default=40, help="requests per second allowed by stub")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0, 35], help="client rate limits (0 disables)")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per TMDB call in seconds")
+    args = parser.parse_args()
+    print(f"{args.calls} calls from {args.threads} threads, stub allows {args.stub_rate_limit} requests per second")
+    for rate in args.rates:
+        # Use fresh stub and full rate limiter for each rate, so throttling from previous run does not carry over
+        rate_limiter = tmdb_utils.tmdb_rate_limiter
+        with TmdbStub(latency=args.latency, rate_limit=args.stub_rate_limit) as stub, \
+                patch("tmdb_utils.tmdb_base_url", stub.base_url), \
+                patch.multiple(rate_limiter, rate=rate, timeout=60, max_waiting=0, max_wait_seconds=0.0, pauses=0,
+                               state=(float(rate_limiter.capacity), rate_limiter.clock(), 0.0)):
+            tmdb_utils.tmdb_invalidate_movie_recommendations()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                results = list(executor.map(tmdb_utils.tmdb_get_movie_recommendations_for_movie_id,
+                                            range(1, args.calls + 1)))
+            elapsed = time.perf_counter() - start
+            empty_count = sum(1 for movies in results if not movies)
+            metrics = rate_limiter.get_metrics()
+            print(f"rate={rate:>5g}/s  empty results={empty_count:>4}  requests={len(stub.request_paths):>4}"
+                  f"  {elapsed:6.1f}s  max waiting={metrics['max_waiting']:>3}"
+                  f"  max wait={metrics['max_wait_seconds']:.2f}s  pauses={metrics['pauses']}")
+
+
+if __name__ == "__main__":
+    run()
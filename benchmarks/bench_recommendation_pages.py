@@ -0,0 +1,45 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tmdb_utils  # noqa: E402
+from tmdb_stub import TmdbStub  # noqa: E402
+
+
+# Define main function to compare latency and popularity of recommendations fetched from increasing numbers of pages
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark fetching several pages of TMDB recommendations")
+    parser.add_argument("--movies", type=int, default=20, help="number of movies to fetch recommendations for")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 2, 3, 5, 8], help="numbers of pages to fetch")
+    parser.add_argument("--workers", type=int, default=4, help="maximum number of pages fetched at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per TMDB call in seconds")
+    args = parser.parse_args()
+    print(f"{args.movies} movies, {args.workers} workers, {args.latency * 1000:.0f}ms stub latency per call,"
+          f" stub has 5 pages per movie")
+    with TmdbStub(latency=args.latency) as stub, patch("tmdb_utils.tmdb_base_url", stub.base_url), \
+            patch.object(tmdb_utils.tmdb_rate_limiter, "rate", 0), patch("tmdb_utils.TMDB_MAX_WORKERS", args.workers):
+        for pages in args.pages:
+            with patch("tmdb_utils.TMDB_RECOMMENDATIONS_PAGES", pages), patch("tmdb_utils.tmdb_page_executor", None):
+                tmdb_utils.tmdb_invalidate_movie_recommendations()
+                metrics_before = tmdb_utils.tmdb_get_recommendations_page_metrics()
+                timings = []
+                popularities = []
+                for movie_id in range(1, args.movies + 1):
+                    start = time.perf_counter()
+                    movies = tmdb_utils.tmdb_get_movie_recommendations_for_movie_id(movie_id)
+                    timings.append(time.perf_counter() - start)
+                    popularities.append(statistics.mean(movie["movie_popularity"] for movie in movies))
+                metrics_after = tmdb_utils.tmdb_get_recommendations_page_metrics()
+                print(f"pages={pages}  median={statistics.median(timings) * 1000:6.1f}ms"
+                      f"  mean top 10 popularity={statistics.mean(popularities):7.2f}"
+                      f"  pages fetched={metrics_after['fetched'] - metrics_before['fetched']:>3}"
+                      f"  skipped={metrics_after['skipped'] - metrics_before['skipped']:>3}")
+
+
+if __name__ == "__main__":
+    run()
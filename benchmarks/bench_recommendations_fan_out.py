@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tmdb_utils  # noqa: E402
+from app import app  # noqa: E402
+from tmdb_stub import TmdbStub  # noqa: E402
+
+
+# Define function to time recommendations endpoint for given number of workers against TMDB stub
+def time_recommendations(client, max_workers, repeats):
+    # Configure shared thread pool for requested number of workers
+    tmdb_utils.TMDB_MAX_WORKERS = max_workers
+    tmdb_utils.tmdb_executor = None
+    timings = []
+    response = None
+    for _ in range(repeats):
+        # Clear cached recommendations so every call fans out to TMDB stub
+        tmdb_utils.tmdb_invalidate_movie_recommendations()
+        start = time.perf_counter()
+        response = client.get("/user/1/movie/recommendations?fresh=1")
+        timings.append(time.perf_counter() - start)
+    return response.get_data(), sorted(timings)
+
+
+# Define main function to compare serial and concurrent fan-out
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark TMDB fan-out in recommendations endpoint")
+    parser.add_argument("--seed-movies", type=int, default=50, help="rows returned for similar users")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per TMDB call in seconds")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    # Build synthetic top 5 rows for user and similar users
+    top_5_movies = [{"movie_name": f"Seed Movie {number}", "user_top_5": 1 if number < 5 else 0}
+                    for number in range(args.seed_movies)]
+    with TmdbStub(latency=args.latency) as stub, \
+            patch("tmdb_utils.tmdb_base_url", stub.base_url), \
+            patch.object(tmdb_utils.tmdb_rate_limiter, "rate", 0), \
+            patch("app.db_get_movie_top_5_for_similar_users", return_value=top_5_movies), \
+            patch("app.db_get_tmdb_movies_for_movie_names", return_value={}), \
+            patch("app.db_add_tmdb_movies_for_movie_names"):
+        client = app.test_client()
+        baseline = None
+        print(f"{args.seed_movies} seed movies, {args.latency * 1000:.0f}ms stub latency per call")
+        for max_workers in args.workers:
+            output, timings = time_recommendations(client, max_workers, args.repeats)
+            # Check merged output identical to serial path
+            baseline = baseline or output
+            identical = "identical" if output == baseline else "DIFFERENT"
+            print(f"workers={max_workers:>3}  median={timings[len(timings) // 2] * 1000:8.1f}ms  "
+                  f"max={timings[-1] * 1000:8.1f}ms  output {identical}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,76 @@
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scoring  # noqa: E402
+from scoring import scoring_get_scores, scoring_get_top_indexes, scoring_get_top_movies  # noqa: E402
+
+# Define weights used for benchmark, so every feature is scored
+WEIGHTS = {"SCORING_POPULARITY_WEIGHT": 1.0, "SCORING_SUPPORT_WEIGHT": 0.8, "SCORING_RECOMMENDERS_WEIGHT": 0.5,
+           "SCORING_RECENCY_WEIGHT": 0.3, "SCORING_RECENCY_HALF_LIFE": 10.0}
+
+
+# Define function to build candidate movies with support and recommender counts keyed by movie_id
+def build_candidates(candidate_count):
+    random.seed(candidate_count)
+    movies = [{"movie_id": movie_id, "movie_popularity": round(random.random() * 100, 3),
+               "movie_release_date": f"{random.randint(1950, 2026)}-01-01"} for movie_id in range(candidate_count)]
+    support_counts = {movie["movie_id"]: random.randint(0, 40) for movie in movies}
+    recommender_counts = {movie["movie_id"]: random.randint(1, 8) for movie in movies}
+    return movies, support_counts, recommender_counts
+
+
+# Define function to score each movie dictionary item in Python, as a per-movie key function would
+def score_in_python(movies, support_counts, recommender_counts, current_year, k):
+    def get_score(indexed_movie):
+        index, movie = indexed_movie
+        year = int(movie["movie_release_date"][:4])
+        score = (WEIGHTS["SCORING_POPULARITY_WEIGHT"] * math.log1p(movie["movie_popularity"])
+                 + WEIGHTS["SCORING_SUPPORT_WEIGHT"] * math.log1p(support_counts[movie["movie_id"]])
+                 + WEIGHTS["SCORING_RECOMMENDERS_WEIGHT"] * math.log1p(recommender_counts[movie["movie_id"]])
+                 + WEIGHTS["SCORING_RECENCY_WEIGHT"] * 2 ** (-max(current_year - year, 0)
+                                                             / WEIGHTS["SCORING_RECENCY_HALF_LIFE"]))
+        return score, -index
+    return [movie for _, movie in heapq.nlargest(k, enumerate(movies), key=get_score)]
+
+
+# Define main function to compare scoring in Python with scoring in NumPy across candidate counts
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark ranking of candidate movies by weighted score")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    with patch.multiple(scoring, **WEIGHTS), patch("scoring.datetime") as mock_datetime:
+        mock_datetime.date.today.return_value.year = 2026
+        for candidate_count in args.sizes:
+            movies, support_counts, recommender_counts = build_candidates(candidate_count)
+            timings = {"python": [], "numpy": [], "arrays only": []}
+            arrays = ([movie["movie_popularity"] for movie in movies], list(support_counts.values()),
+                      list(recommender_counts.values()), [int(movie["movie_release_date"][:4]) for movie in movies])
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                python_result = score_in_python(movies, support_counts, recommender_counts, 2026, args.k)
+                timings["python"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                numpy_result = scoring_get_top_movies(movies, support_counts, recommender_counts, args.k)
+                timings["numpy"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                scoring_get_top_indexes(scoring_get_scores(*arrays, 2026), args.k)
+                timings["arrays only"].append(time.perf_counter() - start)
+            # Check rankings match, as float rounding differs little between Python and NumPy
+            identical = "identical" if python_result == numpy_result else "DIFFERENT"
+            print(f"candidates={candidate_count:>7}  " + "  ".join(
+                f"{name}={sorted(times)[len(times) // 2] * 1000:8.2f}ms" for name, times in timings.items())
+                + f"  output {identical}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similar_users import similar_users_build_responses, similar_users_get_similar_users  # noqa: E402
+from similar_users_config import SIMILAR_USERS_WORKERS  # noqa: E402
+
+# Define number of quizzes, prompts in each quiz and options for each prompt, each option having one of 4 vibes, and
+# how often users lean to each vibe, so some vibes are common and others rare
+QUIZ_COUNT = 10
+PROMPT_COUNT = 5
+VIBE_WEIGHTS = np.array([0.6, 0.25, 0.12, 0.03])
+
+
+# Define function to build (user_id, quiz_prompt_option_id) response rows of users taking 1 to 3 quizzes, each
+# answering most prompts of a quiz with option of vibe they lean to, and (user_id, vibe_id) rows of dominant vibe of
+# each quiz taken, as in user_vibes
+def build_responses(user_count, seed=0):
+    random_generator = np.random.default_rng(seed)
+    quiz_counts = random_generator.choice([1, 2, 3], size=user_count, p=[0.5, 0.3, 0.2])
+    user_ids = np.repeat(np.arange(1, user_count + 1), quiz_counts)
+    quiz_ids = np.concatenate([random_generator.permutation(QUIZ_COUNT)[:quiz_count] for quiz_count in quiz_counts])
+    leaning_vibes = random_generator.choice(4, size=len(quiz_ids), p=VIBE_WEIGHTS)
+    vibes = np.where(random_generator.random((len(quiz_ids), PROMPT_COUNT)) < 0.7, leaning_vibes[:, None],
+                     random_generator.integers(0, 4, (len(quiz_ids), PROMPT_COUNT)))
+    option_ids = (quiz_ids[:, None] * PROMPT_COUNT + np.arange(PROMPT_COUNT)) * 4 + vibes
+    response_rows = np.stack([np.repeat(user_ids, PROMPT_COUNT), option_ids.reshape(-1)], axis=1)
+    # Set dominant vibe of each quiz taken, lowest vibe winning ties
+    dominant_vibes = np.argmax(np.stack([(vibes == vibe).sum(axis=1) for vibe in range(4)], axis=1), axis=1)
+    return response_rows, np.stack([user_ids, quiz_ids * 4 + dominant_vibes], axis=1)
+
+
+# Define main function to compare number of users each user's recommendations are built from when similar users share
+# a vibe_id with when they are the k users with most similar quiz responses, then time finding the k most similar
+# users for one user, and for batches of users at once, with 1 worker and with one per core
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark finding users with most similar quiz responses")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000], help="numbers of users")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=64, help="number of users found at once in batches")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, SIMILAR_USERS_WORKERS}))
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} cores, {QUIZ_COUNT * PROMPT_COUNT * 4} quiz options, k={args.k}")
+    for user_count in args.sizes:
+        response_rows, vibe_rows = build_responses(user_count)
+        start = time.perf_counter()
+        index = similar_users_build_responses([response_rows])
+        index["response_counts"] = np.diff(index["indptr"])
+        build_time = time.perf_counter() - start
+        # Count users sharing each vibe_id, then users sharing any vibe_id with each user, as vibe groups
+        # overlap only where users took more than one quiz, and sum for each user is a close upper bound
+        group_sizes = np.bincount(vibe_rows[:, 1])
+        fan_outs = np.bincount(vibe_rows[:, 0], weights=group_sizes[vibe_rows[:, 1]] - 1)[1:]
+        print(f"users={user_count:>8}  responses={len(index['indices'])}  index built in {build_time:.1f}s")
+        print(f"  vibe groups   sizes min={group_sizes[group_sizes > 0].min()} median="
+              f"{int(np.median(group_sizes[group_sizes > 0]))} max={group_sizes.max()}  users per user "
+              f"p1={int(np.percentile(fan_outs, 1))} median={int(np.median(fan_outs))} max={int(fan_outs.max())}")
+        query_user_ids = np.random.default_rng(1).choice(index["user_ids"], size=max(args.queries, args.batch),
+                                                         replace=False)
+        query_option_ids = [index["quiz_prompt_option_ids"][
+            index["indices"][index["indptr"][user_id - 1]:index["indptr"][user_id]]] for user_id in query_user_ids]
+        for workers in args.workers:
+            executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+            try:
+                start = time.perf_counter()
+                similar_users = [similar_users_get_similar_users(index, [user_id], [option_ids], args.k,
+                                                                 executor=executor)[0]
+                                 for user_id, option_ids in zip(query_user_ids[:args.queries],
+                                                                 query_option_ids[:args.queries])]
+                single_time = (time.perf_counter() - start) / args.queries
+                start = time.perf_counter()
+                similar_users_get_similar_users(index, query_user_ids[:args.batch], query_option_ids[:args.batch],
+                                                args.k, executor=executor)
+                batch_time = (time.perf_counter() - start) / args.batch
+            finally:
+                if executor:
+                    executor.shutdown()
+            print(f"  nearest k     workers={workers}  one user {single_time * 1000:7.1f}ms  in batches of "
+                  f"{args.batch} {batch_time * 1000:6.1f}ms per user  users per user "
+                  f"min={min(map(len, similar_users))} max={max(map(len, similar_users))}")
+
+
+if __name__ == "__main__":
+    run()
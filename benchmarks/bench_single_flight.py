@@ -0,0 +1,61 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tmdb_utils  # noqa: E402
+from tmdb_stub import TmdbStub  # noqa: E402
+
+
+# Define function to simulate burst of users requesting recommendations at once, each for the top 5 movies of their
+# vibe group, returning time taken
+def run_burst(get_recommendations, user_count, group_count, movie_pool_size):
+    random.seed(user_count)
+    group_movie_ids = [random.sample(range(1, movie_pool_size + 1), 5) for _ in range(group_count)]
+    start_barrier = threading.Barrier(user_count)
+
+    def user(user_number):
+        start_barrier.wait()
+        for movie_id in group_movie_ids[user_number % group_count]:
+            get_recommendations(movie_id)
+
+    user_threads = [threading.Thread(target=user, args=(number,)) for number in range(user_count)]
+    start = time.perf_counter()
+    for user_thread in user_threads:
+        user_thread.start()
+    for user_thread in user_threads:
+        user_thread.join()
+    return time.perf_counter() - start
+
+
+# Define main function to compare TMDB calls made for burst with and without calls shared between users
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark sharing concurrent TMDB recommendations calls")
+    parser.add_argument("--users", type=int, default=64, help="number of users requesting recommendations at once")
+    parser.add_argument("--groups", type=int, nargs="+", default=[1, 4, 16, 64], help="numbers of vibe groups")
+    parser.add_argument("--movie-pool", type=int, default=200, help="number of distinct movies in top 5 lists")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per TMDB call in seconds")
+    args = parser.parse_args()
+    with TmdbStub(latency=args.latency) as stub, patch("tmdb_utils.tmdb_base_url", stub.base_url), \
+            patch.object(tmdb_utils.tmdb_rate_limiter, "rate", 0):
+        print(f"{args.users} users at once, {args.latency * 1000:.0f}ms stub latency per call")
+        for group_count in args.groups:
+            results = []
+            for label, get_recommendations in (("unshared", tmdb_utils.tmdb_fetch_movie_recommendations_for_movie_id),
+                                               ("shared", tmdb_utils.tmdb_get_movie_recommendations_for_movie_id)):
+                # Clear cached recommendations so only calls in flight at once can be shared
+                tmdb_utils.tmdb_invalidate_movie_recommendations()
+                request_count = len(stub.request_paths)
+                elapsed = run_burst(get_recommendations, args.users, group_count, args.movie_pool)
+                results.append(f"{label}: calls={len(stub.request_paths) - request_count:>4}  {elapsed * 1000:7.1f}ms")
+            print(f"groups={group_count:>3}  " + "  ".join(results))
+        print(f"single flight counters: {tmdb_utils.tmdb_get_metrics()['single_flight']['recommendations']}")
+
+
+if __name__ == "__main__":
+    run()
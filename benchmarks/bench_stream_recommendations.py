@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tmdb_utils  # noqa: E402
+from app import app  # noqa: E402
+from tmdb_stub import TmdbStub  # noqa: E402
+
+
+# Define function to time first and last line of recommendations endpoint, whole or streamed, returning movies
+def time_recommendations(client, limit, stream):
+    # Clear cached recommendations so every call fans out to TMDB stub
+    tmdb_utils.tmdb_invalidate_movie_recommendations()
+    headers = {"Accept": "application/x-ndjson"} if stream else {}
+    start = time.perf_counter()
+    response = client.get(f"/user/1/movie/recommendations?fresh=1&limit={limit}", headers=headers, buffered=False)
+    first_time = None
+    body = b""
+    for chunk in response.response:
+        first_time = first_time or time.perf_counter() - start
+        body += chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+    last_time = time.perf_counter() - start
+    response.close()
+    if stream:
+        movies = [line["movie"] for line in map(json.loads, body.decode("utf-8").splitlines()) if "rank" in line]
+    else:
+        movies = json.loads(body)["movies"]
+    return first_time, last_time, movies
+
+
+# Define main function to compare time to first line of streamed response with whole response
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark streamed recommendations endpoint")
+    parser.add_argument("--seed-movies", type=int, default=50, help="rows returned for similar users")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per TMDB call in seconds")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--limits", type=int, nargs="+", default=[25, 100])
+    args = parser.parse_args()
+    # Build synthetic top 5 rows for user and similar users
+    top_5_movies = [{"movie_name": f"Seed Movie {number}", "user_top_5": 1 if number < 5 else 0}
+                    for number in range(args.seed_movies)]
+    with TmdbStub(latency=args.latency) as stub, \
+            patch("tmdb_utils.tmdb_base_url", stub.base_url), \
+            patch("tmdb_utils.TMDB_MAX_WORKERS", args.workers), \
+            patch("tmdb_utils.tmdb_executor", None), \
+            patch.object(tmdb_utils.tmdb_rate_limiter, "rate", 0), \
+            patch("app.db_get_movie_top_5_for_similar_users", return_value=top_5_movies), \
+            patch("app.db_get_tmdb_movies_for_movie_names", return_value={}), \
+            patch("app.db_add_tmdb_movies_for_movie_names"):
+        client = app.test_client()
+        print(f"{args.seed_movies} seed movies, {args.latency * 1000:.0f}ms stub latency per call, "
+              f"{args.workers} workers")
+        # Warm up, so movie names are resolved before timings
+        time_recommendations(client, args.limits[0], stream=False)
+        for limit in args.limits:
+            _, whole_time, whole_movies = time_recommendations(client, limit, stream=False)
+            first_time, last_time, stream_movies = time_recommendations(client, limit, stream=True)
+            # Check streamed movies identical to whole response
+            identical = "identical" if stream_movies == whole_movies else "DIFFERENT"
+            print(f"limit={limit:>4}  whole={whole_time * 1000:8.1f}ms  stream first line={first_time * 1000:8.1f}ms"
+                  f"  last line={last_time * 1000:8.1f}ms  movies={len(stream_movies)} {identical}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,87 @@
+import argparse
+import itertools
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from title_index import TitleIndex  # noqa: E402
+
+# Define letters with approximate frequencies in English text, used to build synthetic vocabulary of made up words
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+LETTER_WEIGHTS = [8.2, 1.5, 2.8, 4.3, 12.7, 2.2, 2.0, 6.1, 7.0, 0.2, 0.8, 4.0, 2.4, 6.7, 7.5, 1.9, 0.1, 6.0, 6.3, 9.1,
+                  2.8, 1.0, 2.4, 0.2, 2.0, 0.1]
+
+
+# Define function to build synthetic normalised titles from vocabulary with word frequencies following Zipf's law, as
+# words in real titles do, so a few words such as "of" and "love" appear in many titles and most words in few
+def get_titles(title_count, vocabulary_size):
+    random.seed(title_count)
+    vocabulary = list({"".join(random.choices(LETTERS, LETTER_WEIGHTS, k=random.randint(2, 10)))
+                       for _ in range(vocabulary_size)})
+    cumulative_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    titles = set()
+    while len(titles) < title_count:
+        words = random.choices(vocabulary, cum_weights=cumulative_weights, k=random.randint(1, 5))
+        # Add number to some titles, as for sequels and years
+        if random.random() < 0.1:
+            words.append(str(random.randint(2, 2025)))
+        titles.add(" ".join(words))
+    return list(titles)
+
+
+# Define function to add one typo to title, replacing, removing or swapping one letter
+def add_typo(title):
+    index = random.randrange(len(title) - 1)
+    typo = random.choice(["replace", "remove", "swap"])
+    if typo == "replace":
+        return title[:index] + random.choice(LETTERS) + title[index + 1:]
+    if typo == "remove":
+        return title[:index] + title[index + 1:]
+    return title[:index] + title[index + 1] + title[index] + title[index + 2:]
+
+
+# Define function to time searches, printing percentiles and share of queries finding expected title first
+def time_searches(title_index, label, queries):
+    timings = []
+    found_count = 0
+    for query, expected_title in queries:
+        start = time.perf_counter()
+        matches = title_index.search(query)
+        timings.append(time.perf_counter() - start)
+        found_count += bool(matches) and matches[0][1] == expected_title
+    timings.sort()
+    print(f"{label:>6}  searches={len(timings)}  p50={timings[len(timings) // 2] * 1e6:.0f}us"
+          f"  p99={timings[int(len(timings) * 0.99)] * 1e6:.0f}us  max={timings[-1] * 1e6:.0f}us"
+          f"  top1={found_count / len(queries):.1%}")
+
+
+# Define main function to time building index and searching it with exact, misspelt and unknown titles
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy title index build and search")
+    parser.add_argument("--titles", type=int, default=300000, help="number of synthetic titles in index")
+    parser.add_argument("--vocabulary", type=int, default=50000, help="number of made up words in titles")
+    parser.add_argument("--searches", type=int, default=5000, help="number of searches to time for each kind")
+    parser.add_argument("--min-similarity", type=float, default=0.85, help="minimum similarity for matches")
+    args = parser.parse_args()
+    titles = get_titles(args.titles, args.vocabulary)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    title_index = TitleIndex(((title, random.random() * 100) for title in titles), args.min_similarity)
+    build_time = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"indexed {len(title_index)} titles in {build_time:.1f}s,"
+          f" peak RSS growth {(rss_after - rss_before) / 1024:.0f}MB")
+    sample_titles = random.sample(titles, args.searches)
+    time_searches(title_index, "exact", [(title, title) for title in sample_titles])
+    # Only time typos in titles long enough for one edit to be within min_similarity
+    typo_titles = [title for title in sample_titles if len(title) * (1 - args.min_similarity) >= 1]
+    time_searches(title_index, "typo", [(add_typo(title), title) for title in typo_titles])
+    time_searches(title_index, "miss", [(f"{title} zzqx", None) for title in sample_titles])
+
+
+if __name__ == "__main__":
+    run()
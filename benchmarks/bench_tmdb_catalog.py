@@ -0,0 +1,69 @@
+import argparse
+import gzip
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tmdb_catalog import tmdb_catalog_import, tmdb_catalog_get_movie_for_movie_name  # noqa: E402
+
+# Define words used to build synthetic titles, so many titles share words as in real export
+WORDS = ["the", "night", "of", "return", "last", "dark", "love", "city", "dead", "blue", "house", "king", "star",
+         "war", "girl", "man", "lost", "world", "secret", "summer", "river", "ghost", "wild", "red", "time"]
+
+
+# Define function to write synthetic export in TMDB daily id export format, one line at a time
+def write_export(export_path, movie_count):
+    random.seed(movie_count)
+    titles = []
+    with gzip.open(export_path, "wt", encoding="utf-8") as export_file:
+        for movie_id in range(1, movie_count + 1):
+            title = " ".join(random.choices(WORDS, k=random.randint(1, 4))) + f" {movie_id % 50000}"
+            export_file.write(json.dumps({"adult": False, "id": movie_id, "original_title": title,
+                                          "popularity": round(random.random() * 100, 3), "video": False}) + "\n")
+            # Keep sample of titles to look up
+            if movie_id % 1000 == 0:
+                titles.append(title)
+    return titles
+
+
+# Define main function to time import and lookups for synthetic catalog
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark TMDB catalog import and lookups")
+    parser.add_argument("--movies", type=int, default=1000000, help="number of movies in synthetic export")
+    parser.add_argument("--lookups", type=int, default=20000, help="number of lookups to time")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        export_path = os.path.join(directory, "movie_ids.json.gz")
+        catalog_path = os.path.join(directory, "tmdb_catalog.sqlite3")
+        titles = write_export(export_path, args.movies)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        movie_count = tmdb_catalog_import(export_path, catalog_path)
+        import_time = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        catalog_size = os.path.getsize(catalog_path) / 2**20
+        print(f"imported {movie_count} movies in {import_time:.1f}s, catalog {catalog_size:.0f}MB,"
+              f" peak RSS growth {(rss_after - rss_before) / 1024:.1f}MB")
+        # Time exact lookups for titles in catalog and titles not in catalog, as bench_title_index.py times fuzzy
+        # lookups
+        lookup_names = [random.choice(titles) if index % 2 else f"missing title {index}"
+                        for index in range(args.lookups)]
+        tmdb_catalog_get_movie_for_movie_name(lookup_names[0], catalog_path, min_similarity=0)
+        timings = []
+        for lookup_name in lookup_names:
+            start = time.perf_counter()
+            tmdb_catalog_get_movie_for_movie_name(lookup_name, catalog_path, min_similarity=0)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"lookups={len(timings)}  p50={timings[len(timings) // 2] * 1e6:.1f}us"
+              f"  p99={timings[int(len(timings) * 0.99)] * 1e6:.1f}us  max={timings[-1] * 1e6:.1f}us")
+
+
+if __name__ == "__main__":
+    run()
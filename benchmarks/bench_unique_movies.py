@@ -0,0 +1,72 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from operator import itemgetter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import scoring_get_top_movies  # noqa: E402
+from tmdb_utils import tmdb_add_unique_movies, tmdb_get_filtered_movies  # noqa: E402
+
+
+# Define function to build candidate movies in lists of recommendations per seed movie, with overlapping movie_ids
+def build_recommendation_lists(candidate_count, recommendations_per_seed=10):
+    random.seed(candidate_count)
+    movie_id_range = max(candidate_count // 2, 1)
+    movies = [{"movie_id": random.randrange(movie_id_range), "movie_popularity": round(random.random() * 100, 3)}
+              for _ in range(candidate_count)]
+    return [movies[index:index + recommendations_per_seed] for index in range(0, candidate_count,
+                                                                             recommendations_per_seed)]
+
+
+# Define function to merge recommendation lists as before, rebuilding list of unique movies for every seed movie
+def merge_rebuilding_list(recommendation_lists):
+    movies = []
+    for recommendations in recommendation_lists:
+        movie_ids = []
+        unique_movies = []
+        for movie in itertools.chain(movies, recommendations):
+            if not movie["movie_id"] in movie_ids:
+                movie_ids.append(movie["movie_id"])
+                unique_movies.append(movie)
+        movies = unique_movies
+    movies = tmdb_get_filtered_movies(movies, [])
+    return list(itertools.islice(sorted(movies, key=itemgetter("movie_popularity"), reverse=True), 25))
+
+
+# Define function to merge recommendation lists incrementally into dictionary of unique movies, ranked by popularity
+def merge_incrementally(recommendation_lists):
+    movies = {}
+    for recommendations in recommendation_lists:
+        tmdb_add_unique_movies(movies, recommendations)
+    movies = tmdb_get_filtered_movies(movies.values(), set())
+    return scoring_get_top_movies(movies, {}, {}, 25)
+
+
+# Define main function to compare merge strategies across candidate counts
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark merging of recommendation lists")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000, 20000, 50000])
+    parser.add_argument("--max-rebuild-size", type=int, default=5000,
+                        help="largest candidate count to time with previous list-rebuilding merge")
+    args = parser.parse_args()
+    for candidate_count in args.sizes:
+        recommendation_lists = build_recommendation_lists(candidate_count)
+        start = time.perf_counter()
+        incremental_result = merge_incrementally(recommendation_lists)
+        incremental_time = time.perf_counter() - start
+        line = f"candidates={candidate_count:>6}  incremental={incremental_time * 1000:9.2f}ms"
+        if candidate_count <= args.max_rebuild_size:
+            start = time.perf_counter()
+            rebuild_result = merge_rebuilding_list(recommendation_lists)
+            rebuild_time = time.perf_counter() - start
+            identical = "identical" if rebuild_result == incremental_result else "DIFFERENT"
+            line += f"  rebuilding list={rebuild_time * 1000:10.2f}ms  output {identical}"
+        print(line)
+
+
+if __name__ == "__main__":
+    run()
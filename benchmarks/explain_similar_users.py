@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_utils import (db_connect, db_get_movie_top_5_for_similar_users,  # noqa: E402
+                      db_movie_top_5_for_similar_users_query)
+
+# Define email domain used to identify synthetic users added by this check
+SYNTHETIC_EMAIL_DOMAIN = "synthetic.invalid"
+# Define table aliases in query that must always be read through an index
+INDEXED_TABLE_ALIASES = {"uv1", "uv2", "uv3", "umt5"}
+
+
+# Define function to add synthetic users with vibes and top 5 movies until required number of synthetic users exist
+def seed_synthetic_users(db_connection, user_count, movie_pool_size, batch_size=5000):
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users WHERE user_email LIKE %s", (f"%@{SYNTHETIC_EMAIL_DOMAIN}",))
+    existing_count = cursor.fetchone()[0]
+    cursor.execute("SELECT quiz_id, vibe_id FROM quiz_response_vibes")
+    vibes = cursor.fetchall()
+    if not vibes:
+        raise SystemExit("quiz_response_vibes is empty - load user_movie_vibes.sql before seeding")
+    random.seed(user_count)
+    for start in range(existing_count, user_count, batch_size):
+        emails = [f"user{index}@{SYNTHETIC_EMAIL_DOMAIN}"
+                  for index in range(start, min(start + batch_size, user_count))]
+        cursor.executemany(
+            "INSERT INTO users (user_first_name, user_last_name, user_email, user_password) VALUES (%s, %s, %s, %s)",
+            [("Synthetic", "User", email, "Synthetic1!") for email in emails])
+        cursor.execute("SELECT user_id FROM users WHERE user_email IN (" + ", ".join(["%s"] * len(emails)) + ")",
+                       emails)
+        user_ids = [row[0] for row in cursor.fetchall()]
+        user_vibe_rows = []
+        for user_id in user_ids:
+            quiz_id, vibe_id = random.choice(vibes)
+            user_vibe_rows.append((user_id, quiz_id, vibe_id))
+        cursor.executemany("INSERT INTO user_vibes (user_id, quiz_id, vibe_id) VALUES (%s, %s, %s)", user_vibe_rows)
+        cursor.executemany("INSERT INTO user_movie_top_5 (user_id, movie_name) VALUES (%s, %s)",
+                           [(user_id, f"Synthetic Movie {movie_index}") for user_id in user_ids
+                            for movie_index in random.sample(range(movie_pool_size), 5)])
+        db_connection.commit()
+        print(f"seeded {start + len(user_ids)} of {user_count} synthetic users")
+    # Refresh index statistics so optimiser estimates reflect seeded rows
+    for table_name in ("users", "user_vibes", "user_movie_top_5"):
+        cursor.execute(f"ANALYZE TABLE {table_name}")
+        cursor.fetchall()
+    cursor.close()
+
+
+# Define function to remove synthetic users and all rows that reference them
+def remove_synthetic_users(db_connection):
+    cursor = db_connection.cursor()
+    synthetic_users = f"SELECT user_id FROM users WHERE user_email LIKE '%@{SYNTHETIC_EMAIL_DOMAIN}'"
+    for table_name in ("user_movie_recommendations", "user_quiz_responses", "user_vibes", "user_movie_top_5"):
+        cursor.execute(f"DELETE FROM {table_name} WHERE user_id IN ({synthetic_users})")
+    cursor.execute(f"DELETE FROM users WHERE user_email LIKE '%@{SYNTHETIC_EMAIL_DOMAIN}'")
+    db_connection.commit()
+    cursor.close()
+
+
+# Define function to collect every table access in EXPLAIN FORMAT=JSON plan
+def get_table_accesses(plan):
+    table_accesses = []
+    if isinstance(plan, dict):
+        if "table_name" in plan and "access_type" in plan:
+            table_accesses.append(plan)
+        for value in plan.values():
+            table_accesses.extend(get_table_accesses(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            table_accesses.extend(get_table_accesses(value))
+    return table_accesses
+
+
+# Define main function to seed synthetic users, explain query and fail if any base table is scanned in full
+def run():
+    parser = argparse.ArgumentParser(description="EXPLAIN regression check for similar users' top 5 movies query")
+    parser.add_argument("--users", type=int, default=100000, help="number of synthetic users to seed")
+    parser.add_argument("--movie-pool", type=int, default=20000, help="number of distinct synthetic movie names")
+    parser.add_argument("--cleanup", action="store_true", help="remove synthetic users after check")
+    args = parser.parse_args()
+    db_connection = db_connect()
+    try:
+        seed_synthetic_users(db_connection, args.users, args.movie_pool)
+        cursor = db_connection.cursor()
+        cursor.execute("SELECT user_id FROM users WHERE user_email = %s", (f"user0@{SYNTHETIC_EMAIL_DOMAIN}",))
+        user_id = cursor.fetchone()[0]
+        cursor.execute("EXPLAIN FORMAT=JSON " + db_movie_top_5_for_similar_users_query, {"user_id": user_id})
+        plan = json.loads(cursor.fetchone()[0])
+        cursor.close()
+        failures = []
+        for table_access in get_table_accesses(plan):
+            print(f"{table_access['table_name']:>16}  access={table_access['access_type']:<8}"
+                  f"  key={table_access.get('key', '-'):<34}  rows={table_access.get('rows_examined_per_scan', '-')}")
+            if table_access["table_name"] in INDEXED_TABLE_ALIASES and table_access["access_type"] == "ALL":
+                failures.append(table_access["table_name"])
+        start = time.perf_counter()
+        movies = db_get_movie_top_5_for_similar_users(user_id)
+        print(f"user_id={user_id}  movies={len(movies)}  query={(time.perf_counter() - start) * 1000:.1f}ms")
+        if failures:
+            raise SystemExit(f"FAIL: full table scan on {', '.join(sorted(failures))}")
+        print("OK: every base table read through an index")
+    finally:
+        if args.cleanup:
+            remove_synthetic_users(db_connection)
+        db_connection.close()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,129 @@
+import json
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# Define helper function to derive stable movie_id from movie name
+def stub_movie_id_for_movie_name(movie_name):
+    return zlib.crc32(movie_name.encode("utf-8")) % 1000000 + 1
+
+
+# Define helper function to build TMDB-style movie result for movie_id
+def stub_movie_result(movie_id):
+    return {
+        "id": movie_id,
+        "title": f"Movie {movie_id}",
+        "overview": f"Overview of movie {movie_id}",
+        "popularity": round((movie_id * 7919 % 100000) / 100, 3),
+        "release_date": f"{1950 + movie_id % 75}-01-01"
+    }
+
+
+# Define class to serve subset of TMDB API endpoints used by tmdb_utils, with simulated latency
+class TmdbStubHandler(BaseHTTPRequestHandler):
+    # Keep connections alive between requests, as TMDB does
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    # Latency in seconds added to every response, set by TmdbStub
+    latency = 0.0
+    # Number of recommendations returned per page, and number of pages
+    recommendations_per_page = 20
+    recommendations_pages = 5
+    # Paths of requests received, set by TmdbStub
+    request_paths = []
+    # Maximum requests per second before 429 responses are sent (0 for no limit), and times of recent requests, set
+    # by TmdbStub
+    rate_limit = 0
+    request_times = deque()
+    request_times_lock = threading.Lock()
+
+    # Define method to handle GET requests
+    def do_GET(self):
+        # Record request path, so benchmarks can count calls reaching TMDB
+        self.request_paths.append(self.path)
+        # Simulate round trip to TMDB
+        time.sleep(self.latency)
+        # Throttle requests beyond rate limit in last second, as TMDB does
+        if self.is_throttled():
+            self.send_json({"status_code": 25, "status_message": "Your request count is over the allowed limit."},
+                           429)
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        # Test if search endpoint called
+        if url.path.endswith("/search/movie"):
+            movie_name = query.get("query", [""])[0]
+            results = [stub_movie_result(stub_movie_id_for_movie_name(movie_name))] if movie_name else []
+            self.send_json({"page": 1, "results": results, "total_pages": 1})
+        # Test if recommendations endpoint called
+        elif re.search(r"/movie/\d+/recommendations$", url.path):
+            movie_id = int(url.path.split("/")[-2])
+            page = int(query.get("page", ["1"])[0])
+            first_id = movie_id * 1000 % 99991 + (page - 1) * self.recommendations_per_page
+            # Return empty results for pages beyond total pages, as TMDB does
+            results = [stub_movie_result(first_id + offset) for offset in range(self.recommendations_per_page)
+                       if page <= self.recommendations_pages]
+            self.send_json({"page": page, "results": results, "total_pages": self.recommendations_pages})
+        else:
+            self.send_json({"status_message": "Not found"}, 404)
+
+    # Define helper method to test if request exceeds rate limit, counting requests in last second
+    def is_throttled(self):
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        with self.request_times_lock:
+            while self.request_times and self.request_times[0] <= now - 1:
+                self.request_times.popleft()
+            if len(self.request_times) >= self.rate_limit:
+                return True
+            self.request_times.append(now)
+            return False
+
+    # Define helper method to send JSON response, asking client to retry after 1 second if throttled
+    def send_json(self, body, status_code=200):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        if status_code == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    # Define method to suppress per-request logging
+    def log_message(self, format, *args):
+        pass
+
+
+# Define class to serve stub over threads, with listen backlog large enough for concurrent benchmarks
+class TmdbStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+# Define class to run TMDB stub server in background thread
+class TmdbStub:
+    # Define constructor method to initialise stub server on free local port
+    def __init__(self, latency=0.02, rate_limit=0):
+        self.request_paths = []
+        handler = type("ConfiguredTmdbStubHandler", (TmdbStubHandler,),
+                       {"latency": latency, "request_paths": self.request_paths, "rate_limit": rate_limit,
+                        "request_times": deque(), "request_times_lock": threading.Lock()})
+        self.server = TmdbStubServer(("127.0.0.1", 0), handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/3"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    # Define methods to start and stop stub server as context manager
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# Define class to hold values in memory, evicting least recently used values beyond max_size and expiring values
+# older than ttl_seconds
+class TtlLruCache:
+    # Define constructor method to initialise cache
+    def __init__(self, max_size, ttl_seconds):
+        # Set attributes to input parameters
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # Initialise entries, ordered from least to most recently used, each holding (expiry time, value)
+        self.entries = OrderedDict()
+        # Initialise lock so cache can be shared between threads
+        self.lock = threading.Lock()
+        # Initialise counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    # Define method to get unexpired value for key, or default if key not cached or expired
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            # Test if key not cached or expired
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return default
+            # Mark key as most recently used
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    # Define method to get value for key even if expired, or default if key not cached, for use when value cannot be
+    # refreshed. Expired values are kept until evicted or invalidated
+    def get_stale(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            self.stale_hits += 1
+            return entry[1]
+
+    # Define method to cache value for key, evicting least recently used keys if cache full
+    def put(self, key, value):
+        # Test if caching disabled
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            # Evict least recently used keys until cache within max_size
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # Define method to remove key from cache, or all keys if no key supplied
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    # Define method to get cache counters
+    def get_metrics(self):
+        with self.lock:
+            return {"size": len(self.entries),
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "stale_hits": self.stale_hits}
+
+
+# Define class to share one call between concurrent callers, so callers asking for the same key while a call for it is
+# in flight wait for and share its result instead of repeating the call
+class SingleFlight:
+    # Define constructor method to initialise calls in flight
+    def __init__(self):
+        # Initialise calls in flight keyed by key, each holding event set once call complete, and its result or error
+        self.calls = {}
+        # Initialise lock so calls can be shared between threads
+        self.lock = threading.Lock()
+        # Initialise counters
+        self.calls_made = 0
+        self.calls_shared = 0
+
+    # Define method to call function with args, unless call for key already in flight, returning result of call made
+    # or shared. Errors raised by call are raised for every caller sharing it
+    def do(self, key, function, *args):
+        with self.lock:
+            call = self.calls.get(key)
+            # Test if call for key already in flight
+            is_shared = call is not None
+            if is_shared:
+                self.calls_shared += 1
+            else:
+                call = self.calls[key] = {"done": threading.Event(), "result": None, "error": None}
+                self.calls_made += 1
+        # Wait for call in flight to complete and share its result
+        if is_shared:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+        # Otherwise make call, then remove it from calls in flight so later callers make a new call
+        try:
+            call["result"] = function(*args)
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call["done"].set()
+
+    # Define method to get counters
+    def get_metrics(self):
+        with self.lock:
+            return {"in_flight": len(self.calls),
+                    "calls": self.calls_made,
+                    "deduplicated": self.calls_shared}
@@ -0,0 +1,145 @@
+import argparse
+import time
+
+import numpy as np
+
+from cooccurrence_config import COOCCURRENCE_NEIGHBOURS, COOCCURRENCE_MIN_COUNT, COOCCURRENCE_MEASURE
+from db_utils import db_get_user_movie_top_5_batches, db_replace_movie_neighbours
+from tmdb_catalog import tmdb_normalise_movie_name
+
+# Define number of bits of each movie pair code holding column movie number, leaving row movie number above it
+MOVIE_NUMBER_BITS = 32
+
+
+# Define helper function to add co-occurring movie pairs of users, supplied as list of lists of distinct movie numbers,
+# to lists of pair codes and counts, and movie numbers to list of movie numbers listed by each user. Users are padded
+# to same number of movies, so pairs for all users are found in one pass over arrays
+def cooccurrence_add_user_pairs(user_movie_numbers, pair_codes, pair_counts, movie_numbers):
+    if not user_movie_numbers:
+        return
+    width = max(map(len, user_movie_numbers))
+    movie_matrix = np.full((len(user_movie_numbers), width), -1, dtype=np.int64)
+    for user_index, numbers in enumerate(user_movie_numbers):
+        movie_matrix[user_index, :len(numbers)] = numbers
+    movie_numbers.append(movie_matrix[movie_matrix >= 0])
+    # Pair every movie of each user with every other movie of same user, in both orders
+    rows = np.repeat(movie_matrix, width, axis=1)
+    columns = np.tile(movie_matrix, (1, width))
+    pair_mask = (rows >= 0) & (columns >= 0) & (rows != columns)
+    codes, counts = np.unique(rows[pair_mask] << MOVIE_NUMBER_BITS | columns[pair_mask], return_counts=True)
+    pair_codes.append(codes)
+    pair_counts.append(counts)
+
+
+# Define function to build sparse movie by movie co-occurrence matrix from batches of (user_id, movie_name) rows in
+# user_id order, as yielded by db_get_user_movie_top_5_batches. Movie names are normalised, so variants of a name are
+# one movie. Returns dictionary item holding movie name keys and first movie name seen for each movie number, number of
+# users listing each movie, and matrix in CSR form, where counts[indptr[row]:indptr[row + 1]] are numbers of users
+# listing movie row with movies indices[indptr[row]:indptr[row + 1]], in ascending order
+def cooccurrence_build_matrix(user_movie_batches):
+    movie_numbers_by_key = {}
+    # Initialise movie number of each movie name seen, so each spelling is normalised once
+    movie_numbers_by_name = {}
+    movie_names = []
+    pair_codes = []
+    pair_counts = []
+    movie_numbers = []
+    # Initialise movie numbers of user whose rows may continue in next batch
+    user_id = None
+    user_numbers = set()
+    for user_movie_rows in user_movie_batches:
+        batch_user_movie_numbers = []
+        for row_user_id, movie_name in user_movie_rows:
+            # Complete previous user when rows for next user start
+            if row_user_id != user_id:
+                if user_numbers:
+                    batch_user_movie_numbers.append(sorted(user_numbers))
+                user_id = row_user_id
+                user_numbers = set()
+            if movie_name not in movie_numbers_by_name:
+                movie_name_key = tmdb_normalise_movie_name(movie_name)
+                if movie_name_key not in movie_numbers_by_key:
+                    movie_numbers_by_key[movie_name_key] = len(movie_names)
+                    movie_names.append(movie_name)
+                movie_numbers_by_name[movie_name] = movie_numbers_by_key[movie_name_key]
+            user_numbers.add(movie_numbers_by_name[movie_name])
+        cooccurrence_add_user_pairs(batch_user_movie_numbers, pair_codes, pair_counts, movie_numbers)
+    # Complete last user
+    cooccurrence_add_user_pairs([sorted(user_numbers)] if user_numbers else [], pair_codes, pair_counts, movie_numbers)
+    # Sum counts of pairs found in more than one batch, in pair code order, which is row then column order
+    codes = np.concatenate(pair_codes) if pair_codes else np.empty(0, dtype=np.int64)
+    counts = np.concatenate(pair_counts) if pair_counts else np.empty(0, dtype=np.int64)
+    order = np.argsort(codes, kind="stable")
+    codes, starts = np.unique(codes[order], return_index=True)
+    counts = np.add.reduceat(counts[order], starts) if len(codes) else counts
+    rows = codes >> MOVIE_NUMBER_BITS
+    movie_count = len(movie_names)
+    return {"movie_name_keys": list(movie_numbers_by_key),
+            "movie_names": movie_names,
+            "movie_user_counts": np.bincount(np.concatenate(movie_numbers) if movie_numbers else
+                                             np.empty(0, dtype=np.int64), minlength=movie_count),
+            "indptr": np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=movie_count))]),
+            "indices": codes & (2**MOVIE_NUMBER_BITS - 1),
+            "counts": counts}
+
+
+# Define function to get similarity of each pair of movies in co-occurrence matrix, in same order as matrix counts.
+# Cosine similarity is number of users listing both movies divided by square root of product of numbers of users
+# listing each, and Jaccard similarity is number of users listing both divided by number of users listing either
+def cooccurrence_get_similarities(matrix, measure):
+    rows = np.repeat(np.arange(len(matrix["indptr"]) - 1), np.diff(matrix["indptr"]))
+    row_user_counts = matrix["movie_user_counts"][rows]
+    column_user_counts = matrix["movie_user_counts"][matrix["indices"]]
+    if measure == "cosine":
+        return matrix["counts"] / np.sqrt(row_user_counts * column_user_counts)
+    if measure == "jaccard":
+        return matrix["counts"] / (row_user_counts + column_user_counts - matrix["counts"])
+    raise ValueError(f"Unknown similarity measure: {measure}")
+
+
+# Define function to get top neighbour_count neighbours of each movie listed by at least min_count of same users as
+# (movie_name_key, neighbour_rank, neighbour_movie_name_key, neighbour_movie_name, similarity, co_occurrence_count)
+# tuples, most similar first, then most users listing both, as stored by db_replace_movie_neighbours
+def cooccurrence_get_neighbour_rows(matrix, neighbour_count, min_count, measure):
+    similarities = cooccurrence_get_similarities(matrix, measure)
+    rows = np.repeat(np.arange(len(matrix["indptr"]) - 1), np.diff(matrix["indptr"]))
+    # Keep pairs listed by enough users, sorted by row, then descending similarity and count, then column
+    pair_mask = matrix["counts"] >= min_count
+    rows, columns = rows[pair_mask], matrix["indices"][pair_mask]
+    similarities, counts = similarities[pair_mask], matrix["counts"][pair_mask]
+    order = np.lexsort((columns, -counts, -similarities, rows))
+    rows, columns, similarities, counts = rows[order], columns[order], similarities[order], counts[order]
+    # Rank pairs within each row, keeping top neighbour_count
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    rank_mask = ranks < neighbour_count
+    movie_name_keys = matrix["movie_name_keys"]
+    movie_names = matrix["movie_names"]
+    for row, rank, column, similarity, count in zip(rows[rank_mask].tolist(), ranks[rank_mask].tolist(),
+                                                    columns[rank_mask].tolist(), similarities[rank_mask].tolist(),
+                                                    counts[rank_mask].tolist()):
+        yield movie_name_keys[row], rank + 1, movie_name_keys[column], movie_names[column], similarity, count
+
+
+# Define main function to rebuild movie neighbours from all users' top 5 movies from command line
+def run():
+    parser = argparse.ArgumentParser(description="Rebuild movie neighbours from users' top 5 movies")
+    parser.add_argument("--neighbours", type=int, default=COOCCURRENCE_NEIGHBOURS,
+                        help="number of most similar movies to keep for each movie")
+    parser.add_argument("--min-count", type=int, default=COOCCURRENCE_MIN_COUNT,
+                        help="least number of users listing both movies")
+    parser.add_argument("--measure", choices=["cosine", "jaccard"], default=COOCCURRENCE_MEASURE)
+    parser.add_argument("--dry-run", action="store_true", help="build neighbours without storing them")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    matrix = cooccurrence_build_matrix(db_get_user_movie_top_5_batches())
+    neighbour_rows = cooccurrence_get_neighbour_rows(matrix, args.neighbours, args.min_count, args.measure)
+    if args.dry_run:
+        row_count = sum(1 for _ in neighbour_rows)
+    else:
+        row_count = db_replace_movie_neighbours(neighbour_rows)
+    print(f"Built {row_count} neighbours for {len(matrix['movie_names'])} movies from {len(matrix['counts'])} movie"
+          f" pairs in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    run()
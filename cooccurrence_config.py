@@ -0,0 +1,11 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of most similar movies kept for each movie, least number of users who must list both movies in their top 5
+# for them to be similar, and similarity measure of users listing both movies, either "cosine" or "jaccard"
+COOCCURRENCE_NEIGHBOURS = int(os.getenv("ENV_COOCCURRENCE_NEIGHBOURS", "20"))
+COOCCURRENCE_MIN_COUNT = int(os.getenv("ENV_COOCCURRENCE_MIN_COUNT", "2"))
+COOCCURRENCE_MEASURE = os.getenv("ENV_COOCCURRENCE_MEASURE", "cosine")
@@ -7,3 +7,8 @@ load_dotenv()
 HOST = os.getenv("ENV_MYSQL_HOST")
 USER = os.getenv("ENV_MYSQL_USER")
 PASSWORD = os.getenv("ENV_MYSQL_PASSWORD")
+# Number of pooled connections (maximum 32) and seconds to wait for free connection before failing
+DB_POOL_SIZE = int(os.getenv("ENV_MYSQL_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("ENV_MYSQL_POOL_TIMEOUT", "5"))
+# Number of users to add top 5 movies for in each transaction when adding in batches
+DB_BATCH_SIZE = int(os.getenv("ENV_MYSQL_BATCH_SIZE", "1000"))
@@ -1,6 +1,12 @@
+import itertools
+import json
+import threading
+import time
+
 import mysql.connector
+import mysql.connector.pooling
 
-from db_config import HOST, USER, PASSWORD
+from db_config import HOST, USER, PASSWORD, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_BATCH_SIZE
 
 
 # Create custom exception to handle database connection errors
@@ -8,15 +14,86 @@ class DbConnectionError(Exception):
     pass
 
 
-# Define function to connect to user_movie_vibes database, using credentials from config
+# Initialise shared connection pool, created on first use, and pool counters
+db_connection_pool = None
+db_connection_pool_lock = threading.Lock()
+db_pool_metrics = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "timeouts": 0}
+# Initialise semaphore holding one place for each connection in pool, so callers wait for a connection to be returned
+# without polling pool
+db_connection_slots = threading.BoundedSemaphore(DB_POOL_SIZE)
+
+
+# Define class to wrap connection borrowed from pool, so closing it returns connection to pool and wakes next caller
+# waiting for a connection
+class DbPooledConnection:
+    # Define constructor method to hold borrowed connection and semaphore to release when closed
+    def __init__(self, connection, slots):
+        self.connection = connection
+        self.slots = slots
+        self.closed = False
+
+    # Define method to pass any other attribute through to borrowed connection
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    # Define method to return connection to pool, releasing its place once only however many times closed
+    def close(self):
+        try:
+            self.connection.close()
+        finally:
+            if not self.closed:
+                self.closed = True
+                self.slots.release()
+
+
+# Define helper function to get shared pool of connections to user_movie_vibes database, using credentials from config
+def db_get_connection_pool():
+    global db_connection_pool
+    with db_connection_pool_lock:
+        if db_connection_pool is None:
+            db_connection_pool = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name="user_movie_vibes",
+                pool_size=DB_POOL_SIZE,
+                host=HOST,
+                user=USER,
+                password=PASSWORD,
+                database="user_movie_vibes"
+            )
+    return db_connection_pool
+
+
+# Define helper function to update pool counters
+def db_update_pool_metrics(**increments):
+    with db_connection_pool_lock:
+        for key, increment in increments.items():
+            db_pool_metrics[key] += increment
+
+
+# Define function to borrow connection to user_movie_vibes database from pool, which is returned to pool when closed.
+# Callers block until a connection is returned if none free, raising PoolError if none returned within
+# DB_POOL_TIMEOUT seconds. The pool checks a connection is alive when borrowed, reconnecting if not.
 def db_connect():
-    db_connection = mysql.connector.connect(
-        host=HOST,
-        user=USER,
-        password=PASSWORD,
-        database="user_movie_vibes"
-    )
-    return db_connection
+    connection_pool = db_get_connection_pool()
+    # Take place in pool, waiting for connection to be returned if none free
+    start = time.monotonic()
+    waited = not db_connection_slots.acquire(blocking=False)
+    if waited and not db_connection_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        db_update_pool_metrics(timeouts=1)
+        raise mysql.connector.errors.PoolError("Failed getting connection; pool exhausted")
+    # Borrow connection, freeing place again if borrowing fails
+    try:
+        db_connection = connection_pool.get_connection()
+    except Exception:
+        db_connection_slots.release()
+        raise
+    db_update_pool_metrics(checkouts=1, waits=int(waited), wait_seconds=time.monotonic() - start if waited else 0.0)
+    return DbPooledConnection(db_connection, db_connection_slots)
+
+
+# Define function to get connection pool counters
+def db_get_pool_metrics():
+    with db_connection_pool_lock:
+        return dict(db_pool_metrics, pool_size=DB_POOL_SIZE)
 
 
 # Define function to add new user
@@ -83,21 +160,87 @@ def db_get_user(user_email, user_password):
     return user_id
 
 
-# Define function to add user's top 5 movies
+# Define helper function to split comma-separated list of movie names into list of trimmed movie names
+def db_split_movie_names(movie_names):
+    if not movie_names:
+        return []
+    return [movie_name.strip() for movie_name in movie_names.split(",")]
+
+
+# Define helper function to replace top 5 movies for users with supplied lists of movie names using one multi-row
+# insert, and mark recommendations stale for users and users with same vibe, without committing
+def db_replace_user_movie_top_5(cursor, movie_names_by_user_id):
+    user_ids = list(movie_names_by_user_id)
+    user_id_placeholders = ", ".join(["%s"] * len(user_ids))
+    # Delete any previous top 5 movies for users
+    cursor.execute(f"DELETE FROM user_movie_top_5 WHERE user_id IN ({user_id_placeholders})", user_ids)
+    # Add all movie names in one statement, as executemany combines rows into a single multi-row INSERT
+    rows = [(user_id, movie_name) for user_id, movie_names in movie_names_by_user_id.items()
+            for movie_name in movie_names]
+    cursor.executemany("INSERT INTO user_movie_top_5 (user_id, movie_name) VALUES (%s, %s)", rows)
+    movies_added = cursor.rowcount
+    # Mark recommendations stale once for each user and user with same vibe, as their top 5 movies have changed
+    query = f"""
+        INSERT INTO
+            user_movie_recommendations (user_id, movie_recommendations, is_stale, stale_version)
+        SELECT
+            stale_users.user_id,
+            JSON_ARRAY(),
+            1,
+            1
+        FROM (
+            -- Select users and all other users with same vibe
+            SELECT
+                user_id
+            FROM
+                users
+            WHERE
+                user_id IN ({user_id_placeholders})
+            UNION
+            SELECT
+                uv2.user_id
+            FROM
+                user_vibes uv1
+            INNER JOIN
+                user_vibes uv2
+                ON uv2.vibe_id = uv1.vibe_id
+            WHERE
+                uv1.user_id IN ({user_id_placeholders})
+        ) stale_users
+        ON DUPLICATE KEY UPDATE
+            is_stale = 1,
+            stale_version = stale_version + 1
+    """
+    cursor.execute(query, user_ids + user_ids)
+    # Return number of movies added
+    return movies_added
+
+
+# Define function to add user's top 5 movies, supplied as comma-separated list, replacing any previous top 5 movies.
+# All movies are added or none are, in which case update_count is 0, as in sp_add_user_movie_top_5
 def db_add_user_movie_top_5(user_id, movie_top_5):
     # Initialise update_count to return
     update_count = None
+    # Return 0 without writing if no movie names supplied or any movie name blank
+    movie_names = db_split_movie_names(movie_top_5)
+    if not movie_names or not all(movie_names):
+        return 0
     db_connection = None
-    # Try to set update_count to output value of sp_add_user_movie_top_5 stored procedure
+    # Try to set update_count to number of movies added in one transaction
     try:
         db_connection = db_connect()
         cursor = db_connection.cursor()
-        # Set parameters for sp_add_user_movie_top_5 stored procedure: 2 input, 1 output (integer)
-        args = (user_id, movie_top_5, (update_count, "SIGNED"))
-        # Execute stored procedure, capturing updated parameters in result_args
-        result_args = cursor.callproc("sp_add_user_movie_top_5", args)
-        # Set update_count to value of output parameter
-        update_count = result_args[2]
+        try:
+            update_count = db_replace_user_movie_top_5(cursor, {user_id: movie_names})
+        # Set update_count to 0 if movie names rejected, e.g. too long
+        except (mysql.connector.DataError, mysql.connector.IntegrityError):
+            update_count = 0
+        # Commit changes if expected number of movies added, otherwise roll back and set update_count to 0
+        if update_count == len(movie_names):
+            db_connection.commit()
+        else:
+            db_connection.rollback()
+            update_count = 0
         cursor.close()
     # Raise exception in event of DB error
     except Exception:
@@ -110,6 +253,68 @@ def db_add_user_movie_top_5(user_id, movie_top_5):
     return update_count
 
 
+# Define helper function to add top 5 movies for batch of users, supplied as dictionary of lists of movie names keyed by
+# user_id, in one transaction, returning True if committed, or False if rolled back as any movie names rejected
+def db_add_user_movie_top_5_transaction(db_connection, cursor, movie_names_by_user_id):
+    expected_count = sum(len(movie_names) for movie_names in movie_names_by_user_id.values())
+    try:
+        movies_added = db_replace_user_movie_top_5(cursor, movie_names_by_user_id)
+    # Set movies_added to 0 if any movie names rejected, e.g. too long or user_id not found
+    except (mysql.connector.DataError, mysql.connector.IntegrityError):
+        movies_added = 0
+    # Commit changes if expected number of movies added, otherwise roll back batch
+    if movies_added == expected_count:
+        db_connection.commit()
+        return True
+    db_connection.rollback()
+    return False
+
+
+# Define function to add top 5 movies for many users, supplied as dictionary of comma-separated lists keyed by user_id,
+# in transactions of DB_BATCH_SIZE users. If a transaction is rolled back, its users are added again one transaction
+# each, so every user's movies are added or none are, in which case update_count is 0 for that user only
+def db_add_user_movie_top_5_batch(movie_top_5_by_user_id):
+    # Initialise dictionary of update_count for each user to return
+    update_counts = {}
+    # Split movie names, setting update_count to 0 without writing for users with no movie names supplied or any
+    # movie name blank
+    movie_names_by_user_id = {}
+    for user_id, movie_top_5 in movie_top_5_by_user_id.items():
+        movie_names = db_split_movie_names(movie_top_5)
+        if movie_names and all(movie_names):
+            movie_names_by_user_id[user_id] = movie_names
+        else:
+            update_counts[user_id] = 0
+    if not movie_names_by_user_id:
+        return update_counts
+    db_connection = None
+    # Try to add movies for each batch of users in one transaction
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        user_ids = list(movie_names_by_user_id)
+        for start in range(0, len(user_ids), DB_BATCH_SIZE):
+            batch = {user_id: movie_names_by_user_id[user_id] for user_id in user_ids[start:start + DB_BATCH_SIZE]}
+            if db_add_user_movie_top_5_transaction(db_connection, cursor, batch):
+                update_counts.update({user_id: len(movie_names) for user_id, movie_names in batch.items()})
+                continue
+            # Otherwise add each user of batch in own transaction, so users whose movies are rejected do not stop others
+            for user_id, movie_names in batch.items():
+                is_added = len(batch) > 1 and db_add_user_movie_top_5_transaction(db_connection, cursor,
+                                                                                  {user_id: movie_names})
+                update_counts[user_id] = len(movie_names) if is_added else 0
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to write to database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return dictionary of update_count for each user
+    return update_counts
+
+
 # Define helper function to map quiz_prompt_option_rows into nested list of quiz dictionary items
 def map_quiz_prompt_option_rows(quiz_prompt_option_rows):
     # Initialise variables for building nested list of quiz dictionary items to return
@@ -196,6 +401,32 @@ def db_get_quizzes():
     return quizzes
 
 
+# Define function to get quiz catalog version, incremented by triggers whenever quiz tables change
+def db_get_quiz_catalog_version():
+    # Initialise version to return
+    version = None
+    db_connection = None
+    # Try to set version to output value of SELECT query on quiz_catalog_version table
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        cursor.execute("SELECT version FROM quiz_catalog_version WHERE quiz_catalog_version_id = 1")
+        # Set version to first column of output row if one exists
+        quiz_catalog_version = cursor.fetchone()
+        if quiz_catalog_version:
+            version = quiz_catalog_version[0]
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return version or None if version row not found
+    return version
+
+
 # Define function to add user's quiz responses
 def db_add_user_quiz_responses(user_id, quiz_id, quiz_responses):
     # Initialise update_count to return
@@ -232,11 +463,13 @@ def map_movie_rows(movie_rows):
         # movie_row comprises:
         # movie_row[0] holds movie_name
         # movie_row[1] holds user_top_5
+        # movie_row[2] holds others_top_5
 
         # Create movie dictionary item
         movie_item = {
             "movie_name": movie_row[0],
-            "user_top_5": movie_row[1]
+            "user_top_5": movie_row[1],
+            "others_top_5": movie_row[2]
         }
         # Append movie dictionary item to list of movies
         movies.append(movie_item)
@@ -244,30 +477,351 @@ def map_movie_rows(movie_rows):
     return movies
 
 
+# Define query to get top 5 movies for user and users with same vibe, shared with EXPLAIN regression check in
+# benchmarks. Users with same vibe are looked up through user_vibes indexes and top 5 movies are joined on user_id
+# alone, so rows read grow with size of user's vibe group rather than total number of users
+db_movie_top_5_for_similar_users_query = """
+    WITH vibe_group_users AS (
+        -- Select user and all users with same vibe, where at least one other user has same vibe
+        SELECT DISTINCT
+            uv2.user_id
+        FROM
+            user_vibes uv1
+        INNER JOIN
+            user_vibes uv2
+            ON uv2.vibe_id = uv1.vibe_id
+        WHERE
+            uv1.user_id = %(user_id)s
+            AND EXISTS (
+                SELECT
+                    1
+                FROM
+                    user_vibes uv3
+                WHERE
+                    uv3.vibe_id = uv1.vibe_id
+                    AND uv3.user_id <> uv1.user_id
+            )
+    )
+    SELECT
+        umt5.movie_name,
+        -- Determine if movie in user's top 5
+        MAX(CASE WHEN umt5.user_id = %(user_id)s THEN 1 ELSE 0 END) AS user_top_5_count,
+        -- Calculate number of other users with movie in their top 5
+        COUNT(DISTINCT CASE WHEN umt5.user_id <> %(user_id)s THEN umt5.user_id END) AS others_top_5_count
+    FROM
+        vibe_group_users vgu
+    INNER JOIN
+        user_movie_top_5 umt5
+        ON umt5.user_id = vgu.user_id
+    GROUP BY
+        umt5.movie_name
+    ORDER BY
+        umt5.movie_name
+"""
+
+
 # Define function to get top 5 movies for similar users
 def db_get_movie_top_5_for_similar_users(user_id):
     # Initialise list of movies to return
     movies = []
     db_connection = None
-    # Try to set movies to transformed output value of SELECT query on vw_user_similar_vibe_movies view
+    # Try to set movies to transformed output value of query on user_vibes and user_movie_top_5 tables
     try:
         db_connection = db_connect()
         cursor = db_connection.cursor()
-        # Prepare query to retrieve movie details for supplied user_id
-        query = """
+        # Execute query with supplied user_id
+        cursor.execute(db_movie_top_5_for_similar_users_query, {"user_id": user_id})
+        # Set movies to output of mapping all rows returned
+        movie_rows = cursor.fetchall()
+        movies = map_movie_rows(movie_rows)
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return list of movie dictionary items or empty list if query failed
+    return movies
+
+
+# Define query to get top 5 movies for each of a batch of users and users with same vibe, in same order as
+# db_movie_top_5_for_similar_users_query, with user_id of batch user first in each row, where {user_ids} is replaced
+# with one placeholder for each user_id
+db_movie_top_5_for_similar_users_batch_query = """
+    WITH vibe_group_users AS (
+        -- Select each batch user and all users with same vibe, where at least one other user has same vibe
+        SELECT DISTINCT
+            uv1.user_id AS batch_user_id,
+            uv2.user_id
+        FROM
+            user_vibes uv1
+        INNER JOIN
+            user_vibes uv2
+            ON uv2.vibe_id = uv1.vibe_id
+        WHERE
+            uv1.user_id IN ({user_ids})
+            AND EXISTS (
+                SELECT
+                    1
+                FROM
+                    user_vibes uv3
+                WHERE
+                    uv3.vibe_id = uv1.vibe_id
+                    AND uv3.user_id <> uv1.user_id
+            )
+    )
+    SELECT
+        vgu.batch_user_id,
+        umt5.movie_name,
+        -- Determine if movie in batch user's top 5
+        MAX(CASE WHEN umt5.user_id = vgu.batch_user_id THEN 1 ELSE 0 END) AS user_top_5_count,
+        -- Calculate number of other users with movie in their top 5
+        COUNT(DISTINCT CASE WHEN umt5.user_id <> vgu.batch_user_id THEN umt5.user_id END) AS others_top_5_count
+    FROM
+        vibe_group_users vgu
+    INNER JOIN
+        user_movie_top_5 umt5
+        ON umt5.user_id = vgu.user_id
+    GROUP BY
+        vgu.batch_user_id,
+        umt5.movie_name
+    ORDER BY
+        vgu.batch_user_id,
+        umt5.movie_name
+"""
+
+
+# Define function to get top 5 movies for similar users for each of a batch of users, returning dictionary of lists
+# of movie dictionary items keyed by user_id, in same format as db_get_movie_top_5_for_similar_users. Users are
+# queried DB_BATCH_SIZE at a time over one connection
+def db_get_movie_top_5_for_similar_users_batch(user_ids):
+    # Initialise empty list of movies to return for every user
+    movies_by_user_id = {user_id: [] for user_id in user_ids}
+    if not movies_by_user_id:
+        return movies_by_user_id
+    db_connection = None
+    # Try to add output of query on user_vibes and user_movie_top_5 tables for each batch of users
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        user_ids = list(movies_by_user_id)
+        for start in range(0, len(user_ids), DB_BATCH_SIZE):
+            batch = user_ids[start:start + DB_BATCH_SIZE]
+            cursor.execute(db_movie_top_5_for_similar_users_batch_query.format(user_ids=", ".join(["%s"] * len(batch))),
+                           tuple(batch))
+            # Add movie dictionary items to list for batch user in first column of each row
+            for movie_row in cursor.fetchall():
+                movies_by_user_id[movie_row[0]].extend(map_movie_rows([movie_row[1:]]))
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return dictionary of lists of movie dictionary items, with empty list for users with no similar users
+    return movies_by_user_id
+
+
+# Define query to get top 5 movies for user and supplied similar users, in same order and format as
+# db_movie_top_5_for_similar_users_query, where {user_ids} is replaced with one placeholder for each user_id
+db_movie_top_5_for_users_query = """
+    SELECT
+        umt5.movie_name,
+        -- Determine if movie in user's top 5
+        MAX(CASE WHEN umt5.user_id = %s THEN 1 ELSE 0 END) AS user_top_5_count,
+        -- Calculate number of other users with movie in their top 5
+        COUNT(DISTINCT CASE WHEN umt5.user_id <> %s THEN umt5.user_id END) AS others_top_5_count
+    FROM
+        user_movie_top_5 umt5
+    WHERE
+        umt5.user_id IN ({user_ids})
+    GROUP BY
+        umt5.movie_name
+    ORDER BY
+        umt5.movie_name
+"""
+
+
+# Define function to get top 5 movies for user and similar_user_ids, such as users with most similar quiz responses,
+# in same format as db_get_movie_top_5_for_similar_users
+def db_get_movie_top_5_for_users(user_id, similar_user_ids):
+    # Initialise list of movies to return
+    movies = []
+    db_connection = None
+    # Try to set movies to transformed output value of query on user_movie_top_5 table
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        # Execute query with supplied user_id, then user_id and similar_user_ids to read top 5 movies of
+        user_ids = [user_id] + list(similar_user_ids)
+        cursor.execute(db_movie_top_5_for_users_query.format(user_ids=", ".join(["%s"] * len(user_ids))),
+                       (user_id, user_id, *user_ids))
+        # Set movies to output of mapping all rows returned
+        movies = map_movie_rows(cursor.fetchall())
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return list of movie dictionary items or empty list if no top 5 movies
+    return movies
+
+
+# Define helper function to map tmdb_movie_rows into dictionary of movie dictionary items keyed by movie name key
+def map_tmdb_movie_rows(tmdb_movie_rows):
+    # Initialise dictionary of movie dictionary items to return
+    movies = {}
+    # Iterate over tmdb_movie_rows
+    for tmdb_movie_row in tmdb_movie_rows:
+        # tmdb_movie_row comprises:
+        # tmdb_movie_row[0] holds movie_name_key
+        # tmdb_movie_row[1] holds movie_id
+        # tmdb_movie_row[2] holds movie_name
+        # tmdb_movie_row[3] holds movie_overview
+        # tmdb_movie_row[4] holds movie_popularity
+        # tmdb_movie_row[5] holds movie_release_date
+
+        # Create movie dictionary item in same format as returned by TMDB utilities
+        movies[tmdb_movie_row[0]] = {
+            "movie_id": tmdb_movie_row[1],
+            "movie_name": tmdb_movie_row[2],
+            "movie_overview": tmdb_movie_row[3],
+            "movie_popularity": tmdb_movie_row[4],
+            "movie_release_date": tmdb_movie_row[5]
+        }
+    # Return dictionary of movie dictionary items or empty dictionary if no rows supplied
+    return movies
+
+
+# Define function to get cached TMDB movie details for normalised movie names
+def db_get_tmdb_movies_for_movie_names(movie_name_keys, ttl_seconds=0):
+    # Initialise dictionary of movies to return
+    movies = {}
+    # Return empty dictionary without querying if no keys supplied
+    if not movie_name_keys:
+        return movies
+    db_connection = None
+    # Try to set movies to transformed output value of SELECT query on tmdb_movie_names table
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        # Prepare query to retrieve movie details for all supplied keys in one round trip, excluding expired rows if
+        # TTL supplied
+        params = list(movie_name_keys)
+        ttl_condition = ""
+        if ttl_seconds > 0:
+            ttl_condition = "AND resolved_at >= NOW() - INTERVAL %s SECOND"
+            params.append(ttl_seconds)
+        query = f"""
             SELECT
+                movie_name_key,
+                movie_id,
                 movie_name,
-                user_top_5_count
+                movie_overview,
+                movie_popularity,
+                movie_release_date
+            FROM
+                tmdb_movie_names
+            WHERE
+                movie_name_key IN ({", ".join(["%s"] * len(movie_name_keys))})
+                {ttl_condition}
+        """
+        # Execute query with supplied keys
+        cursor.execute(query, tuple(params))
+        # Set movies to output of mapping all rows returned
+        tmdb_movie_rows = cursor.fetchall()
+        movies = map_tmdb_movie_rows(tmdb_movie_rows)
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return dictionary of movie dictionary items keyed by movie name key, omitting keys not cached
+    return movies
+
+
+# Define function to cache TMDB movie details for normalised movie names
+def db_add_tmdb_movies_for_movie_names(movies):
+    # Initialise update_count to return
+    update_count = None
+    db_connection = None
+    # Try to insert or refresh a row for every movie name key supplied
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        # Prepare statement to insert movie details, refreshing details and resolved_at of existing rows
+        query = """
+            INSERT INTO
+                tmdb_movie_names (movie_name_key, movie_id, movie_name, movie_overview, movie_popularity,
+                                  movie_release_date)
+            VALUES
+                (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                movie_id = VALUES(movie_id),
+                movie_name = VALUES(movie_name),
+                movie_overview = VALUES(movie_overview),
+                movie_popularity = VALUES(movie_popularity),
+                movie_release_date = VALUES(movie_release_date),
+                resolved_at = CURRENT_TIMESTAMP
+        """
+        # Execute statement for all movies in one batch and commit
+        rows = [(movie_name_key, movie["movie_id"], movie["movie_name"], movie["movie_overview"],
+                 movie["movie_popularity"], movie["movie_release_date"])
+                for movie_name_key, movie in movies.items()]
+        cursor.executemany(query, rows)
+        db_connection.commit()
+        update_count = cursor.rowcount
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to write to database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return update_count of rows affected or None if failed to add
+    return update_count
+
+
+# Define function to get precomputed movie recommendations for user
+def db_get_user_movie_recommendations(user_id):
+    # Initialise movies and stale_version to return
+    movies = None
+    stale_version = 0
+    db_connection = None
+    # Try to set movies to output value of SELECT query on user_movie_recommendations table
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        # Prepare query to retrieve recommendations for supplied user_id
+        query = """
+            SELECT
+                movie_recommendations,
+                is_stale,
+                stale_version
             FROM
-                vw_user_similar_vibe_movies
+                user_movie_recommendations
             WHERE
                 user_id = %s
         """
         # Execute query with supplied user_id
         cursor.execute(query, (user_id,))
-        # Set movies to output of mapping all rows returned
-        movie_rows = cursor.fetchall()
-        movies = map_movie_rows(movie_rows)
+        # Set movies to decoded recommendations if row exists and not stale, and stale_version to value in row
+        user_movie_recommendations = cursor.fetchone()
+        if user_movie_recommendations:
+            if not user_movie_recommendations[1]:
+                movies = json.loads(user_movie_recommendations[0])
+            stale_version = user_movie_recommendations[2]
         cursor.close()
     # Raise exception in event of DB error
     except Exception:
@@ -276,5 +830,274 @@ def db_get_movie_top_5_for_similar_users(user_id):
     finally:
         if db_connection:
             db_connection.close()
-    # Return list of movie dictionary items or empty list if query failed
-    return movies
+    # Return list of movie dictionary items or None if not computed or stale, along with stale_version to pass to
+    # db_add_user_movie_recommendations once recomputed
+    return movies, stale_version
+
+
+# Define function to store precomputed movie recommendations for user
+def db_add_user_movie_recommendations(user_id, movies, stale_version):
+    # Initialise update_count to return
+    update_count = None
+    db_connection = None
+    # Try to insert or replace recommendations for user
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        # Prepare statement to store recommendations, leaving them stale if marked stale again since stale_version read
+        query = """
+            INSERT INTO
+                user_movie_recommendations (user_id, movie_recommendations, is_stale, stale_version)
+            VALUES
+                (%s, %s, 0, %s)
+            ON DUPLICATE KEY UPDATE
+                is_stale = IF(stale_version = VALUES(stale_version), 0, is_stale),
+                movie_recommendations = VALUES(movie_recommendations)
+        """
+        # Execute statement with recommendations in JSON format and commit
+        cursor.execute(query, (user_id, json.dumps(movies), stale_version))
+        db_connection.commit()
+        update_count = cursor.rowcount
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to write to database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return update_count of rows affected or None if failed to add
+    return update_count
+
+
+# Define function to get users whose recommendations are stale or not yet computed
+def db_get_stale_user_movie_recommendations(after_user_id, limit):
+    # Initialise list of (user_id, stale_version) tuples to return
+    stale_users = []
+    db_connection = None
+    # Try to set stale_users to output value of SELECT query on users and user_movie_recommendations tables
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        # Prepare query to retrieve next page of users, in user_id order, without up-to-date recommendations
+        query = """
+            SELECT
+                u.user_id,
+                COALESCE(umr.stale_version, 0) AS stale_version
+            FROM
+                users u
+            LEFT JOIN
+                user_movie_recommendations umr
+                ON umr.user_id = u.user_id
+            WHERE
+                u.user_id > %s
+                AND (umr.user_id IS NULL OR umr.is_stale = 1)
+            ORDER BY
+                u.user_id
+            LIMIT %s
+        """
+        # Execute query with supplied user_id to start after and limit
+        cursor.execute(query, (after_user_id, limit))
+        stale_users = [(user_row[0], user_row[1]) for user_row in cursor.fetchall()]
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return list of (user_id, stale_version) tuples or empty list if none stale
+    return stale_users
+
+
+# Define helper function to yield lists of up to batch_size rows returned by query as they are read, so memory use does
+# not grow with number of rows. Rows are streamed from one query over one connection, held until all rows are read
+def db_get_row_batches(query, batch_size):
+    db_connection = None
+    # Try to yield output of SELECT query one batch at a time
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+
+
+# Define function to read all users' top 5 movies in user_id order, yielding lists of up to batch_size (user_id,
+# movie_name) rows as they are read
+def db_get_user_movie_top_5_batches(batch_size=DB_BATCH_SIZE):
+    # Read rows in order of index on user_id and movie_name, so all rows for a user are read together
+    query = """
+        SELECT
+            user_id,
+            movie_name
+        FROM
+            user_movie_top_5
+        ORDER BY
+            user_id,
+            movie_name
+    """
+    yield from db_get_row_batches(query, batch_size)
+
+
+# Define function to read all users' quiz responses in user_id order, yielding lists of up to batch_size (user_id,
+# quiz_prompt_option_id) rows as they are read
+def db_get_user_quiz_response_batches(batch_size=DB_BATCH_SIZE):
+    # Read rows in order of index on user_id, quiz_id and quiz_prompt_option_id, so rows for a user are read together
+    query = """
+        SELECT
+            user_id,
+            quiz_prompt_option_id
+        FROM
+            user_quiz_responses
+        ORDER BY
+            user_id,
+            quiz_id,
+            quiz_prompt_option_id
+    """
+    yield from db_get_row_batches(query, batch_size)
+
+
+# Define function to get user's top 5 movie names and quiz_prompt_option_ids of user's quiz responses, returning
+# (movie_names, quiz_prompt_option_ids) tuple of lists, read over one connection
+def db_get_user_movie_top_5_and_quiz_responses(user_id):
+    # Initialise lists to return
+    movie_names = []
+    quiz_prompt_option_ids = []
+    db_connection = None
+    # Try to set lists to output of SELECT queries on user_movie_top_5 and user_quiz_responses tables
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        cursor.execute("SELECT movie_name FROM user_movie_top_5 WHERE user_id = %s ORDER BY movie_name", (user_id,))
+        movie_names = [movie_row[0] for movie_row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT
+                quiz_prompt_option_id
+            FROM
+                user_quiz_responses
+            WHERE
+                user_id = %s
+            ORDER BY
+                quiz_id,
+                quiz_prompt_option_id
+        """, (user_id,))
+        quiz_prompt_option_ids = [response_row[0] for response_row in cursor.fetchall()]
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return tuple of lists, empty if user has no top 5 movies or quiz responses
+    return movie_names, quiz_prompt_option_ids
+
+
+# Define function to replace all movie neighbours with neighbour rows of (movie_name_key, neighbour_rank,
+# neighbour_movie_name_key, neighbour_movie_name, similarity, co_occurrence_count) tuples. Rows are added to a new
+# table DB_BATCH_SIZE at a time, which then replaces movie_neighbours in one step, so lookups never see a partly
+# built table. Returns number of rows added
+def db_replace_movie_neighbours(neighbour_rows):
+    # Initialise row_count to return
+    row_count = 0
+    db_connection = None
+    # Try to build new table of movie neighbours and swap it for current table
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        # Create empty copy of table, removing any tables left by a failed run
+        cursor.execute("DROP TABLE IF EXISTS movie_neighbours_new, movie_neighbours_old")
+        cursor.execute("CREATE TABLE movie_neighbours_new LIKE movie_neighbours")
+        # Prepare statement to insert neighbours
+        query = """
+            INSERT INTO
+                movie_neighbours_new (movie_name_key, neighbour_rank, neighbour_movie_name_key, neighbour_movie_name,
+                                      similarity, co_occurrence_count)
+            VALUES
+                (%s, %s, %s, %s, %s, %s)
+        """
+        # Execute statement for each batch of rows and commit
+        neighbour_rows = iter(neighbour_rows)
+        while True:
+            batch = list(itertools.islice(neighbour_rows, DB_BATCH_SIZE))
+            if not batch:
+                break
+            cursor.executemany(query, batch)
+            db_connection.commit()
+            row_count += len(batch)
+        # Swap new table for current table in one step, then drop current table
+        cursor.execute("""
+            RENAME TABLE
+                movie_neighbours TO movie_neighbours_old,
+                movie_neighbours_new TO movie_neighbours
+        """)
+        cursor.execute("DROP TABLE movie_neighbours_old")
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to write to database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return number of neighbour rows added
+    return row_count
+
+
+# Define function to get neighbours of normalised movie names, returning dictionary of lists of neighbour dictionary
+# items, most similar first, keyed by movie name key. Movie name keys without neighbours are omitted
+def db_get_movie_neighbours(movie_name_keys):
+    # Initialise dictionary of neighbours to return
+    neighbours = {}
+    # Return empty dictionary without querying if no keys supplied
+    if not movie_name_keys:
+        return neighbours
+    db_connection = None
+    # Try to set neighbours to transformed output value of SELECT query on movie_neighbours table
+    try:
+        db_connection = db_connect()
+        cursor = db_connection.cursor()
+        # Prepare query to retrieve neighbours for all supplied keys in one round trip, in primary key order
+        query = f"""
+            SELECT
+                movie_name_key,
+                neighbour_movie_name,
+                similarity
+            FROM
+                movie_neighbours
+            WHERE
+                movie_name_key IN ({", ".join(["%s"] * len(movie_name_keys))})
+            ORDER BY
+                movie_name_key,
+                neighbour_rank
+        """
+        # Execute query with supplied keys
+        cursor.execute(query, tuple(movie_name_keys))
+        # Add neighbour dictionary item to list for movie name key in first column of each row
+        for neighbour_row in cursor.fetchall():
+            neighbours.setdefault(neighbour_row[0], []).append({"movie_name": neighbour_row[1],
+                                                                "similarity": neighbour_row[2]})
+        cursor.close()
+    # Raise exception in event of DB error
+    except Exception:
+        raise DbConnectionError("Failed to read from database.")
+    # Close DB connection if exists
+    finally:
+        if db_connection:
+            db_connection.close()
+    # Return dictionary of lists of neighbour dictionary items
+    return neighbours
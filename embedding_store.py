@@ -0,0 +1,289 @@
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from embedding_store_config import EMBEDDING_STORE_PROBES
+from scoring import scoring_get_top_indexes
+
+# Define names of files in store folder holding metadata naming current version and number of rows, and vectors and
+# ids of rows, which are only appended to so rows already written never move
+EMBEDDING_STORE_META_NAME = "meta.json"
+EMBEDDING_STORE_VECTORS_NAME = "vectors.f32"
+EMBEDDING_STORE_IDS_NAME = "ids.bin"
+# Define names of arrays saved for each version, looking up row of each id, and of inverted file index if built
+EMBEDDING_STORE_LOOKUP_NAMES = ("sorted_ids", "sorted_rows", "live")
+EMBEDDING_STORE_INDEX_NAMES = ("centroids", "list_offsets", "list_rows")
+# Define number of rows assigned to nearest centroids at once, bounding memory of distances between rows and centroids,
+# and largest number of rows sampled for each centroid while clustering
+EMBEDDING_STORE_ASSIGN_BLOCK_SIZE = 2048
+EMBEDDING_STORE_SAMPLES_PER_LIST = 256
+# Define number of sampled rows for each centroid that starting centroids are chosen from, as choosing each centroid
+# passes over all of them
+EMBEDDING_STORE_SEED_SAMPLES_PER_LIST = 8
+
+# Initialise store opened for each store path, with metadata version it was opened from
+embedding_stores = {}
+embedding_stores_lock = threading.Lock()
+
+
+# Define helper function to get path of file in store folder holding array for store version
+def embedding_store_get_array_path(path, version, array_name):
+    return os.path.join(path, f"{version}.{array_name}.npy")
+
+
+# Define helper function to scale vectors to unit length, leaving zero vectors unchanged
+def embedding_store_normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+# Define helper function to get number of nearest centroid to each vector by Euclidean distance, block of vectors at a
+# time. Squared distance is |v|^2 - 2 v.c + |c|^2, and |v|^2 is same for all centroids so is left out. Vectors are
+# extended with 1 and centroids with |c|^2, so one matrix product gives distances without another pass over them
+def embedding_store_assign(vectors, centroids):
+    extended_centroids = np.concatenate([-2 * centroids, (centroids * centroids).sum(axis=1, keepdims=True)], axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), EMBEDDING_STORE_ASSIGN_BLOCK_SIZE):
+        block = np.asarray(vectors[start:start + EMBEDDING_STORE_ASSIGN_BLOCK_SIZE], dtype=np.float32)
+        extended_block = np.concatenate([block, np.ones((len(block), 1), dtype=np.float32)], axis=1)
+        assignments[start:start + len(block)] = np.argmin(extended_block @ extended_centroids.T, axis=1)
+    return assignments
+
+
+# Define helper function to choose list_count starting centroids from vectors by k-means++, picking each with
+# probability proportional to squared distance from centroids already picked, so clusters far apart each get one
+def embedding_store_seed_centroids(vectors, list_count, random_generator):
+    centroids = np.empty((list_count, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[random_generator.integers(len(vectors))]
+    distances = ((vectors - centroids[0]) ** 2).sum(axis=1)
+    for centroid_number in range(1, list_count):
+        total = distances.sum()
+        row = random_generator.choice(len(vectors), p=distances / total) if total > 0 \
+            else random_generator.integers(len(vectors))
+        centroids[centroid_number] = vectors[row]
+        distances = np.minimum(distances, ((vectors - vectors[row]) ** 2).sum(axis=1))
+    return centroids
+
+
+# Define function to cluster vectors into list_count clusters with iterations of k-means, on a random sample of at
+# most EMBEDDING_STORE_SAMPLES_PER_LIST vectors for each cluster, as more barely moves centroids. Starting centroids
+# are seeded from EMBEDDING_STORE_SEED_SAMPLES_PER_LIST sampled vectors for each cluster, and empty clusters
+# restarted from random sampled vectors. Returns centroids as float32 array
+def embedding_store_kmeans(vectors, list_count, iterations=10, seed=0):
+    random_generator = np.random.default_rng(seed)
+    sample_size = min(len(vectors), list_count * EMBEDDING_STORE_SAMPLES_PER_LIST)
+    sample = np.asarray(vectors[np.sort(random_generator.choice(len(vectors), sample_size, replace=False))],
+                        dtype=np.float32)
+    seed_sample_size = min(sample_size, list_count * EMBEDDING_STORE_SEED_SAMPLES_PER_LIST)
+    centroids = embedding_store_seed_centroids(sample[random_generator.choice(sample_size, seed_sample_size,
+                                                                              replace=False)],
+                                               list_count, random_generator)
+    for _ in range(iterations):
+        assignments = embedding_store_assign(sample, centroids)
+        counts = np.bincount(assignments, minlength=list_count)
+        sums = np.stack([np.bincount(assignments, weights=sample[:, dimension], minlength=list_count)
+                         for dimension in range(sample.shape[1])], axis=1)
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        centroids[~filled] = sample[random_generator.choice(sample_size, (~filled).sum())]
+    return centroids
+
+
+# Define function to get store saved at path, opening it on first use and again whenever rows appended or index built,
+# identifying metadata by inode and modification time. Returns None if no store saved
+def embedding_store_get(path):
+    try:
+        meta_stat = os.stat(os.path.join(path, EMBEDDING_STORE_META_NAME))
+    except FileNotFoundError:
+        return None
+    meta_version = meta_stat.st_ino, meta_stat.st_mtime_ns
+    with embedding_stores_lock:
+        version, store = embedding_stores.get(path, (None, None))
+        if version != meta_version:
+            store = EmbeddingStore(path)
+            embedding_stores[path] = (meta_version, store)
+    return store
+
+
+# Define class to find rows of a float32 matrix saved on disk whose vectors have highest inner product with a query
+# vector, or highest cosine similarity for stores created with metric "cosine", whose vectors are scaled to unit length
+# as appended. Vectors and ids are memory-mapped, so processes opening the same store share them through page cache
+# rather than each holding a copy. Each object is a snapshot of the store when opened: appending rows or building an
+# index writes new files, then replaces metadata in one step, and returns a new object, so objects already open are
+# never changed under readers. Rows appended with an id already stored replace that id's earlier row. Stores have one
+# writer at a time
+class EmbeddingStore:
+    # Define constructor method to open store saved in folder at path
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, EMBEDDING_STORE_META_NAME)) as meta_file:
+            self.meta = json.load(meta_file)
+        self.count = self.meta["count"]
+        self.dimension = self.meta["dimension"]
+        self.metric = self.meta["metric"]
+        self.id_dtype = np.dtype(self.meta["id_dtype"])
+        # Map only rows counted in metadata, as rows after them may be partly written by an append in progress.
+        # Files cannot be mapped while empty
+        if self.count:
+            self.vectors = np.memmap(os.path.join(path, EMBEDDING_STORE_VECTORS_NAME), dtype=np.float32, mode="r",
+                                     shape=(self.count, self.dimension))
+            self.ids = np.memmap(os.path.join(path, EMBEDDING_STORE_IDS_NAME), dtype=self.id_dtype, mode="r",
+                                 shape=(self.count,))
+        else:
+            self.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+            self.ids = np.zeros(0, dtype=self.id_dtype)
+        # Map ids in ascending order with row of each, and whether each row holds latest vector of its id
+        for array_name in EMBEDDING_STORE_LOOKUP_NAMES:
+            setattr(self, array_name, np.load(embedding_store_get_array_path(path, self.meta["version"], array_name),
+                                              mmap_mode="r"))
+        # Map inverted file index, if built, where rows nearest each centroid are
+        # list_rows[list_offsets[list_number]:list_offsets[list_number + 1]]
+        self.index_count = self.meta["index_count"]
+        for array_name in EMBEDDING_STORE_INDEX_NAMES:
+            setattr(self, array_name, np.load(embedding_store_get_array_path(path, self.meta["index_version"],
+                                                                             array_name), mmap_mode="r")
+                    if self.meta["index_version"] else None)
+
+    # Define method to create empty store in folder at path, which must not hold a store, for vectors of dimension
+    # floats and ids of id_dtype, such as "<i8" for integers or "<U200" for strings of up to 200 characters. Returns
+    # new store
+    @classmethod
+    def create(cls, path, dimension, id_dtype, metric="dot"):
+        if metric not in ("dot", "cosine"):
+            raise ValueError("metric must be 'dot' or 'cosine'")
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, EMBEDDING_STORE_META_NAME)):
+            raise FileExistsError(f"Embedding store already saved at {path}")
+        for file_name in (EMBEDDING_STORE_VECTORS_NAME, EMBEDDING_STORE_IDS_NAME):
+            open(os.path.join(path, file_name), "wb").close()
+        meta = {"version": None, "count": 0, "dimension": dimension, "metric": metric,
+                "id_dtype": np.dtype(id_dtype).str, "index_version": None, "index_count": 0}
+        lookup = {"sorted_ids": np.zeros(0, dtype=id_dtype), "sorted_rows": np.zeros(0, dtype=np.int64),
+                  "live": np.zeros(0, dtype=bool)}
+        return cls.save(path, meta, lookup)
+
+    # Define helper method to save arrays named by new version, then replace metadata with metadata pointing at them
+    # in one step. Files of versions older than those replaced are removed, unless still open, e.g. on Windows.
+    # Returns new store
+    @classmethod
+    def save(cls, path, meta, arrays, previous_meta=None):
+        previous_meta = previous_meta or {}
+        meta = dict(meta, version=str(time.time_ns()))
+        if "centroids" in arrays:
+            meta["index_version"] = meta["version"]
+        for array_name, array in arrays.items():
+            np.save(embedding_store_get_array_path(path, meta["version"], array_name), array)
+        meta_path = os.path.join(path, EMBEDDING_STORE_META_NAME)
+        with open(f"{meta_path}.tmp", "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        # Remove files of older versions
+        versions = {meta["version"], meta["index_version"], previous_meta.get("version"),
+                    previous_meta.get("index_version")}
+        for file_name in os.listdir(path):
+            if file_name.endswith(".npy") and file_name.split(".")[0] not in versions:
+                try:
+                    os.remove(os.path.join(path, file_name))
+                except OSError:
+                    pass
+        return cls(path)
+
+    # Define method to get number of ids in store
+    def __len__(self):
+        return len(self.sorted_ids)
+
+    # Define method to append rows of vectors with ids, written after rows counted in metadata, so rows left partly
+    # written by a failed append are overwritten. Ids already stored move to their new row. Returns new store
+    def append(self, ids, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        new_ids = np.asarray(ids)
+        if len(new_ids) != len(vectors):
+            raise ValueError("ids and vectors must have same number of rows")
+        if new_ids.dtype.kind != self.id_dtype.kind or new_ids.dtype.itemsize > self.id_dtype.itemsize:
+            raise ValueError(f"ids must fit store id type {self.id_dtype.str}")
+        new_ids = new_ids.astype(self.id_dtype)
+        if self.metric == "cosine":
+            vectors = embedding_store_normalise(vectors)
+        for file_name, array, row_size in ((EMBEDDING_STORE_VECTORS_NAME, vectors, 4 * self.dimension),
+                                           (EMBEDDING_STORE_IDS_NAME, new_ids, self.id_dtype.itemsize)):
+            with open(os.path.join(self.path, file_name), "r+b") as store_file:
+                store_file.seek(self.count * row_size)
+                store_file.write(array.tobytes())
+                store_file.truncate()
+                store_file.flush()
+                os.fsync(store_file.fileno())
+        # Sort all ids, keeping latest row of each id
+        all_ids = np.concatenate([self.ids, new_ids])
+        order = np.argsort(all_ids, kind="stable")
+        sorted_ids = all_ids[order]
+        latest = np.append(sorted_ids[1:] != sorted_ids[:-1], True) if len(sorted_ids) else np.zeros(0, dtype=bool)
+        live = np.zeros(len(all_ids), dtype=bool)
+        live[order[latest]] = True
+        meta = dict(self.meta, count=len(all_ids))
+        return self.save(self.path, meta, {"sorted_ids": sorted_ids[latest], "sorted_rows": order[latest],
+                                           "live": live}, self.meta)
+
+    # Define method to build inverted file index, clustering latest vector of each id into list_count lists, which
+    # defaults to square root of number of ids, with iterations of k-means. Searches then score only rows in lists
+    # whose centroids score highest for query, and rows appended after index built. Returns new store
+    def build_index(self, list_count=None, iterations=10, seed=0):
+        live_rows = np.flatnonzero(self.live)
+        list_count = min(list_count or max(1, round(math.sqrt(len(live_rows)))), len(live_rows))
+        if not list_count:
+            raise ValueError("Embedding store has no rows to index")
+        centroids = embedding_store_kmeans(self.vectors[live_rows], list_count, iterations, seed)
+        if self.metric == "cosine":
+            centroids = embedding_store_normalise(centroids)
+        assignments = embedding_store_assign(self.vectors[live_rows], centroids)
+        # Group rows by list, keeping rows of each list in ascending order so they are read in file order
+        list_rows = live_rows[np.argsort(assignments, kind="stable")]
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=list_count))])
+        lookup = {array_name: getattr(self, array_name) for array_name in EMBEDDING_STORE_LOOKUP_NAMES}
+        meta = dict(self.meta, index_count=self.count)
+        return self.save(self.path, meta, dict(lookup, centroids=centroids, list_offsets=list_offsets,
+                                               list_rows=list_rows), self.meta)
+
+    # Define method to get row of each id, or -1 for ids not stored, by binary search of sorted ids
+    def get_rows(self, ids):
+        ids = np.asarray(ids)
+        if not len(ids) or not len(self.sorted_ids) or ids.dtype.kind != self.id_dtype.kind:
+            return np.full(len(ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.sorted_ids, ids), len(self.sorted_ids) - 1)
+        return np.where(self.sorted_ids[positions] == ids, self.sorted_rows[positions], -1)
+
+    # Define method to get up to k (rows, scores) arrays of rows scoring highest for query vector, highest score first,
+    # skipping excluded_rows. Stores with an index score rows in the probes lists whose centroids score highest, which
+    # defaults to EMBEDDING_STORE_PROBES, and rows appended since index built. Stores without an index, or probes of 0,
+    # score all rows with one matrix-vector product. Only scores above the k-th highest are sorted
+    def search_rows(self, query, k, excluded_rows=(), probes=None):
+        query = np.asarray(query, dtype=np.float32)
+        if self.metric == "cosine":
+            query = embedding_store_normalise(query)
+        probes = EMBEDDING_STORE_PROBES if probes is None else probes
+        if self.centroids is not None and 0 < probes < len(self.centroids):
+            list_numbers = np.sort(scoring_get_top_indexes(self.centroids @ query, probes))
+            rows = np.sort(np.concatenate([self.list_rows[self.list_offsets[list_number]:
+                                                          self.list_offsets[list_number + 1]]
+                                           for list_number in list_numbers]
+                                          + [np.arange(self.index_count, self.count)]))
+            scores = self.vectors[rows] @ query
+        else:
+            rows = np.arange(self.count)
+            scores = self.vectors @ query
+        scores = np.where(self.live[rows], scores, -np.inf)
+        if len(excluded_rows):
+            scores[np.isin(rows, excluded_rows)] = -np.inf
+        top_indexes = scoring_get_top_indexes(scores, k)
+        top_indexes = top_indexes[scores[top_indexes] > -np.inf]
+        return rows[top_indexes], scores[top_indexes]
+
+    # Define method to get up to k (id, score) tuples of ids whose vectors score highest for query vector, highest
+    # score first, skipping excluded_ids
+    def search(self, query, k, excluded_ids=(), probes=None):
+        excluded_rows = self.get_rows(excluded_ids) if len(excluded_ids) else ()
+        rows, scores = self.search_rows(query, k, excluded_rows, probes)
+        return list(zip(self.ids[rows].tolist(), scores.tolist()))
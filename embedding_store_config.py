@@ -0,0 +1,11 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of inverted file lists searched for each query in stores with an index (0 searches all rows exactly)
+EMBEDDING_STORE_PROBES = int(os.getenv("ENV_EMBEDDING_STORE_PROBES", "8"))
+# Least number of movies for which als.py builds an inverted file index over movie embeddings, as searching fewer
+# exactly takes well under a millisecond
+EMBEDDING_STORE_INDEX_MIN_ROWS = int(os.getenv("ENV_EMBEDDING_STORE_INDEX_MIN_ROWS", "100000"))
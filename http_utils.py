@@ -0,0 +1,375 @@
+import os
+import struct
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Import fcntl to lock rate limit state shared between processes, which is unavailable on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Define format of rate limit state shared between processes, holding tokens, time tokens last counted and time calls
+# paused until
+RATE_LIMIT_STATE_FORMAT = "ddd"
+# Define seconds to pause calls after 429 response without Retry-After header
+RATE_LIMIT_DEFAULT_PAUSE = 1.0
+
+# Initialise seconds each thread has waited for rate limit tokens and retry backoff, so circuit breaker can leave time
+# queued locally out of call latency
+http_local_waits = threading.local()
+
+
+# Define helper function to add seconds this thread waited before sending request
+def http_add_local_wait_seconds(seconds):
+    http_local_waits.seconds = http_get_local_wait_seconds() + seconds
+
+
+# Define function to get total seconds this thread has waited for rate limit tokens and retry backoff
+def http_get_local_wait_seconds():
+    return getattr(http_local_waits, "seconds", 0.0)
+
+
+# Define exception raised when no rate limit token becomes available before deadline, as a requests exception so
+# callers handle it as any other failed call
+class RateLimitTimeout(requests.exceptions.RequestException):
+    pass
+
+
+# Define class to limit rate of calls with a token bucket holding up to capacity tokens, refilled at rate tokens per
+# second, where each call takes one token. Callers queue for tokens in arrival order for up to timeout seconds instead
+# of failing, and all callers wait while calls are paused after a 429 response. If state_path supplied, tokens and
+# pauses are shared by every process using that file, otherwise by every thread in this process. A rate of 0 disables
+# the limit
+class TokenBucket:
+    # Define constructor method to initialise full bucket
+    def __init__(self, rate, capacity, timeout, state_path=None):
+        # Test if state to be shared between processes on platform unable to lock it
+        if state_path and fcntl is None:
+            raise ValueError("Sharing rate limit between processes requires fcntl")
+        # Set attributes to input parameters
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.timeout = timeout
+        self.state_path = state_path
+        # Use wall clock if state shared, so times are comparable between processes
+        self.clock = time.time if state_path else time.monotonic
+        # Initialise tokens, time tokens last counted and time calls paused until
+        self.state = (float(self.capacity), self.clock(), 0.0)
+        # Initialise lock so bucket can be shared between threads
+        self.lock = threading.Lock()
+        # Initialise counters
+        self.waiting = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.pauses = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    # Define helper method to update state with function, passed current time and state and returning new state and
+    # result, reading and writing state file under exclusive lock if state shared
+    def update_state(self, function):
+        with self.lock:
+            if not self.state_path:
+                self.state, result = function(self.clock(), self.state)
+                return result
+            # Open file for each update, as lock held by file descriptor inherited by forked process would be shared
+            state_file = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(state_file, fcntl.LOCK_EX)
+                state_bytes = os.pread(state_file, struct.calcsize(RATE_LIMIT_STATE_FORMAT), 0)
+                state = struct.unpack(RATE_LIMIT_STATE_FORMAT, state_bytes) \
+                    if len(state_bytes) == struct.calcsize(RATE_LIMIT_STATE_FORMAT) else self.state
+                state, result = function(self.clock(), state)
+                os.pwrite(state_file, struct.pack(RATE_LIMIT_STATE_FORMAT, *state), 0)
+                return result
+            finally:
+                os.close(state_file)
+
+    # Define helper method to count tokens added since tokens last counted, never counting time paused
+    def refill(self, now, state):
+        tokens, counted_time, paused_until = state
+        tokens = min(self.capacity, tokens + max(now - counted_time, 0) * self.rate)
+        return tokens, max(now, counted_time), paused_until
+
+    # Define method to take token, waiting in turn for token if none available, and raising RateLimitTimeout if no
+    # token available within timeout. Returns seconds waited
+    def acquire(self):
+        # Test if limit disabled
+        if self.rate <= 0:
+            return 0.0
+        start = time.monotonic()
+        deadline = self.clock() + self.timeout
+
+        # Define function to reserve next token, leaving tokens below 0 while callers wait, so callers are served in
+        # arrival order. Returns time reserved token available, or None if not available before deadline
+        def reserve(now, state):
+            tokens, counted_time, paused_until = self.refill(now, state)
+            ready_time = max(counted_time + max(1 - tokens, 0) / self.rate, paused_until)
+            if ready_time > max(deadline, now):
+                return (tokens, counted_time, paused_until), None
+            return (tokens - 1, counted_time, paused_until), ready_time
+
+        with self.lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            ready_time = self.update_state(reserve)
+            # Wait for token, and again if calls paused while waiting
+            while ready_time is not None and ready_time > self.clock():
+                time.sleep(ready_time - self.clock())
+                paused_until = self.update_state(lambda now, state: (state, state[2]))
+                ready_time = paused_until if paused_until <= deadline else None
+            if ready_time is None:
+                with self.lock:
+                    self.timeouts += 1
+                raise RateLimitTimeout(f"No rate limit token available within {self.timeout} seconds")
+        finally:
+            wait_seconds = time.monotonic() - start
+            http_add_local_wait_seconds(wait_seconds)
+            with self.lock:
+                self.waiting -= 1
+                self.calls += 1
+                self.wait_seconds += wait_seconds
+                self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        return wait_seconds
+
+    # Define method to pause all calls for seconds, e.g. as requested by Retry-After header of 429 response. Tokens
+    # are emptied so calls resume at rate rather than in a burst
+    def pause(self, seconds):
+        if self.rate <= 0:
+            return
+
+        # Define function to extend pause, counting tokens from end of pause
+        def extend_pause(now, state):
+            tokens, counted_time, paused_until = self.refill(now, state)
+            paused_until = max(paused_until, now + seconds)
+            return (min(tokens, 0), max(counted_time, paused_until), paused_until), None
+
+        self.update_state(extend_pause)
+        with self.lock:
+            self.pauses += 1
+
+    # Define method to get counters, where queue depth and wait times are for callers in this process
+    def get_metrics(self):
+        with self.lock:
+            return {"waiting": self.waiting,
+                    "max_waiting": self.max_waiting,
+                    "calls": self.calls,
+                    "timeouts": self.timeouts,
+                    "pauses": self.pauses,
+                    "wait_seconds": round(self.wait_seconds, 3),
+                    "max_wait_seconds": round(self.max_wait_seconds, 3)}
+
+
+# Define exception raised for calls not made while circuit open, as a requests exception so callers handle it as any
+# other failed call
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+# Define class to stop calls to a service failing or responding slowly, so callers fail immediately instead of waiting
+# out every call. The circuit opens after failure_threshold consecutive calls raise an error or take longer than
+# latency_budget seconds, not counting time waiting for rate limit tokens or retry backoff, so calls queued locally
+# while the service is healthy do not open it, and calls raising RateLimitTimeout are not counted at all. While open,
+# calls raise CircuitOpenError, and one background thread calls probe every reset_timeout seconds, closing the circuit
+# once probe succeeds within latency_budget. A failure_threshold of 0 disables the breaker
+class CircuitBreaker:
+    # Define constructor method to initialise closed circuit
+    def __init__(self, failure_threshold, latency_budget, reset_timeout, probe):
+        # Set attributes to input parameters
+        self.failure_threshold = failure_threshold
+        self.latency_budget = latency_budget
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        # Initialise state
+        self.is_open = False
+        self.consecutive_failures = 0
+        # Initialise lock so breaker can be shared between threads
+        self.lock = threading.Lock()
+        # Initialise counters
+        self.trips = 0
+        self.rejected = 0
+        self.probes = 0
+        self.probe_failures = 0
+
+    # Define method to call function with args unless circuit open, recording whether call failed
+    def call(self, function, *args):
+        with self.lock:
+            if self.is_open:
+                self.rejected += 1
+                raise CircuitOpenError("Circuit open after repeated failures, waiting for probe to succeed")
+        start = self.get_start()
+        try:
+            result = function(*args)
+        except RateLimitTimeout:
+            raise
+        except Exception:
+            self.record_call(is_failure=True)
+            raise
+        self.record_call(is_failure=self.get_latency(start) > self.latency_budget)
+        return result
+
+    # Define helper method to get start of call, as time and seconds this thread has waited before sending requests
+    @staticmethod
+    def get_start():
+        return time.monotonic(), http_get_local_wait_seconds()
+
+    # Define helper method to get seconds since start of call, less seconds waited before sending requests since then
+    @staticmethod
+    def get_latency(start):
+        start_time, start_wait_seconds = start
+        return time.monotonic() - start_time - (http_get_local_wait_seconds() - start_wait_seconds)
+
+    # Define helper method to count consecutive failures, opening circuit and starting probe once threshold reached
+    def record_call(self, is_failure):
+        with self.lock:
+            if not is_failure:
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.is_open or self.failure_threshold <= 0 or self.consecutive_failures < self.failure_threshold:
+                return
+            self.is_open = True
+            self.trips += 1
+        threading.Thread(target=self.run_probe, name="circuit-probe", daemon=True).start()
+
+    # Define helper method to probe service every reset_timeout seconds until it succeeds within latency_budget, then
+    # close circuit
+    def run_probe(self):
+        while True:
+            time.sleep(self.reset_timeout)
+            start = self.get_start()
+            try:
+                self.probe()
+                is_failure = self.get_latency(start) > self.latency_budget
+            except Exception:
+                is_failure = True
+            with self.lock:
+                self.probes += 1
+                if not is_failure:
+                    self.is_open = False
+                    self.consecutive_failures = 0
+                    return
+                self.probe_failures += 1
+
+    # Define method to get counters
+    def get_metrics(self):
+        with self.lock:
+            return {"state": "open" if self.is_open else "closed",
+                    "consecutive_failures": self.consecutive_failures,
+                    "trips": self.trips,
+                    "rejected": self.rejected,
+                    "probes": self.probes,
+                    "probe_failures": self.probe_failures}
+
+
+# Define class to count retries across all requests made by a session
+class RetryCounter:
+    # Define constructor method to initialise counter
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    # Define method to increment counter
+    def increment(self):
+        with self.lock:
+            self.count += 1
+
+
+# Define class to retry failed requests with backoff, counting every retry, and pausing calls sharing rate limiter
+# after 429 responses
+class CountingRetry(Retry):
+    # Define constructor method to initialise retry configuration with shared counter and rate limiter
+    def __init__(self, *args, retry_counter=None, rate_limiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_counter = retry_counter
+        self.rate_limiter = rate_limiter
+
+    # Define method to create retry configuration for next attempt, passing on shared counter and rate limiter
+    def new(self, **kwargs):
+        kwargs["retry_counter"] = self.retry_counter
+        kwargs["rate_limiter"] = self.rate_limiter
+        return super().new(**kwargs)
+
+    # Define method to record retry, and pause calls for Retry-After seconds after 429 response, before delegating to
+    # urllib3
+    def increment(self, *args, **kwargs):
+        if self.retry_counter:
+            self.retry_counter.increment()
+        response = kwargs.get("response")
+        if self.rate_limiter and response is not None and response.status == 429:
+            retry_after = self.get_retry_after(response)
+            self.rate_limiter.pause(RATE_LIMIT_DEFAULT_PAUSE if retry_after is None else retry_after)
+        return super().increment(*args, **kwargs)
+
+    # Define method to wait before retry, then take rate limit token for retry
+    def sleep(self, response=None):
+        start = time.monotonic()
+        super().sleep(response)
+        http_add_local_wait_seconds(time.monotonic() - start)
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+
+# Define class to send requests through connection pool, taking rate limit token for each request
+class RateLimitedAdapter(HTTPAdapter):
+    # Define constructor method to initialise adapter with rate limiter
+    def __init__(self, *args, rate_limiter=None, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(*args, **kwargs)
+
+    # Define method to wait for rate limit token before sending request
+    def send(self, request, *args, **kwargs):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        return super().send(request, *args, **kwargs)
+
+
+# Define function to create session that keeps connections alive and retries with backoff on 429 and 5xx responses,
+# limiting rate of requests and retries with rate_limiter if supplied
+def http_create_session(pool_connections, pool_maxsize, max_retries, backoff_factor, rate_limiter=None):
+    session = requests.Session()
+    # Attach retry counter to session so retries can be observed
+    session.retry_counter = RetryCounter()
+    # Retry idempotent requests only, honouring any Retry-After header, and return final response once retries exhausted
+    retry = CountingRetry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        retry_counter=session.retry_counter,
+        rate_limiter=rate_limiter
+    )
+    # Limit number of hosts pooled and number of connections kept per host, blocking when host limit reached
+    adapter = RateLimitedAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry,
+                                 pool_block=True, rate_limiter=rate_limiter)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Define function to get connection reuse and retry counters for session
+def http_get_session_metrics(session):
+    # Initialise counters
+    requests_sent = 0
+    connections_opened = 0
+    # Iterate over connection pools held by each adapter mounted on session
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool:
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+    # Return counters, deriving number of requests that reused an open connection
+    return {"requests": requests_sent,
+            "connections_opened": connections_opened,
+            "connections_reused": max(requests_sent - connections_opened, 0),
+            "retries": session.retry_counter.count}
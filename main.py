@@ -1,7 +1,8 @@
 import re
 
+from api_config import API_SHOW_METRICS
 from api_utils import (api_add_user, api_get_user, api_add_user_movie_top_5, api_get_quizzes,
-                       api_add_user_quiz_responses, api_get_user_movie_recommendations)
+                       api_add_user_quiz_responses, api_get_user_movie_recommendations, api_get_metrics)
 from menu import Menu
 
 
@@ -179,6 +180,14 @@ def get_user_movie_recommendations():
         print("Sorry, unable to get movie recommendations.")
 
 
+# Define function to display connection reuse and retry counters for calls made to Movie Recommender API this session
+def display_session_metrics():
+    http_metrics = api_get_metrics()["http"]
+    print(f"Movie Recommender API: {http_metrics['requests']} requests, "
+          f"{http_metrics['connections_opened']} connections opened, "
+          f"{http_metrics['connections_reused']} connections reused, {http_metrics['retries']} retries")
+
+
 # Define main function to run application
 def run():
     display_welcome_banner()
@@ -201,6 +210,9 @@ def run():
         while not main_menu.exit_condition:
             main_menu.loop()
     print("\nThank you for using Movie Recommender!")
+    # Display counters for session if configured
+    if API_SHOW_METRICS:
+        display_session_metrics()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+import argparse
+import os
+import re
+
+import mysql.connector
+
+from db_utils import db_connect
+
+# Define folder holding numbered migration files, named like 001_add_covering_indexes.sql
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# Define MySQL error numbers raised when re-running DDL that already took effect before a migration failed part way,
+# as DDL statements commit immediately and cannot be rolled back: table exists, duplicate column, duplicate index,
+# index does not exist, procedure exists and trigger exists
+MIGRATION_ALREADY_APPLIED_ERRNOS = {1050, 1060, 1061, 1091, 1304, 1359}
+
+
+# Define function to get list of migration dictionary items, ordered by version, from numbered SQL files in directory
+def migrate_get_migrations(directory=MIGRATIONS_DIRECTORY):
+    migrations = []
+    versions = set()
+    for file_name in sorted(os.listdir(directory)):
+        match = re.fullmatch(r"(\d+)_(\w+)\.sql", file_name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        # Raise exception if two files share version, as order they are applied in would be ambiguous
+        if version in versions:
+            raise ValueError(f"Duplicate migration version {version}: {file_name}")
+        versions.add(version)
+        migrations.append({"version": version, "name": match.group(2), "path": os.path.join(directory, file_name)})
+    return sorted(migrations, key=lambda migration: migration["version"])
+
+
+# Define function to split SQL script into statements, honouring DELIMITER lines as used in user_movie_vibes.sql
+def migrate_split_statements(sql):
+    statements = []
+    delimiter = ";"
+    statement_lines = []
+    for line in sql.splitlines():
+        # Switch delimiter so statements in stored procedure bodies are not split
+        if line.strip().upper().startswith("DELIMITER "):
+            delimiter = line.strip().split()[1]
+            continue
+        # Skip lines holding only a comment
+        if line.strip().startswith("--"):
+            continue
+        statement_lines.append(line)
+        # Complete statement when line ends with delimiter
+        if line.rstrip().endswith(delimiter):
+            statement = "\n".join(statement_lines).rstrip()[:-len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            statement_lines = []
+    # Add any final statement without trailing delimiter
+    statement = "\n".join(statement_lines).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+# Define function to create table recording applied migrations if it does not exist
+def migrate_create_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+# Define function to get set of versions already applied
+def migrate_get_applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+# Define function to apply statements in migration file and record migration as applied
+def migrate_apply_migration(db_connection, migration):
+    cursor = db_connection.cursor()
+    with open(migration["path"], encoding="utf-8") as migration_file:
+        statements = migrate_split_statements(migration_file.read())
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+        # Skip statement if change already made by earlier failed attempt at migration, otherwise roll back and stop
+        except mysql.connector.Error as error:
+            if error.errno not in MIGRATION_ALREADY_APPLIED_ERRNOS:
+                db_connection.rollback()
+                raise
+            print(f"  Skipped statement already applied: {error.msg}")
+    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                   (migration["version"], migration["name"]))
+    db_connection.commit()
+    cursor.close()
+
+
+# Define function to apply all pending migrations in version order, up to target version if supplied
+def migrate_run(directory=MIGRATIONS_DIRECTORY, target_version=None, dry_run=False):
+    applied = []
+    db_connection = db_connect()
+    try:
+        cursor = db_connection.cursor()
+        migrate_create_migrations_table(cursor)
+        applied_versions = migrate_get_applied_versions(cursor)
+        cursor.close()
+        for migration in migrate_get_migrations(directory):
+            if migration["version"] in applied_versions:
+                continue
+            if target_version is not None and migration["version"] > target_version:
+                break
+            print(f"Applying migration {migration['version']:03d}_{migration['name']}")
+            if not dry_run:
+                migrate_apply_migration(db_connection, migration)
+            applied.append(migration["version"])
+    finally:
+        db_connection.close()
+    return applied
+
+
+# Define main function to apply pending migrations from command line
+def run():
+    parser = argparse.ArgumentParser(description="Apply pending migrations to user_movie_vibes database")
+    parser.add_argument("--target", type=int, help="highest migration version to apply")
+    parser.add_argument("--dry-run", action="store_true", help="list pending migrations without applying them")
+    args = parser.parse_args()
+    applied = migrate_run(target_version=args.target, dry_run=args.dry_run)
+    if not applied:
+        print("Database is up to date.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,33 @@
+-- Add covering indexes for hot queries in db_utils.py and stored procedures
+-- InnoDB drops the index it created for each foreign key once a new index starts with the same column
+
+-- Cover join from users with same vibe to their top 5 movies in db_get_movie_top_5_for_similar_users, reading
+-- movie_name from index, and delete of previous top 5 movies in sp_add_user_movie_top_5
+ALTER TABLE
+	user_movie_top_5
+ADD INDEX
+	idx_user_movie_top_5_user_id_movie_name (user_id, movie_name);
+
+-- Cover delete of previous quiz responses and count of vibes in sp_refresh_user_vibe for one user for one quiz
+ALTER TABLE
+	user_quiz_responses
+ADD INDEX
+	idx_user_quiz_responses_user_id_quiz_id (user_id, quiz_id, quiz_prompt_option_id);
+
+-- Cover join and ordering of quiz prompts and options in vw_quiz_prompt_options, read by db_get_quizzes
+ALTER TABLE
+	quiz_prompts
+ADD INDEX
+	idx_quiz_prompts_quiz_id_order (quiz_id, quiz_prompt_order);
+
+ALTER TABLE
+	quiz_prompt_options
+ADD INDEX
+	idx_quiz_prompt_options_quiz_prompt_id_order (quiz_prompt_id, quiz_prompt_option_order);
+
+-- Cover lookup of vibe_id from dominant quiz prompt option vibe in sp_refresh_user_vibe
+ALTER TABLE
+	quiz_response_vibes
+ADD INDEX
+	idx_quiz_response_vibes_quiz_id_vibe_mode (quiz_id, quiz_prompt_option_vibe_mode);
+
@@ -0,0 +1,43 @@
+-- Add version number for quiz catalog, incremented by triggers whenever quizzes, quiz prompts or quiz prompt options
+-- change, so cached copies of quiz catalog can be checked with a single primary key lookup
+
+-- Create table to hold single row with current quiz catalog version
+CREATE TABLE quiz_catalog_version (
+	quiz_catalog_version_id TINYINT PRIMARY KEY DEFAULT 1,
+	version INT NOT NULL DEFAULT 1,
+	updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+	CONSTRAINT chk_quiz_catalog_version_single_row CHECK (quiz_catalog_version_id = 1)
+);
+
+INSERT IGNORE INTO
+	quiz_catalog_version (quiz_catalog_version_id, version)
+VALUES
+	(1, 1);
+
+-- Create triggers to increment quiz catalog version when rows in quiz tables are added, changed or deleted
+CREATE TRIGGER trg_quizzes_after_insert AFTER INSERT ON quizzes
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quizzes_after_update AFTER UPDATE ON quizzes
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quizzes_after_delete AFTER DELETE ON quizzes
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompts_after_insert AFTER INSERT ON quiz_prompts
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompts_after_update AFTER UPDATE ON quiz_prompts
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompts_after_delete AFTER DELETE ON quiz_prompts
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompt_options_after_insert AFTER INSERT ON quiz_prompt_options
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompt_options_after_update AFTER UPDATE ON quiz_prompt_options
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompt_options_after_delete AFTER DELETE ON quiz_prompt_options
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
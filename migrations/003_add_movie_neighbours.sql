@@ -0,0 +1,13 @@
+-- Add table holding most similar movies for each movie, by how often users list both in their top 5, rebuilt by
+-- cooccurrence.py and read by db_get_movie_neighbours
+
+-- Create table to hold top neighbours of each normalised movie name, most similar first
+CREATE TABLE movie_neighbours (
+	movie_name_key VARCHAR(200) NOT NULL, -- Normalised movie name
+	neighbour_rank SMALLINT NOT NULL, -- 1 for most similar movie
+	neighbour_movie_name_key VARCHAR(200) NOT NULL, -- Normalised movie name of neighbour
+	neighbour_movie_name VARCHAR(200) NOT NULL, -- Movie name of neighbour as first added by a user
+	similarity DOUBLE NOT NULL, -- Cosine or Jaccard similarity of users listing both movies
+	co_occurrence_count INT NOT NULL, -- Number of users listing both movies
+	PRIMARY KEY (movie_name_key, neighbour_rank)
+);
@@ -0,0 +1,323 @@
+-- Add tables, views and stored procedures introduced before migrations were tracked, so a database created from the
+-- original user_movie_vibes.sql can be brought up to date. Tables are only created if missing and views and stored
+-- procedures are replaced, so this is safe to apply to a database created from the current user_movie_vibes.sql
+
+-- Create table to store dominant vibe for each user for each quiz, maintained by sp_add_user_quiz_responses
+CREATE TABLE IF NOT EXISTS user_vibes (
+	user_id INT NOT NULL,
+	quiz_id INT NOT NULL,
+	vibe_id INT NOT NULL,
+	PRIMARY KEY (user_id, quiz_id),
+	INDEX idx_user_vibes_vibe_id_user_id (vibe_id, user_id), -- Look up users with same vibe without scanning all users
+	CONSTRAINT fk_user_vibes_user_id FOREIGN KEY (user_id) REFERENCES users(user_id),
+	CONSTRAINT fk_user_vibes_quiz_id FOREIGN KEY (quiz_id) REFERENCES quizzes(quiz_id),
+	CONSTRAINT fk_user_vibes_vibe_id FOREIGN KEY (vibe_id) REFERENCES quiz_response_vibes(vibe_id)
+);
+
+-- Create table to cache TMDB movie details resolved for normalised movie names
+CREATE TABLE IF NOT EXISTS tmdb_movie_names (
+	movie_name_key VARCHAR(200) PRIMARY KEY, -- Normalised movie name
+	movie_id INT NOT NULL,
+	movie_name VARCHAR(200),
+	movie_overview TEXT,
+	movie_popularity DOUBLE,
+	movie_release_date VARCHAR(10),
+	resolved_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP -- Time movie name resolved
+);
+
+-- Create table to store precomputed movie recommendations for users
+CREATE TABLE IF NOT EXISTS user_movie_recommendations (
+	user_id INT PRIMARY KEY,
+	movie_recommendations JSON NOT NULL, -- List of recommended movie dictionary items
+	is_stale TINYINT NOT NULL DEFAULT 0, -- Set to 1 when top 5 movies or quiz responses change for user or similar users
+	stale_version INT NOT NULL DEFAULT 0, -- Incremented every time recommendations marked stale
+	computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+	CONSTRAINT fk_user_movie_recommendations_user_id FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+-- Create view to get users' vibes from dominant vibes stored for each quiz
+CREATE OR REPLACE VIEW vw_user_vibes AS
+SELECT
+	uv.user_id AS user_id,
+	qrv.vibe_id AS vibe_id,
+	qrv.vibe_name AS vibe_name
+FROM
+	user_vibes uv
+INNER JOIN
+	quiz_response_vibes qrv
+	ON qrv.vibe_id = uv.vibe_id;
+
+-- Create view to get top 5 movies for user and users with same vibe
+CREATE OR REPLACE VIEW vw_user_similar_vibe_movies AS
+SELECT 
+	vibe_groups.user_id AS user_id,
+	umt5.movie_name AS movie_name,
+	-- Determine if movie in user's top 5
+	MAX(CASE WHEN umt5.user_id = vibe_groups.user_id THEN 1 ELSE 0 END) AS user_top_5_count,
+	-- Calculate number of other users with movie in their top 5
+	COUNT(DISTINCT CASE WHEN umt5.user_id <> vibe_groups.user_id THEN umt5.user_id END) AS others_top_5_count
+FROM (
+	-- Select each user paired with every user in same vibe group, including themselves, where at least one other
+	-- user has same vibe
+	SELECT DISTINCT
+		uv1.user_id AS user_id,
+		uv2.user_id AS group_user_id
+	FROM
+		user_vibes uv1
+	INNER JOIN
+		user_vibes uv2
+		ON uv2.vibe_id = uv1.vibe_id
+	WHERE
+		EXISTS (
+			SELECT
+				1
+			FROM
+				user_vibes uv3
+			WHERE
+				uv3.vibe_id = uv1.vibe_id
+				AND uv3.user_id <> uv1.user_id
+		)
+) vibe_groups
+-- Inner join to user_movie_top_5 on single indexed column to get top 5 movies for user and users with same vibe
+INNER JOIN
+	user_movie_top_5 umt5
+	ON umt5.user_id = vibe_groups.group_user_id
+GROUP BY
+	vibe_groups.user_id,
+	umt5.movie_name
+ORDER BY
+	vibe_groups.user_id,
+	umt5.movie_name;
+
+-- Create stored procedure to store dominant vibe for user for quiz, recomputed from that user's quiz responses only
+DROP PROCEDURE IF EXISTS sp_refresh_user_vibe;
+
+DELIMITER //
+CREATE PROCEDURE sp_refresh_user_vibe (
+	IN in_user_id INT,
+	IN in_quiz_id INT
+)
+BEGIN
+	-- Delete any previous vibe for user for quiz
+	DELETE FROM
+		user_vibes
+	WHERE
+		user_id = in_user_id
+		AND quiz_id = in_quiz_id;
+	-- Add vibe for row 1 as dominant vibe
+	INSERT INTO
+		user_vibes (user_id, quiz_id, vibe_id)
+	SELECT
+		t2.user_id,
+		t2.quiz_id,
+		qrv.vibe_id
+	FROM (
+		-- Sort vibe counts in descending order and allocate row number
+		SELECT
+			user_id,
+			quiz_id,
+			quiz_prompt_option_vibe,
+			ROW_NUMBER() OVER(ORDER BY vibe_count DESC) AS rn
+		FROM (
+			-- Calculate number of responses for each vibe for user for quiz
+			SELECT
+				uqr.user_id,
+				uqr.quiz_id,
+				qpo.quiz_prompt_option_vibe,
+				COUNT(*) AS vibe_count
+			FROM
+				user_quiz_responses uqr
+			INNER JOIN
+				quiz_prompt_options qpo
+				ON qpo.quiz_prompt_option_id = uqr.quiz_prompt_option_id
+			WHERE
+				uqr.user_id = in_user_id
+				AND uqr.quiz_id = in_quiz_id
+			GROUP BY
+				uqr.user_id,
+				uqr.quiz_id,
+				qpo.quiz_prompt_option_vibe
+		) t1
+	) t2
+	-- Join dominant vibe to quiz_response_vibes to get vibe_id
+	INNER JOIN
+		quiz_response_vibes qrv
+		ON qrv.quiz_id = t2.quiz_id
+		AND qrv.quiz_prompt_option_vibe_mode = t2.quiz_prompt_option_vibe
+	WHERE
+		t2.rn = 1;
+END //
+
+DELIMITER ;
+
+-- Create stored procedure to mark recommendations stale for user and all users with same vibe, adding placeholder rows
+-- for users without recommendations so changes made while recommendations are being computed are not lost
+DROP PROCEDURE IF EXISTS sp_mark_user_movie_recommendations_stale;
+
+DELIMITER //
+CREATE PROCEDURE sp_mark_user_movie_recommendations_stale (
+	IN in_user_id INT
+)
+BEGIN
+	INSERT INTO
+		user_movie_recommendations (user_id, movie_recommendations, is_stale, stale_version)
+	SELECT
+		stale_users.user_id,
+		JSON_ARRAY(),
+		1,
+		1
+	FROM (
+		-- Select user and all other users with same vibe
+		SELECT
+			in_user_id AS user_id
+		UNION
+		SELECT
+			uv2.user_id
+		FROM
+			user_vibes uv1
+		INNER JOIN
+			user_vibes uv2
+			ON uv2.vibe_id = uv1.vibe_id
+			AND uv2.user_id <> uv1.user_id
+		WHERE
+			uv1.user_id = in_user_id
+	) stale_users
+	ON DUPLICATE KEY UPDATE
+		is_stale = 1,
+		stale_version = stale_version + 1;
+END //
+
+DELIMITER ;
+
+-- Replace stored procedure to add user's top 5 movies, now marking recommendations stale
+DROP PROCEDURE IF EXISTS sp_add_user_movie_top_5;
+
+DELIMITER //
+CREATE PROCEDURE sp_add_user_movie_top_5 (
+	IN in_user_id INT,
+	IN in_movie_names VARCHAR(1000),
+	OUT out_movies_added INT
+)
+BEGIN
+	-- Declare tracking variables
+	DECLARE number_of_movies_to_add INT;
+	DECLARE movie_name_to_add VARCHAR(200);
+	-- Declare handler for SQL Exception to roll back changes and set output number of movies added to 0
+	DECLARE EXIT HANDLER FOR SQLEXCEPTION
+	BEGIN
+		ROLLBACK;
+		SET out_movies_added = 0;
+	END;
+	-- Initialise number of movies added
+	SET out_movies_added = 0;
+	-- Calculate number of movies in comma-separated list supplied
+	SET number_of_movies_to_add = CHAR_LENGTH(in_movie_names) - CHAR_LENGTH(REPLACE(in_movie_names,',','')) + 1;
+	-- Start transaction block to remove any previous top 5 movies for user, add supplied movie names, set output parameter and commit change
+	START TRANSACTION;
+	-- Delete any previous top 5 movies for user
+	DELETE FROM
+		user_movie_top_5
+	WHERE
+		user_id = in_user_id;
+	-- Process list of movie names in loop
+	WHILE in_movie_names <> '' DO
+		-- Extract movie name up to next comma or end of string
+		SET movie_name_to_add = TRIM(SUBSTRING_INDEX(in_movie_names, ',', 1));
+		-- Add movie to user's top 5
+		INSERT INTO
+			user_movie_top_5 (user_id, movie_name)
+		VALUES
+			(in_user_id, movie_name_to_add);
+		-- Increment number of movies added
+		SELECT ROW_COUNT() + out_movies_added INTO out_movies_added;
+		-- Check whether commas remaining in list of movie names to process
+		IF LOCATE(',', in_movie_names) > 0 THEN
+			-- Remove up to and including first comma from list of movie names to process, as that movie already processed
+			SET in_movie_names = SUBSTRING(in_movie_names, LOCATE(',', in_movie_names) + 1);
+		ELSE
+			-- Set list of movie names to empty string, as all movies processed
+			SET in_movie_names = '';
+		END IF;
+	END WHILE;
+	-- Commit changes if expected number of movies added, otherwise roll back and set output number of movies added to 0
+	IF out_movies_added = number_of_movies_to_add THEN
+		-- Mark recommendations stale for user and users with same vibe, as their top 5 movies have changed
+		CALL sp_mark_user_movie_recommendations_stale(in_user_id);
+		COMMIT;
+	ELSE
+		ROLLBACK;
+		SET out_movies_added = 0;
+	END IF;
+END //
+
+DELIMITER ;
+
+-- Replace stored procedure to add user's quiz responses, now storing user's vibe and marking recommendations stale
+DROP PROCEDURE IF EXISTS sp_add_user_quiz_responses;
+
+DELIMITER //
+CREATE PROCEDURE sp_add_user_quiz_responses (
+	IN in_user_id INT,
+	IN in_quiz_id INT,
+	IN in_quiz_responses VARCHAR(200),
+	OUT out_responses_added INT
+)
+BEGIN
+	-- Declare tracking variable
+	DECLARE number_of_responses_to_add INT;
+	-- Declare variable to hold dynamic SQL statement
+	DECLARE sql_statement VARCHAR(1000);
+	-- Declare handler for SQL Exception to roll back changes and set output number of responses added to 0
+	DECLARE EXIT HANDLER FOR SQLEXCEPTION
+	BEGIN
+		ROLLBACK;
+		SET out_responses_added = 0;
+	END;
+	-- Initialise number of responses added
+	SET out_responses_added = 0;
+	-- Calculate number of responses in comma-separated list supplied
+	SET number_of_responses_to_add = CHAR_LENGTH(in_quiz_responses) - CHAR_LENGTH(REPLACE(in_quiz_responses,',','')) + 1;
+	-- Start transaction block to remove any previous quiz responses for user, add supplied responses, set output parameter and commit change
+	START TRANSACTION;
+		-- Mark recommendations stale for user and users with same vibe before responses change
+		CALL sp_mark_user_movie_recommendations_stale(in_user_id);
+		-- Delete any previous quiz responses for user
+		DELETE FROM
+			user_quiz_responses
+		WHERE
+			user_id = in_user_id
+			AND quiz_id = in_quiz_id;
+		-- Prepare SQL to add quiz responses for user by inserting quiz prompt options that match responses supplied
+		SET @sql_statement = CONCAT(
+			'INSERT INTO
+				user_quiz_responses (user_id, quiz_id, quiz_prompt_option_id) '
+			'SELECT ',
+				in_user_id,',',
+				in_quiz_id,','
+				'quiz_prompt_option_id '
+			'FROM
+				quiz_prompt_options '
+			'WHERE
+				quiz_prompt_option_id IN (', in_quiz_responses,');'
+		);
+		-- Prepare and execute dynamic SQL statement
+		PREPARE statement FROM @sql_statement;
+		EXECUTE statement;
+		-- Set output parameter to number of responses added
+		SELECT ROW_COUNT() INTO out_responses_added;
+		-- Deallocate resources used for dynamic SQL statement
+		DEALLOCATE PREPARE statement;
+		-- Commit changes if expected number of responses added, otherwise roll back and set output number of responses added to 0
+		IF out_responses_added = number_of_responses_to_add THEN
+			-- Store user's new dominant vibe for quiz
+			CALL sp_refresh_user_vibe(in_user_id, in_quiz_id);
+			-- Mark recommendations stale for users with same vibe after responses change
+			CALL sp_mark_user_movie_recommendations_stale(in_user_id);
+			COMMIT;
+		ELSE
+			ROLLBACK;
+			SET out_responses_added = 0;
+		END IF;
+END //
+
+DELIMITER ;
@@ -0,0 +1,68 @@
+-- Backfill user_vibes from quiz responses added before sp_add_user_quiz_responses stored each user's vibe, so users
+-- with the same vibe are found without users answering quizzes again. Users and quizzes that already have a stored
+-- vibe are skipped, so this is safe to run again
+
+-- Mark recommendations stale for users about to be given a vibe, as they were computed without any users with same vibe
+UPDATE
+	user_movie_recommendations umr
+SET
+	umr.is_stale = 1,
+	umr.stale_version = umr.stale_version + 1
+WHERE
+	EXISTS (
+		SELECT
+			1
+		FROM
+			user_quiz_responses uqr
+		WHERE
+			uqr.user_id = umr.user_id
+			AND NOT EXISTS (
+				SELECT
+					1
+				FROM
+					user_vibes uv
+				WHERE
+					uv.user_id = uqr.user_id
+					AND uv.quiz_id = uqr.quiz_id
+			)
+	);
+
+-- Add dominant vibe for each user for each quiz, as sp_refresh_user_vibe stores for one user and quiz
+INSERT IGNORE INTO
+	user_vibes (user_id, quiz_id, vibe_id)
+SELECT
+	t2.user_id,
+	t2.quiz_id,
+	qrv.vibe_id
+FROM (
+	-- Sort vibe counts for each user for each quiz in descending order and allocate row number
+	SELECT
+		user_id,
+		quiz_id,
+		quiz_prompt_option_vibe,
+		ROW_NUMBER() OVER(PARTITION BY user_id, quiz_id ORDER BY vibe_count DESC) AS rn
+	FROM (
+		-- Calculate number of responses for each vibe for each user for each quiz
+		SELECT
+			uqr.user_id,
+			uqr.quiz_id,
+			qpo.quiz_prompt_option_vibe,
+			COUNT(*) AS vibe_count
+		FROM
+			user_quiz_responses uqr
+		INNER JOIN
+			quiz_prompt_options qpo
+			ON qpo.quiz_prompt_option_id = uqr.quiz_prompt_option_id
+		GROUP BY
+			uqr.user_id,
+			uqr.quiz_id,
+			qpo.quiz_prompt_option_vibe
+	) t1
+) t2
+-- Join dominant vibe to quiz_response_vibes to get vibe_id
+INNER JOIN
+	quiz_response_vibes qrv
+	ON qrv.quiz_id = t2.quiz_id
+	AND qrv.quiz_prompt_option_vibe_mode = t2.quiz_prompt_option_vibe
+WHERE
+	t2.rn = 1;
@@ -0,0 +1,6 @@
+-- Clear movie names resolved with TMDB, as they were cached under keys from an earlier movie name normaliser that no
+-- longer match the keys looked up, so would never be read or replaced. Movie names are resolved and cached again
+-- under current keys as they are next requested, so this is safe to run again
+
+DELETE FROM
+	tmdb_movie_names;
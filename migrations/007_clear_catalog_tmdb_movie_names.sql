@@ -0,0 +1,8 @@
+-- Clear movie names resolved from local catalog and cached as if resolved by TMDB, which have no overview and only year
+-- as release date. Movie names are resolved from catalog again without being cached, or searched on TMDB and cached
+-- with full details, so this is safe to run again
+
+DELETE FROM
+	tmdb_movie_names
+WHERE
+	movie_overview IS NULL;
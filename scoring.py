@@ -0,0 +1,86 @@
+import datetime
+
+import numpy as np
+
+from scoring_config import (SCORING_POPULARITY_WEIGHT, SCORING_SUPPORT_WEIGHT, SCORING_RECOMMENDERS_WEIGHT,
+                            SCORING_RECENCY_WEIGHT, SCORING_RECENCY_HALF_LIFE, SCORING_COOCCURRENCE_WEIGHT)
+
+
+# Define helper function to test if movies are ranked by popularity alone, so callers can rank without other features
+def scoring_is_popularity_only():
+    return not (SCORING_SUPPORT_WEIGHT or SCORING_RECOMMENDERS_WEIGHT or SCORING_RECENCY_WEIGHT
+                or SCORING_COOCCURRENCE_WEIGHT)
+
+
+# Define helper function to test if co-occurrence similarities are weighted, so movie neighbours need reading
+def scoring_is_cooccurrence_weighted():
+    return bool(SCORING_COOCCURRENCE_WEIGHT)
+
+
+# Define function to get ranking score of each candidate movie from arrays of equal length, in one pass over arrays.
+# Popularity, support and number of recommending movies are log scaled, as a few movies have far higher values than the
+# rest, and recency halves every SCORING_RECENCY_HALF_LIFE years, with release year 0 treated as unknown. With only
+# popularity weighted, popularities are returned unscaled, so ranking matches popularity exactly. Co-occurrence
+# similarities are already between 0 and 1 for each of user's top 5 movies, so are not scaled
+def scoring_get_scores(popularities, support_counts, recommender_counts, release_years, current_year,
+                       similarities=0):
+    popularities = np.nan_to_num(np.asarray(popularities, dtype=np.float64))
+    if scoring_is_popularity_only():
+        return popularities
+    release_years = np.asarray(release_years, dtype=np.float64)
+    ages = np.maximum(current_year - release_years, 0)
+    recencies = np.where(release_years > 0, np.exp2(-ages / SCORING_RECENCY_HALF_LIFE), 0)
+    return (SCORING_POPULARITY_WEIGHT * np.log1p(np.maximum(popularities, 0))
+            + SCORING_SUPPORT_WEIGHT * np.log1p(np.asarray(support_counts, dtype=np.float64))
+            + SCORING_RECOMMENDERS_WEIGHT * np.log1p(np.asarray(recommender_counts, dtype=np.float64))
+            + SCORING_RECENCY_WEIGHT * recencies
+            + SCORING_COOCCURRENCE_WEIGHT * np.asarray(similarities, dtype=np.float64))
+
+
+# Define function to get indexes of k highest scores, highest first, keeping earlier candidates first where scores are
+# equal. Only scores above the k-th highest are sorted, so ranking many candidates costs little more than one pass
+def scoring_get_top_indexes(scores, k):
+    scores = np.asarray(scores, dtype=np.float64)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= len(scores):
+        indexes = np.arange(len(scores))
+    else:
+        # Select scores above k-th highest score, then earliest scores equal to it, so ties at cut-off are kept in
+        # candidate order
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above_indexes = np.flatnonzero(scores > threshold)
+        equal_indexes = np.flatnonzero(scores == threshold)[:k - len(above_indexes)]
+        indexes = np.concatenate([above_indexes, equal_indexes])
+    # Sort by descending score, then ascending index
+    return indexes[np.lexsort((indexes, -scores[indexes]))]
+
+
+# Define helper function to get release year from movie release date, or 0 if unknown
+def scoring_get_release_year(movie):
+    release_date = movie["movie_release_date"] or ""
+    return int(release_date[:4]) if release_date[:4].isdigit() else 0
+
+
+# Define function to get top k movie dictionary items from list of candidate movies by ranking score, where
+# support_counts and recommender_counts hold number of top 5 places held by movies recommending each movie_id and
+# number of movies recommending it, and similarities hold sum of its co-occurrence similarities to user's top 5
+# movies. Movies with equal scores keep their order in list
+def scoring_get_top_movies(movies, support_counts, recommender_counts, k, similarities=None):
+    movies = list(movies)
+    # Build candidate arrays, skipping features with no weight
+    popularities = np.fromiter((movie["movie_popularity"] for movie in movies), dtype=np.float64, count=len(movies))
+    if scoring_is_popularity_only():
+        scores = scoring_get_scores(popularities, None, None, None, None)
+    else:
+        scores = scoring_get_scores(
+            popularities,
+            np.fromiter((support_counts.get(movie["movie_id"], 0) for movie in movies), dtype=np.float64,
+                        count=len(movies)),
+            np.fromiter((recommender_counts.get(movie["movie_id"], 0) for movie in movies), dtype=np.float64,
+                        count=len(movies)),
+            np.fromiter((scoring_get_release_year(movie) for movie in movies), dtype=np.float64, count=len(movies)),
+            datetime.date.today().year,
+            np.fromiter(((similarities or {}).get(movie["movie_id"], 0) for movie in movies), dtype=np.float64,
+                        count=len(movies)))
+    return [movies[index] for index in scoring_get_top_indexes(scores, k)]
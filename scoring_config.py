@@ -0,0 +1,21 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of movie recommendations stored for each user, and returned unless another limit requested
+SCORING_TOP_K = int(os.getenv("ENV_SCORING_TOP_K", "25"))
+# Largest number of movie recommendations that can be requested, bounding TMDB calls and memory used by each request
+SCORING_MAX_LIMIT = int(os.getenv("ENV_SCORING_MAX_LIMIT", "100"))
+# Weights of each candidate movie's log popularity, log number of top 5 places held by movies recommending it, log
+# number of movies recommending it, recency and sum of its co-occurrence similarities to user's top 5 movies in ranking
+# score. With only popularity weighted, movies are ranked by popularity alone, and with no co-occurrence weight,
+# movie neighbours are not read
+SCORING_POPULARITY_WEIGHT = float(os.getenv("ENV_SCORING_POPULARITY_WEIGHT", "1"))
+SCORING_SUPPORT_WEIGHT = float(os.getenv("ENV_SCORING_SUPPORT_WEIGHT", "0"))
+SCORING_RECOMMENDERS_WEIGHT = float(os.getenv("ENV_SCORING_RECOMMENDERS_WEIGHT", "0"))
+SCORING_RECENCY_WEIGHT = float(os.getenv("ENV_SCORING_RECENCY_WEIGHT", "0"))
+SCORING_COOCCURRENCE_WEIGHT = float(os.getenv("ENV_SCORING_COOCCURRENCE_WEIGHT", "0"))
+# Number of years after which recency of a movie halves
+SCORING_RECENCY_HALF_LIFE = float(os.getenv("ENV_SCORING_RECENCY_HALF_LIFE", "10"))
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from cache_utils import TtlLruCache
+from db_utils import db_get_user_quiz_response_batches
+from scoring import scoring_get_top_indexes
+from similar_users_config import (SIMILAR_USERS_INDEX_PATH, SIMILAR_USERS_MIN_SIMILARITY, SIMILAR_USERS_WORKERS,
+                                  SIMILAR_USERS_BLOCK_SIZE, SIMILAR_USERS_CACHE_SIZE, SIMILAR_USERS_CACHE_TTL)
+
+# Define name of file in index folder naming current index version, and names of arrays saved for each version
+SIMILAR_USERS_MANIFEST_NAME = "index.json"
+SIMILAR_USERS_ARRAY_NAMES = ("user_ids", "quiz_prompt_option_ids", "indptr", "indices")
+
+# Initialise index loaded for each index path, with manifest version it was loaded from
+similar_users_indexes = {}
+similar_users_indexes_lock = threading.Lock()
+
+# Initialise shared thread pool scoring blocks of users, created on first use
+similar_users_executor = None
+similar_users_executor_lock = threading.Lock()
+
+# Initialise cache of (index version, similar users) tuples keyed by user_id
+similar_users_cache = TtlLruCache(SIMILAR_USERS_CACHE_SIZE, SIMILAR_USERS_CACHE_TTL)
+
+
+# Define function to build user by quiz prompt option response matrix from batches of (user_id,
+# quiz_prompt_option_id) rows, as yielded by db_get_user_quiz_response_batches. Returns dictionary item holding user_ids
+# and quiz_prompt_option_ids in ascending order, and matrix in CSR form, where indices[indptr[row]:indptr[row + 1]]
+# are quiz prompt option numbers of user row in ascending order
+def similar_users_build_responses(user_quiz_response_batches):
+    # Convert each batch to array as read, so rows are not all held as tuples
+    response_rows = [np.array(user_response_rows, dtype=np.int64).reshape(-1, 2)
+                     for user_response_rows in user_quiz_response_batches]
+    response_rows = np.concatenate(response_rows) if response_rows else np.empty((0, 2), dtype=np.int64)
+    user_ids, user_numbers = np.unique(response_rows[:, 0], return_inverse=True)
+    quiz_prompt_option_ids, option_numbers = np.unique(response_rows[:, 1], return_inverse=True)
+    column_count = max(len(quiz_prompt_option_ids), 1)
+    # Remove duplicate responses of each user, sorting by user then quiz prompt option
+    codes = np.unique(user_numbers.reshape(-1) * column_count + option_numbers.reshape(-1))
+    return {"user_ids": user_ids,
+            "quiz_prompt_option_ids": quiz_prompt_option_ids,
+            "indptr": np.concatenate([[0], np.cumsum(np.bincount(codes // column_count, minlength=len(user_ids)))]),
+            "indices": (codes % column_count).astype(np.int32)}
+
+
+# Define helper function to get path of file in index folder holding array for index version
+def similar_users_get_array_path(index_path, version, array_name):
+    return os.path.join(index_path, f"{version}.{array_name}.npy")
+
+
+# Define function to save responses, as built by similar_users_build_responses, to index_path as .npy files named by
+# new version, then point manifest at them in one step, so app.py never loads a partly saved index. Files of versions
+# older than the version replaced are removed, unless still open, e.g. on Windows. Returns new version
+def similar_users_save_index(index_path, responses):
+    os.makedirs(index_path, exist_ok=True)
+    manifest_path = os.path.join(index_path, SIMILAR_USERS_MANIFEST_NAME)
+    # Set version replaced, if any, so app.py processes still loading it can finish
+    try:
+        with open(manifest_path) as manifest_file:
+            previous_version = json.load(manifest_file)["version"]
+    except FileNotFoundError:
+        previous_version = None
+    version = str(time.time_ns())
+    for array_name in SIMILAR_USERS_ARRAY_NAMES:
+        np.save(similar_users_get_array_path(index_path, version, array_name), responses[array_name])
+    # Write manifest to temporary file, then replace current manifest with it
+    with open(f"{manifest_path}.tmp", "w") as manifest_file:
+        json.dump({"version": version}, manifest_file)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    # Remove files of older versions
+    for file_name in os.listdir(index_path):
+        if file_name.endswith(".npy") and file_name.split(".")[0] not in (version, previous_version):
+            try:
+                os.remove(os.path.join(index_path, file_name))
+            except OSError:
+                pass
+    return version
+
+
+# Define function to load index saved at index_path, memory-mapping arrays so they are shared between processes
+# through page cache rather than copied into each
+def similar_users_load_index(index_path):
+    with open(os.path.join(index_path, SIMILAR_USERS_MANIFEST_NAME)) as manifest_file:
+        index = json.load(manifest_file)
+    for array_name in SIMILAR_USERS_ARRAY_NAMES:
+        index[array_name] = np.load(similar_users_get_array_path(index_path, index["version"], array_name),
+                                    mmap_mode="r")
+    # Set number of responses of each user
+    index["response_counts"] = np.diff(index["indptr"])
+    return index
+
+
+# Define function to get index saved at index_path, loading it on first use and again whenever new index saved,
+# identifying manifest by inode and modification time. Returns None if no index saved
+def similar_users_get_index(index_path=None):
+    index_path = index_path or SIMILAR_USERS_INDEX_PATH
+    try:
+        manifest_stat = os.stat(os.path.join(index_path, SIMILAR_USERS_MANIFEST_NAME))
+    except FileNotFoundError:
+        return None
+    manifest_version = manifest_stat.st_ino, manifest_stat.st_mtime_ns
+    with similar_users_indexes_lock:
+        version, index = similar_users_indexes.get(index_path, (None, None))
+        if version != manifest_version:
+            index = similar_users_load_index(index_path)
+            similar_users_indexes[index_path] = (manifest_version, index)
+    return index
+
+
+# Define helper function to get shared thread pool scoring blocks of users, or None if scoring on calling thread
+def similar_users_get_executor():
+    global similar_users_executor
+    if SIMILAR_USERS_WORKERS <= 1:
+        return None
+    with similar_users_executor_lock:
+        if similar_users_executor is None:
+            similar_users_executor = ThreadPoolExecutor(max_workers=SIMILAR_USERS_WORKERS,
+                                                        thread_name_prefix="similar_users")
+    return similar_users_executor
+
+
+# Define helper function to get (query_columns, query_counts) tuple for lists of quiz_prompt_option_ids, where each row
+# of query_columns marks quiz prompt options of index responded to, and query_counts holds number of distinct
+# responses of each list, counting responses to quiz prompt options not in index
+def similar_users_get_queries(index, quiz_prompt_option_ids_lists):
+    option_ids = index["quiz_prompt_option_ids"]
+    query_columns = np.zeros((len(quiz_prompt_option_ids_lists), len(option_ids)), dtype=np.int32)
+    query_counts = np.zeros(len(quiz_prompt_option_ids_lists), dtype=np.int64)
+    for query_number, quiz_prompt_option_ids in enumerate(quiz_prompt_option_ids_lists):
+        quiz_prompt_option_ids = np.unique(np.asarray(quiz_prompt_option_ids, dtype=np.int64))
+        if len(quiz_prompt_option_ids) and len(option_ids):
+            option_numbers = np.minimum(np.searchsorted(option_ids, quiz_prompt_option_ids), len(option_ids) - 1)
+            query_columns[query_number, option_numbers[option_ids[option_numbers] == quiz_prompt_option_ids]] = 1
+        query_counts[query_number] = len(quiz_prompt_option_ids)
+    return query_columns, query_counts
+
+
+# Define function to get top k (rows, similarities) tuple of each query among users start to end of index, most
+# similar first, skipping each query's excluded row and users with similarity of min_similarity or less. Each query's
+# responses shared with every user are counted with one pass over block's responses, multiplying block of user by
+# quiz prompt option matrix by query matrix, by summing each query's marks at each response, then differencing those
+# sums at each user's first response. Cosine similarity is shared count divided by square root of product of both
+# users' response counts, so users responding alike have similarity of exactly 1
+def similar_users_score_block(index, query_columns, query_counts, excluded_rows, start, end, k, min_similarity):
+    indptr = np.asarray(index["indptr"][start:end + 1])
+    offsets = indptr - indptr[0]
+    sums = np.zeros((len(query_columns), offsets[-1] + 1), dtype=np.int64)
+    np.cumsum(query_columns[:, index["indices"][indptr[0]:indptr[-1]]], axis=1, out=sums[:, 1:])
+    shared_counts = sums[:, offsets[1:]] - sums[:, offsets[:-1]]
+    similarities = shared_counts / np.sqrt(np.maximum(query_counts[:, None] * index["response_counts"][start:end], 1))
+    similarities[similarities <= min_similarity] = -np.inf
+    block_results = []
+    for query_number, excluded_row in enumerate(excluded_rows):
+        if start <= excluded_row < end:
+            similarities[query_number, excluded_row - start] = -np.inf
+        top_indexes = scoring_get_top_indexes(similarities[query_number], k)
+        top_indexes = top_indexes[similarities[query_number, top_indexes] > -np.inf]
+        block_results.append((start + top_indexes, similarities[query_number, top_indexes]))
+    return block_results
+
+
+# Define function to get up to k (user_id, similarity) tuples for each of user_ids, of users in index whose quiz
+# responses are most similar by cosine similarity to corresponding list of quiz_prompt_option_ids, most similar first,
+# then in user_id order. Users are not similar to themselves, and users with similarity of min_similarity or less are
+# skipped. Index users are scored block_size at a time, with blocks scored concurrently by executor if supplied. NumPy
+# releases GIL while gathering and summing, so blocks use as many cores as executor has threads
+def similar_users_get_similar_users(index, user_ids, quiz_prompt_option_ids_lists, k,
+                                    min_similarity=SIMILAR_USERS_MIN_SIMILARITY, block_size=SIMILAR_USERS_BLOCK_SIZE,
+                                    executor=None):
+    query_columns, query_counts = similar_users_get_queries(index, quiz_prompt_option_ids_lists)
+    # Set row of each user in index, or -1 if not in index
+    index_user_ids = index["user_ids"]
+    rows = np.minimum(np.searchsorted(index_user_ids, user_ids), max(len(index_user_ids) - 1, 0))
+    excluded_rows = np.where(index_user_ids[rows] == user_ids, rows, -1) if len(index_user_ids) else rows - 1
+    user_count = len(index_user_ids)
+    map_function = executor.map if executor else map
+    block_results = list(map_function(
+        lambda start: similar_users_score_block(index, query_columns, query_counts, excluded_rows, start,
+                                                min(start + block_size, user_count), k, min_similarity),
+        range(0, user_count, block_size)))
+    # Merge top k of each block, kept in row order so ties rank as if scored in one block
+    similar_users = []
+    for query_number in range(len(user_ids)):
+        top_rows = np.concatenate([np.empty(0, dtype=np.intp)]
+                                  + [block_result[query_number][0] for block_result in block_results])
+        top_similarities = np.concatenate([np.empty(0)]
+                                          + [block_result[query_number][1] for block_result in block_results])
+        top_indexes = scoring_get_top_indexes(top_similarities, k)
+        similar_users.append(list(zip(index_user_ids[top_rows[top_indexes]].tolist(),
+                                      top_similarities[top_indexes].tolist())))
+    return similar_users
+
+
+# Define function to get up to k (user_id, similarity) tuples of users with quiz responses most similar to user's,
+# cached for each user until index replaced or cache entry expires. User's quiz_prompt_option_ids are read by calling
+# get_quiz_prompt_option_ids with user_id only if not cached. Cache entry for user should be invalidated when user's
+# quiz responses change
+def similar_users_get_cached_similar_users(index, user_id, get_quiz_prompt_option_ids, k):
+    cached = similar_users_cache.get(user_id)
+    if cached is not None and cached[0] == (index["version"], k):
+        return cached[1]
+    similar_users = similar_users_get_similar_users(index, [user_id], [get_quiz_prompt_option_ids(user_id)], k,
+                                                    executor=similar_users_get_executor())[0]
+    similar_users_cache.put(user_id, ((index["version"], k), similar_users))
+    return similar_users
+
+
+# Define main function to index all users' quiz responses from command line
+def run():
+    parser = argparse.ArgumentParser(description="Index users' quiz responses to find users with similar responses")
+    parser.add_argument("--index-path", default=SIMILAR_USERS_INDEX_PATH, help="folder to save index to")
+    parser.add_argument("--dry-run", action="store_true", help="build index without saving it")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    responses = similar_users_build_responses(db_get_user_quiz_response_batches())
+    if not args.dry_run:
+        similar_users_save_index(args.index_path, responses)
+    print(f"Indexed {len(responses['indices'])} quiz responses of {len(responses['user_ids'])} users to "
+          f"{len(responses['quiz_prompt_option_ids'])} quiz options in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,18 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Path to folder holding index of users' quiz responses built by similar_users.py, memory-mapped by app.py
+SIMILAR_USERS_INDEX_PATH = os.getenv("ENV_SIMILAR_USERS_INDEX_PATH", "similar_users_index")
+# Number of users with most similar quiz responses whose top 5 movies are combined for each user, and least cosine
+# similarity they must have, which bound the number of users each user's recommendations are built from
+SIMILAR_USERS_K = int(os.getenv("ENV_SIMILAR_USERS_K", "50"))
+SIMILAR_USERS_MIN_SIMILARITY = float(os.getenv("ENV_SIMILAR_USERS_MIN_SIMILARITY", "0"))
+# Number of threads scoring blocks of users at once (empty uses one per core), and number of users in each block
+SIMILAR_USERS_WORKERS = int(os.getenv("ENV_SIMILAR_USERS_WORKERS") or os.cpu_count() or 1)
+SIMILAR_USERS_BLOCK_SIZE = int(os.getenv("ENV_SIMILAR_USERS_BLOCK_SIZE", "65536"))
+# Maximum number of users whose similar users are cached in memory, and seconds before they are found again
+SIMILAR_USERS_CACHE_SIZE = int(os.getenv("ENV_SIMILAR_USERS_CACHE_SIZE", "10000"))
+SIMILAR_USERS_CACHE_TTL = int(os.getenv("ENV_SIMILAR_USERS_CACHE_TTL", "3600"))
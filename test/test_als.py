@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from als import (als_build_interactions, als_transpose, als_solve_rows, als_train, als_save_model, als_get_model,
+                 als_get_user_factor, als_get_top_movie_names)
+
+
+class TestAls(unittest.TestCase):
+
+    def setUp(self):
+        # Prepare test data, where users 1 to 10 each list four of five comedies and take quiz option 1, and users 11 to
+        # 20 each list four of five thrillers and take quiz option 2
+        self.test_user_movie_rows = [(user_id, f"{genre} {(user_id + offset) % 5}") for genre, user_ids in
+                                     (("Comedy", range(1, 11)), ("Thriller", range(11, 21)))
+                                     for user_id in user_ids for offset in range(4)]
+        self.test_user_quiz_response_rows = [(user_id, 1 if user_id <= 10 else 2) for user_id in range(1, 21)]
+
+    def test_als_build_interactions(self):
+        # Prepare test data, with variant spelling of one movie name, duplicate row and user with quiz responses only
+        test_user_movie_batches = [[(3, "Shrek"), (3, "Spy")], [(5, "shrek"), (5, "Shrek"), (5, "Toy Story")]]
+        test_user_quiz_response_batches = [[(3, 12), (5, 11)], [(7, 12)]]
+        # Execute test
+        interactions = als_build_interactions(iter(test_user_movie_batches), iter(test_user_quiz_response_batches))
+        # Evaluate results, where quiz prompt options are columns after movies
+        np.testing.assert_array_equal(interactions["user_ids"], [3, 5, 7])
+        self.assertEqual(interactions["movie_name_keys"], ["shrek", "spy", "toy story"])
+        self.assertEqual(interactions["movie_names"], ["Shrek", "Spy", "Toy Story"])
+        np.testing.assert_array_equal(interactions["quiz_prompt_option_ids"], [11, 12])
+        np.testing.assert_array_equal(interactions["indptr"], [0, 3, 6, 7])
+        np.testing.assert_array_equal(interactions["indices"], [0, 1, 4, 0, 2, 3, 4])
+
+    def test_als_build_interactions_empty(self):
+        # Execute test
+        interactions = als_build_interactions([], [])
+        # Evaluate results
+        self.assertEqual(len(interactions["user_ids"]), 0)
+        np.testing.assert_array_equal(interactions["indptr"], [0])
+
+    def test_als_transpose(self):
+        # Execute test
+        indptr, indices = als_transpose(np.array([0, 2, 3, 5]), np.array([0, 2, 2, 0, 1]), 3)
+        # Evaluate results
+        np.testing.assert_array_equal(indptr, [0, 2, 3, 5])
+        np.testing.assert_array_equal(indices, [0, 2, 2, 0, 1])
+
+    def test_als_solve_rows(self):
+        # Prepare test data, with random interactions and column embeddings
+        random_generator = np.random.default_rng(3)
+        dense = random_generator.random((50, 30)) < 0.2
+        indptr = np.concatenate([[0], np.cumsum(dense.sum(axis=1))])
+        indices = np.flatnonzero(dense) % 30
+        confidences = np.full(len(indices), 10, dtype=np.float32)
+        column_factors = random_generator.standard_normal((30, 4)).astype(np.float32)
+        gram = column_factors.T @ column_factors + 0.1 * np.eye(4, dtype=np.float32)
+        # Define expected result by solving each row with dense confidence matrix
+        expected_factors = [np.linalg.solve(column_factors.T @ np.diag(1 + 10 * row) @ column_factors + 0.1 * np.eye(4),
+                                            column_factors.T @ ((1 + 10 * row) * row)) for row in dense]
+        # Execute test, solving rows in batches, then one at a time, then with as many conjugate gradient steps as
+        # factors, which solve exactly apart from rounding
+        factors = als_solve_rows(np.arange(50), indptr, indices, confidences, column_factors, gram)
+        with patch("als.ALS_PADDED_WIDTH", 0):
+            single_factors = als_solve_rows(np.arange(50), indptr, indices, confidences, column_factors, gram)
+        cg_factors = als_solve_rows(np.arange(50), indptr, indices, confidences, column_factors, gram,
+                                    np.zeros((50, 4), dtype=np.float32), 4)
+        # Evaluate results
+        np.testing.assert_allclose(factors, expected_factors, rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(single_factors, expected_factors, rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(cg_factors, expected_factors, rtol=1e-3, atol=1e-4)
+
+    def test_als_train(self):
+        # Prepare test data
+        interactions = als_build_interactions([self.test_user_movie_rows], [self.test_user_quiz_response_rows])
+        # Execute test, serially and with blocks of 3 users solved concurrently
+        user_factors, column_factors = als_train(interactions, 2, 10, 1.0, 10, 0.5)
+        concurrent_factors = als_train(interactions, 2, 10, 1.0, 10, 0.5, workers=3, block_size=3)
+        # Evaluate results, where each user scores movies of own genre above other genre
+        scores = user_factors @ column_factors[:10].T
+        self.assertTrue((scores[:10, :5].min(axis=1) > scores[:10, 5:].max(axis=1)).all())
+        self.assertTrue((scores[10:, 5:].min(axis=1) > scores[10:, :5].max(axis=1)).all())
+        np.testing.assert_allclose(concurrent_factors[0], user_factors, rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(concurrent_factors[1], column_factors, rtol=1e-4, atol=1e-5)
+
+    def test_als_save_model(self):
+        # Prepare test data
+        interactions = als_build_interactions([self.test_user_movie_rows], [self.test_user_quiz_response_rows])
+        user_factors, column_factors = als_train(interactions, 2, 10, 1.0, 10, 0.5)
+        with tempfile.TemporaryDirectory() as model_path:
+            # Execute test, saving model three times
+            versions = [als_save_model(model_path, interactions, user_factors, column_factors, 1.0, 10, 0.5)
+                        for _ in range(3)]
+            model = als_get_model(model_path)
+            # Evaluate results, where arrays memory-mapped and files of first version removed
+            self.assertEqual(model["version"], versions[2])
+            self.assertIsInstance(model["movie_factors"], np.memmap)
+            np.testing.assert_array_equal(model["user_factors"], user_factors)
+            np.testing.assert_array_equal(model["quiz_factors"], column_factors[10:])
+            np.testing.assert_array_equal(model["movie_store"].get_rows(["thriller 0"]), [9])
+            self.assertIsNone(model["movie_store"].centroids)
+            self.assertEqual({file_name.split(".")[0] for file_name in os.listdir(model_path)
+                              if file_name.endswith((".npy", ".movies"))}, set(versions[1:]))
+            self.assertIs(als_get_model(model_path), model)
+            self.assertIsNone(als_get_model(os.path.join(model_path, "missing")))
+
+    @patch("als.EMBEDDING_STORE_INDEX_MIN_ROWS", 10)
+    def test_als_save_model_index(self):
+        # Prepare test data
+        interactions = als_build_interactions([self.test_user_movie_rows], [self.test_user_quiz_response_rows])
+        user_factors, column_factors = als_train(interactions, 2, 10, 1.0, 10, 0.5)
+        with tempfile.TemporaryDirectory() as model_path:
+            # Execute test
+            als_save_model(model_path, interactions, user_factors, column_factors, 1.0, 10, 0.5)
+            model = als_get_model(model_path)
+            # Evaluate results, where index built over all 10 movies
+            self.assertEqual(model["movie_store"].list_offsets[-1], 10)
+            self.assertEqual(model["movie_store"].index_count, 10)
+
+    def test_als_get_user_factor_and_top_movie_names(self):
+        # Prepare test data
+        interactions = als_build_interactions([self.test_user_movie_rows], [self.test_user_quiz_response_rows])
+        user_factors, column_factors = als_train(interactions, 2, 10, 1.0, 10, 0.5)
+        with tempfile.TemporaryDirectory() as model_path:
+            als_save_model(model_path, interactions, user_factors, column_factors, 1.0, 10, 0.5)
+            model = als_get_model(model_path)
+            # Execute test, for user trained on, new user with quiz response only and new user unknown to model
+            trained_factor = als_get_user_factor(model, 1, [], [])
+            new_factor = als_get_user_factor(model, 99, ["unknown movie"], [2])
+            unknown_factor = als_get_user_factor(model, 99, ["unknown movie"], [3])
+            movie_names = als_get_top_movie_names(model, trained_factor, 2, ["comedy 1", "comedy 2", "comedy 3",
+                                                                            "comedy 4"])
+            new_movie_names = als_get_top_movie_names(model, new_factor, 5)
+            all_movie_names = als_get_top_movie_names(model, new_factor, 20, ["thriller 0"])
+        # Evaluate results, where user 1's missing comedy ranked first and new user ranked near thriller fans
+        np.testing.assert_array_equal(trained_factor, user_factors[0])
+        self.assertIsNone(unknown_factor)
+        self.assertEqual(movie_names[0], "Comedy 0")
+        self.assertEqual(len(movie_names), 2)
+        self.assertEqual(sorted(new_movie_names), [f"Thriller {number}" for number in range(5)])
+        self.assertEqual(len(all_movie_names), 9)
+        self.assertNotIn("Thriller 0", all_movie_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,12 +4,17 @@ from unittest.mock import patch
 
 from api_config import API_BASE_URL
 from api_utils import (api_add_user, api_get_user, api_add_user_movie_top_5, api_get_quizzes, map_quiz_responses,
-                       api_add_user_quiz_responses, api_get_user_movie_recommendations)
+                       api_add_user_quiz_responses, api_get_user_movie_recommendations, api_get_metrics, api_timeout,
+                       api_quizzes_cache)
 
 
 class TestApiUtils(unittest.TestCase):
 
-    @patch("api_utils.requests.post")
+    def setUp(self):
+        # Clear client copy of quizzes
+        api_quizzes_cache.update(etag=None, quizzes=None)
+
+    @patch("api_utils.api_session.post")
     def test_api_add_user_success(self, mock_post):
         # Define expected result
         expected_user_id = 1
@@ -33,10 +38,11 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         mock_post.assert_called_with(f"{API_BASE_URL}/user",
                                      data=json.dumps(test_user_data),
-                                     headers={"content-type": "application/json"})
+                                     headers={"content-type": "application/json"},
+                                    timeout=api_timeout)
         self.assertEqual(user_id, expected_user_id)
 
-    @patch("api_utils.requests.post")
+    @patch("api_utils.api_session.post")
     def test_api_add_user_failure(self, mock_post):
         # Define expected result
         expected_user_id = None
@@ -60,10 +66,11 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         mock_post.assert_called_with(f"{API_BASE_URL}/user",
                                      data=json.dumps(test_user_data),
-                                     headers={"content-type": "application/json"})
+                                     headers={"content-type": "application/json"},
+                                    timeout=api_timeout)
         self.assertEqual(user_id, expected_user_id)
 
-    @patch("api_utils.requests.get")
+    @patch("api_utils.api_session.get")
     def test_api_get_user_success(self, mock_get):
         # Define expected result
         expected_user_id = 1
@@ -83,10 +90,11 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         mock_get.assert_called_with(f"{API_BASE_URL}/user",
                                     data=json.dumps(test_user_data),
-                                    headers={"content-type": "application/json"})
+                                    headers={"content-type": "application/json"},
+                                    timeout=api_timeout)
         self.assertEqual(user_id, expected_user_id)
 
-    @patch("api_utils.requests.get")
+    @patch("api_utils.api_session.get")
     def test_api_get_user_failure(self, mock_get):
         # Define expected result
         expected_user_id = None
@@ -106,10 +114,11 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         mock_get.assert_called_with(f"{API_BASE_URL}/user",
                                     data=json.dumps(test_user_data),
-                                    headers={"content-type": "application/json"})
+                                    headers={"content-type": "application/json"},
+                                    timeout=api_timeout)
         self.assertEqual(user_id, expected_user_id)
 
-    @patch("api_utils.requests.post")
+    @patch("api_utils.api_session.post")
     def test_api_add_user_movie_top_5_success(self, mock_post):
         # Define expected result
         expected_update_count = 5
@@ -128,10 +137,11 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         mock_post.assert_called_with(f"{API_BASE_URL}/user/{test_user_id}/movie/top_5",
                                      data=json.dumps(test_movie_data),
-                                     headers={"content-type": "application/json"})
+                                     headers={"content-type": "application/json"},
+                                    timeout=api_timeout)
         self.assertEqual(update_count, expected_update_count)
 
-    @patch("api_utils.requests.post")
+    @patch("api_utils.api_session.post")
     def test_api_add_user_movie_top_5_failure(self, mock_post):
         # Define expected result
         expected_update_count = None
@@ -150,10 +160,11 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         mock_post.assert_called_with(f"{API_BASE_URL}/user/{test_user_id}/movie/top_5",
                                      data=json.dumps(test_movie_data),
-                                     headers={"content-type": "application/json"})
+                                     headers={"content-type": "application/json"},
+                                    timeout=api_timeout)
         self.assertEqual(update_count, expected_update_count)
 
-    @patch("api_utils.requests.get")
+    @patch("api_utils.api_session.get")
     def test_api_get_quizzes_success(self, mock_get):
         # Define expected result
         expected_quizzes = [
@@ -192,10 +203,28 @@ class TestApiUtils(unittest.TestCase):
         # Execute test
         quizzes = api_get_quizzes()
         # Evaluate results
-        mock_get.assert_called_with(f"{API_BASE_URL}/quizzes")
+        mock_get.assert_called_with(f"{API_BASE_URL}/quizzes", headers={}, timeout=api_timeout)
         self.assertEqual(quizzes, expected_quizzes)
 
-    @patch("api_utils.requests.get")
+    @patch("api_utils.api_session.get")
+    def test_api_get_quizzes_not_modified(self, mock_get):
+        # Define expected result
+        expected_quizzes = [{"quiz_id": 1, "quiz_prompts": []}]
+        # Prepare mock function to return quizzes with ETag, then status code 304
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.headers = {"ETag": '"abc123"'}
+        mock_get.return_value.json.return_value = {"quizzes": expected_quizzes}
+        api_get_quizzes()
+        mock_get.return_value.status_code = 304
+        mock_get.return_value.json.side_effect = ValueError("No JSON body")
+        # Execute test
+        quizzes = api_get_quizzes()
+        # Evaluate results
+        mock_get.assert_called_with(f"{API_BASE_URL}/quizzes", headers={"If-None-Match": '"abc123"'},
+                                    timeout=api_timeout)
+        self.assertEqual(quizzes, expected_quizzes)
+
+    @patch("api_utils.api_session.get")
     def test_api_get_quizzes_failure(self, mock_get):
         # Define expected result
         expected_quizzes = None
@@ -207,7 +236,7 @@ class TestApiUtils(unittest.TestCase):
         # Execute test
         quizzes = api_get_quizzes()
         # Evaluate results
-        mock_get.assert_called_with(f"{API_BASE_URL}/quizzes")
+        mock_get.assert_called_with(f"{API_BASE_URL}/quizzes", headers={}, timeout=api_timeout)
         self.assertEqual(quizzes, expected_quizzes)
 
     def test_map_quiz_responses(self):
@@ -220,7 +249,7 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         self.assertEqual(mapped_responses, expected_responses)
 
-    @patch("api_utils.requests.post")
+    @patch("api_utils.api_session.post")
     def test_api_add_user_quiz_responses_success(self, mock_post):
         # Define expected result
         expected_update_count = 2
@@ -238,10 +267,11 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         mock_post.assert_called_with(f"{API_BASE_URL}/user/{test_user_id}/quiz/{test_quiz_id}",
                                      data=json.dumps(test_quiz_response_data),
-                                     headers={"content-type": "application/json"})
+                                     headers={"content-type": "application/json"},
+                                    timeout=api_timeout)
         self.assertEqual(update_count, expected_update_count)
 
-    @patch("api_utils.requests.post")
+    @patch("api_utils.api_session.post")
     def test_api_add_user_quiz_responses_failure(self, mock_post):
         # Define expected result
         expected_update_count = None
@@ -259,10 +289,11 @@ class TestApiUtils(unittest.TestCase):
         # Evaluate results
         mock_post.assert_called_with(f"{API_BASE_URL}/user/{test_user_id}/quiz/{test_quiz_id}",
                                      data=json.dumps(test_quiz_response_data),
-                                     headers={"content-type": "application/json"})
+                                     headers={"content-type": "application/json"},
+                                    timeout=api_timeout)
         self.assertEqual(update_count, expected_update_count)
 
-    @patch("api_utils.requests.get")
+    @patch("api_utils.api_session.get")
     def test_api_get_user_movie_recommendations_success(self, mock_get):
         # Define expected result
         expected_movies = {"movies": [
@@ -288,10 +319,11 @@ class TestApiUtils(unittest.TestCase):
         # Execute test
         movies = api_get_user_movie_recommendations(test_user_id)
         # Evaluate results
-        mock_get.assert_called_with(f"{API_BASE_URL}/user/{test_user_id}/movie/recommendations")
+        mock_get.assert_called_with(f"{API_BASE_URL}/user/{test_user_id}/movie/recommendations",
+                                    timeout=api_timeout)
         self.assertEqual(movies, expected_movies)
 
-    @patch("api_utils.requests.get")
+    @patch("api_utils.api_session.get")
     def test_api_get_user_movie_recommendations_failure(self, mock_get):
         # Define expected result
         expected_movies = None
@@ -304,9 +336,16 @@ class TestApiUtils(unittest.TestCase):
         # Execute test
         movies = api_get_user_movie_recommendations(test_user_id)
         # Evaluate results
-        mock_get.assert_called_with(f"{API_BASE_URL}/user/{test_user_id}/movie/recommendations")
+        mock_get.assert_called_with(f"{API_BASE_URL}/user/{test_user_id}/movie/recommendations",
+                                    timeout=api_timeout)
         self.assertEqual(movies, expected_movies)
 
+    def test_api_get_metrics(self):
+        # Execute test
+        metrics = api_get_metrics()
+        # Evaluate results
+        self.assertEqual(set(metrics["http"]), {"requests", "connections_opened", "connections_reused", "retries"})
+
 
 if __name__ == "__main__":
     unittest.main()
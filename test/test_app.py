@@ -1,7 +1,16 @@
+import itertools
+import json
+import time
 import unittest
-from unittest.mock import patch, call
+from unittest.mock import patch, call, ANY
 
-from app import app
+from app import (app, app_get_movies_for_movie_names, app_get_cached_movies_for_movie_names, app_quiz_catalog,
+                 app_quiz_catalog_metrics)
+from db_utils import DbConnectionError
+from scoring_config import SCORING_MAX_LIMIT
+from similar_users import similar_users_cache
+from similar_users_config import SIMILAR_USERS_K
+from tmdb_utils import tmdb_add_degraded
 
 
 class TestApp(unittest.TestCase):
@@ -10,6 +19,9 @@ class TestApp(unittest.TestCase):
         # Create app test client
         self.app = app.test_client()
         self.app.testing = True
+        # Clear quiz catalog cache and counters
+        app_quiz_catalog.update(version=None, body=None, etag=None)
+        app_quiz_catalog_metrics.update(hits=0, misses=0, not_modified=0)
 
     @patch("app.db_add_user")
     def test_app_post_user_success(self, mock_db_add_user):
@@ -136,8 +148,39 @@ class TestApp(unittest.TestCase):
         self.assertEqual(response.json, {"update_count": expected_update_count})
         self.assertEqual(response.status_code, expected_status_code)
 
+    @patch("app.db_add_user_movie_top_5_batch")
+    def test_app_post_users_movie_top_5(self, mock_db_add_user_movie_top_5_batch):
+        # Define expected result
+        expected_users = [{"user_id": 2, "update_count": 0}, {"user_id": 1, "update_count": 2}]
+        # Prepare test data, with duplicate user_id where last movie names kept
+        test_user_data = {"users": [{"user_id": 2, "movie_names": ""},
+                                    {"user_id": 1, "movie_names": "Shrek"},
+                                    {"user_id": 1, "movie_names": "Shrek, Spy"}]}
+        # Prepare mock function
+        mock_db_add_user_movie_top_5_batch.return_value = {1: 2, 2: 0}
+        # Execute test
+        response = self.app.post("/users/movie/top_5", json=test_user_data)
+        # Evaluate results, where all users added in one call and returned in order first supplied
+        mock_db_add_user_movie_top_5_batch.assert_called_once_with({2: "", 1: "Shrek, Spy"})
+        self.assertEqual(response.json, {"users": expected_users})
+        self.assertEqual(response.status_code, 200)
+
+    @patch("app.db_add_user_movie_top_5_batch")
+    def test_app_post_users_movie_top_5_invalid(self, mock_db_add_user_movie_top_5_batch):
+        # Prepare test data
+        test_user_data_list = [{}, {"users": {"user_id": 1}}, {"users": [{"user_id": "1", "movie_names": "Shrek"}]},
+                               {"users": [{"user_id": 1, "movie_names": ["Shrek"]}]}, {"users": [1]}]
+        for test_user_data in test_user_data_list:
+            # Execute test
+            response = self.app.post("/users/movie/top_5", json=test_user_data)
+            # Evaluate results
+            self.assertEqual(response.json, {"users": []})
+            self.assertEqual(response.status_code, 400)
+        mock_db_add_user_movie_top_5_batch.assert_not_called()
+
+    @patch("app.db_get_quiz_catalog_version")
     @patch("app.db_get_quizzes")
-    def test_app_get_quizzes_success(self, mock_db_get_quizzes):
+    def test_app_get_quizzes_success(self, mock_db_get_quizzes, mock_db_get_quiz_catalog_version):
         # Define expected results
         expected_quizzes = [
             {
@@ -168,8 +211,9 @@ class TestApp(unittest.TestCase):
             }
         ]
         expected_status_code = 200
-        # Prepare mock function
+        # Prepare mock functions
         mock_db_get_quizzes.return_value = expected_quizzes
+        mock_db_get_quiz_catalog_version.return_value = 1
         # Execute test
         response = self.app.get(
             "/quizzes"
@@ -178,6 +222,58 @@ class TestApp(unittest.TestCase):
         mock_db_get_quizzes.assert_called_once()
         self.assertEqual(response.json, {"quizzes": expected_quizzes})
         self.assertEqual(response.status_code, expected_status_code)
+        self.assertIsNotNone(response.get_etag()[0])
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+    @patch("app.db_get_quiz_catalog_version")
+    @patch("app.db_get_quizzes")
+    def test_app_get_quizzes_cached_until_version_changes(self, mock_db_get_quizzes,
+                                                          mock_db_get_quiz_catalog_version):
+        # Prepare mock functions, with quiz catalog version changing before third request
+        mock_db_get_quizzes.side_effect = [[{"quiz_id": 1, "quiz_prompts": []}],
+                                           [{"quiz_id": 2, "quiz_prompts": []}]]
+        mock_db_get_quiz_catalog_version.side_effect = [1, 1, 2]
+        # Execute test
+        first_response = self.app.get("/quizzes")
+        second_response = self.app.get("/quizzes")
+        third_response = self.app.get("/quizzes")
+        # Evaluate results
+        self.assertEqual(mock_db_get_quizzes.call_count, 2)
+        self.assertEqual(second_response.json, first_response.json)
+        self.assertEqual(second_response.get_etag(), first_response.get_etag())
+        self.assertEqual(third_response.json, {"quizzes": [{"quiz_id": 2, "quiz_prompts": []}]})
+        self.assertNotEqual(third_response.get_etag(), first_response.get_etag())
+        self.assertEqual(app_quiz_catalog_metrics, {"hits": 1, "misses": 2, "not_modified": 0})
+
+    @patch("app.db_get_quiz_catalog_version")
+    @patch("app.db_get_quizzes")
+    def test_app_get_quizzes_not_modified(self, mock_db_get_quizzes, mock_db_get_quiz_catalog_version):
+        # Define expected results
+        expected_status_code = 304
+        # Prepare mock functions
+        mock_db_get_quizzes.return_value = [{"quiz_id": 1, "quiz_prompts": []}]
+        mock_db_get_quiz_catalog_version.return_value = 1
+        # Execute test
+        etag = self.app.get("/quizzes").get_etag()[0]
+        response = self.app.get("/quizzes", headers={"If-None-Match": f'"{etag}"'})
+        # Evaluate results
+        self.assertEqual(response.status_code, expected_status_code)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.get_etag()[0], etag)
+        mock_db_get_quizzes.assert_called_once()
+
+    @patch("app.db_get_quiz_catalog_version")
+    @patch("app.db_get_quizzes")
+    def test_app_get_quizzes_version_unavailable(self, mock_db_get_quizzes, mock_db_get_quiz_catalog_version):
+        # Prepare mock functions
+        mock_db_get_quizzes.return_value = [{"quiz_id": 1, "quiz_prompts": []}]
+        mock_db_get_quiz_catalog_version.side_effect = DbConnectionError("Failed to read from database.")
+        # Execute test
+        self.app.get("/quizzes")
+        response = self.app.get("/quizzes")
+        # Evaluate results
+        self.assertEqual(response.json, {"quizzes": [{"quiz_id": 1, "quiz_prompts": []}]})
+        self.assertEqual(mock_db_get_quizzes.call_count, 2)
 
     @patch("app.db_add_user_quiz_responses")
     def test_app_post_user_quiz_success(self, mock_db_add_user_quiz_responses):
@@ -228,16 +324,24 @@ class TestApp(unittest.TestCase):
         self.assertEqual(response.json, {"update_count": expected_update_count})
         self.assertEqual(response.status_code, expected_status_code)
 
+    @patch("app.db_add_user_movie_recommendations")
+    @patch("app.db_get_user_movie_recommendations", return_value=(None, 0))
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names", return_value={})
     @patch("app.db_get_movie_top_5_for_similar_users")
     @patch("app.tmdb_get_movie_for_movie_name")
     @patch("app.tmdb_get_movie_recommendations_for_movie_id")
-    @patch("app.tmdb_get_unique_movies")
+    @patch("app.tmdb_add_unique_movies")
     @patch("app.tmdb_get_filtered_movies")
     def test_app_get_user_movie_recommendations_success(self, mock_tmdb_get_filtered_movies,
-                                                        mock_tmdb_get_unique_movies,
+                                                        mock_tmdb_add_unique_movies,
                                                         mock_tmdb_get_movie_recommendations_for_movie_id,
                                                         mock_tmdb_get_movie_for_movie_name,
-                                                        mock_db_get_movie_top_5_for_similar_users):
+                                                        mock_db_get_movie_top_5_for_similar_users,
+                                                        mock_db_get_tmdb_movies_for_movie_names,
+                                                        mock_db_add_tmdb_movies_for_movie_names,
+                                                        mock_db_get_user_movie_recommendations,
+                                                        mock_db_add_user_movie_recommendations):
         # Define expected results
         expected_movies = [
             {"movie_id": 808,
@@ -266,12 +370,12 @@ class TestApp(unittest.TestCase):
         test_user_id = 1
         # Prepare mock functions
         mock_db_get_movie_top_5_for_similar_users.return_value = [
-            {"movie_name": "Shrek", "user_top_5": 0},
-            {"movie_name": "Spy", "user_top_5": 0},
-            {"movie_name": "Star Wars", "user_top_5": 1},
-            {"movie_name": "Titanic", "user_top_5": 1},
-            {"movie_name": "Top Gun", "user_top_5": 1},
-            {"movie_name": "Terminator", "user_top_5": 0}
+            {"movie_name": "Shrek", "user_top_5": 0, "others_top_5": 0},
+            {"movie_name": "Spy", "user_top_5": 0, "others_top_5": 0},
+            {"movie_name": "Star Wars", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Titanic", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Top Gun", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Terminator", "user_top_5": 0, "others_top_5": 0}
         ]
         mock_tmdb_get_movie_for_movie_name.return_value = {
             "movie_id": 808,
@@ -289,22 +393,6 @@ class TestApp(unittest.TestCase):
                 "movie_release_date": "2010-05-16"
             }
         ]
-        mock_tmdb_get_unique_movies.return_value = iter([
-            {
-                "movie_id": 808,
-                "movie_name": "Shrek",
-                "movie_overview": "It ain't easy being green ...",
-                "movie_popularity": 144.817,
-                "movie_release_date": "2001-05-18"
-            },
-            {
-                "movie_id": 238713,
-                "movie_name": "Spy",
-                "movie_overview": "A desk-bound CIA analyst ...",
-                "movie_popularity": 29.197,
-                "movie_release_date": "2015-05-06"
-            }
-        ])
         mock_tmdb_get_filtered_movies.return_value = iter([
             {
                 "movie_id": 808,
@@ -329,9 +417,613 @@ class TestApp(unittest.TestCase):
         mock_db_get_movie_top_5_for_similar_users.assert_called_with(test_user_id)
         mock_tmdb_get_movie_for_movie_name.assert_has_calls(expected_calls)
         mock_tmdb_get_movie_recommendations_for_movie_id.assert_called_with(808)
+        mock_db_get_user_movie_recommendations.assert_called_with(test_user_id)
+        mock_db_add_user_movie_recommendations.assert_called_with(test_user_id, expected_movies, 0)
         self.assertEqual(response.json, {"movies": expected_movies})
         self.assertEqual(response.status_code, expected_status_code)
 
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names", return_value={})
+    @patch("app.db_get_movie_top_5_for_similar_users")
+    @patch("app.tmdb_get_movie_for_movie_name")
+    @patch("app.tmdb_get_movie_recommendations_for_movie_id")
+    def test_app_get_user_movie_recommendations_concurrent(self, mock_tmdb_get_movie_recommendations_for_movie_id,
+                                                           mock_tmdb_get_movie_for_movie_name,
+                                                           mock_db_get_movie_top_5_for_similar_users,
+                                                           mock_db_get_tmdb_movies_for_movie_names,
+                                                           mock_db_add_tmdb_movies_for_movie_names):
+        # Define expected result
+        expected_status_code = 200
+        # Prepare test data
+        test_user_id = 1
+        test_movie_names = [f"Movie {movie_number}" for movie_number in range(20)]
+        # Prepare mock functions, with recommendations that overlap between movies
+        mock_db_get_movie_top_5_for_similar_users.return_value = [
+            {"movie_name": movie_name, "user_top_5": 1 if movie_number < 5 else 0, "others_top_5": 0}
+            for movie_number, movie_name in enumerate(test_movie_names)
+        ]
+        mock_tmdb_get_movie_for_movie_name.side_effect = lambda movie_name: {
+            "movie_id": int(movie_name.split()[1]),
+            "movie_name": movie_name,
+            "movie_overview": "Overview",
+            "movie_popularity": float(int(movie_name.split()[1])),
+            "movie_release_date": "2001-05-18"
+        }
+        mock_tmdb_get_movie_recommendations_for_movie_id.side_effect = lambda movie_id: [
+            {"movie_id": recommendation_id,
+             "movie_name": f"Movie {recommendation_id}",
+             "movie_overview": "Overview",
+             "movie_popularity": float(recommendation_id % 7),
+             "movie_release_date": "2001-05-18"}
+            for recommendation_id in range(movie_id, movie_id + 10)
+        ]
+        # Execute test serially, then concurrently
+        with patch("tmdb_utils.TMDB_MAX_WORKERS", 1):
+            serial_response = self.app.get(f"/user/{test_user_id}/movie/recommendations?fresh=1")
+        with patch("tmdb_utils.TMDB_MAX_WORKERS", 4), patch("tmdb_utils.tmdb_executor", None):
+            concurrent_response = self.app.get(f"/user/{test_user_id}/movie/recommendations?fresh=1")
+        # Evaluate results
+        self.assertEqual(concurrent_response.status_code, expected_status_code)
+        self.assertEqual(concurrent_response.get_data(), serial_response.get_data())
+        # Movie ids 0 to 28 are returned, less the 5 in specified user's top 5
+        self.assertEqual(len(concurrent_response.json["movies"]), 24)
+
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names", return_value={})
+    @patch("app.db_get_movie_top_5_for_similar_users")
+    @patch("app.tmdb_get_movie_for_movie_name")
+    @patch("app.tmdb_get_movie_recommendations_for_movie_id", return_value=[])
+    def test_app_get_user_movie_recommendations_unresolved_movie_name(
+            self, mock_tmdb_get_movie_recommendations_for_movie_id, mock_tmdb_get_movie_for_movie_name,
+            mock_db_get_movie_top_5_for_similar_users, mock_db_get_tmdb_movies_for_movie_names,
+            mock_db_add_tmdb_movies_for_movie_names):
+        # Define expected result
+        expected_movies = [{"movie_id": 238713, "movie_name": "Spy", "movie_overview": "A desk-bound CIA analyst ...",
+                            "movie_popularity": 29.197, "movie_release_date": "2015-05-06"}]
+        # Prepare mock functions, where one movie name is not a movie
+        mock_db_get_movie_top_5_for_similar_users.return_value = [
+            {"movie_name": "Shrek", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Occasional Coarse Language", "user_top_5": 0, "others_top_5": 0},
+            {"movie_name": "Spy", "user_top_5": 0, "others_top_5": 0}
+        ]
+        mock_tmdb_get_movie_for_movie_name.side_effect = [
+            {"movie_id": 808, "movie_name": "Shrek", "movie_overview": "It ain't easy being green ...",
+             "movie_popularity": 144.817, "movie_release_date": "2001-05-18"},
+            None,
+            expected_movies[0]
+        ]
+        # Execute test
+        response = self.app.get("/user/1/movie/recommendations?fresh=1")
+        # Evaluate results, where unresolved movie name skipped
+        mock_tmdb_get_movie_recommendations_for_movie_id.assert_has_calls([call(808), call(238713)])
+        self.assertEqual(mock_tmdb_get_movie_recommendations_for_movie_id.call_count, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"movies": expected_movies})
+
+    @patch("app.DB_BATCH_SIZE", 2)
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names", return_value={})
+    @patch("app.db_get_movie_top_5_for_similar_users_batch")
+    @patch("app.tmdb_get_movie_for_movie_name")
+    @patch("app.tmdb_get_movie_recommendations_for_movie_id", return_value=[])
+    def test_app_post_users_movie_recommendations(self, mock_tmdb_get_movie_recommendations_for_movie_id,
+                                                  mock_tmdb_get_movie_for_movie_name,
+                                                  mock_db_get_movie_top_5_for_similar_users_batch,
+                                                  mock_db_get_tmdb_movies_for_movie_names,
+                                                  mock_db_add_tmdb_movies_for_movie_names):
+        # Define expected result
+        shrek = {"movie_id": 808, "movie_name": "Shrek", "movie_overview": "It ain't easy being green ...",
+                 "movie_popularity": 144.817, "movie_release_date": "2001-05-18"}
+        spy = {"movie_id": 238713, "movie_name": "Spy", "movie_overview": "A desk-bound CIA analyst ...",
+               "movie_popularity": 29.197, "movie_release_date": "2015-05-06"}
+        expected_users = [{"user_id": 1, "movies": [spy]}, {"user_id": 2, "movies": [shrek, spy]},
+                          {"user_id": 3, "movies": []}]
+        # Prepare mock functions, where users 1 and 2 share movies in one batch and user 3 is in next batch
+        mock_db_get_movie_top_5_for_similar_users_batch.side_effect = [
+            {1: [{"movie_name": "Shrek", "user_top_5": 1, "others_top_5": 0},
+                 {"movie_name": "Spy", "user_top_5": 0, "others_top_5": 0}],
+             2: [{"movie_name": "Shrek", "user_top_5": 0, "others_top_5": 0},
+                 {"movie_name": "Spy", "user_top_5": 0, "others_top_5": 0}]},
+            {3: []}
+        ]
+        mock_tmdb_get_movie_for_movie_name.side_effect = lambda movie_name: shrek if movie_name == "Shrek" else spy
+        # Execute test, with duplicate user_id
+        response = self.app.post("/users/movie/recommendations", json={"user_ids": [1, 2, 1, 3]})
+        # Evaluate results, where each movie resolved and its recommendations retrieved once for batch
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"users": expected_users})
+        mock_db_get_movie_top_5_for_similar_users_batch.assert_has_calls([call([1, 2]), call([3])])
+        self.assertEqual(mock_tmdb_get_movie_for_movie_name.call_count, 2)
+        self.assertEqual(mock_tmdb_get_movie_recommendations_for_movie_id.call_count, 2)
+
+    @patch("app.db_get_movie_top_5_for_similar_users_batch")
+    @patch("app.app_build_movie_recommendations")
+    def test_app_post_users_movie_recommendations_stream(self, mock_app_build_movie_recommendations,
+                                                         mock_db_get_movie_top_5_for_similar_users_batch):
+        # Define expected result
+        expected_lines = [{"user_id": 1, "movies": [{"movie_id": 808, "movie_name": "Shrek"}]},
+                          {"user_id": 2, "movies": []}]
+        # Prepare mock function
+        mock_app_build_movie_recommendations.return_value = {1: [{"movie_id": 808, "movie_name": "Shrek"}], 2: []}
+        # Execute test
+        response = self.app.post("/users/movie/recommendations?stream=1", json={"user_ids": [1, 2]})
+        # Evaluate results, where each user returned as one JSON line
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertEqual([json.loads(line) for line in response.get_data(as_text=True).splitlines()], expected_lines)
+        mock_db_get_movie_top_5_for_similar_users_batch.assert_called_once_with([1, 2])
+
+    @patch("app.db_get_movie_top_5_for_similar_users_batch")
+    def test_app_post_users_movie_recommendations_failure(self, mock_db_get_movie_top_5_for_similar_users_batch):
+        # Prepare test data, with user_ids missing or not a list of integers
+        test_user_data = [{}, {"user_ids": 1}, {"user_ids": ["1"]}, {"user_ids": [True]}, [1, 2]]
+        # Execute test and evaluate results
+        for user_data in test_user_data:
+            response = self.app.post("/users/movie/recommendations", json=user_data)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json, {"users": []})
+        mock_db_get_movie_top_5_for_similar_users_batch.assert_not_called()
+
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names", return_value={})
+    @patch("app.db_get_movie_top_5_for_similar_users")
+    @patch("app.tmdb_get_movie_for_movie_name")
+    @patch("app.tmdb_get_movie_recommendations_for_movie_id")
+    def test_app_get_user_movie_recommendations_stream(self, mock_tmdb_get_movie_recommendations_for_movie_id,
+                                                       mock_tmdb_get_movie_for_movie_name,
+                                                       mock_db_get_movie_top_5_for_similar_users,
+                                                       mock_db_get_tmdb_movies_for_movie_names,
+                                                       mock_db_add_tmdb_movies_for_movie_names):
+        # Prepare test data
+        test_movie_names = [f"Movie {movie_number}" for movie_number in range(12)]
+        # Prepare mock functions, with recommendations that overlap between movies and share popularities, and
+        # arrive in reverse order
+        mock_db_get_movie_top_5_for_similar_users.return_value = [
+            {"movie_name": movie_name, "user_top_5": 1 if movie_number < 3 else 0, "others_top_5": movie_number % 3}
+            for movie_number, movie_name in enumerate(test_movie_names)
+        ]
+        mock_tmdb_get_movie_for_movie_name.side_effect = lambda movie_name: {
+            "movie_id": int(movie_name.split()[1]),
+            "movie_name": movie_name,
+            "movie_overview": "Overview",
+            "movie_popularity": float(int(movie_name.split()[1]) % 5),
+            "movie_release_date": "2001-05-18"
+        }
+
+        def test_get_movie_recommendations_for_movie_id(movie_id):
+            time.sleep((12 - movie_id) * 0.002)
+            return [{"movie_id": recommendation_id,
+                     "movie_name": f"Movie {recommendation_id}",
+                     "movie_overview": "Overview",
+                     "movie_popularity": float(recommendation_id % 5),
+                     "movie_release_date": "2001-05-18"}
+                    for recommendation_id in range(movie_id, movie_id + 10)]
+
+        mock_tmdb_get_movie_recommendations_for_movie_id.side_effect = test_get_movie_recommendations_for_movie_id
+        # Execute test for each limit, ranking by popularity alone and by ranking score, returning whole response and
+        # streamed response
+        for limit, weight in itertools.product((5, 25, 40), (0, 1)):
+            with patch("tmdb_utils.TMDB_MAX_WORKERS", 4), patch("tmdb_utils.tmdb_executor", None), \
+                    patch("scoring.SCORING_SUPPORT_WEIGHT", weight), \
+                    patch("scoring.SCORING_RECOMMENDERS_WEIGHT", weight):
+                response = self.app.get(f"/user/1/movie/recommendations?fresh=1&limit={limit}")
+                stream_response = self.app.get(f"/user/1/movie/recommendations?fresh=1&limit={limit}",
+                                               headers={"Accept": "application/x-ndjson"})
+                # Read streamed response while settings patched, as it is built as it is read
+                lines = [json.loads(line) for line in stream_response.get_data(as_text=True).splitlines()]
+            # Evaluate results, where streamed movies match whole response after header and progress lines
+            self.assertEqual(stream_response.mimetype, "application/x-ndjson")
+            self.assertEqual(lines[0], {"user_id": 1, "limit": limit})
+            self.assertEqual(lines[1:14], [{"fetched": fetched, "total": 12} for fetched in range(13)])
+            self.assertEqual([line["rank"] for line in lines[14:]], list(range(1, len(lines) - 13)))
+            self.assertEqual([line["movie"] for line in lines[14:]], response.json["movies"])
+            self.assertEqual(len(response.json["movies"]), min(limit, 18))
+
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names")
+    @patch("app.db_get_movie_neighbours")
+    @patch("app.db_get_movie_top_5_for_similar_users")
+    @patch("app.tmdb_get_movie_for_movie_name")
+    @patch("app.tmdb_get_movie_recommendations_for_movie_id", return_value=[])
+    def test_app_get_user_movie_recommendations_neighbours(self, mock_tmdb_get_movie_recommendations_for_movie_id,
+                                                           mock_tmdb_get_movie_for_movie_name,
+                                                           mock_db_get_movie_top_5_for_similar_users,
+                                                           mock_db_get_movie_neighbours,
+                                                           mock_db_get_tmdb_movies_for_movie_names,
+                                                           mock_db_add_tmdb_movies_for_movie_names):
+        # Define expected results
+        spy = {"movie_id": 238713, "movie_name": "Spy", "movie_overview": "A desk-bound CIA analyst ...",
+               "movie_popularity": 29.197, "movie_release_date": "2015-05-06"}
+        toy_story = {"movie_id": 862, "movie_name": "Toy Story", "movie_overview": "Led by Woody ...",
+                     "movie_popularity": 10.0, "movie_release_date": "1995-10-30"}
+        shrek = {"movie_id": 808, "movie_name": "Shrek", "movie_overview": "It ain't easy being green ...",
+                 "movie_popularity": 144.817, "movie_release_date": "2001-05-18"}
+        # Prepare mock functions, where neighbours of user's top 5 movie include movie from similar user, a cached movie
+        # name and an unresolved movie name
+        mock_db_get_tmdb_movies_for_movie_names.side_effect = lambda movie_name_keys, ttl_seconds=0: {
+            movie_name_key: toy_story for movie_name_key in movie_name_keys if movie_name_key == "toy story"}
+        mock_db_get_movie_top_5_for_similar_users.return_value = [
+            {"movie_name": "Shrek", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Spy", "user_top_5": 0, "others_top_5": 0}
+        ]
+        mock_db_get_movie_neighbours.return_value = {"shrek": [{"movie_name": "Toy Story", "similarity": 0.9},
+                                                               {"movie_name": "Not A Movie", "similarity": 0.6},
+                                                               {"movie_name": "Spy", "similarity": 0.4}]}
+        mock_tmdb_get_movie_for_movie_name.side_effect = lambda movie_name: {"Shrek": shrek, "Spy": spy}.get(movie_name)
+        # Execute test without co-occurrence weight, then with weight returning whole response and streamed response
+        response = self.app.get("/user/1/movie/recommendations?fresh=1")
+        with patch("scoring.SCORING_COOCCURRENCE_WEIGHT", 10.0):
+            weighted_response = self.app.get("/user/1/movie/recommendations?fresh=1")
+            stream_response = self.app.get("/user/1/movie/recommendations?fresh=1&stream=1")
+            # Read streamed response while settings patched, as it is built as it is read
+            lines = [json.loads(line) for line in stream_response.get_data(as_text=True).splitlines()]
+        # Evaluate results, where neighbours read only when weighted, ranked by similarity over popularity, and not
+        # fetched recommendations for
+        self.assertEqual(response.json, {"movies": [spy]})
+        mock_db_get_movie_neighbours.assert_has_calls([call({"shrek"}), call({"shrek"})])
+        self.assertEqual(mock_db_get_movie_neighbours.call_count, 2)
+        self.assertEqual(weighted_response.json, {"movies": [toy_story, spy]})
+        self.assertEqual([line["movie"] for line in lines if "rank" in line], [toy_story, spy])
+        self.assertNotIn(call(862), mock_tmdb_get_movie_recommendations_for_movie_id.call_args_list)
+        # Evaluate results, where neighbours resolved from cache without searching TMDB
+        self.assertEqual({movie_name for (movie_name,), _ in mock_tmdb_get_movie_for_movie_name.call_args_list},
+                         {"Shrek", "Spy"})
+        # Execute test with DB error reading neighbours
+        mock_db_get_movie_neighbours.side_effect = DbConnectionError("Failed to read from database.")
+        with patch("scoring.SCORING_COOCCURRENCE_WEIGHT", 10.0):
+            failed_response = self.app.get("/user/1/movie/recommendations?fresh=1")
+        # Evaluate results, where recommendations built without neighbours
+        self.assertEqual(failed_response.status_code, 200)
+        self.assertEqual(failed_response.json, {"movies": [spy]})
+
+    @patch("app.app_get_movies_for_movie_names")
+    @patch("app.als_get_top_movie_names")
+    @patch("app.als_get_user_factor")
+    @patch("app.db_get_user_movie_top_5_and_quiz_responses")
+    @patch("app.als_get_model")
+    @patch("app.db_get_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_als(self, mock_db_get_user_movie_recommendations, mock_als_get_model,
+                                                    mock_db_get_user_movie_top_5_and_quiz_responses,
+                                                    mock_als_get_user_factor, mock_als_get_top_movie_names,
+                                                    mock_app_get_movies_for_movie_names):
+        # Define expected result
+        spy = {"movie_id": 238713, "movie_name": "Spy"}
+        toy_story = {"movie_id": 862, "movie_name": "Toy Story"}
+        # Prepare mock functions, where one movie name unresolved and two resolve to same movie
+        mock_db_get_user_movie_top_5_and_quiz_responses.return_value = (["Shrek"], [11])
+        mock_als_get_user_factor.return_value = "user factor"
+        mock_als_get_top_movie_names.return_value = ["Spy", "Not A Movie", "spy", "Toy Story"]
+        mock_app_get_movies_for_movie_names.return_value = [spy, None, spy, toy_story]
+        # Execute test, returning whole response and streamed response
+        response = self.app.get("/user/1/movie/recommendations?mode=als&limit=2")
+        stream_response = self.app.get("/user/1/movie/recommendations?mode=als&limit=2&stream=1")
+        # Evaluate results, where user's top 5 movies excluded and stored recommendations not read
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"movies": [spy, toy_story]})
+        self.assertEqual([json.loads(line) for line in stream_response.get_data(as_text=True).splitlines()],
+                         [{"user_id": 1, "limit": 2}, {"rank": 1, "movie": spy}, {"rank": 2, "movie": toy_story}])
+        mock_als_get_user_factor.assert_called_with(mock_als_get_model.return_value, 1, ["shrek"], [11])
+        mock_als_get_top_movie_names.assert_called_with(mock_als_get_model.return_value, "user factor", 4, ["shrek"])
+        mock_db_get_user_movie_recommendations.assert_not_called()
+
+    @patch("app.tmdb_get_movie_recommendations_for_movie_id", return_value=[])
+    @patch("app.app_get_movies_for_movie_names")
+    @patch("app.db_get_movie_top_5_for_users")
+    @patch("similar_users.similar_users_get_similar_users")
+    @patch("app.db_get_user_movie_top_5_and_quiz_responses")
+    @patch("app.similar_users_get_index")
+    @patch("app.db_get_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_nearest(self, mock_db_get_user_movie_recommendations,
+                                                        mock_similar_users_get_index,
+                                                        mock_db_get_user_movie_top_5_and_quiz_responses,
+                                                        mock_similar_users_get_similar_users,
+                                                        mock_db_get_movie_top_5_for_users,
+                                                        mock_app_get_movies_for_movie_names,
+                                                        mock_tmdb_get_movie_recommendations_for_movie_id):
+        # Define expected result
+        spy = {"movie_id": 238713, "movie_name": "Spy", "movie_popularity": 29.197}
+        # Prepare mock functions
+        mock_similar_users_get_index.return_value = {"version": "1"}
+        mock_db_get_user_movie_top_5_and_quiz_responses.return_value = (["Shrek"], [11, 12])
+        mock_similar_users_get_similar_users.return_value = [[(7, 1.0), (9, 0.5)]]
+        mock_db_get_movie_top_5_for_users.return_value = [{"movie_name": "Shrek", "user_top_5": 1, "others_top_5": 0},
+                                                          {"movie_name": "Spy", "user_top_5": 0, "others_top_5": 2}]
+        mock_app_get_movies_for_movie_names.side_effect = lambda movie_names: [{"Spy": spy}.get(movie_name)
+                                                                               for movie_name in movie_names]
+        similar_users_cache.invalidate()
+        try:
+            # Execute test, returning whole response and streamed response, then posting user's quiz responses
+            response = self.app.get("/user/1/movie/recommendations?mode=nearest")
+            stream_response = self.app.get("/user/1/movie/recommendations?mode=nearest&stream=1")
+            lines = [json.loads(line) for line in stream_response.get_data(as_text=True).splitlines()]
+            with patch("app.db_add_user_quiz_responses", return_value=1):
+                self.app.post("/user/1/quiz/1", json={"quiz_responses": [{"quiz_prompt_option_id": 13}]})
+            self.app.get("/user/1/movie/recommendations?mode=nearest")
+        finally:
+            similar_users_cache.invalidate()
+        # Evaluate results, where similar users found once until user's quiz responses change, and stored
+        # recommendations not read
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"movies": [spy]})
+        self.assertEqual([line["movie"] for line in lines if "rank" in line], [spy])
+        mock_similar_users_get_similar_users.assert_called_with({"version": "1"}, [1], [[11, 12]], SIMILAR_USERS_K,
+                                                                executor=ANY)
+        self.assertEqual(mock_similar_users_get_similar_users.call_count, 2)
+        mock_db_get_movie_top_5_for_users.assert_called_with(1, [7, 9])
+        mock_db_get_user_movie_recommendations.assert_not_called()
+
+    @patch("builtins.print")
+    @patch("app.db_get_movie_top_5_for_users")
+    @patch("app.similar_users_get_index", return_value=None)
+    @patch("app.db_get_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_nearest_no_index(self, mock_db_get_user_movie_recommendations,
+                                                                 mock_similar_users_get_index,
+                                                                 mock_db_get_movie_top_5_for_users, mock_print):
+        # Prepare mock function
+        mock_db_get_user_movie_recommendations.return_value = ([{"movie_id": 808, "movie_name": "Shrek"}], 0)
+        # Execute test
+        response = self.app.get("/user/1/movie/recommendations?mode=nearest")
+        # Evaluate results, where stored recommendations from users with same vibe returned without index
+        self.assertEqual(response.json, {"movies": [{"movie_id": 808, "movie_name": "Shrek"}]})
+        mock_print.assert_called_once()
+        mock_db_get_movie_top_5_for_users.assert_not_called()
+
+    @patch("builtins.print")
+    @patch("app.als_get_model", return_value=None)
+    @patch("app.db_get_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_als_no_model(self, mock_db_get_user_movie_recommendations,
+                                                             mock_als_get_model, mock_print):
+        # Prepare mock function
+        mock_db_get_user_movie_recommendations.return_value = ([{"movie_id": 808, "movie_name": "Shrek"}], 0)
+        # Execute test, with model not trained, then with unknown mode
+        response = self.app.get("/user/1/movie/recommendations?mode=als")
+        bad_response = self.app.get("/user/1/movie/recommendations?mode=unknown")
+        # Evaluate results, where stored recommendations returned without model
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"movies": [{"movie_id": 808, "movie_name": "Shrek"}]})
+        mock_print.assert_called_once()
+        self.assertEqual(bad_response.status_code, 400)
+        self.assertEqual(bad_response.json, {"movies": []})
+
+    @patch("app.db_get_movie_top_5_for_similar_users")
+    @patch("app.db_get_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_stream_precomputed(self, mock_db_get_user_movie_recommendations,
+                                                                   mock_db_get_movie_top_5_for_similar_users):
+        # Define expected result
+        expected_lines = [{"user_id": 1, "limit": 1}, {"rank": 1, "movie": {"movie_id": 808, "movie_name": "Shrek"}}]
+        # Prepare mock function
+        mock_db_get_user_movie_recommendations.return_value = ([{"movie_id": 808, "movie_name": "Shrek"},
+                                                                {"movie_id": 238713, "movie_name": "Spy"}], 3)
+        # Execute test
+        response = self.app.get("/user/1/movie/recommendations?stream=1&limit=1")
+        # Evaluate results, where precomputed recommendations streamed up to limit
+        self.assertEqual([json.loads(line) for line in response.get_data(as_text=True).splitlines()], expected_lines)
+        mock_db_get_movie_top_5_for_similar_users.assert_not_called()
+
+    @patch("app.db_get_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_limit(self, mock_db_get_user_movie_recommendations):
+        # Prepare mock function
+        mock_db_get_user_movie_recommendations.return_value = ([{"movie_id": 808, "movie_name": "Shrek"},
+                                                                {"movie_id": 238713, "movie_name": "Spy"}], 3)
+        # Execute test
+        response = self.app.get("/user/1/movie/recommendations?limit=1")
+        invalid_responses = [self.app.get(f"/user/1/movie/recommendations?limit={limit}")
+                             for limit in ("0", "-1", "ten", "²", SCORING_MAX_LIMIT + 1, 100000)]
+        # Evaluate results, where precomputed recommendations returned up to limit, and invalid limits rejected
+        self.assertEqual(response.json, {"movies": [{"movie_id": 808, "movie_name": "Shrek"}]})
+        self.assertEqual([invalid_response.status_code for invalid_response in invalid_responses], [400] * 6)
+
+    @patch("app.app_build_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_max_limit(self, mock_app_build_user_movie_recommendations):
+        # Prepare mock function
+        mock_app_build_user_movie_recommendations.return_value = [{"movie_id": 808, "movie_name": "Shrek"}]
+        # Execute test
+        response = self.app.get(f"/user/1/movie/recommendations?limit={SCORING_MAX_LIMIT}")
+        # Evaluate results, where largest limit allowed built fresh
+        self.assertEqual(response.status_code, 200)
+        mock_app_build_user_movie_recommendations.assert_called_once_with(1, SCORING_MAX_LIMIT)
+
+    @patch("app.db_add_user_movie_recommendations")
+    @patch("app.db_get_user_movie_recommendations")
+    @patch("app.app_build_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_precomputed(self, mock_app_build_user_movie_recommendations,
+                                                            mock_db_get_user_movie_recommendations,
+                                                            mock_db_add_user_movie_recommendations):
+        # Define expected results
+        expected_movies = [{"movie_id": 808, "movie_name": "Shrek"}]
+        expected_status_code = 200
+        # Prepare test data
+        test_user_id = 1
+        # Prepare mock function
+        mock_db_get_user_movie_recommendations.return_value = (expected_movies, 3)
+        # Execute test
+        response = self.app.get(f"/user/{test_user_id}/movie/recommendations")
+        # Evaluate results
+        mock_db_get_user_movie_recommendations.assert_called_with(test_user_id)
+        mock_app_build_user_movie_recommendations.assert_not_called()
+        mock_db_add_user_movie_recommendations.assert_not_called()
+        self.assertEqual(response.json, {"movies": expected_movies})
+        self.assertEqual(response.status_code, expected_status_code)
+
+    @patch("app.db_add_user_movie_recommendations")
+    @patch("app.db_get_user_movie_recommendations")
+    @patch("app.app_build_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_stale(self, mock_app_build_user_movie_recommendations,
+                                                      mock_db_get_user_movie_recommendations,
+                                                      mock_db_add_user_movie_recommendations):
+        # Define expected results
+        expected_movies = [{"movie_id": 808, "movie_name": "Shrek"}]
+        expected_status_code = 200
+        # Prepare test data
+        test_user_id = 1
+        test_stale_version = 3
+        # Prepare mock functions
+        mock_db_get_user_movie_recommendations.return_value = (None, test_stale_version)
+        mock_app_build_user_movie_recommendations.return_value = expected_movies
+        mock_db_add_user_movie_recommendations.side_effect = DbConnectionError("Failed to write to database.")
+        # Execute test
+        with patch("builtins.print"):
+            response = self.app.get(f"/user/{test_user_id}/movie/recommendations")
+        # Evaluate results
+        mock_app_build_user_movie_recommendations.assert_called_with(test_user_id)
+        mock_db_add_user_movie_recommendations.assert_called_with(test_user_id, expected_movies, test_stale_version)
+        self.assertEqual(response.json, {"movies": expected_movies})
+        self.assertEqual(response.status_code, expected_status_code)
+
+    @patch("app.db_add_user_movie_recommendations")
+    @patch("app.db_get_user_movie_recommendations")
+    @patch("app.app_build_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_degraded(self, mock_app_build_user_movie_recommendations,
+                                                         mock_db_get_user_movie_recommendations,
+                                                         mock_db_add_user_movie_recommendations):
+        # Define expected result
+        expected_movies = [{"movie_id": 808, "movie_name": "Shrek"}]
+        # Prepare mock functions, with TMDB call failing while building recommendations
+        mock_db_get_user_movie_recommendations.return_value = (None, 3)
+
+        def test_build_user_movie_recommendations(user_id):
+            tmdb_add_degraded("recommendations")
+            return expected_movies
+
+        mock_app_build_user_movie_recommendations.side_effect = test_build_user_movie_recommendations
+        # Execute test
+        response = self.app.get("/user/1/movie/recommendations")
+        # Evaluate results, where movies returned but not stored, so built again on next request
+        mock_db_add_user_movie_recommendations.assert_not_called()
+        self.assertEqual(response.json, {"movies": expected_movies})
+        self.assertEqual(response.status_code, 200)
+
+    @patch("app.db_get_user_movie_recommendations")
+    @patch("app.app_build_user_movie_recommendations")
+    def test_app_get_user_movie_recommendations_fresh(self, mock_app_build_user_movie_recommendations,
+                                                      mock_db_get_user_movie_recommendations):
+        # Define expected result
+        expected_movies = [{"movie_id": 808, "movie_name": "Shrek"}]
+        # Prepare test data
+        test_user_id = 1
+        # Prepare mock function
+        mock_app_build_user_movie_recommendations.return_value = expected_movies
+        # Execute test
+        response = self.app.get(f"/user/{test_user_id}/movie/recommendations?fresh=1")
+        # Evaluate results
+        mock_db_get_user_movie_recommendations.assert_not_called()
+        self.assertEqual(response.json, {"movies": expected_movies})
+
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names")
+    @patch("app.tmdb_get_movie_for_movie_name")
+    def test_app_get_movies_for_movie_names(self, mock_tmdb_get_movie_for_movie_name,
+                                            mock_db_get_tmdb_movies_for_movie_names,
+                                            mock_db_add_tmdb_movies_for_movie_names):
+        # Define expected results
+        expected_cached_movie = {"movie_id": 4638, "movie_name": "Hot Fuzz"}
+        expected_resolved_movie = {"movie_id": 78, "movie_name": "Blade Runner"}
+        expected_movies = [expected_cached_movie, expected_resolved_movie, None, expected_cached_movie]
+        # Prepare test data
+        test_movie_names = ["Hot Fuzz", "Blade Runner (1982)", "Occasional Coarse Language", "hot fuzz!"]
+        # Prepare mock functions
+        mock_db_get_tmdb_movies_for_movie_names.return_value = {"hot fuzz": expected_cached_movie}
+        mock_tmdb_get_movie_for_movie_name.side_effect = [expected_resolved_movie, None]
+        # Execute test
+        with patch("app.TMDB_MOVIE_NAME_TTL", 3600):
+            movies = app_get_movies_for_movie_names(test_movie_names)
+        # Evaluate results
+        mock_db_get_tmdb_movies_for_movie_names.assert_called_once_with(
+            {"hot fuzz", "blade runner 1982", "occasional coarse language"}, 3600)
+        mock_tmdb_get_movie_for_movie_name.assert_has_calls([call("Blade Runner (1982)"),
+                                                             call("Occasional Coarse Language")])
+        self.assertEqual(mock_tmdb_get_movie_for_movie_name.call_count, 2)
+        mock_db_add_tmdb_movies_for_movie_names.assert_called_once_with(
+            {"blade runner 1982": expected_resolved_movie})
+        self.assertEqual(movies, expected_movies)
+
+    @patch("app.tmdb_get_catalog_movie_for_movie_name")
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names")
+    @patch("app.tmdb_get_movie_for_movie_name")
+    def test_app_get_movies_for_movie_names_catalog(self, mock_tmdb_get_movie_for_movie_name,
+                                                    mock_db_get_tmdb_movies_for_movie_names,
+                                                    mock_db_add_tmdb_movies_for_movie_names,
+                                                    mock_tmdb_get_catalog_movie_for_movie_name):
+        # Define expected results
+        expected_catalog_movie = {"movie_id": 238713, "movie_name": "Spy", "movie_overview": None,
+                                  "movie_popularity": 29.197, "movie_release_date": "2015"}
+        expected_resolved_movie = {"movie_id": 808, "movie_name": "Shrek", "movie_overview": "...",
+                                   "movie_popularity": 144.817, "movie_release_date": "2001-05-18"}
+        # Prepare mock functions, where one movie name in local catalog only
+        mock_db_get_tmdb_movies_for_movie_names.return_value = {}
+        mock_tmdb_get_catalog_movie_for_movie_name.side_effect = lambda movie_name: {
+            "Spy": expected_catalog_movie}.get(movie_name)
+        mock_tmdb_get_movie_for_movie_name.return_value = expected_resolved_movie
+        # Execute test
+        movies = app_get_movies_for_movie_names(["Spy", "Shrek"])
+        # Evaluate results, where TMDB searched only for movie name not in catalog, and catalog movie not cached
+        mock_tmdb_get_movie_for_movie_name.assert_called_once_with("Shrek")
+        mock_db_add_tmdb_movies_for_movie_names.assert_called_once_with({"shrek": expected_resolved_movie})
+        self.assertEqual(movies, [expected_catalog_movie, expected_resolved_movie])
+
+    @patch("app.tmdb_is_circuit_open", return_value=True)
+    @patch("app.db_add_tmdb_movies_for_movie_names")
+    @patch("app.db_get_tmdb_movies_for_movie_names")
+    @patch("app.tmdb_get_movie_for_movie_name", return_value=None)
+    def test_app_get_movies_for_movie_names_circuit_open(self, mock_tmdb_get_movie_for_movie_name,
+                                                         mock_db_get_tmdb_movies_for_movie_names,
+                                                         mock_db_add_tmdb_movies_for_movie_names,
+                                                         mock_tmdb_is_circuit_open):
+        # Define expected result
+        expected_stale_movie = {"movie_id": 78, "movie_name": "Blade Runner"}
+        # Prepare mock function, returning no unexpired movie details, then expired movie details
+        mock_db_get_tmdb_movies_for_movie_names.side_effect = [{}, {"blade runner 1982": expected_stale_movie}]
+        # Execute test
+        with patch("app.TMDB_MOVIE_NAME_TTL", 3600):
+            movies = app_get_movies_for_movie_names(["Blade Runner (1982)", "Spy"])
+        # Evaluate results, where expired movie details used and not cached again
+        mock_db_get_tmdb_movies_for_movie_names.assert_called_with({"blade runner 1982", "spy"})
+        mock_db_add_tmdb_movies_for_movie_names.assert_not_called()
+        self.assertEqual(movies, [expected_stale_movie, None])
+
+    @patch("app.tmdb_get_catalog_movie_for_movie_name")
+    @patch("app.db_get_tmdb_movies_for_movie_names")
+    @patch("app.tmdb_get_movie_for_movie_name")
+    def test_app_get_cached_movies_for_movie_names(self, mock_tmdb_get_movie_for_movie_name,
+                                                   mock_db_get_tmdb_movies_for_movie_names,
+                                                   mock_tmdb_get_catalog_movie_for_movie_name):
+        # Define expected results
+        expected_cached_movie = {"movie_id": 78, "movie_name": "Blade Runner"}
+        expected_catalog_movie = {"movie_id": 238713, "movie_name": "Spy"}
+        # Prepare mock functions, where one movie name cached, one in local catalog only and one in neither
+        mock_db_get_tmdb_movies_for_movie_names.return_value = {"blade runner 1982": expected_cached_movie}
+        mock_tmdb_get_catalog_movie_for_movie_name.side_effect = lambda movie_name: {
+            "Spy": expected_catalog_movie}.get(movie_name)
+        # Execute test, then with DB error
+        movies = app_get_cached_movies_for_movie_names(["Blade Runner (1982)", "Spy", "Not A Movie"])
+        mock_db_get_tmdb_movies_for_movie_names.side_effect = DbConnectionError("Failed to read from database.")
+        with patch("builtins.print"):
+            failed_movies = app_get_cached_movies_for_movie_names(["Spy"])
+        # Evaluate results, where cached movie details used however old and TMDB never searched
+        mock_db_get_tmdb_movies_for_movie_names.assert_called_with({"spy"})
+        self.assertEqual(movies, [expected_cached_movie, expected_catalog_movie, None])
+        self.assertEqual(failed_movies, [None])
+        mock_tmdb_get_movie_for_movie_name.assert_not_called()
+
+    @patch("app.db_get_pool_metrics")
+    @patch("app.tmdb_get_metrics")
+    def test_app_get_metrics(self, mock_tmdb_get_metrics, mock_db_get_pool_metrics):
+        # Define expected results
+        expected_metrics = {"recommendations_cache": {"size": 1, "hits": 2, "misses": 1, "evictions": 0}}
+        expected_db_metrics = {"checkouts": 3, "waits": 0, "wait_seconds": 0.0, "timeouts": 0, "pool_size": 5}
+        expected_status_code = 200
+        # Prepare mock function
+        mock_tmdb_get_metrics.return_value = expected_metrics
+        mock_db_get_pool_metrics.return_value = expected_db_metrics
+        # Execute test
+        response = self.app.get("/metrics")
+        # Evaluate results
+        self.assertEqual(response.json, {"tmdb": expected_metrics, "db": expected_db_metrics,
+                                         "quiz_catalog": {"hits": 0, "misses": 0, "not_modified": 0},
+                                         "similar_users_cache": similar_users_cache.get_metrics()})
+        self.assertEqual(response.status_code, expected_status_code)
+
 
 if __name__ == "__main__":
     unittest.main()
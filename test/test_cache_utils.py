@@ -0,0 +1,205 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from cache_utils import TtlLruCache, SingleFlight
+
+
+class TestTtlLruCache(unittest.TestCase):
+
+    def test_get_hit_and_miss(self):
+        # Define expected result
+        expected_metrics = {"size": 1, "hits": 1, "misses": 1, "evictions": 0, "stale_hits": 0}
+        # Prepare test data
+        cache = TtlLruCache(max_size=2, ttl_seconds=60)
+        cache.put(120, ["Shrek"])
+        # Execute test
+        cached_value = cache.get(120)
+        missing_value = cache.get(808)
+        # Evaluate results
+        self.assertEqual(cached_value, ["Shrek"])
+        self.assertIsNone(missing_value)
+        self.assertEqual(cache.get_metrics(), expected_metrics)
+
+    def test_put_evicts_least_recently_used(self):
+        # Prepare test data
+        cache = TtlLruCache(max_size=2, ttl_seconds=60)
+        cache.put(1, "Shrek")
+        cache.put(2, "Spy")
+        # Use key 1 so key 2 becomes least recently used
+        cache.get(1)
+        # Execute test
+        cache.put(3, "Star Wars")
+        # Evaluate results
+        self.assertEqual(cache.get(1), "Shrek")
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(3), "Star Wars")
+        self.assertEqual(cache.get_metrics()["evictions"], 1)
+
+    @patch("cache_utils.time.monotonic")
+    def test_get_expired(self, mock_monotonic):
+        # Prepare test data
+        cache = TtlLruCache(max_size=2, ttl_seconds=60)
+        mock_monotonic.return_value = 1000.0
+        cache.put(1, "Shrek")
+        # Execute test, before and after TTL elapsed
+        mock_monotonic.return_value = 1059.0
+        value_before_expiry = cache.get(1)
+        mock_monotonic.return_value = 1060.0
+        value_after_expiry = cache.get(1)
+        # Evaluate results
+        self.assertEqual(value_before_expiry, "Shrek")
+        self.assertIsNone(value_after_expiry)
+
+    @patch("cache_utils.time.monotonic")
+    def test_get_stale(self, mock_monotonic):
+        # Prepare test data
+        cache = TtlLruCache(max_size=2, ttl_seconds=60)
+        mock_monotonic.return_value = 1000.0
+        cache.put(1, "Shrek")
+        mock_monotonic.return_value = 1060.0
+        # Execute test
+        expired_value = cache.get(1)
+        stale_value = cache.get_stale(1)
+        missing_value = cache.get_stale(2, "Spy")
+        # Evaluate results, where expired value still available as stale value
+        self.assertIsNone(expired_value)
+        self.assertEqual(stale_value, "Shrek")
+        self.assertEqual(missing_value, "Spy")
+        self.assertEqual(cache.get_metrics()["stale_hits"], 1)
+
+    def test_put_disabled(self):
+        # Prepare test data
+        cache = TtlLruCache(max_size=0, ttl_seconds=60)
+        # Execute test
+        cache.put(1, "Shrek")
+        # Evaluate results
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get_metrics()["size"], 0)
+
+    def test_invalidate(self):
+        # Prepare test data
+        cache = TtlLruCache(max_size=5, ttl_seconds=60)
+        for key in range(3):
+            cache.put(key, key)
+        # Execute test, invalidating single key then all keys
+        cache.invalidate(0)
+        size_after_key_invalidated = cache.get_metrics()["size"]
+        cache.invalidate()
+        # Evaluate results
+        self.assertEqual(size_after_key_invalidated, 2)
+        self.assertEqual(cache.get_metrics()["size"], 0)
+
+    def test_thread_safety(self):
+        # Prepare test data
+        cache = TtlLruCache(max_size=50, ttl_seconds=60)
+
+        def test_function(thread_number):
+            for key in range(200):
+                cache.put((thread_number, key), key)
+                cache.get((thread_number, key))
+
+        test_threads = [threading.Thread(target=test_function, args=(number,)) for number in range(8)]
+        # Execute test
+        for test_thread in test_threads:
+            test_thread.start()
+        for test_thread in test_threads:
+            test_thread.join()
+        # Evaluate results
+        metrics = cache.get_metrics()
+        self.assertEqual(metrics["size"], 50)
+        self.assertEqual(metrics["hits"] + metrics["misses"], 1600)
+        self.assertEqual(metrics["evictions"], 1550)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    # Define helper method to start thread calling single_flight.do for key, recording result or error in outcomes
+    def start_caller(self, single_flight, key, function, outcomes):
+        def test_caller():
+            try:
+                outcomes.append(single_flight.do(key, function))
+            except ValueError as e:
+                outcomes.append(e)
+
+        test_thread = threading.Thread(target=test_caller)
+        test_thread.start()
+        return test_thread
+
+    # Define helper method to wait until number of shared calls reaches count
+    def wait_for_shared_calls(self, single_flight, count):
+        for _ in range(1000):
+            if single_flight.get_metrics()["deduplicated"] >= count:
+                return
+            time.sleep(0.001)
+        self.fail("Calls not shared")
+
+    def test_do_shares_call_in_flight(self):
+        # Define expected result
+        expected_metrics = {"in_flight": 0, "calls": 1, "deduplicated": 3}
+        # Prepare test data, with function blocked until every caller waiting
+        single_flight = SingleFlight()
+        release_event = threading.Event()
+        test_calls = []
+        outcomes = []
+
+        def test_function():
+            test_calls.append(1)
+            release_event.wait()
+            return ["Shrek"]
+
+        # Execute test
+        test_threads = [self.start_caller(single_flight, 120, test_function, outcomes)]
+        while not test_calls:
+            time.sleep(0.001)
+        test_threads += [self.start_caller(single_flight, 120, test_function, outcomes) for _ in range(3)]
+        self.wait_for_shared_calls(single_flight, 3)
+        release_event.set()
+        for test_thread in test_threads:
+            test_thread.join()
+        # Evaluate results
+        self.assertEqual(len(test_calls), 1)
+        self.assertEqual(outcomes, [["Shrek"]] * 4)
+        self.assertEqual(single_flight.get_metrics(), expected_metrics)
+
+    def test_do_raises_error_for_every_caller(self):
+        # Prepare test data, with function blocked until second caller waiting
+        single_flight = SingleFlight()
+        release_event = threading.Event()
+        outcomes = []
+
+        def test_function():
+            release_event.wait()
+            raise ValueError("TMDB unavailable")
+
+        # Execute test
+        test_threads = [self.start_caller(single_flight, 120, test_function, outcomes)]
+        while not single_flight.get_metrics()["in_flight"]:
+            time.sleep(0.001)
+        test_threads.append(self.start_caller(single_flight, 120, test_function, outcomes))
+        self.wait_for_shared_calls(single_flight, 1)
+        release_event.set()
+        for test_thread in test_threads:
+            test_thread.join()
+        # Evaluate results
+        self.assertEqual(len(outcomes), 2)
+        self.assertTrue(all(isinstance(outcome, ValueError) for outcome in outcomes))
+
+    def test_do_makes_new_call_once_complete(self):
+        # Prepare test data
+        single_flight = SingleFlight()
+        test_results = iter([["Shrek"], ["Spy"]])
+        # Execute test, calling for same key in turn and for different key
+        first_result = single_flight.do(120, next, test_results)
+        second_result = single_flight.do(120, next, test_results)
+        other_result = single_flight.do(808, len, "Shrek")
+        # Evaluate results
+        self.assertEqual(first_result, ["Shrek"])
+        self.assertEqual(second_result, ["Spy"])
+        self.assertEqual(other_result, 5)
+        self.assertEqual(single_flight.get_metrics(), {"in_flight": 0, "calls": 3, "deduplicated": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
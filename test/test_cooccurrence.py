@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+from cooccurrence import cooccurrence_build_matrix, cooccurrence_get_similarities, cooccurrence_get_neighbour_rows
+
+
+class TestCooccurrence(unittest.TestCase):
+
+    def setUp(self):
+        # Prepare test data, where user 2's rows are split across batches and user 3 spells Shrek differently
+        self.test_user_movie_batches = [
+            [(1, "Shrek"), (1, "Spy"), (1, "Toy Story"), (2, "Shrek")],
+            [(2, "Spy"), (3, "shrek"), (3, "Toy Story")]
+        ]
+
+    def test_cooccurrence_build_matrix(self):
+        # Execute test
+        matrix = cooccurrence_build_matrix(iter(self.test_user_movie_batches))
+        # Evaluate results, where Shrek and Spy are listed together by users 1 and 2, Shrek and Toy Story by users 1
+        # and 3, and Spy and Toy Story by user 1
+        self.assertEqual(matrix["movie_name_keys"], ["shrek", "spy", "toy story"])
+        self.assertEqual(matrix["movie_names"], ["Shrek", "Spy", "Toy Story"])
+        np.testing.assert_array_equal(matrix["movie_user_counts"], [3, 2, 2])
+        np.testing.assert_array_equal(matrix["indptr"], [0, 2, 4, 6])
+        np.testing.assert_array_equal(matrix["indices"], [1, 2, 0, 2, 0, 1])
+        np.testing.assert_array_equal(matrix["counts"], [2, 2, 2, 1, 2, 1])
+
+    def test_cooccurrence_build_matrix_empty(self):
+        # Execute test
+        matrix = cooccurrence_build_matrix([])
+        # Evaluate results
+        self.assertEqual(matrix["movie_names"], [])
+        np.testing.assert_array_equal(matrix["indptr"], [0])
+        self.assertEqual(len(matrix["counts"]), 0)
+
+    def test_cooccurrence_get_similarities(self):
+        # Prepare test data
+        matrix = cooccurrence_build_matrix(self.test_user_movie_batches)
+        # Execute test and evaluate results
+        np.testing.assert_allclose(cooccurrence_get_similarities(matrix, "cosine"),
+                                   [2 / np.sqrt(6), 2 / np.sqrt(6), 2 / np.sqrt(6), 1 / 2, 2 / np.sqrt(6), 1 / 2])
+        np.testing.assert_allclose(cooccurrence_get_similarities(matrix, "jaccard"),
+                                   [2 / 3, 2 / 3, 2 / 3, 1 / 3, 2 / 3, 1 / 3])
+        with self.assertRaises(ValueError):
+            cooccurrence_get_similarities(matrix, "euclidean")
+
+    def test_cooccurrence_get_neighbour_rows(self):
+        # Define expected results
+        expected_top_rows = [("shrek", 1, "spy", "Spy", 2 / 3, 2),
+                             ("spy", 1, "shrek", "Shrek", 2 / 3, 2),
+                             ("toy story", 1, "shrek", "Shrek", 2 / 3, 2)]
+        expected_common_rows = [("shrek", 1, "spy", "Spy", 2 / 3, 2),
+                                ("shrek", 2, "toy story", "Toy Story", 2 / 3, 2),
+                                ("spy", 1, "shrek", "Shrek", 2 / 3, 2),
+                                ("toy story", 1, "shrek", "Shrek", 2 / 3, 2)]
+        # Prepare test data
+        matrix = cooccurrence_build_matrix(self.test_user_movie_batches)
+        # Execute test, keeping most similar neighbour of each movie, then all neighbours listed by two users
+        top_rows = list(cooccurrence_get_neighbour_rows(matrix, 1, 1, "jaccard"))
+        common_rows = list(cooccurrence_get_neighbour_rows(matrix, 5, 2, "jaccard"))
+        # Evaluate results, where equally similar neighbours ranked in order movies first seen
+        self.assertEqual(top_rows, expected_top_rows)
+        self.assertEqual(common_rows, expected_common_rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
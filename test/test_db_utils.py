@@ -1,15 +1,27 @@
+import threading
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 
-from db_config import HOST, USER, PASSWORD
-from db_utils import (db_connect, db_add_user, db_get_user, db_add_user_movie_top_5, map_quiz_prompt_option_rows,
+from mysql.connector.errors import DataError, IntegrityError, PoolError
+
+from db_config import HOST, USER, PASSWORD, DB_POOL_SIZE
+from db_utils import (db_connect, db_add_user, db_get_user, db_add_user_movie_top_5, db_add_user_movie_top_5_batch,
+                      db_split_movie_names, map_quiz_prompt_option_rows, db_get_quiz_catalog_version,
                       db_get_quizzes, db_add_user_quiz_responses, map_movie_rows, db_get_movie_top_5_for_similar_users,
-                      DbConnectionError)
+                      db_movie_top_5_for_similar_users_query, db_get_movie_top_5_for_similar_users_batch,
+                      db_get_movie_top_5_for_users,
+                      map_tmdb_movie_rows, db_get_tmdb_movies_for_movie_names, db_add_tmdb_movies_for_movie_names,
+                      db_get_user_movie_recommendations, db_add_user_movie_recommendations,
+                      db_get_stale_user_movie_recommendations, db_get_user_movie_top_5_batches,
+                      db_replace_movie_neighbours, db_get_movie_neighbours, db_get_user_quiz_response_batches,
+                      db_get_user_movie_top_5_and_quiz_responses, db_get_pool_metrics, DbConnectionError)
 
 
 class TestDbUtils(unittest.TestCase):
-    @patch("db_utils.mysql.connector.connect")
-    def test_db_connect(self, mock_db_connect):
+    @patch("db_utils.db_connection_slots", threading.BoundedSemaphore(DB_POOL_SIZE))
+    @patch("db_utils.db_connection_pool", None)
+    @patch("db_utils.mysql.connector.pooling.MySQLConnectionPool")
+    def test_db_connect(self, mock_connection_pool):
         # Define expected results
         expected_host = HOST
         expected_user = USER
@@ -17,14 +29,75 @@ class TestDbUtils(unittest.TestCase):
         expected_database = "user_movie_vibes"
         # Prepare mock function
         mock_db_connection = MagicMock()
-        mock_db_connect.return_value = mock_db_connection
-        # Execute test
+        mock_connection_pool.return_value.get_connection.return_value = mock_db_connection
+        # Execute test, borrowing two connections from same pool
         db_connection = db_connect()
+        db_connect()
         # Evaluate results
-        mock_db_connect.assert_called_once_with(
+        mock_connection_pool.assert_called_once_with(
+            pool_name="user_movie_vibes", pool_size=DB_POOL_SIZE,
             host=expected_host, user=expected_user, password=expected_password, database=expected_database
         )
-        self.assertEqual(db_connection, mock_db_connection)
+        self.assertEqual(mock_connection_pool.return_value.get_connection.call_count, 2)
+        self.assertEqual(db_connection.connection, mock_db_connection)
+
+    @patch("db_utils.db_connection_slots", threading.BoundedSemaphore(1))
+    @patch("db_utils.db_connection_pool")
+    def test_db_connect_waits_for_free_connection(self, mock_connection_pool):
+        # Prepare test data, with only connection in pool borrowed and returned shortly
+        first_connection = db_connect()
+        timer = threading.Timer(0.05, first_connection.close)
+        metrics_before = db_get_pool_metrics()
+        # Execute test
+        timer.start()
+        db_connection = db_connect()
+        timer.join()
+        # Evaluate results, where pool asked for connection only once it was returned
+        metrics_after = db_get_pool_metrics()
+        self.assertEqual(db_connection.connection, mock_connection_pool.get_connection.return_value)
+        self.assertEqual(mock_connection_pool.get_connection.call_count, 2)
+        self.assertEqual(metrics_after["checkouts"] - metrics_before["checkouts"], 1)
+        self.assertEqual(metrics_after["waits"] - metrics_before["waits"], 1)
+        self.assertGreater(metrics_after["wait_seconds"] - metrics_before["wait_seconds"], 0.0)
+        db_connection.close()
+
+    @patch("db_utils.DB_POOL_TIMEOUT", 0.05)
+    @patch("db_utils.db_connection_slots", threading.BoundedSemaphore(1))
+    @patch("db_utils.db_connection_pool")
+    def test_db_connect_timeout(self, mock_connection_pool):
+        # Prepare test data, with only connection in pool borrowed and never returned
+        db_connection = db_connect()
+        metrics_before = db_get_pool_metrics()
+        # Execute test and evaluate results, where pool not asked again while exhausted
+        with self.assertRaises(PoolError):
+            db_connect()
+        self.assertEqual(db_get_pool_metrics()["timeouts"] - metrics_before["timeouts"], 1)
+        self.assertEqual(mock_connection_pool.get_connection.call_count, 1)
+        # Execute test, closing connection twice, and evaluate results, where place in pool freed once only
+        db_connection.close()
+        db_connection.close()
+        self.assertEqual(db_connect().connection, mock_connection_pool.get_connection.return_value)
+
+    @patch("db_utils.db_connection_slots", threading.BoundedSemaphore(1))
+    @patch("db_utils.db_connection_pool")
+    def test_db_connect_error_frees_connection(self, mock_connection_pool):
+        # Prepare mock function, failing to connect once
+        mock_connection_pool.get_connection.side_effect = [PoolError("Failed to connect"), MagicMock()]
+        # Execute test and evaluate results, where place in pool freed after failure
+        with self.assertRaises(PoolError):
+            db_connect()
+        self.assertIsNotNone(db_connect())
+
+    @patch("db_utils.db_connect")
+    def test_db_function_closes_connection(self, mock_db_connect):
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_db_connection.cursor.return_value.fetchone.return_value = None
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        db_get_user("sophie.stubbs@nomail.com", "TestPassword1!")
+        # Evaluate results, as closing pooled connection returns it to pool
+        mock_db_connection.close.assert_called_once()
 
     @patch("db_utils.db_connect")
     def test_db_add_user(self, mock_db_connect):
@@ -81,6 +154,11 @@ class TestDbUtils(unittest.TestCase):
         )
         self.assertEqual(user_id, expected_user_id)
 
+    def test_db_split_movie_names(self):
+        # Execute test and evaluate results
+        self.assertEqual(db_split_movie_names(" Shrek,Spy , Star Wars"), ["Shrek", "Spy", "Star Wars"])
+        self.assertEqual(db_split_movie_names(""), [])
+
     @patch("db_utils.db_connect")
     def test_db_add_user_movie_top_5(self, mock_db_connect):
         # Define expected result
@@ -91,17 +169,121 @@ class TestDbUtils(unittest.TestCase):
         # Prepare mock function and cursor
         mock_db_connection = MagicMock()
         mock_cursor = MagicMock()
-        mock_cursor.callproc.return_value = (test_user_id, test_movie_names, expected_update_count)
+        mock_cursor.rowcount = 5
         mock_db_connection.cursor.return_value = mock_cursor
         mock_db_connect.return_value = mock_db_connection
         # Execute test
         update_count = db_add_user_movie_top_5(test_user_id, test_movie_names)
         # Evaluate results
-        mock_cursor.callproc.assert_called_once_with(
-            "sp_add_user_movie_top_5",
-            (test_user_id, test_movie_names, (None, "SIGNED"))
-        )
         self.assertEqual(update_count, expected_update_count)
+        mock_cursor.executemany.assert_called_once_with(
+            "INSERT INTO user_movie_top_5 (user_id, movie_name) VALUES (%s, %s)",
+            [(1, "Shrek"), (1, "Spy"), (1, "Star Wars"), (1, "Titanic"), (1, "Top Gun")]
+        )
+        self.assertEqual(mock_cursor.execute.call_count, 2)
+        mock_db_connection.commit.assert_called_once()
+        mock_db_connection.rollback.assert_not_called()
+
+    @patch("db_utils.db_connect")
+    def test_db_add_user_movie_top_5_partial_insert(self, mock_db_connect):
+        # Prepare mock function and cursor to report fewer rows added than supplied
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.rowcount = 4
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        update_count = db_add_user_movie_top_5(1, "Shrek, Spy, Star Wars, Titanic, Top Gun")
+        # Evaluate results
+        self.assertEqual(update_count, 0)
+        mock_db_connection.rollback.assert_called_once()
+        mock_db_connection.commit.assert_not_called()
+
+    @patch("db_utils.db_connect")
+    def test_db_add_user_movie_top_5_rejected(self, mock_db_connect):
+        # Prepare mock function and cursor to reject movie name
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.executemany.side_effect = DataError("Data too long for column 'movie_name'")
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        update_count = db_add_user_movie_top_5(1, "Shrek, " + "S" * 201)
+        # Evaluate results
+        self.assertEqual(update_count, 0)
+        mock_db_connection.rollback.assert_called_once()
+
+    @patch("db_utils.db_connect")
+    def test_db_add_user_movie_top_5_blank(self, mock_db_connect):
+        # Execute test and evaluate results
+        self.assertEqual(db_add_user_movie_top_5(1, ""), 0)
+        self.assertEqual(db_add_user_movie_top_5(1, "Shrek, , Spy"), 0)
+        mock_db_connect.assert_not_called()
+
+    @patch("db_utils.db_connect")
+    def test_db_add_user_movie_top_5_error(self, mock_db_connect):
+        # Prepare mock function to fail to connect
+        mock_db_connect.side_effect = Exception("Connection refused")
+        # Execute test and evaluate results
+        with self.assertRaises(DbConnectionError):
+            db_add_user_movie_top_5(1, "Shrek")
+
+    @patch("db_utils.DB_BATCH_SIZE", 2)
+    @patch("db_utils.db_connect")
+    def test_db_add_user_movie_top_5_batch(self, mock_db_connect):
+        # Define expected result
+        expected_update_counts = {1: 2, 2: 1, 3: 0, 4: 0}
+        # Prepare test data
+        test_movie_top_5_by_user_id = {1: "Shrek, Spy", 2: "Titanic", 3: "", 4: "Top Gun"}
+        # Prepare mock function and cursor, with second batch reporting no rows added
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        rowcounts = iter([3, 0])
+
+        def executemany(query, rows):
+            mock_cursor.rowcount = next(rowcounts)
+
+        mock_cursor.executemany.side_effect = executemany
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        update_counts = db_add_user_movie_top_5_batch(test_movie_top_5_by_user_id)
+        # Evaluate results
+        self.assertEqual(update_counts, expected_update_counts)
+        self.assertEqual(mock_cursor.executemany.call_args_list[0][0][1], [(1, "Shrek"), (1, "Spy"), (2, "Titanic")])
+        self.assertEqual(mock_cursor.executemany.call_args_list[1][0][1], [(4, "Top Gun")])
+        mock_db_connection.commit.assert_called_once()
+        mock_db_connection.rollback.assert_called_once()
+        mock_db_connect.assert_called_once()
+
+    @patch("db_utils.DB_BATCH_SIZE", 3)
+    @patch("db_utils.db_connect")
+    def test_db_add_user_movie_top_5_batch_user_rejected(self, mock_db_connect):
+        # Define expected result
+        expected_update_counts = {1: 2, 2: 0, 3: 1}
+        # Prepare test data
+        test_movie_top_5_by_user_id = {1: "Shrek, Spy", 2: "Titanic", 3: "Top Gun"}
+        # Prepare mock function and cursor, where second user not found, so any insert including them fails
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+
+        def executemany(query, rows):
+            if any(user_id == 2 for user_id, _ in rows):
+                raise IntegrityError("Cannot add or update a child row")
+            mock_cursor.rowcount = len(rows)
+
+        mock_cursor.executemany.side_effect = executemany
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        update_counts = db_add_user_movie_top_5_batch(test_movie_top_5_by_user_id)
+        # Evaluate results, where batch rolled back, then each user added in own transaction
+        self.assertEqual(update_counts, expected_update_counts)
+        self.assertEqual([mock_call[0][1] for mock_call in mock_cursor.executemany.call_args_list],
+                         [[(1, "Shrek"), (1, "Spy"), (2, "Titanic"), (3, "Top Gun")], [(1, "Shrek"), (1, "Spy")],
+                          [(2, "Titanic")], [(3, "Top Gun")]])
+        self.assertEqual(mock_db_connection.commit.call_count, 2)
+        self.assertEqual(mock_db_connection.rollback.call_count, 2)
 
     def test_map_quiz_prompt_option_rows(self):
         # Define expected result
@@ -194,6 +376,22 @@ class TestDbUtils(unittest.TestCase):
         # Evaluate results
         self.assertEqual(quizzes, expected_quizzes)
 
+    @patch("db_utils.db_connect")
+    def test_db_get_quiz_catalog_version(self, mock_db_connect):
+        # Define expected result
+        expected_version = 7
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.return_value = (expected_version,)
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        version = db_get_quiz_catalog_version()
+        # Evaluate results
+        self.assertEqual(version, expected_version)
+        mock_db_connection.close.assert_called_once()
+
     @patch("db_utils.db_connect")
     def test_db_add_user_quiz_responses(self, mock_db_connect):
         # Define expected result
@@ -220,21 +418,21 @@ class TestDbUtils(unittest.TestCase):
     def test_map_movie_rows(self):
         # Define expected result
         expected_movies = [
-            {"movie_name": "Shrek", "user_top_5": 1},
-            {"movie_name": "Spy", "user_top_5": 1},
-            {"movie_name": "Star Wars", "user_top_5": 1},
-            {"movie_name": "Titanic", "user_top_5": 1},
-            {"movie_name": "Top Gun", "user_top_5": 1},
-            {"movie_name": "Terminator", "user_top_5": 0}
+            {"movie_name": "Shrek", "user_top_5": 1, "others_top_5": 2},
+            {"movie_name": "Spy", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Star Wars", "user_top_5": 1, "others_top_5": 1},
+            {"movie_name": "Titanic", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Top Gun", "user_top_5": 1, "others_top_5": 3},
+            {"movie_name": "Terminator", "user_top_5": 0, "others_top_5": 4}
         ]
         # Prepare test data
         test_movie_rows = [
-            ("Shrek", 1),
-            ("Spy", 1),
-            ("Star Wars", 1),
-            ("Titanic", 1),
-            ("Top Gun", 1),
-            ("Terminator", 0)
+            ("Shrek", 1, 2),
+            ("Spy", 1, 0),
+            ("Star Wars", 1, 1),
+            ("Titanic", 1, 0),
+            ("Top Gun", 1, 3),
+            ("Terminator", 0, 4)
         ]
         # Execute test
         movies = map_movie_rows(test_movie_rows)
@@ -245,21 +443,21 @@ class TestDbUtils(unittest.TestCase):
     def test_db_get_movie_top_5_for_similar_users(self, mock_db_connect):
         # Define expected result
         expected_movies = [
-            {"movie_name": "Shrek", "user_top_5": 1},
-            {"movie_name": "Spy", "user_top_5": 1},
-            {"movie_name": "Star Wars", "user_top_5": 1},
-            {"movie_name": "Titanic", "user_top_5": 1},
-            {"movie_name": "Top Gun", "user_top_5": 1},
-            {"movie_name": "Terminator", "user_top_5": 0}
+            {"movie_name": "Shrek", "user_top_5": 1, "others_top_5": 2},
+            {"movie_name": "Spy", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Star Wars", "user_top_5": 1, "others_top_5": 1},
+            {"movie_name": "Titanic", "user_top_5": 1, "others_top_5": 0},
+            {"movie_name": "Top Gun", "user_top_5": 1, "others_top_5": 3},
+            {"movie_name": "Terminator", "user_top_5": 0, "others_top_5": 4}
         ]
         # Prepare test data
         test_movie_rows = [
-            ("Shrek", 1),
-            ("Spy", 1),
-            ("Star Wars", 1),
-            ("Titanic", 1),
-            ("Top Gun", 1),
-            ("Terminator", 0)
+            ("Shrek", 1, 2),
+            ("Spy", 1, 0),
+            ("Star Wars", 1, 1),
+            ("Titanic", 1, 0),
+            ("Top Gun", 1, 3),
+            ("Terminator", 0, 4)
         ]
         # Prepare mock function and cursor
         mock_db_connection = MagicMock()
@@ -271,6 +469,299 @@ class TestDbUtils(unittest.TestCase):
         movies = db_get_movie_top_5_for_similar_users(1)
         # Evaluate results
         self.assertEqual(movies, expected_movies)
+        mock_cursor.execute.assert_called_once_with(db_movie_top_5_for_similar_users_query, {"user_id": 1})
+
+    @patch("db_utils.DB_BATCH_SIZE", 2)
+    @patch("db_utils.db_connect")
+    def test_db_get_movie_top_5_for_similar_users_batch(self, mock_db_connect):
+        # Define expected result
+        expected_movies = {
+            1: [{"movie_name": "Shrek", "user_top_5": 1, "others_top_5": 2},
+                {"movie_name": "Spy", "user_top_5": 0, "others_top_5": 0}],
+            2: [],
+            3: [{"movie_name": "Spy", "user_top_5": 1, "others_top_5": 0}]
+        }
+        # Prepare mock function and cursor, returning rows for one batch of users at a time
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.side_effect = [[(1, "Shrek", 1, 2), (1, "Spy", 0, 0)], [(3, "Spy", 1, 0)]]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        movies = db_get_movie_top_5_for_similar_users_batch([1, 2, 3])
+        # Evaluate results, where users are queried two at a time over one connection
+        self.assertEqual(movies, expected_movies)
+        self.assertEqual(mock_cursor.execute.call_args_list[0].args[1], (1, 2))
+        self.assertIn("IN (%s, %s)", mock_cursor.execute.call_args_list[0].args[0])
+        self.assertEqual(mock_cursor.execute.call_args_list[1].args[1], (3,))
+        mock_db_connect.assert_called_once()
+        mock_db_connection.close.assert_called_once()
+
+    @patch("db_utils.db_connect")
+    def test_db_get_movie_top_5_for_similar_users_batch_empty(self, mock_db_connect):
+        # Execute test and evaluate results, where no query made for no users
+        self.assertEqual(db_get_movie_top_5_for_similar_users_batch([]), {})
+        mock_db_connect.assert_not_called()
+
+    @patch("db_utils.db_connect")
+    def test_db_get_movie_top_5_for_users(self, mock_db_connect):
+        # Define expected result
+        expected_movies = [{"movie_name": "Shrek", "user_top_5": 1, "others_top_5": 2}]
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [("Shrek", 1, 2)]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        movies = db_get_movie_top_5_for_users(1, [7, 9])
+        # Evaluate results, where user and similar users queried together
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("IN (%s, %s, %s)", query)
+        self.assertEqual(params, (1, 1, 1, 7, 9))
+        self.assertEqual(movies, expected_movies)
+        mock_db_connection.close.assert_called_once()
+
+    def test_map_tmdb_movie_rows(self):
+        # Define expected result
+        expected_movies = {
+            "hot fuzz": {"movie_id": 4638, "movie_name": "Hot Fuzz", "movie_overview": "Top cop ...",
+                         "movie_popularity": 30.5, "movie_release_date": "2007-02-14"}
+        }
+        # Prepare test data
+        test_tmdb_movie_rows = [("hot fuzz", 4638, "Hot Fuzz", "Top cop ...", 30.5, "2007-02-14")]
+        # Execute test
+        movies = map_tmdb_movie_rows(test_tmdb_movie_rows)
+        # Evaluate results
+        self.assertEqual(movies, expected_movies)
+
+    @patch("db_utils.db_connect")
+    def test_db_get_tmdb_movies_for_movie_names(self, mock_db_connect):
+        # Define expected result
+        expected_movies = {
+            "hot fuzz": {"movie_id": 4638, "movie_name": "Hot Fuzz", "movie_overview": "Top cop ...",
+                         "movie_popularity": 30.5, "movie_release_date": "2007-02-14"}
+        }
+        # Prepare test data
+        test_movie_name_keys = ["hot fuzz", "spy"]
+        test_ttl_seconds = 3600
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [("hot fuzz", 4638, "Hot Fuzz", "Top cop ...", 30.5, "2007-02-14")]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        movies = db_get_tmdb_movies_for_movie_names(test_movie_name_keys, test_ttl_seconds)
+        # Evaluate results
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("movie_name_key IN (%s, %s)", query)
+        self.assertIn("INTERVAL %s SECOND", query)
+        self.assertEqual(params, ("hot fuzz", "spy", test_ttl_seconds))
+        self.assertEqual(movies, expected_movies)
+
+    @patch("db_utils.db_connect")
+    def test_db_get_tmdb_movies_for_movie_names_empty(self, mock_db_connect):
+        # Execute test
+        movies = db_get_tmdb_movies_for_movie_names([])
+        # Evaluate results
+        mock_db_connect.assert_not_called()
+        self.assertEqual(movies, {})
+
+    @patch("db_utils.db_connect")
+    def test_db_add_tmdb_movies_for_movie_names(self, mock_db_connect):
+        # Define expected result
+        expected_update_count = 1
+        # Prepare test data
+        test_movies = {
+            "hot fuzz": {"movie_id": 4638, "movie_name": "Hot Fuzz", "movie_overview": "Top cop ...",
+                         "movie_popularity": 30.5, "movie_release_date": "2007-02-14"}
+        }
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.rowcount = expected_update_count
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        update_count = db_add_tmdb_movies_for_movie_names(test_movies)
+        # Evaluate results
+        self.assertEqual(mock_cursor.executemany.call_args[0][1],
+                         [("hot fuzz", 4638, "Hot Fuzz", "Top cop ...", 30.5, "2007-02-14")])
+        mock_db_connection.commit.assert_called_once()
+        self.assertEqual(update_count, expected_update_count)
+
+    @patch("db_utils.db_connect")
+    def test_db_get_user_movie_recommendations(self, mock_db_connect):
+        # Define expected results
+        expected_movies = [{"movie_id": 808, "movie_name": "Shrek"}]
+        expected_stale_version = 2
+        # Prepare mock function and cursor, returning up-to-date row then stale row then no row
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.side_effect = [
+            ('[{"movie_id": 808, "movie_name": "Shrek"}]', 0, expected_stale_version),
+            ('[{"movie_id": 808, "movie_name": "Shrek"}]', 1, expected_stale_version),
+            None
+        ]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        up_to_date_result = db_get_user_movie_recommendations(1)
+        stale_result = db_get_user_movie_recommendations(1)
+        missing_result = db_get_user_movie_recommendations(1)
+        # Evaluate results
+        mock_cursor.execute.assert_called_with(ANY, (1,))
+        self.assertEqual(up_to_date_result, (expected_movies, expected_stale_version))
+        self.assertEqual(stale_result, (None, expected_stale_version))
+        self.assertEqual(missing_result, (None, 0))
+
+    @patch("db_utils.db_connect")
+    def test_db_add_user_movie_recommendations(self, mock_db_connect):
+        # Define expected result
+        expected_update_count = 2
+        # Prepare test data
+        test_movies = [{"movie_id": 808, "movie_name": "Shrek"}]
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.rowcount = expected_update_count
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        update_count = db_add_user_movie_recommendations(1, test_movies, 2)
+        # Evaluate results
+        self.assertEqual(mock_cursor.execute.call_args[0][1],
+                         (1, '[{"movie_id": 808, "movie_name": "Shrek"}]', 2))
+        mock_db_connection.commit.assert_called_once()
+        self.assertEqual(update_count, expected_update_count)
+
+    @patch("db_utils.db_connect")
+    def test_db_get_stale_user_movie_recommendations(self, mock_db_connect):
+        # Define expected result
+        expected_stale_users = [(3, 0), (7, 4)]
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [(3, 0), (7, 4)]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        stale_users = db_get_stale_user_movie_recommendations(2, 50)
+        # Evaluate results
+        self.assertEqual(mock_cursor.execute.call_args[0][1], (2, 50))
+        self.assertEqual(stale_users, expected_stale_users)
+
+    @patch("db_utils.db_connect")
+    def test_db_get_user_movie_top_5_batches(self, mock_db_connect):
+        # Define expected result
+        expected_batches = [[(1, "Shrek"), (1, "Spy")], [(2, "Shrek")]]
+        # Prepare mock function and cursor, returning rows one batch at a time
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchmany.side_effect = expected_batches + [[]]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        batches = list(db_get_user_movie_top_5_batches(2))
+        # Evaluate results, where one query read over one connection, closed once all rows read
+        self.assertEqual(batches, expected_batches)
+        mock_cursor.execute.assert_called_once()
+        mock_cursor.fetchmany.assert_called_with(2)
+        mock_db_connection.close.assert_called_once()
+
+    @patch("db_utils.db_connect")
+    def test_db_get_user_quiz_response_batches(self, mock_db_connect):
+        # Prepare mock function and cursor, where read fails after first batch
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchmany.side_effect = [[(1, 11), (1, 14)], DataError()]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        batches = db_get_user_quiz_response_batches(2)
+        # Evaluate results, where first batch yielded before DB error raised
+        self.assertEqual(next(batches), [(1, 11), (1, 14)])
+        with self.assertRaises(DbConnectionError):
+            next(batches)
+        self.assertIn("user_quiz_responses", mock_cursor.execute.call_args[0][0])
+        mock_db_connection.close.assert_called_once()
+
+    @patch("db_utils.db_connect")
+    def test_db_get_user_movie_top_5_and_quiz_responses(self, mock_db_connect):
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.side_effect = [[("Shrek",), ("Spy",)], [(11,), (14,)]]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        movie_names, quiz_prompt_option_ids = db_get_user_movie_top_5_and_quiz_responses(1)
+        # Evaluate results, where both read over one connection
+        self.assertEqual(movie_names, ["Shrek", "Spy"])
+        self.assertEqual(quiz_prompt_option_ids, [11, 14])
+        self.assertEqual([execute_call.args[1] for execute_call in mock_cursor.execute.call_args_list], [(1,), (1,)])
+        mock_db_connect.assert_called_once()
+
+    @patch("db_utils.DB_BATCH_SIZE", 2)
+    @patch("db_utils.db_connect")
+    def test_db_replace_movie_neighbours(self, mock_db_connect):
+        # Prepare test data
+        test_neighbour_rows = [("shrek", 1, "spy", "Spy", 0.8, 4), ("shrek", 2, "toy story", "Toy Story", 0.5, 2),
+                               ("spy", 1, "shrek", "Shrek", 0.8, 4)]
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        row_count = db_replace_movie_neighbours(iter(test_neighbour_rows))
+        # Evaluate results, where rows added to new table two at a time, then new table swapped for current table
+        self.assertEqual(row_count, 3)
+        self.assertEqual([executemany_call.args[1] for executemany_call in mock_cursor.executemany.call_args_list],
+                         [test_neighbour_rows[:2], test_neighbour_rows[2:]])
+        self.assertIn("movie_neighbours_new", mock_cursor.executemany.call_args.args[0])
+        self.assertIn("RENAME TABLE", mock_cursor.execute.call_args_list[-2].args[0])
+        self.assertEqual(mock_cursor.execute.call_args_list[-1].args[0], "DROP TABLE movie_neighbours_old")
+        self.assertEqual(mock_db_connection.commit.call_count, 2)
+
+    @patch("db_utils.db_connect")
+    def test_db_replace_movie_neighbours_failure(self, mock_db_connect):
+        # Prepare mock function and cursor, where insert fails
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.executemany.side_effect = DataError()
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test and evaluate results, where current table not replaced
+        with self.assertRaises(DbConnectionError):
+            db_replace_movie_neighbours([("shrek", 1, "spy", "Spy", 0.8, 4)])
+        self.assertFalse(any("RENAME TABLE" in execute_call.args[0]
+                             for execute_call in mock_cursor.execute.call_args_list))
+        mock_db_connection.close.assert_called_once()
+
+    @patch("db_utils.db_connect")
+    def test_db_get_movie_neighbours(self, mock_db_connect):
+        # Define expected result
+        expected_neighbours = {"shrek": [{"movie_name": "Spy", "similarity": 0.8},
+                                         {"movie_name": "Toy Story", "similarity": 0.5}]}
+        # Prepare mock function and cursor
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [("shrek", "Spy", 0.8), ("shrek", "Toy Story", 0.5)]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        neighbours = db_get_movie_neighbours(["shrek", "hot fuzz"])
+        # Evaluate results, where key without neighbours omitted
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("movie_name_key IN (%s, %s)", query)
+        self.assertEqual(params, ("shrek", "hot fuzz"))
+        self.assertEqual(neighbours, expected_neighbours)
+        # Execute test and evaluate results, where no query made for no keys
+        mock_db_connect.reset_mock()
+        self.assertEqual(db_get_movie_neighbours([]), {})
+        mock_db_connect.assert_not_called()
 
 
 class TestDbConnectionError(unittest.TestCase):
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from embedding_store import embedding_store_kmeans, embedding_store_get, EmbeddingStore
+
+
+class TestEmbeddingStore(unittest.TestCase):
+
+    def setUp(self):
+        # Prepare store folder, and vectors of 400 rows in 4 well separated clusters
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temporary_directory.name, "store")
+        random_generator = np.random.default_rng(0)
+        self.test_centres = np.array([[10, 0, 0], [0, 10, 0], [0, 0, 10], [-10, -10, -10]], dtype=np.float32)
+        self.test_vectors = (np.repeat(self.test_centres, 100, axis=0)
+                             + random_generator.standard_normal((400, 3))).astype(np.float32)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_embedding_store_kmeans(self):
+        # Execute test
+        centroids = embedding_store_kmeans(self.test_vectors, 4)
+        # Evaluate results, where each cluster centre has a centroid near it
+        distances = np.linalg.norm(self.test_centres[:, None] - centroids[None], axis=2)
+        self.assertTrue((distances.min(axis=1) < 1).all())
+
+    def test_embedding_store_append_and_search(self):
+        # Prepare test data
+        store = EmbeddingStore.create(self.path, 3, "<i8")
+        # Execute test, appending rows, then replacing vector of id 5
+        store = store.append(np.arange(400), self.test_vectors)
+        replaced_store = store.append([5], [[0, 0, 100]])
+        # Define expected result by scoring all rows
+        query = np.array([1, 2, 3], dtype=np.float32)
+        expected_ids = np.argsort(-(self.test_vectors @ query), kind="stable")[:5].tolist()
+        # Evaluate results, where replaced row no longer found and rows written once
+        self.assertEqual([store_id for store_id, _ in store.search(query, 5)], expected_ids)
+        self.assertEqual(replaced_store.search(query, 1), [(5, 300.0)])
+        self.assertEqual(len(replaced_store), 400)
+        np.testing.assert_array_equal(replaced_store.get_rows([5, 6, 999]), [400, 6, -1])
+        self.assertEqual([store_id for store_id, _ in replaced_store.search(-query, 401)].count(5), 1)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "vectors.f32")), 401 * 3 * 4)
+        self.assertEqual(len(store.search(query, 2, excluded_ids=[expected_ids[0]])), 2)
+        self.assertEqual(store.search(query, 2, excluded_ids=[expected_ids[0]])[0][0], expected_ids[1])
+        self.assertIs(embedding_store_get(self.path), embedding_store_get(self.path))
+        self.assertEqual(embedding_store_get(self.path).count, 401)
+        self.assertIsNone(embedding_store_get(os.path.join(self.path, "missing")))
+
+    def test_embedding_store_append_partly_written(self):
+        # Prepare test data, with bytes left after counted rows by failed append
+        store = EmbeddingStore.create(self.path, 3, "<U5").append(["a", "b"], self.test_vectors[:2])
+        with open(os.path.join(self.path, "vectors.f32"), "ab") as vectors_file:
+            vectors_file.write(b"\0" * 7)
+        # Execute test
+        store = store.append(["c"], self.test_vectors[2:3])
+        # Evaluate results
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "vectors.f32")), 3 * 3 * 4)
+        np.testing.assert_array_equal(store.vectors, self.test_vectors[:3])
+        self.assertEqual(store.ids.tolist(), ["a", "b", "c"])
+
+    def test_embedding_store_errors(self):
+        # Prepare test data
+        store = EmbeddingStore.create(self.path, 3, "<U5")
+        # Execute test and evaluate results
+        with self.assertRaises(FileExistsError):
+            EmbeddingStore.create(self.path, 3, "<U5")
+        with self.assertRaises(ValueError):
+            store.append(["too long"], self.test_vectors[:1])
+        with self.assertRaises(ValueError):
+            store.append(["a", "b"], self.test_vectors[:1])
+        with self.assertRaises(ValueError):
+            store.build_index()
+        self.assertEqual(store.search([1, 0, 0], 5), [])
+
+    def test_embedding_store_cosine(self):
+        # Prepare test data
+        store = EmbeddingStore.create(self.path, 2, "<i8", metric="cosine")
+        # Execute test
+        store = store.append([1, 2], [[10, 0], [1, 1]])
+        # Evaluate results, where vectors scaled to unit length so shorter vector closer in direction ranks first
+        np.testing.assert_allclose(np.linalg.norm(store.vectors, axis=1), [1, 1])
+        self.assertEqual([store_id for store_id, _ in store.search([1, 2], 2)], [2, 1])
+
+    def test_embedding_store_build_index(self):
+        # Prepare test data
+        store = EmbeddingStore.create(self.path, 3, "<i8").append(np.arange(400), self.test_vectors)
+        query = self.test_vectors[0]
+        # Execute test, then append row after index built
+        indexed_store = store.build_index(list_count=4)
+        appended_store = indexed_store.append([1000], [query * 2])
+        # Evaluate results, where probing nearest list finds same rows as exact search within well separated cluster
+        self.assertEqual(indexed_store.list_offsets.tolist(), [0, 100, 200, 300, 400])
+        self.assertEqual(sorted(indexed_store.list_rows.tolist()), list(range(400)))
+        self.assertEqual(indexed_store.search(query, 10, probes=1), store.search(query, 10))
+        self.assertEqual(indexed_store.search(query, 10, probes=0), store.search(query, 10))
+        self.assertEqual(appended_store.search(query, 1, probes=1)[0][0], 1000)
+        self.assertEqual(appended_store.index_count, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
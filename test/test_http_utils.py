@@ -0,0 +1,239 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_utils import (CircuitBreaker, CircuitOpenError, RateLimitTimeout, TokenBucket, http_create_session,
+                        http_get_session_metrics)
+
+
+# Define class to serve local responses, failing first request with first_status_code to exercise retries
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    request_count = 0
+    first_status_code = 503
+
+    def do_GET(self):
+        StubHandler.request_count += 1
+        status_code = StubHandler.first_status_code if StubHandler.request_count == 1 else 200
+        payload = json.dumps({"request_count": StubHandler.request_count}).encode("utf-8")
+        self.send_response(status_code)
+        if status_code == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpUtils(unittest.TestCase):
+
+    def setUp(self):
+        # Start local server in background thread
+        StubHandler.request_count = 0
+        StubHandler.first_status_code = 503
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_http_create_session_retries_and_reuses_connection(self):
+        # Define expected results
+        expected_status_codes = [200, 200, 200]
+        expected_metrics = {"requests": 4, "connections_opened": 1, "connections_reused": 3, "retries": 1}
+        # Prepare test data
+        session = http_create_session(pool_connections=1, pool_maxsize=1, max_retries=2, backoff_factor=0)
+        # Execute test
+        status_codes = [session.get(f"{self.base_url}/movie", timeout=(1, 1)).status_code for _ in range(3)]
+        metrics = http_get_session_metrics(session)
+        session.close()
+        # Evaluate results
+        self.assertEqual(status_codes, expected_status_codes)
+        self.assertEqual(metrics, expected_metrics)
+
+    def test_http_create_session_returns_final_response_when_retries_exhausted(self):
+        # Prepare test data
+        session = http_create_session(pool_connections=1, pool_maxsize=1, max_retries=0, backoff_factor=0)
+        # Execute test
+        response = session.get(f"{self.base_url}/movie", timeout=(1, 1))
+        session.close()
+        # Evaluate results
+        self.assertEqual(response.status_code, 503)
+
+    def test_http_create_session_pauses_rate_limiter_on_429(self):
+        # Prepare test data
+        StubHandler.first_status_code = 429
+        rate_limiter = TokenBucket(rate=100, capacity=10, timeout=1)
+        session = http_create_session(pool_connections=1, pool_maxsize=1, max_retries=2, backoff_factor=0,
+                                      rate_limiter=rate_limiter)
+        # Execute test
+        response = session.get(f"{self.base_url}/movie", timeout=(1, 1))
+        metrics = rate_limiter.get_metrics()
+        session.close()
+        # Evaluate results, where request and retry each take a token
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(metrics["calls"], 2)
+        self.assertEqual(metrics["pauses"], 1)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_token_bucket_acquire_waits_once_burst_used(self):
+        # Prepare test data
+        token_bucket = TokenBucket(rate=20, capacity=2, timeout=1)
+        # Execute test
+        wait_times = [token_bucket.acquire() for _ in range(3)]
+        metrics = token_bucket.get_metrics()
+        # Evaluate results, where third call waits for token to be added
+        self.assertLess(wait_times[1], 0.02)
+        self.assertGreater(wait_times[2], 0.03)
+        self.assertEqual(metrics["calls"], 3)
+        self.assertEqual(metrics["waiting"], 0)
+        self.assertGreater(metrics["max_wait_seconds"], 0.03)
+
+    def test_token_bucket_acquire_raises_error_after_timeout(self):
+        # Prepare test data
+        token_bucket = TokenBucket(rate=1, capacity=1, timeout=0.05)
+        token_bucket.acquire()
+        # Execute test and evaluate results, where call fails without waiting for token it cannot get within timeout
+        start = time.monotonic()
+        with self.assertRaises(RateLimitTimeout):
+            token_bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(token_bucket.get_metrics()["timeouts"], 1)
+
+    def test_token_bucket_pause(self):
+        # Prepare test data
+        token_bucket = TokenBucket(rate=100, capacity=10, timeout=1)
+        # Execute test
+        token_bucket.pause(0.1)
+        wait_time = token_bucket.acquire()
+        # Evaluate results
+        self.assertGreater(wait_time, 0.09)
+        self.assertEqual(token_bucket.get_metrics()["pauses"], 1)
+
+    def test_token_bucket_disabled(self):
+        # Prepare test data
+        token_bucket = TokenBucket(rate=0, capacity=1, timeout=0)
+        # Execute test and evaluate results
+        self.assertEqual([token_bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+
+    def test_token_bucket_shares_state_path(self):
+        # Prepare test data with buckets in place of separate processes
+        with tempfile.TemporaryDirectory() as directory:
+            state_path = os.path.join(directory, "tmdb_rate_limit")
+            token_bucket = TokenBucket(rate=1, capacity=1, timeout=0, state_path=state_path)
+            other_token_bucket = TokenBucket(rate=1, capacity=1, timeout=0, state_path=state_path)
+            # Execute test and evaluate results, where other bucket finds only token already taken
+            token_bucket.acquire()
+            with self.assertRaises(RateLimitTimeout):
+                other_token_bucket.acquire()
+
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    # Define helper function to fail as unavailable service would
+    @staticmethod
+    def fail():
+        raise ConnectionError("Connection refused")
+
+    # Define helper method to wait for circuit to close, failing test after 1 second
+    def wait_for_close(self, circuit_breaker):
+        deadline = time.monotonic() + 1
+        while circuit_breaker.get_metrics()["state"] == "open":
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+
+    def test_circuit_breaker_opens_after_consecutive_failures(self):
+        # Prepare test data with probe that never succeeds
+        circuit_breaker = CircuitBreaker(failure_threshold=2, latency_budget=1, reset_timeout=60, probe=self.fail)
+        # Execute test, where success between failures resets count of consecutive failures
+        with self.assertRaises(ConnectionError):
+            circuit_breaker.call(self.fail)
+        function_result = circuit_breaker.call(lambda: "Shrek")
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                circuit_breaker.call(self.fail)
+        # Evaluate results, where calls raise error without being made while circuit open
+        self.assertEqual(function_result, "Shrek")
+        with self.assertRaises(CircuitOpenError):
+            circuit_breaker.call(lambda: "Spy")
+        metrics = circuit_breaker.get_metrics()
+        self.assertEqual(metrics["state"], "open")
+        self.assertEqual(metrics["trips"], 1)
+        self.assertEqual(metrics["rejected"], 1)
+
+    def test_circuit_breaker_opens_after_slow_calls(self):
+        # Prepare test data
+        circuit_breaker = CircuitBreaker(failure_threshold=2, latency_budget=0.01, reset_timeout=60, probe=self.fail)
+        # Execute test, where slow calls still return result
+        results = [circuit_breaker.call(lambda: time.sleep(0.02) or "Shrek") for _ in range(2)]
+        # Evaluate results
+        self.assertEqual(results, ["Shrek", "Shrek"])
+        self.assertEqual(circuit_breaker.get_metrics()["state"], "open")
+
+    def test_circuit_breaker_ignores_rate_limit_waits(self):
+        # Prepare test data with rate limit allowing one call at once, then one call every 0.05 seconds, and timeout
+        # too short to wait for token
+        token_bucket = TokenBucket(rate=20, capacity=1, timeout=1)
+        timed_out_token_bucket = TokenBucket(rate=1, capacity=1, timeout=0)
+        timed_out_token_bucket.acquire()
+        circuit_breaker = CircuitBreaker(failure_threshold=2, latency_budget=0.02, reset_timeout=60, probe=self.fail)
+        # Execute test, where calls wait longer than latency budget for tokens, then fail without tokens
+        results = [circuit_breaker.call(lambda: (token_bucket.acquire(), "Shrek")[1]) for _ in range(3)]
+        for _ in range(2):
+            with self.assertRaises(RateLimitTimeout):
+                circuit_breaker.call(timed_out_token_bucket.acquire)
+        # Evaluate results, where circuit stays closed as only local queueing was slow
+        self.assertEqual(results, ["Shrek"] * 3)
+        self.assertGreater(token_bucket.get_metrics()["max_wait_seconds"], 0.02)
+        metrics = circuit_breaker.get_metrics()
+        self.assertEqual(metrics["state"], "closed")
+        self.assertEqual(metrics["consecutive_failures"], 0)
+
+    def test_circuit_breaker_closes_once_probe_succeeds(self):
+        # Prepare test data with probe failing once then succeeding
+        probe_results = [ConnectionError("Connection refused"), None]
+
+        def test_probe():
+            probe_result = probe_results.pop(0)
+            if probe_result:
+                raise probe_result
+
+        circuit_breaker = CircuitBreaker(failure_threshold=1, latency_budget=1, reset_timeout=0.01, probe=test_probe)
+        # Execute test
+        with self.assertRaises(ConnectionError):
+            circuit_breaker.call(self.fail)
+        self.wait_for_close(circuit_breaker)
+        function_result = circuit_breaker.call(lambda: "Shrek")
+        # Evaluate results
+        self.assertEqual(function_result, "Shrek")
+        metrics = circuit_breaker.get_metrics()
+        self.assertEqual(metrics["probes"], 2)
+        self.assertEqual(metrics["probe_failures"], 1)
+
+    def test_circuit_breaker_disabled(self):
+        # Prepare test data
+        circuit_breaker = CircuitBreaker(failure_threshold=0, latency_budget=1, reset_timeout=60, probe=self.fail)
+        # Execute test
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                circuit_breaker.call(self.fail)
+        # Evaluate results
+        self.assertEqual(circuit_breaker.get_metrics()["state"], "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,8 @@ from unittest.mock import patch, call
 
 import main
 from main import (display_welcome_banner, get_valid_input, add_user, validate_user, exit_user_menu,
-                  add_user_movie_top_5, add_user_quiz_response, take_quiz, get_user_movie_recommendations)
+                  add_user_movie_top_5, add_user_quiz_response, take_quiz, get_user_movie_recommendations,
+                  display_session_metrics)
 
 
 class TestMain(unittest.TestCase):
@@ -409,6 +410,20 @@ class TestMain(unittest.TestCase):
         mock_api_get_user_movie_recommendations.assert_called_with(test_user_id)
         mock_print.assert_has_calls(expected_calls)
 
+    @patch("builtins.print")
+    @patch("main.api_get_metrics")
+    def test_display_session_metrics(self, mock_api_get_metrics, mock_print):
+        # Define expected result
+        expected_calls = [
+            call("Movie Recommender API: 5 requests, 1 connections opened, 4 connections reused, 2 retries")
+        ]
+        # Prepare mock function
+        mock_api_get_metrics.return_value = {"http": {"requests": 5, "connections_opened": 1,
+                                                      "connections_reused": 4, "retries": 2}}
+        # Execute test
+        display_session_metrics()
+        # Evaluate results
+        mock_print.assert_has_calls(expected_calls)
 
 if __name__ == "__main__":
     unittest.main()
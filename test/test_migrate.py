@@ -0,0 +1,184 @@
+import os
+import re
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import mysql.connector
+
+from migrate import (migrate_get_migrations, migrate_split_statements, migrate_apply_migration, migrate_run,
+                     MIGRATIONS_DIRECTORY)
+
+
+class TestMigrate(unittest.TestCase):
+
+    def setUp(self):
+        # Prepare temporary folder of migration files
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = self.temporary_directory.name
+        for file_name, sql in (("002_second.sql", "ALTER TABLE users ADD INDEX idx_b (user_last_name);"),
+                               ("001_first.sql", "ALTER TABLE users ADD INDEX idx_a (user_first_name);"),
+                               ("notes.txt", "Not a migration")):
+            with open(os.path.join(self.directory, file_name), "w", encoding="utf-8") as migration_file:
+                migration_file.write(sql)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_migrate_get_migrations(self):
+        # Execute test
+        migrations = migrate_get_migrations(self.directory)
+        # Evaluate results
+        self.assertEqual([(migration["version"], migration["name"]) for migration in migrations],
+                         [(1, "first"), (2, "second")])
+
+    def test_migrate_get_migrations_duplicate_version(self):
+        # Prepare test data
+        with open(os.path.join(self.directory, "001_clash.sql"), "w", encoding="utf-8") as migration_file:
+            migration_file.write("SELECT 1;")
+        # Execute test and evaluate results
+        with self.assertRaises(ValueError):
+            migrate_get_migrations(self.directory)
+
+    def test_migrate_get_migrations_shipped(self):
+        # Execute test
+        migrations = migrate_get_migrations(MIGRATIONS_DIRECTORY)
+        # Evaluate results
+        self.assertEqual(migrations[0]["version"], 1)
+        self.assertEqual(migrations[0]["name"], "add_covering_indexes")
+
+    def test_migrate_get_migrations_recorded_in_schema_script(self):
+        # Prepare test data, reading migrations recorded as applied by user_movie_vibes.sql
+        with open(os.path.join(os.path.dirname(MIGRATIONS_DIRECTORY), "user_movie_vibes.sql"),
+                  encoding="utf-8") as schema_file:
+            schema_sql = schema_file.read()
+        recorded_values = re.search(r"schema_migrations \(version, name\)\s+VALUES\s+([^;]+);", schema_sql).group(1)
+        # Execute test
+        migrations = migrate_get_migrations(MIGRATIONS_DIRECTORY)
+        # Evaluate results, where schema script records every shipped migration, so it matches migrated database
+        self.assertEqual(re.findall(r"\((\d+), '(\w+)'\)", recorded_values),
+                         [(str(migration["version"]), migration["name"]) for migration in migrations])
+
+    def test_migrate_split_statements_shipped(self):
+        # Execute test
+        statements = []
+        for migration in migrate_get_migrations(MIGRATIONS_DIRECTORY):
+            with open(migration["path"], encoding="utf-8") as migration_file:
+                statements += migrate_split_statements(migration_file.read())
+        # Evaluate results, where stored procedures are replaced whole and not split at statements in their bodies
+        self.assertIn("DROP PROCEDURE IF EXISTS sp_add_user_quiz_responses", statements)
+        procedure_statements = [statement for statement in statements if statement.startswith("CREATE PROCEDURE")]
+        self.assertEqual(len(procedure_statements), 4)
+        self.assertTrue(all(statement.endswith("END") for statement in procedure_statements))
+
+    def test_migrate_backfill_user_vibes_shipped(self):
+        # Prepare test data
+        migration = [migration for migration in migrate_get_migrations(MIGRATIONS_DIRECTORY)
+                     if migration["name"] == "backfill_user_vibes"][0]
+        with open(migration["path"], encoding="utf-8") as migration_file:
+            statements = migrate_split_statements(migration_file.read())
+        # Execute test
+        backfill_statement = statements[-1]
+        # Evaluate results, where stale recommendations marked before vibes added, and vibes already stored are kept
+        # so backfill can be run again
+        self.assertTrue(statements[0].startswith("UPDATE\n\tuser_movie_recommendations"))
+        self.assertTrue(backfill_statement.startswith("INSERT IGNORE INTO\n\tuser_vibes"))
+        self.assertIn("PARTITION BY user_id, quiz_id", backfill_statement)
+
+    def test_migrate_clear_tmdb_movie_names_shipped(self):
+        # Define expected result
+        expected_statements = ["DELETE FROM\n\ttmdb_movie_names"]
+        # Prepare test data
+        migration = [migration for migration in migrate_get_migrations(MIGRATIONS_DIRECTORY)
+                     if migration["name"] == "clear_tmdb_movie_names"][0]
+        # Execute test
+        with open(migration["path"], encoding="utf-8") as migration_file:
+            statements = migrate_split_statements(migration_file.read())
+        # Evaluate results, where movie names cached under keys from earlier normaliser are removed
+        self.assertEqual(statements, expected_statements)
+
+    def test_migrate_clear_catalog_tmdb_movie_names_shipped(self):
+        # Define expected result
+        expected_statements = ["DELETE FROM\n\ttmdb_movie_names\nWHERE\n\tmovie_overview IS NULL"]
+        # Prepare test data
+        migration = [migration for migration in migrate_get_migrations(MIGRATIONS_DIRECTORY)
+                     if migration["name"] == "clear_catalog_tmdb_movie_names"][0]
+        # Execute test
+        with open(migration["path"], encoding="utf-8") as migration_file:
+            statements = migrate_split_statements(migration_file.read())
+        # Evaluate results, where only movie names resolved from local catalog, without overview, are removed
+        self.assertEqual(statements, expected_statements)
+
+    def test_migrate_split_statements(self):
+        # Define expected result
+        expected_statements = [
+            "ALTER TABLE users\nADD INDEX idx_a (user_first_name)",
+            "CREATE PROCEDURE sp_test ()\nBEGIN\n\tSELECT 1;\n\tSELECT 2;\nEND",
+            "SELECT 3"
+        ]
+        # Prepare test data
+        test_sql = ("-- Comment; with semicolon\nALTER TABLE users\nADD INDEX idx_a (user_first_name);\n\n"
+                    "DELIMITER //\nCREATE PROCEDURE sp_test ()\nBEGIN\n\tSELECT 1;\n\tSELECT 2;\nEND //\n"
+                    "DELIMITER ;\nSELECT 3")
+        # Execute test
+        statements = migrate_split_statements(test_sql)
+        # Evaluate results
+        self.assertEqual(statements, expected_statements)
+
+    def test_migrate_apply_migration_skips_statement_already_applied(self):
+        # Prepare mock connection and cursor to fail first statement with duplicate index error
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.execute.side_effect = [mysql.connector.Error(msg="Duplicate key name 'idx_a'", errno=1061), None]
+        mock_db_connection.cursor.return_value = mock_cursor
+        # Execute test
+        migrate_apply_migration(mock_db_connection, migrate_get_migrations(self.directory)[0])
+        # Evaluate results
+        mock_cursor.execute.assert_called_with("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                                               (1, "first"))
+        mock_db_connection.commit.assert_called_once()
+
+    def test_migrate_apply_migration_failure(self):
+        # Prepare mock connection and cursor to fail first statement with syntax error
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.execute.side_effect = mysql.connector.Error(msg="Syntax error", errno=1064)
+        mock_db_connection.cursor.return_value = mock_cursor
+        # Execute test and evaluate results
+        with self.assertRaises(mysql.connector.Error):
+            migrate_apply_migration(mock_db_connection, migrate_get_migrations(self.directory)[0])
+        mock_db_connection.rollback.assert_called_once()
+        mock_db_connection.commit.assert_not_called()
+
+    @patch("migrate.migrate_apply_migration")
+    @patch("migrate.db_connect")
+    def test_migrate_run_applies_pending_migrations_only(self, mock_db_connect, mock_migrate_apply_migration):
+        # Prepare mock connection and cursor with migration 001 already applied
+        mock_db_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [(1,)]
+        mock_db_connection.cursor.return_value = mock_cursor
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        applied = migrate_run(self.directory)
+        # Evaluate results
+        self.assertEqual(applied, [2])
+        mock_migrate_apply_migration.assert_called_once()
+        self.assertEqual(mock_migrate_apply_migration.call_args[0][1]["version"], 2)
+        mock_db_connection.close.assert_called_once()
+
+    @patch("migrate.migrate_apply_migration")
+    @patch("migrate.db_connect")
+    def test_migrate_run_target_version(self, mock_db_connect, mock_migrate_apply_migration):
+        # Prepare mock connection and cursor with no migrations applied
+        mock_db_connection = MagicMock()
+        mock_db_connection.cursor.return_value.fetchall.return_value = []
+        mock_db_connect.return_value = mock_db_connection
+        # Execute test
+        applied = migrate_run(self.directory, target_version=1)
+        # Evaluate results
+        self.assertEqual(applied, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from scoring import scoring_get_scores, scoring_get_top_indexes, scoring_get_release_year, scoring_get_top_movies
+
+
+class TestScoring(unittest.TestCase):
+
+    def test_scoring_get_scores_popularity_only(self):
+        # Execute test and evaluate results, where popularities returned unscaled
+        np.testing.assert_array_equal(scoring_get_scores([144.817, 29.197], None, None, None, None), [144.817, 29.197])
+
+    @patch("scoring.SCORING_POPULARITY_WEIGHT", 1.0)
+    @patch("scoring.SCORING_SUPPORT_WEIGHT", 2.0)
+    @patch("scoring.SCORING_RECOMMENDERS_WEIGHT", 0.5)
+    @patch("scoring.SCORING_RECENCY_WEIGHT", 3.0)
+    @patch("scoring.SCORING_RECENCY_HALF_LIFE", 10.0)
+    def test_scoring_get_scores_weighted(self):
+        # Define expected result, where unknown release year adds no recency
+        expected_scores = [np.log1p(9) + 2 * np.log1p(3) + 0.5 * np.log1p(1) + 3 * 0.5,
+                           np.log1p(0) + 2 * np.log1p(0) + 0.5 * np.log1p(2) + 3 * 1.0,
+                           np.log1p(1) + 2 * np.log1p(1) + 0.5 * np.log1p(0)]
+        # Execute test
+        scores = scoring_get_scores([9, -1, 1], [3, 0, 1], [1, 2, 0], [2016, 2026, 0], 2026)
+        # Evaluate results
+        np.testing.assert_allclose(scores, expected_scores)
+
+    def test_scoring_get_top_indexes(self):
+        # Prepare test data, with equal scores either side of cut-off
+        test_scores = [1.0, 5.0, 3.0, 5.0, 3.0, 3.0, 0.5]
+        # Execute test and evaluate results, where equal scores keep candidate order
+        np.testing.assert_array_equal(scoring_get_top_indexes(test_scores, 4), [1, 3, 2, 4])
+        np.testing.assert_array_equal(scoring_get_top_indexes(test_scores, 10), [1, 3, 2, 4, 5, 0, 6])
+        self.assertEqual(len(scoring_get_top_indexes(test_scores, 0)), 0)
+        self.assertEqual(len(scoring_get_top_indexes([], 5)), 0)
+
+    def test_scoring_get_top_indexes_matches_sort(self):
+        # Prepare test data, with many equal scores
+        test_scores = np.random.default_rng(7).integers(0, 20, 10000).astype(np.float64)
+        # Define expected result from stable sort of all scores
+        expected_indexes = np.argsort(-test_scores, kind="stable")[:25]
+        # Execute test and evaluate results
+        np.testing.assert_array_equal(scoring_get_top_indexes(test_scores, 25), expected_indexes)
+
+    def test_scoring_get_release_year(self):
+        # Execute test and evaluate results
+        self.assertEqual(scoring_get_release_year({"movie_release_date": "2001-05-18"}), 2001)
+        self.assertEqual(scoring_get_release_year({"movie_release_date": "1982"}), 1982)
+        self.assertEqual(scoring_get_release_year({"movie_release_date": None}), 0)
+        self.assertEqual(scoring_get_release_year({"movie_release_date": ""}), 0)
+
+    def test_scoring_get_top_movies(self):
+        # Prepare test data
+        test_movies = [{"movie_id": 808, "movie_popularity": 144.817, "movie_release_date": "2001-05-18"},
+                       {"movie_id": 238713, "movie_popularity": 29.197, "movie_release_date": "2015-05-06"},
+                       {"movie_id": 10192, "movie_popularity": 29.197, "movie_release_date": None}]
+        test_support_counts = {238713: 40, 10192: 1}
+        test_recommender_counts = {238713: 3}
+        # Execute test, ranking by popularity alone, then by support as well
+        popular_movies = scoring_get_top_movies(test_movies, test_support_counts, test_recommender_counts, 2)
+        with patch("scoring.SCORING_SUPPORT_WEIGHT", 1.0):
+            supported_movies = scoring_get_top_movies(iter(test_movies), test_support_counts, test_recommender_counts,
+                                                      2)
+        # Evaluate results
+        self.assertEqual([movie["movie_id"] for movie in popular_movies], [808, 238713])
+        self.assertEqual([movie["movie_id"] for movie in supported_movies], [238713, 808])
+
+    @patch("scoring.SCORING_COOCCURRENCE_WEIGHT", 2.0)
+    def test_scoring_get_top_movies_cooccurrence(self):
+        # Prepare test data
+        test_movies = [{"movie_id": 808, "movie_popularity": 144.817, "movie_release_date": "2001-05-18"},
+                       {"movie_id": 862, "movie_popularity": 10.0, "movie_release_date": "1995-10-30"}]
+        # Define expected result, where similarities added unscaled
+        expected_scores = [np.log1p(144.817), np.log1p(10.0) + 2 * 3.5]
+        # Execute test
+        scores = scoring_get_scores([144.817, 10.0], [0, 0], [0, 0], [2001, 1995], 2026, [0, 3.5])
+        top_movies = scoring_get_top_movies(test_movies, {}, {}, 2, {862: 3.5})
+        # Evaluate results
+        np.testing.assert_allclose(scores, expected_scores)
+        self.assertEqual([movie["movie_id"] for movie in top_movies], [862, 808])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from similar_users import (similar_users_build_responses, similar_users_save_index, similar_users_get_index,
+                           similar_users_get_similar_users, similar_users_get_cached_similar_users,
+                           similar_users_cache)
+
+
+class TestSimilarUsers(unittest.TestCase):
+
+    def setUp(self):
+        # Prepare test data, where users 1 and 2 respond alike, user 3 shares one response with them, user 4 shares
+        # none and user 5 responds twice to one option
+        self.test_user_quiz_response_rows = [(1, 11), (1, 12), (1, 13), (2, 11), (2, 12), (2, 13), (3, 13), (3, 14),
+                                             (4, 15), (5, 11), (5, 11)]
+
+    def test_similar_users_build_responses(self):
+        # Execute test
+        responses = similar_users_build_responses(iter([self.test_user_quiz_response_rows[:4],
+                                                        self.test_user_quiz_response_rows[4:]]))
+        # Evaluate results, where duplicate response removed
+        np.testing.assert_array_equal(responses["user_ids"], [1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(responses["quiz_prompt_option_ids"], [11, 12, 13, 14, 15])
+        np.testing.assert_array_equal(responses["indptr"], [0, 3, 6, 8, 9, 10])
+        np.testing.assert_array_equal(responses["indices"], [0, 1, 2, 0, 1, 2, 2, 3, 4, 0])
+
+    def test_similar_users_get_similar_users(self):
+        # Prepare test data
+        responses = similar_users_build_responses([self.test_user_quiz_response_rows])
+        with tempfile.TemporaryDirectory() as index_path:
+            similar_users_save_index(index_path, responses)
+            index = similar_users_get_index(index_path)
+            # Execute test, for users in index, and new user with response to option not in index, scoring blocks
+            # of 2 users concurrently, then with least similarity
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                similar_users = similar_users_get_similar_users(index, [1, 4, 99], [[11, 12, 13], [15], [11, 16]], 3,
+                                                                block_size=2, executor=executor)
+            similar_users_above = similar_users_get_similar_users(index, [1], [[11, 12, 13]], 3, min_similarity=0.5)
+            # Evaluate results, where users not similar to themselves, and users sharing no responses skipped
+            self.assertEqual([user_id for user_id, _ in similar_users[0]], [2, 5, 3])
+            np.testing.assert_allclose([similarity for _, similarity in similar_users[0]],
+                                       [1, 1 / np.sqrt(3), 1 / np.sqrt(6)])
+            self.assertEqual(similar_users[1], [])
+            self.assertEqual([user_id for user_id, _ in similar_users[2]], [5, 1, 2])
+            np.testing.assert_allclose(similar_users[2][0][1], 1 / np.sqrt(2))
+            self.assertEqual([user_id for user_id, _ in similar_users_above[0]], [2, 5])
+            self.assertIs(similar_users_get_index(index_path), index)
+            self.assertIsNone(similar_users_get_index(os.path.join(index_path, "missing")))
+
+    def test_similar_users_get_similar_users_random(self):
+        # Prepare test data, with random responses of 500 users to 30 options
+        random_generator = np.random.default_rng(5)
+        dense = random_generator.random((500, 30)) < 0.2
+        rows = [(user_number + 1, option_number) for user_number, option_number in zip(*np.nonzero(dense))]
+        responses = similar_users_build_responses([rows])
+        with tempfile.TemporaryDirectory() as index_path:
+            similar_users_save_index(index_path, responses)
+            index = similar_users_get_index(index_path)
+            # Define expected result by scoring all users with dense matrix, ranked by similarity then user_id
+            matrix = dense[responses["user_ids"] - 1].astype(float)
+            similarities = matrix @ matrix[0] / (np.sqrt(matrix.sum(axis=1)) * np.sqrt(matrix[0].sum()))
+            similarities[0] = 0
+            expected_user_ids = responses["user_ids"][np.lexsort((responses["user_ids"], -similarities))[:10]]
+            # Execute test
+            similar_users = similar_users_get_similar_users(index, [responses["user_ids"][0]],
+                                                            [np.flatnonzero(matrix[0])], 10, block_size=64)[0]
+        # Evaluate results
+        self.assertEqual([user_id for user_id, _ in similar_users], expected_user_ids.tolist())
+
+    def test_similar_users_get_cached_similar_users(self):
+        # Prepare test data and mock function
+        responses = similar_users_build_responses([self.test_user_quiz_response_rows])
+        mock_get_quiz_prompt_option_ids = MagicMock(return_value=[11, 12, 13])
+        similar_users_cache.invalidate()
+        with tempfile.TemporaryDirectory() as index_path:
+            similar_users_save_index(index_path, responses)
+            index = similar_users_get_index(index_path)
+            try:
+                # Execute test, twice with same index, then with new index version
+                similar_users = similar_users_get_cached_similar_users(index, 1, mock_get_quiz_prompt_option_ids, 1)
+                cached_similar_users = similar_users_get_cached_similar_users(index, 1,
+                                                                              mock_get_quiz_prompt_option_ids, 1)
+                similar_users_get_cached_similar_users(dict(index, version="new"), 1,
+                                                       mock_get_quiz_prompt_option_ids, 1)
+            finally:
+                similar_users_cache.invalidate()
+        # Evaluate results, where quiz responses read only when not cached for index version
+        self.assertEqual(similar_users, [(2, 1.0)])
+        self.assertIs(cached_similar_users, similar_users)
+        self.assertEqual(mock_get_quiz_prompt_option_ids.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
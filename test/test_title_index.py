@@ -0,0 +1,82 @@
+import unittest
+
+from title_index import title_index_get_edit_distance, title_index_get_segments, TitleIndex
+
+
+class TestTitleIndex(unittest.TestCase):
+
+    def setUp(self):
+        # Prepare index of normalised titles
+        self.title_index = TitleIndex([("matrix", 80.0), ("matrix reloaded", 40.0), ("alien", 50.0), ("alien 3", 20.0),
+                                       ("terminator 2 judgment day", 60.0), ("terminator", 55.0), ("hot fuzz", 30.5),
+                                       ("hot fuss", 1.0), ("matrix", 90.0), ("", 0.0)], min_similarity=0.5)
+
+    def test_title_index_get_segments(self):
+        # Execute test and evaluate results
+        self.assertEqual(title_index_get_segments(10, 3), [(0, 3), (3, 3), (6, 4)])
+        self.assertEqual(title_index_get_segments(6, 1), [(0, 6)])
+
+    def test_title_index_get_edit_distance(self):
+        # Execute test and evaluate results
+        self.assertEqual(title_index_get_edit_distance("matrix", "matrix", 2), 0)
+        self.assertEqual(title_index_get_edit_distance("matirx", "matrix", 2), 2)
+        self.assertEqual(title_index_get_edit_distance("kitten", "sitting", 3), 3)
+        # Distances beyond max_distance are reported as max_distance + 1
+        self.assertEqual(title_index_get_edit_distance("matrix", "alien", 1), 2)
+        self.assertEqual(title_index_get_edit_distance("a", "terminator", 2), 3)
+
+    def test_title_index_init(self):
+        # Evaluate results, where duplicate titles keep highest popularity and blank titles are skipped
+        self.assertEqual(len(self.title_index), 8)
+        self.assertEqual(self.title_index.popularities[self.title_index.title_numbers["matrix"]], 90.0)
+
+    def test_title_index_search_exact(self):
+        # Execute test and evaluate results
+        self.assertEqual(self.title_index.search("matrix"), [(1.0, "matrix")])
+
+    def test_title_index_search_typo(self):
+        # Execute test
+        matches = self.title_index.search("matirx", min_similarity=0.6)
+        # Evaluate results
+        self.assertEqual(matches[0], (1 - 2 / 6, "matrix"))
+
+    def test_title_index_search_prefix(self):
+        # Execute test
+        matches = self.title_index.search("terminator 2")
+        # Evaluate results, where similarity is scored by edit distance
+        self.assertEqual(matches, [(12 / 25, "terminator 2 judgment day")])
+
+    def test_title_index_search_prefix_without_number(self):
+        # Prepare index of titles starting with other movies' names
+        title_index = TitleIndex([("godfather part ii", 70.0), ("alien resurrection", 30.0), ("amelie rennt", 5.0),
+                                  ("alien", 50.0)], min_similarity=0.85)
+        # Execute test and evaluate results, where titles only starting with title not matched, so exact title used
+        self.assertEqual(title_index.search("godfather"), [])
+        self.assertEqual(title_index.search("alien"), [(1.0, "alien")])
+        self.assertEqual(title_index.search("alen"), [])
+        self.assertEqual(title_index.search("amelie"), [])
+
+    def test_title_index_search_numbers_differ(self):
+        # Execute test and evaluate results
+        self.assertEqual(self.title_index.search("alien 4"), [])
+        self.assertEqual(self.title_index.search("alen"), [(0.8, "alien")])
+
+    def test_title_index_search_popularity(self):
+        # Execute test
+        matches = self.title_index.search("hot fuzs", min_similarity=0.8)
+        # Evaluate results, where titles equally similar are ordered by popularity
+        self.assertEqual([title for _, title in matches], ["hot fuzz", "hot fuss"])
+
+    def test_title_index_search_min_similarity(self):
+        # Execute test and evaluate results, where min_similarity below index min_similarity is raised to it
+        self.assertEqual(self.title_index.search("alen", min_similarity=0.85), [])
+        self.assertEqual(TitleIndex([("alien", 50.0)], min_similarity=0.85).search("alen", min_similarity=0.5), [])
+
+    def test_title_index_search_no_match(self):
+        # Execute test and evaluate results
+        self.assertEqual(self.title_index.search("spy"), [])
+        self.assertEqual(TitleIndex().search("matrix"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from tmdb_catalog import (tmdb_normalise_movie_name, tmdb_split_movie_name_year, tmdb_catalog_read_export,
+                          tmdb_catalog_import, tmdb_catalog_get_movie_for_movie_name, tmdb_catalog_get_metrics)
+
+
+class TestTmdbCatalog(unittest.TestCase):
+
+    def setUp(self):
+        # Prepare temporary folder holding export in TMDB daily id export format
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.export_path = os.path.join(self.temporary_directory.name, "movie_ids.json.gz")
+        self.catalog_path = os.path.join(self.temporary_directory.name, "tmdb_catalog.sqlite3")
+        self.write_export([
+            {"adult": False, "id": 78, "original_title": "Blade Runner", "popularity": 45.2, "video": False,
+             "release_date": "1982-06-25"},
+            {"adult": False, "id": 335984, "original_title": "Blade Runner 2049", "popularity": 60.1, "video": False},
+            {"adult": False, "id": 4638, "original_title": "Hot Fuzz", "popularity": 30.5, "video": False},
+            {"adult": False, "id": 999999, "original_title": "Hot  FUZZ", "popularity": 0.6, "video": False},
+            {"adult": True, "id": 123, "original_title": "Adult Title", "popularity": 99.0, "video": False}
+        ])
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    # Define helper method to write movies to export file, one JSON object per line
+    def write_export(self, movies):
+        with gzip.open(self.export_path, "wt", encoding="utf-8") as export_file:
+            for movie in movies:
+                export_file.write(json.dumps(movie) + "\n")
+            export_file.write("\n")
+
+    def test_tmdb_normalise_movie_name(self):
+        # Prepare test data, mapping each expected key to movie name variants
+        test_movie_names = {
+            "blade runner 1982": ["Blade Runner (1982)", "  BLADE   runner (1982) ", "blade runner 1982"],
+            "howls moving castle": ["Howl's Moving Castle", "Howl\u2019s moving castle", "howls moving castle"],
+            "matrix": ["The Matrix", "the matrix", "Matrix"],
+            "8 1 2": ["8\u00bd", "8 1/2"],
+            "amelie": ["Am\u00e9lie", "AMELIE"],
+            "fast and furious": ["Fast & Furious", "Fast and Furious"],
+            "terminator 2 judgment day": ["Terminator 2: Judgment Day"],
+            "a": ["A"]
+        }
+        # Execute test and evaluate results
+        for expected_movie_name_key, movie_names in test_movie_names.items():
+            for test_movie_name in movie_names:
+                self.assertEqual(tmdb_normalise_movie_name(test_movie_name), expected_movie_name_key)
+
+    def test_tmdb_split_movie_name_year(self):
+        # Execute test and evaluate results
+        self.assertEqual(tmdb_split_movie_name_year("Blade Runner (1982)"), ("Blade Runner", 1982))
+        self.assertEqual(tmdb_split_movie_name_year("Hot Fuzz"), ("Hot Fuzz", None))
+
+    def test_tmdb_catalog_read_export(self):
+        # Define expected result
+        expected_rows = [
+            ("blade runner", 78, 1982, "Blade Runner", 45.2),
+            ("blade runner 2049", 335984, None, "Blade Runner 2049", 60.1),
+            ("hot fuzz", 4638, None, "Hot Fuzz", 30.5),
+            ("hot fuzz", 999999, None, "Hot  FUZZ", 0.6)
+        ]
+        # Execute test
+        rows = list(tmdb_catalog_read_export(self.export_path))
+        # Evaluate results
+        self.assertEqual(rows, expected_rows)
+
+    def test_tmdb_catalog_import(self):
+        # Execute test
+        movie_count = tmdb_catalog_import(self.export_path, self.catalog_path, batch_size=2)
+        # Evaluate results
+        self.assertEqual(movie_count, 4)
+        self.assertTrue(os.path.exists(self.catalog_path))
+        self.assertFalse(os.path.exists(f"{self.catalog_path}.tmp"))
+
+    def test_tmdb_catalog_get_movie_for_movie_name(self):
+        # Define expected result
+        expected_movie = {"movie_id": 4638, "movie_name": "Hot Fuzz", "movie_overview": None,
+                          "movie_popularity": 30.5, "movie_release_date": None}
+        # Prepare test data
+        tmdb_catalog_import(self.export_path, self.catalog_path)
+        metrics_before = tmdb_catalog_get_metrics()
+        # Execute test
+        movie = tmdb_catalog_get_movie_for_movie_name(" hot fuzz", self.catalog_path)
+        missing_movie = tmdb_catalog_get_movie_for_movie_name("Spy", self.catalog_path)
+        # Evaluate results
+        self.assertEqual(movie, expected_movie)
+        self.assertIsNone(missing_movie)
+        metrics_after = tmdb_catalog_get_metrics()
+        self.assertEqual(metrics_after["hits"] - metrics_before["hits"], 1)
+        self.assertEqual(metrics_after["misses"] - metrics_before["misses"], 1)
+
+    def test_tmdb_catalog_get_movie_for_movie_name_with_year(self):
+        # Prepare test data
+        tmdb_catalog_import(self.export_path, self.catalog_path)
+        # Execute test
+        movie = tmdb_catalog_get_movie_for_movie_name("Blade Runner (1982)", self.catalog_path)
+        wrong_year_movie = tmdb_catalog_get_movie_for_movie_name("Blade Runner (1990)", self.catalog_path)
+        # Evaluate results
+        self.assertEqual(movie["movie_id"], 78)
+        self.assertEqual(movie["movie_release_date"], "1982")
+        self.assertIsNone(wrong_year_movie)
+
+    def test_tmdb_catalog_get_movie_for_movie_name_fuzzy(self):
+        # Prepare test data
+        tmdb_catalog_import(self.export_path, self.catalog_path)
+        metrics_before = tmdb_catalog_get_metrics()
+        # Execute test
+        movie = tmdb_catalog_get_movie_for_movie_name("The Blade Runer (1982)", self.catalog_path)
+        sequel_movie = tmdb_catalog_get_movie_for_movie_name("Blade Runner 2094", self.catalog_path)
+        disabled_movie = tmdb_catalog_get_movie_for_movie_name("Blade Runer", self.catalog_path, min_similarity=0)
+        prefix_movie = tmdb_catalog_get_movie_for_movie_name("Hot", self.catalog_path)
+        # Evaluate results, where names only starting longer titles are left to TMDB search
+        self.assertEqual(movie["movie_id"], 78)
+        self.assertIsNone(sequel_movie)
+        self.assertIsNone(disabled_movie)
+        self.assertIsNone(prefix_movie)
+        metrics_after = tmdb_catalog_get_metrics()
+        self.assertEqual(metrics_after["fuzzy_hits"] - metrics_before["fuzzy_hits"], 1)
+        self.assertEqual(metrics_after["misses"] - metrics_before["misses"], 3)
+
+    def test_tmdb_catalog_get_movie_for_movie_name_after_reimport(self):
+        # Prepare test data with catalog opened before new export imported
+        tmdb_catalog_import(self.export_path, self.catalog_path)
+        self.assertIsNone(tmdb_catalog_get_movie_for_movie_name("Spy", self.catalog_path))
+        self.assertIsNone(tmdb_catalog_get_movie_for_movie_name("Spyy", self.catalog_path))
+        self.write_export([{"adult": False, "id": 238713, "original_title": "Spy", "popularity": 25.0}])
+        tmdb_catalog_import(self.export_path, self.catalog_path)
+        # Execute test
+        movie = tmdb_catalog_get_movie_for_movie_name("Spy", self.catalog_path)
+        fuzzy_movie = tmdb_catalog_get_movie_for_movie_name("Spyy", self.catalog_path, min_similarity=0.7)
+        # Evaluate results
+        self.assertEqual(movie["movie_id"], 238713)
+        self.assertEqual(fuzzy_movie["movie_id"], 238713)
+
+
+if __name__ == "__main__":
+    unittest.main()
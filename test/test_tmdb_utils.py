@@ -1,13 +1,29 @@
+import threading
+import time
 import unittest
-from unittest.mock import patch, MagicMock
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock, ANY
 
+import requests
+
+from cache_utils import TtlLruCache
+from http_utils import CircuitBreaker
 from tmdb_config import TMDB_BEARER_TOKEN
 from tmdb_utils import (tmdb_get_unique_movies, tmdb_get_filtered_movies, tmdb_get_movie_for_movie_name,
-                        tmdb_get_movie_recommendations_for_movie_id)
+                        tmdb_get_movie_recommendations_for_movie_id, tmdb_map_concurrently,
+                        tmdb_map_as_completed, tmdb_invalidate_movie_recommendations, tmdb_get_metrics,
+                        tmdb_timeout, tmdb_add_unique_movies, tmdb_get_degraded_count,
+                        tmdb_get_catalog_movie_for_movie_name,
+                        tmdb_unresolved_movie_names_cache)
 
 
 class TestTmdbUtils(unittest.TestCase):
 
+    def setUp(self):
+        # Clear cached recommendations and unresolved movie names so every test calls TMDB
+        tmdb_invalidate_movie_recommendations()
+        tmdb_unresolved_movie_names_cache.invalidate()
+
     def test_tmdb_get_unique_movies(self):
         # Define expected result
         expected_movie_ids = [1, 2]
@@ -24,6 +40,23 @@ class TestTmdbUtils(unittest.TestCase):
         self.assertEqual(unique_movies[0]["movie_id"], expected_movie_ids[0])
         self.assertEqual(unique_movies[1]["movie_id"], expected_movie_ids[1])
 
+    def test_tmdb_add_unique_movies(self):
+        # Define expected result
+        expected_movie_names = ["Shrek", "Spy", "Star Wars"]
+        # Prepare test data
+        test_unique_movies = {1: {"movie_id": 1, "movie_name": "Shrek"}}
+        test_movies = [
+            {"movie_id": 2, "movie_name": "Spy"},
+            {"movie_id": 1, "movie_name": "Shrek 2"},
+            {"movie_id": 3, "movie_name": "Star Wars"},
+            {"movie_id": 2, "movie_name": "Spy 2"}
+        ]
+        # Execute test
+        unique_movies = tmdb_add_unique_movies(test_unique_movies, test_movies)
+        # Evaluate results
+        self.assertIs(unique_movies, test_unique_movies)
+        self.assertEqual([movie["movie_name"] for movie in unique_movies.values()], expected_movie_names)
+
     def test_tmdb_get_filtered_movies(self):
         # Define expected result
         expected_movie_ids = [1, 3]
@@ -42,7 +75,51 @@ class TestTmdbUtils(unittest.TestCase):
         self.assertEqual(filtered_movies[0]["movie_id"], expected_movie_ids[0])
         self.assertEqual(filtered_movies[1]["movie_id"], expected_movie_ids[1])
 
-    @patch("tmdb_utils.requests.get")
+    @patch("tmdb_utils.TMDB_MAX_WORKERS", 1)
+    def test_tmdb_map_concurrently_serial(self):
+        # Define expected result
+        expected_results = [2, 4, 6]
+        # Prepare test data
+        test_items = [1, 2, 3]
+        # Execute test
+        results = tmdb_map_concurrently(lambda item: item * 2, test_items)
+        # Evaluate results
+        self.assertEqual(results, expected_results)
+
+    @patch("tmdb_utils.TMDB_MAX_WORKERS", 4)
+    @patch("tmdb_utils.tmdb_executor", None)
+    def test_tmdb_map_concurrently_concurrent(self):
+        # Define expected result
+        expected_results = [item * 2 for item in range(50)]
+        # Prepare test data
+        test_items = range(50)
+        test_thread_names = set()
+
+        def test_function(item):
+            test_thread_names.add(threading.current_thread().name)
+            time.sleep(0.001)
+            return item * 2
+
+        # Execute test
+        results = tmdb_map_concurrently(test_function, test_items)
+        # Evaluate results
+        self.assertEqual(results, expected_results)
+        self.assertTrue(all(name.startswith("tmdb") for name in test_thread_names))
+
+    @patch("tmdb_utils.TMDB_MAX_WORKERS", 4)
+    @patch("tmdb_utils.tmdb_executor", None)
+    def test_tmdb_map_as_completed(self):
+        # Prepare test data, where first item takes longest
+        test_items = [0.2, 0, 0]
+        # Execute test
+        results = list(tmdb_map_as_completed(lambda item: time.sleep(item) or item * 2, test_items))
+        # Evaluate results, where first item's result arrives last
+        self.assertEqual(sorted(results), [(0, 0.4), (1, 0), (2, 0)])
+        self.assertEqual(results[-1], (0, 0.4))
+        with patch("tmdb_utils.TMDB_MAX_WORKERS", 1):
+            self.assertEqual(list(tmdb_map_as_completed(lambda item: item * 2, [1, 2])), [(0, 2), (1, 4)])
+
+    @patch("tmdb_utils.tmdb_session.get")
     def test_tmdb_get_movie_for_movie_name(self, mock_get):
         # Define expected results
         expected_movie_id = 808
@@ -75,7 +152,7 @@ class TestTmdbUtils(unittest.TestCase):
         # Execute test
         movie = tmdb_get_movie_for_movie_name(test_movie_name)
         # Evaluate results
-        mock_get.assert_called_with(test_url, headers=test_headers)
+        mock_get.assert_called_with(test_url, headers=test_headers, timeout=tmdb_timeout)
         self.assertIsNotNone(movie)
         self.assertEqual(movie["movie_id"], expected_movie_id)
         self.assertEqual(movie["movie_name"], expected_movie_name)
@@ -83,7 +160,84 @@ class TestTmdbUtils(unittest.TestCase):
         self.assertEqual(movie["movie_popularity"], expected_movie_popularity)
         self.assertEqual(movie["movie_release_date"], expected_movie_release_date)
 
-    @patch("tmdb_utils.requests.get")
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_for_movie_name_no_results_cached(self, mock_get):
+        # Prepare mock function
+        mock_get.return_value.json.return_value = {"results": []}
+        metrics_before = tmdb_get_metrics()["movie_names"]
+        # Execute test, with variant of movie name sharing normalised movie name
+        movies = [tmdb_get_movie_for_movie_name("Occasional Coarse Language"),
+                  tmdb_get_movie_for_movie_name("occasional coarse language!")]
+        # Evaluate results, where TMDB searched once
+        metrics_after = tmdb_get_metrics()["movie_names"]
+        self.assertEqual(movies, [None, None])
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(metrics_after["lookups"] - metrics_before["lookups"], 2)
+        self.assertEqual(metrics_after["unresolved"] - metrics_before["unresolved"], 2)
+        self.assertEqual(tmdb_get_metrics()["unresolved_movie_names_cache"]["size"], 1)
+
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_for_movie_name_error_not_cached(self, mock_get):
+        # Prepare mock function to fail then succeed
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"results": [{"id": 808, "title": "Shrek", "overview": "...",
+                                                        "popularity": 144.817, "release_date": "2001-05-18"}]}
+        mock_get.side_effect = [requests.exceptions.ConnectionError("Connection refused"), mock_response]
+        # Execute test
+        with patch("builtins.print"):
+            first_movie = tmdb_get_movie_for_movie_name("Shrek")
+        second_movie = tmdb_get_movie_for_movie_name("Shrek")
+        # Evaluate results
+        self.assertIsNone(first_movie)
+        self.assertEqual(second_movie["movie_id"], 808)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_for_movie_name_with_year(self, mock_get):
+        # Prepare test data
+        test_url = ("https://api.themoviedb.org/3/search/movie?include_adult=false&language=en-GB&page=1"
+                    "&query=Blade Runner&year=1982")
+        # Prepare mock function
+        mock_get.return_value.json.return_value = {"results": [{"id": 78, "title": "Blade Runner", "overview": "...",
+                                                                 "popularity": 45.2, "release_date": "1982-06-25"}]}
+        # Execute test
+        movie = tmdb_get_movie_for_movie_name("Blade Runner (1982)")
+        # Evaluate results
+        mock_get.assert_called_with(test_url, headers=ANY, timeout=tmdb_timeout)
+        self.assertEqual(movie["movie_id"], 78)
+
+    @patch("tmdb_utils.TMDB_CATALOG_PATH", "tmdb_catalog.sqlite3")
+    @patch("tmdb_utils.tmdb_catalog_get_movie_for_movie_name")
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_catalog_movie_for_movie_name(self, mock_get, mock_tmdb_catalog_get_movie_for_movie_name):
+        # Define expected result
+        expected_movie = {"movie_id": 808, "movie_name": "Shrek", "movie_overview": None, "movie_popularity": 144.817,
+                          "movie_release_date": None}
+        # Prepare mock function, with catalog match for first call and missing catalog file for second call
+        mock_tmdb_catalog_get_movie_for_movie_name.side_effect = [expected_movie,
+                                                                  FileNotFoundError("tmdb_catalog.sqlite3")]
+        # Execute test
+        with patch("builtins.print"):
+            movies = [tmdb_get_catalog_movie_for_movie_name("Shrek"), tmdb_get_catalog_movie_for_movie_name("Shrek")]
+        # Evaluate results, where TMDB never searched
+        self.assertEqual(movies, [expected_movie, None])
+        mock_get.assert_not_called()
+
+    @patch("tmdb_utils.TMDB_CATALOG_PATH", "tmdb_catalog.sqlite3")
+    @patch("tmdb_utils.tmdb_catalog_get_movie_for_movie_name")
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_for_movie_name_skips_catalog(self, mock_get, mock_tmdb_catalog_get_movie_for_movie_name):
+        # Prepare mock functions, with catalog holding movie without overview
+        mock_tmdb_catalog_get_movie_for_movie_name.return_value = {"movie_id": 808, "movie_overview": None}
+        mock_get.return_value.json.return_value = {"results": [{"id": 808, "title": "Shrek", "overview": "...",
+                                                                 "popularity": 144.817, "release_date": "2001-05-18"}]}
+        # Execute test
+        movie = tmdb_get_movie_for_movie_name("Shrek")
+        # Evaluate results, where movie resolved by TMDB search with overview and full release date
+        self.assertEqual((movie["movie_overview"], movie["movie_release_date"]), ("...", "2001-05-18"))
+        mock_tmdb_catalog_get_movie_for_movie_name.assert_not_called()
+
+    @patch("tmdb_utils.tmdb_session.get")
     def test_tmdb_get_movie_recommendations_for_movie_id(self, mock_get):
         # Define expected results
         expected_movies = [
@@ -138,7 +292,7 @@ class TestTmdbUtils(unittest.TestCase):
         # Execute test
         movies = tmdb_get_movie_recommendations_for_movie_id(test_movie_id)
         # Evaluate results
-        mock_get.assert_called_with(test_url, headers=test_headers)
+        mock_get.assert_called_with(test_url, headers=test_headers, timeout=tmdb_timeout)
         self.assertEqual(len(movies), len(expected_movies))
         self.assertEqual(movies[0]["movie_id"], expected_movies[0]["movie_id"])
         self.assertEqual(movies[0]["movie_name"], expected_movies[0]["movie_name"])
@@ -151,6 +305,177 @@ class TestTmdbUtils(unittest.TestCase):
         self.assertEqual(movies[1]["movie_popularity"], expected_movies[1]["movie_popularity"])
         self.assertEqual(movies[1]["movie_release_date"], expected_movies[1]["movie_release_date"])
 
+    @patch("tmdb_utils.TMDB_RECOMMENDATIONS_PAGES", 3)
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_recommendations_for_movie_id_pages(self, mock_get):
+        # Define expected result, where movies with equal popularity keep page order
+        expected_movie_ids = [11, 1, 12, 2, 13, 3, 14, 15, 16, 17]
+        # Prepare mock function returning pages of results, with two pages available
+        test_popularities = {1: [9.0, 8.0, 7.0], 2: [10.0, 9.0, 8.0, 7.0, 6.0, 5.0, 4.0, 3.0]}
+
+        def test_get(url, **kwargs):
+            page = int(url.split("page=")[1])
+            mock_response = MagicMock()
+            mock_response.json.return_value = {
+                "results": [{"id": (page - 1) * 10 + number, "title": "Movie", "overview": "...",
+                             "popularity": popularity, "release_date": "2001-05-18"}
+                            for number, popularity in enumerate(test_popularities[page], 1)],
+                "total_pages": 2
+            }
+            return mock_response
+
+        mock_get.side_effect = test_get
+        # Execute test
+        with patch("tmdb_utils.tmdb_page_executor", ThreadPoolExecutor(max_workers=3)):
+            movies = tmdb_get_movie_recommendations_for_movie_id(120)
+        # Evaluate results
+        self.assertEqual([movie["movie_id"] for movie in movies], expected_movie_ids)
+
+    @patch("tmdb_utils.TMDB_RECOMMENDATIONS_PAGES", 4)
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_recommendations_for_movie_id_pages_skipped(self, mock_get):
+        # Define expected result, where pages beyond two pages available never requested
+        expected_urls = ["https://api.themoviedb.org/3/movie/120/recommendations?language=en-GB&page=1",
+                         "https://api.themoviedb.org/3/movie/120/recommendations?language=en-GB&page=2"]
+
+        # Prepare mock function returning two pages available
+        def test_get(url, **kwargs):
+            mock_response = MagicMock()
+            mock_response.json.return_value = {"results": [], "total_pages": 2}
+            return mock_response
+
+        mock_get.side_effect = test_get
+        metrics_before = tmdb_get_metrics()["recommendations_pages"]
+        # Execute test
+        with patch("tmdb_utils.tmdb_page_executor", ThreadPoolExecutor(max_workers=4)):
+            tmdb_get_movie_recommendations_for_movie_id(120)
+        # Evaluate results
+        metrics_after = tmdb_get_metrics()["recommendations_pages"]
+        self.assertEqual([mock_call.args[0] for mock_call in mock_get.call_args_list], expected_urls)
+        self.assertEqual(metrics_after["fetched"] - metrics_before["fetched"], 2)
+        self.assertEqual(metrics_after["skipped"] - metrics_before["skipped"], 2)
+
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_recommendations_for_movie_id_cached(self, mock_get):
+        # Prepare test data
+        test_movie_id = 10192
+        test_movie_results = {
+            "results": [{"id": 808, "title": "Shrek", "overview": "It ain't easy being green ...",
+                         "popularity": 144.817, "release_date": "2001-05-18"}]
+        }
+        # Prepare mock function
+        mock_get.return_value.json.return_value = test_movie_results
+        metrics_before = tmdb_get_metrics()["recommendations_cache"]
+        # Execute test, calling twice then again after invalidating movie_id
+        first_movies = tmdb_get_movie_recommendations_for_movie_id(test_movie_id)
+        second_movies = tmdb_get_movie_recommendations_for_movie_id(test_movie_id)
+        tmdb_invalidate_movie_recommendations(test_movie_id)
+        third_movies = tmdb_get_movie_recommendations_for_movie_id(test_movie_id)
+        # Evaluate results
+        metrics_after = tmdb_get_metrics()["recommendations_cache"]
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(first_movies, second_movies)
+        self.assertEqual(first_movies, third_movies)
+        self.assertEqual(metrics_after["hits"] - metrics_before["hits"], 1)
+        self.assertEqual(metrics_after["misses"] - metrics_before["misses"], 2)
+
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_recommendations_for_movie_id_error_not_cached(self, mock_get):
+        # Prepare mock function to fail then succeed
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"results": []}
+        mock_get.side_effect = [requests.exceptions.ConnectionError("Connection refused"), mock_response]
+        # Execute test
+        with patch("builtins.print"):
+            first_movies = tmdb_get_movie_recommendations_for_movie_id(10192)
+        second_movies = tmdb_get_movie_recommendations_for_movie_id(10192)
+        # Evaluate results
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(first_movies, [])
+        self.assertEqual(second_movies, [])
+
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_recommendations_for_movie_id_throttled_not_cached(self, mock_get):
+        # Prepare mock function returning 429 response once retries exhausted, then succeeding
+        throttled_response = MagicMock()
+        throttled_response.raise_for_status.side_effect = requests.exceptions.HTTPError("429 Client Error")
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"results": []}
+        mock_get.side_effect = [throttled_response, mock_response]
+        # Execute test
+        with patch("builtins.print") as mock_print:
+            first_movies = tmdb_get_movie_recommendations_for_movie_id(10192)
+        tmdb_get_movie_recommendations_for_movie_id(10192)
+        # Evaluate results, where throttled response reported as TMDB API error
+        self.assertEqual(first_movies, [])
+        self.assertEqual(mock_get.call_count, 2)
+        mock_print.assert_called_once_with("An error occurred with the TMDB API: 429 Client Error")
+
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_recommendations_for_movie_id_circuit_open(self, mock_get):
+        # Define expected result
+        expected_movies = [{"movie_id": 808, "movie_name": "Shrek", "movie_overview": "It ain't easy being green ...",
+                            "movie_popularity": 144.817, "movie_release_date": "2001-05-18"}]
+        # Prepare mock function to succeed, then fail as TMDB outage would
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"results": [{"id": 808, "title": "Shrek",
+                                                         "overview": "It ain't easy being green ...",
+                                                         "popularity": 144.817, "release_date": "2001-05-18"}]}
+        mock_get.side_effect = [mock_response, requests.exceptions.ConnectionError("Connection refused")]
+        # Prepare test data with cache expiring recommendations immediately and circuit opening after one failure
+        circuit_breaker = CircuitBreaker(failure_threshold=1, latency_budget=10, reset_timeout=60,
+                                         probe=MagicMock(side_effect=requests.exceptions.ConnectionError))
+        with patch("tmdb_utils.tmdb_recommendations_cache", TtlLruCache(max_size=10, ttl_seconds=0)), \
+                patch("tmdb_utils.tmdb_circuit_breaker", circuit_breaker), patch("builtins.print"):
+            # Execute test, where TMDB called for first two calls only
+            degraded_count = tmdb_get_degraded_count()
+            movies = [tmdb_get_movie_recommendations_for_movie_id(120) for _ in range(3)]
+            # Evaluate results, where last recommendations retrieved used once TMDB unavailable, and counted as failed
+            self.assertEqual(movies, [expected_movies] * 3)
+            self.assertEqual(mock_get.call_count, 2)
+            self.assertEqual(tmdb_get_metrics()["circuit_breaker"]["rejected"], 1)
+            self.assertEqual(tmdb_get_degraded_count() - degraded_count, 2)
+
+    @patch("tmdb_utils.tmdb_session.get")
+    def test_tmdb_get_movie_recommendations_for_movie_id_shared(self, mock_get):
+        # Prepare test data
+        test_movie_results = {
+            "results": [{"id": 808, "title": "Shrek", "overview": "It ain't easy being green ...",
+                         "popularity": 144.817, "release_date": "2001-05-18"}]
+        }
+        release_event = threading.Event()
+        test_results = []
+
+        # Prepare mock function, blocked until second caller waiting for call in flight
+        def test_get(*args, **kwargs):
+            release_event.wait()
+            mock_response = MagicMock()
+            mock_response.json.return_value = test_movie_results
+            return mock_response
+
+        mock_get.side_effect = test_get
+        metrics_before = tmdb_get_metrics()["single_flight"]["recommendations"]
+        test_threads = [threading.Thread(target=lambda: test_results.append(
+            tmdb_get_movie_recommendations_for_movie_id(120))) for _ in range(2)]
+        # Execute test
+        for test_thread in test_threads:
+            test_thread.start()
+        for _ in range(1000):
+            if tmdb_get_metrics()["single_flight"]["recommendations"]["deduplicated"] > metrics_before["deduplicated"]:
+                break
+            time.sleep(0.001)
+        release_event.set()
+        for test_thread in test_threads:
+            test_thread.join()
+        # Evaluate results
+        metrics_after = tmdb_get_metrics()["single_flight"]["recommendations"]
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(test_results[0], test_results[1])
+        self.assertIsNot(test_results[0], test_results[1])
+        self.assertEqual(metrics_after["calls"] - metrics_before["calls"], 1)
+        self.assertEqual(metrics_after["deduplicated"] - metrics_before["deduplicated"], 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import patch, call
+
+from worker import worker_refresh_user_movie_recommendations
+
+
+class TestWorker(unittest.TestCase):
+
+    @patch("worker.db_add_user_movie_recommendations")
+    @patch("worker.app_build_user_movie_recommendations_to_store")
+    @patch("worker.db_get_stale_user_movie_recommendations")
+    def test_worker_refresh_user_movie_recommendations(self, mock_db_get_stale_user_movie_recommendations,
+                                                       mock_app_build_user_movie_recommendations_to_store,
+                                                       mock_db_add_user_movie_recommendations):
+        # Define expected results
+        expected_refresh_count = 2
+        expected_next_user_id = 7
+        expected_calls = [
+            call(3, [{"movie_id": 3}], 0),
+            call(7, [{"movie_id": 7}], 4)
+        ]
+        # Prepare mock functions
+        mock_db_get_stale_user_movie_recommendations.return_value = [(3, 0), (7, 4)]
+        mock_app_build_user_movie_recommendations_to_store.side_effect = lambda user_id: ([{"movie_id": user_id}],
+                                                                                         False)
+        # Execute test
+        refresh_count, next_user_id = worker_refresh_user_movie_recommendations(0, 2)
+        # Evaluate results
+        mock_db_get_stale_user_movie_recommendations.assert_called_with(0, 2)
+        mock_db_add_user_movie_recommendations.assert_has_calls(expected_calls)
+        self.assertEqual(refresh_count, expected_refresh_count)
+        self.assertEqual(next_user_id, expected_next_user_id)
+
+    @patch("builtins.print")
+    @patch("worker.db_add_user_movie_recommendations")
+    @patch("worker.app_build_user_movie_recommendations_to_store")
+    @patch("worker.db_get_stale_user_movie_recommendations")
+    def test_worker_refresh_user_movie_recommendations_error(self, mock_db_get_stale_user_movie_recommendations,
+                                                             mock_app_build_user_movie_recommendations_to_store,
+                                                             mock_db_add_user_movie_recommendations, mock_print):
+        # Define expected results
+        expected_refresh_count = 1
+        expected_next_user_id = 0
+        # Prepare mock functions, failing for first user
+        mock_db_get_stale_user_movie_recommendations.return_value = [(3, 0), (7, 4)]
+        mock_app_build_user_movie_recommendations_to_store.side_effect = [Exception("TMDB unavailable"),
+                                                                          ([{"movie_id": 7}], False)]
+        # Execute test, with batch size larger than number of stale users
+        refresh_count, next_user_id = worker_refresh_user_movie_recommendations(0, 50)
+        # Evaluate results
+        mock_db_add_user_movie_recommendations.assert_called_once_with(7, [{"movie_id": 7}], 4)
+        mock_print.assert_called_once_with("Unable to refresh movie recommendations for user 3: TMDB unavailable")
+        self.assertEqual(refresh_count, expected_refresh_count)
+        self.assertEqual(next_user_id, expected_next_user_id)
+
+    @patch("builtins.print")
+    @patch("worker.db_add_user_movie_recommendations")
+    @patch("worker.app_build_user_movie_recommendations_to_store")
+    @patch("worker.db_get_stale_user_movie_recommendations")
+    def test_worker_refresh_user_movie_recommendations_degraded(self, mock_db_get_stale_user_movie_recommendations,
+                                                                mock_app_build_user_movie_recommendations_to_store,
+                                                                mock_db_add_user_movie_recommendations, mock_print):
+        # Prepare mock functions, with TMDB call failing while building recommendations for first user
+        mock_db_get_stale_user_movie_recommendations.return_value = [(3, 0), (7, 4)]
+        mock_app_build_user_movie_recommendations_to_store.side_effect = [([], True), ([{"movie_id": 7}], False)]
+        # Execute test
+        refresh_count, next_user_id = worker_refresh_user_movie_recommendations(0, 50)
+        # Evaluate results, where first user's recommendations left stale to retry on next pass
+        mock_db_add_user_movie_recommendations.assert_called_once_with(7, [{"movie_id": 7}], 4)
+        mock_print.assert_called_once_with("Unable to refresh movie recommendations for user 3: TMDB unavailable")
+        self.assertEqual(refresh_count, 1)
+        self.assertEqual(next_user_id, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+# Define number of bits of each posting holding title number, leaving 43 bits of 64 bit segment hash, and shift giving
+# first 16 of those bits
+TITLE_NUMBER_BITS = 21
+HASH_START_SHIFT = 64 - TITLE_NUMBER_BITS - 16
+
+
+# Define helper function to get edit distance between titles, only calculating cells within max_distance of diagonal
+# and stopping early once distance exceeds max_distance, when max_distance + 1 is returned
+def title_index_get_edit_distance(title, other_title, max_distance):
+    # Return early if lengths alone differ by more than max_distance
+    exceeded_distance = max_distance + 1
+    if abs(len(title) - len(other_title)) > max_distance:
+        return exceeded_distance
+    # Remove common start and end, which do not change distance, so titles differing by a typo compare a few characters
+    start_length = 0
+    while start_length < len(title) and start_length < len(other_title) \
+            and title[start_length] == other_title[start_length]:
+        start_length += 1
+    end_length = 0
+    while end_length < len(title) - start_length and end_length < len(other_title) - start_length \
+            and title[-1 - end_length] == other_title[-1 - end_length]:
+        end_length += 1
+    title = title[start_length:len(title) - end_length]
+    other_title = other_title[start_length:len(other_title) - end_length]
+    # Calculate Levenshtein distance one row at a time, treating cells outside band as exceeding max_distance
+    previous_row = list(range(min(len(other_title) + 1, exceeded_distance)))
+    previous_row += [exceeded_distance] * (len(other_title) + 1 - len(previous_row))
+    for row_index, character in enumerate(title, 1):
+        start = row_index - max_distance if row_index > max_distance else 1
+        end = row_index + max_distance if row_index + max_distance < len(other_title) else len(other_title)
+        current_row = [exceeded_distance] * (len(other_title) + 1)
+        if row_index < exceeded_distance:
+            current_row[0] = row_index
+        row_distance = current_row[start - 1]
+        for column_index in range(start, end + 1):
+            # Take cheapest of deleting, inserting or substituting character, comparing directly as faster than min
+            distance = previous_row[column_index - 1] + (character != other_title[column_index - 1])
+            if previous_row[column_index] + 1 < distance:
+                distance = previous_row[column_index] + 1
+            if current_row[column_index - 1] + 1 < distance:
+                distance = current_row[column_index - 1] + 1
+            current_row[column_index] = distance
+            if distance < row_distance:
+                row_distance = distance
+        # Stop if every path through this row already exceeds max_distance
+        if row_distance > max_distance:
+            return exceeded_distance
+        previous_row = current_row
+    return previous_row[-1] if previous_row[-1] < exceeded_distance else exceeded_distance
+
+
+# Define helper function to get set of number tokens in title, which must match for titles to match, so sequels such as
+# "alien 3" are not matched to "alien"
+def title_index_get_numbers(title):
+    return {token for token in title.split() if token.isdigit()}
+
+
+# Define helper function to get largest edit distance allowed between titles of given length for min_similarity,
+# rounding first so float error such as 10 * (1 - 0.8) == 1.9999999999999996 does not lower it
+def title_index_get_max_distance(length, min_similarity):
+    return int(round(length * (1 - min_similarity), 9))
+
+
+# Define helper function to split title length into segment_count (position, length) segments of near equal length
+def title_index_get_segments(length, segment_count):
+    segments = []
+    position = 0
+    for segment_index in range(segment_count):
+        segment_length = length // segment_count + (segment_index >= segment_count - length % segment_count)
+        segments.append((position, segment_length))
+        position += segment_length
+    return segments
+
+
+# Define class to find titles most similar to a normalised title. Each title is split into one more segment than the
+# edit distance it can be matched within, so any title within that distance has at least one of its segments unchanged,
+# near the same position. Titles with segments matching parts of title are found through postings for each length,
+# segment number and segment, and those matching most segments ranked by edit distance. Index is built once from all
+# titles for min_similarity, so searches with lower min_similarity need an index built for them
+class TitleIndex:
+    # Define constructor method to build index from (title, popularity) tuples, keeping highest popularity for titles
+    # supplied more than once
+    def __init__(self, titles=(), min_similarity=0.8):
+        self.min_similarity = min_similarity
+        popularity_by_title = {}
+        for title, popularity in titles:
+            if title:
+                popularity_by_title[title] = max(popularity, popularity_by_title.get(title, popularity))
+        self.titles = list(popularity_by_title)
+        self.popularities = array("d", popularity_by_title.values())
+        if len(self.titles) > 2**TITLE_NUMBER_BITS:
+            raise ValueError(f"TitleIndex holds at most {2**TITLE_NUMBER_BITS} titles")
+        self.title_numbers = {title: title_number for title_number, title in enumerate(self.titles)}
+        # Sort titles alphabetically as well, so titles starting with a title can be found by binary search
+        self.sorted_titles = sorted(self.titles)
+        # Split titles of each length into segments
+        self.length_segments = [self.get_segments(length)
+                                for length in range(max(map(len, self.titles), default=0) + 1)]
+        # Store postings as title numbers sorted by hash of (length, segment number, segment), so postings for a
+        # segment are found by binary search without a dictionary entry for each of over a million segments. Hashes
+        # that collide only add candidates. Hash and title number are sorted packed into one integer, with
+        # TITLE_NUMBER_BITS bits for title number, to halve memory used while sorting
+        postings = sorted(
+            hash((len(title), segment_number, title[position:position + segment_length]))
+            >> TITLE_NUMBER_BITS << TITLE_NUMBER_BITS | title_number
+            for title_number, title in enumerate(self.titles)
+            for segment_number, (position, segment_length) in enumerate(self.length_segments[len(title)]))
+        self.segment_hashes = array("q", (posting >> TITLE_NUMBER_BITS for posting in postings))
+        self.segment_title_numbers = array("I", (posting & (2**TITLE_NUMBER_BITS - 1) for posting in postings))
+        del postings
+        # Record where hashes starting with each 16 bits start, so binary search only covers hashes starting the same
+        self.segment_hash_starts = array("I", (bisect_left(self.segment_hashes, hash_start << HASH_START_SHIFT)
+                                               for hash_start in range(-2**15, 2**15 + 1)))
+
+    # Define method to get number of titles in index
+    def __len__(self):
+        return len(self.titles)
+
+    # Define helper method to get segments of titles of given length. Titles can only match titles up to
+    # length / min_similarity long, so at most max_distance edits apart, and are split into max_distance + 1 segments
+    def get_segments(self, length):
+        max_distance = title_index_get_max_distance(int(round(length / self.min_similarity, 9)), self.min_similarity)
+        return title_index_get_segments(length, max_distance + 1)
+
+    # Define method to get up to k (similarity, title) tuples for titles with similarity of at least min_similarity to
+    # normalised title, most similar first. Similarity is 1 minus edit distance divided by length of longer title,
+    # and min_similarity defaults to, and cannot be below, index min_similarity. Only the max_candidates titles
+    # matching most segments are ranked. Titles ending with a sequel number also match titles starting with them
+    # followed by a subtitle, up to max_candidates of them and scored by edit distance as other titles, so
+    # "terminator 2" matches "terminator 2 judgment day" but "godfather" does not match "godfather part ii"
+    def search(self, title, k=5, min_similarity=None, max_candidates=10):
+        # Return exact match without searching
+        if title in self.title_numbers:
+            return [(1.0, title)]
+        min_similarity = max(min_similarity or 0, self.min_similarity)
+        # Count segments matching part of title for titles of each length that could match, from
+        # len(title) * min_similarity to len(title) / min_similarity
+        candidate_counts = Counter()
+        for length in range(math.ceil(round(len(title) * min_similarity, 9)),
+                            min(int(round(len(title) / min_similarity, 9)), len(self.length_segments) - 1) + 1):
+            max_distance = title_index_get_max_distance(max(len(title), length), min_similarity)
+            segments = self.length_segments[length]
+            for segment_number, (position, segment_length) in enumerate(segments):
+                # A title within max_distance edits has a segment with at most segment_number edits before it and
+                # len(segments) - 1 - segment_number edits after it, which limits where it can be found in title
+                before_distance = min(segment_number, max_distance)
+                after_distance = min(len(segments) - 1 - segment_number, max_distance)
+                length_difference = len(title) - length
+                shifted_positions = range(
+                    max(0, position - before_distance, position + length_difference - after_distance),
+                    min(len(title) - segment_length, position + before_distance,
+                        position + length_difference + after_distance) + 1)
+                for shifted_position in shifted_positions:
+                    segment = title[shifted_position:shifted_position + segment_length]
+                    segment_hash = hash((length, segment_number, segment)) >> TITLE_NUMBER_BITS
+                    hash_start = (segment_hash >> HASH_START_SHIFT) + 2**15
+                    postings_start = bisect_left(self.segment_hashes, segment_hash,
+                                                 self.segment_hash_starts[hash_start],
+                                                 self.segment_hash_starts[hash_start + 1])
+                    postings_end = bisect_right(self.segment_hashes, segment_hash, postings_start,
+                                                self.segment_hash_starts[hash_start + 1])
+                    if postings_start < postings_end:
+                        candidate_counts.update(self.segment_title_numbers[postings_start:postings_end])
+        # Rank candidates by edit distance similarity
+        numbers = title_index_get_numbers(title)
+        matches = []
+        for title_number, _ in candidate_counts.most_common(max_candidates):
+            candidate = self.titles[title_number]
+            if title_index_get_numbers(candidate) != numbers:
+                continue
+            max_distance = title_index_get_max_distance(max(len(title), len(candidate)), min_similarity)
+            distance = title_index_get_edit_distance(title, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance / max(len(title), len(candidate)) - 1, False,
+                                -self.popularities[title_number], candidate))
+        # Add titles starting with title followed by subtitle if title ends with sequel number, whose edit distance is
+        # the number of characters added, so they are kept even below min_similarity
+        title_words = title.split()
+        if len(title_words) > 1 and title_words[-1].isdigit():
+            prefix = f"{title} "
+            index = bisect_left(self.sorted_titles, prefix)
+            for candidate in self.sorted_titles[index:index + max_candidates]:
+                if not candidate.startswith(prefix):
+                    break
+                if title_index_get_numbers(candidate) == numbers:
+                    matches.append((-len(title) / len(candidate), True,
+                                    -self.popularities[self.title_numbers[candidate]], candidate))
+        # Rank by similarity, so shortest titles starting with title first, then full matches above prefix matches,
+        # then more popular titles above less popular titles
+        matches.sort()
+        return [(-similarity, candidate) for similarity, _, _, candidate in matches[:k]]
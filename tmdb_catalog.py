@@ -0,0 +1,220 @@
+import argparse
+import gzip
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from title_index import TitleIndex
+from tmdb_config import TMDB_CATALOG_PATH, TMDB_TITLE_MIN_SIMILARITY
+
+# Initialise read-only connections to catalog for each thread, as SQLite connections cannot be shared between threads
+tmdb_catalog_local = threading.local()
+# Initialise fuzzy title index for each catalog and minimum similarity, built on first use, with catalog version it was
+# built from
+tmdb_catalog_title_indexes = {}
+tmdb_catalog_title_indexes_lock = threading.Lock()
+# Initialise catalog lookup counters
+tmdb_catalog_metrics = {"hits": 0, "fuzzy_hits": 0, "misses": 0}
+tmdb_catalog_metrics_lock = threading.Lock()
+
+
+# Define helper function to normalise movie name into key for caching resolved movie details, so variants such as
+# "Howl's Moving Castle" and "howls moving castle", or "The Matrix" and "Matrix", share a key
+def tmdb_normalise_movie_name(movie_name):
+    # Casefold, spell out ampersands and separate accents from letters and fractions into digits, e.g. "8½" into
+    # "8 1⁄2", so they can be removed or split below
+    movie_name = unicodedata.normalize("NFKD", "".join(
+        f" {character} " if "\u2044" in unicodedata.normalize("NFKD", character) else character
+        for character in movie_name.casefold().replace("&", " and ")
+    ))
+    # Remove apostrophes and accents, and replace other punctuation with spaces
+    movie_name = "".join(
+        character if character.isalnum() or character.isspace() else " "
+        for character in movie_name
+        if character not in "'\u2019" and not unicodedata.combining(character)
+    )
+    # Split into words, removing leading article
+    words = movie_name.split()
+    if len(words) > 1 and words[0] in ("the", "a", "an"):
+        words = words[1:]
+    return " ".join(words)
+
+
+# Define helper function to split movie name into movie name without bracketed year and year, or None if no year
+def tmdb_split_movie_name_year(movie_name):
+    # Test if movie name ends with bracketed year
+    if re.search(r"\(\d{4}\)$", movie_name):
+        return movie_name[:-6].strip(), int(movie_name[-5:-1])
+    return movie_name, None
+
+
+# Define function to read catalog rows from TMDB daily id export file one line at a time, skipping adult titles as
+# TMDB search does. Daily id exports hold only original_title, so catalog matches movie names in each movie's original
+# language, e.g. "Sen to Chihiro no Kamikakushi" rather than "Spirited Away", and title and year are only used when
+# exports of other formats supply them
+def tmdb_catalog_read_export(export_path):
+    with gzip.open(export_path, "rt", encoding="utf-8") as export_file:
+        for line in export_file:
+            # Skip blank lines
+            if not line.strip():
+                continue
+            movie = json.loads(line)
+            # Use title if present, otherwise original_title as supplied in daily id exports
+            movie_name = movie.get("title") or movie.get("original_title")
+            if movie.get("adult") or not movie_name:
+                continue
+            # Set year from release_date or year if present, as daily id exports do not include either
+            release_date = movie.get("release_date") or ""
+            year = int(release_date[:4]) if release_date[:4].isdigit() else movie.get("year")
+            yield (tmdb_normalise_movie_name(movie_name), movie["id"], year, movie_name, movie.get("popularity") or 0.0)
+
+
+# Define function to build catalog at catalog_path from TMDB daily id export, returning number of movies imported.
+# Rows are streamed into a new file in batches so memory use does not grow with export size, and the new file then
+# replaces any existing catalog in one step so lookups never see a partly built catalog
+def tmdb_catalog_import(export_path, catalog_path, batch_size=10000):
+    temporary_path = f"{catalog_path}.tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    connection = sqlite3.connect(temporary_path)
+    try:
+        # Skip journal and fsync while building, as file is discarded if import fails
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        # Create table clustered by movie name key, so all movies sharing name are stored together and found with one
+        # index descent
+        connection.execute("""
+            CREATE TABLE movies (
+                movie_name_key TEXT NOT NULL,
+                movie_id INTEGER NOT NULL,
+                year INTEGER,
+                movie_name TEXT NOT NULL,
+                movie_popularity REAL NOT NULL,
+                PRIMARY KEY (movie_name_key, movie_id)
+            ) WITHOUT ROWID
+        """)
+        rows = tmdb_catalog_read_export(export_path)
+        movie_count = 0
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            connection.executemany("INSERT OR REPLACE INTO movies VALUES (?, ?, ?, ?, ?)", batch)
+            movie_count += len(batch)
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temporary_path, catalog_path)
+    return movie_count
+
+
+# Define helper function to get catalog version, identifying catalog file by inode and modification time, which change
+# when new import replaces it
+def tmdb_catalog_get_version(catalog_path):
+    catalog_stat = os.stat(catalog_path)
+    return catalog_stat.st_ino, catalog_stat.st_mtime_ns
+
+
+# Define helper function to get this thread's read-only connection to catalog, reopening it if catalog replaced
+def tmdb_catalog_get_connection(catalog_path):
+    connections = getattr(tmdb_catalog_local, "connections", None)
+    if connections is None:
+        connections = tmdb_catalog_local.connections = {}
+    catalog_version = tmdb_catalog_get_version(catalog_path)
+    connection, version = connections.get(catalog_path, (None, None))
+    if version != catalog_version:
+        if connection:
+            connection.close()
+        connection = sqlite3.connect(f"file:{catalog_path}?mode=ro", uri=True)
+        connections[catalog_path] = (connection, catalog_version)
+    return connection
+
+
+# Define helper function to get fuzzy title index of distinct movie name keys in catalog for min_similarity, building
+# it on first use and again whenever catalog replaced. Building reads every key once, so takes a few seconds for a full
+# catalog
+def tmdb_catalog_get_title_index(catalog_path, min_similarity):
+    catalog_version = tmdb_catalog_get_version(catalog_path)
+    with tmdb_catalog_title_indexes_lock:
+        version, title_index = tmdb_catalog_title_indexes.get((catalog_path, min_similarity), (None, None))
+        if version != catalog_version:
+            # Group rows by key in primary key order, so keys are read without sorting
+            title_index = TitleIndex(tmdb_catalog_get_connection(catalog_path).execute(
+                "SELECT movie_name_key, MAX(movie_popularity) FROM movies GROUP BY movie_name_key"), min_similarity)
+            tmdb_catalog_title_indexes[(catalog_path, min_similarity)] = (catalog_version, title_index)
+    return title_index
+
+
+# Define function to get most popular movie in catalog for movie name key, matching year if supplied, in same format as
+# tmdb_get_movie_for_movie_name but with no overview and only year as release date. Returns None if movie name key not
+# in catalog
+def tmdb_catalog_get_movie(movie_name_key, year=None, catalog_path=None):
+    catalog_path = catalog_path or TMDB_CATALOG_PATH
+    # Prepare query on primary key, adding year condition if supplied
+    query = "SELECT movie_id, movie_name, year, movie_popularity FROM movies WHERE movie_name_key = ?"
+    params = [movie_name_key]
+    if year is not None:
+        query += " AND year = ?"
+        params.append(year)
+    query += " ORDER BY movie_popularity DESC LIMIT 1"
+    movie_row = tmdb_catalog_get_connection(catalog_path).execute(query, params).fetchone()
+    if not movie_row:
+        return None
+    # Create movie dictionary item, without overview and with year in place of release date as catalog holds neither
+    return {"movie_id": movie_row[0],
+            "movie_name": movie_row[1],
+            "movie_overview": None,
+            "movie_popularity": movie_row[3],
+            "movie_release_date": str(movie_row[2]) if movie_row[2] else None}
+
+
+# Define function to get movie in catalog for movie name, matching year if movie name ends with bracketed year. If
+# normalised movie name not in catalog, the most similar movie name keys found by fuzzy title index are tried instead,
+# unless min_similarity is 0. Returns None if no movie found
+def tmdb_catalog_get_movie_for_movie_name(movie_name, catalog_path=None, min_similarity=None):
+    catalog_path = catalog_path or TMDB_CATALOG_PATH
+    min_similarity = TMDB_TITLE_MIN_SIMILARITY if min_similarity is None else min_similarity
+    movie_name, year = tmdb_split_movie_name_year(movie_name)
+    movie_name_key = tmdb_normalise_movie_name(movie_name)
+    # Try exact normalised movie name first
+    movie = tmdb_catalog_get_movie(movie_name_key, year, catalog_path)
+    metric = "hits"
+    # Otherwise try most similar movie name keys in turn, so one matching year is used
+    if not movie and min_similarity > 0:
+        metric = "fuzzy_hits"
+        title_index = tmdb_catalog_get_title_index(catalog_path, min_similarity)
+        for _, similar_movie_name_key in title_index.search(movie_name_key):
+            movie = tmdb_catalog_get_movie(similar_movie_name_key, year, catalog_path)
+            if movie:
+                break
+    # Update counters
+    with tmdb_catalog_metrics_lock:
+        tmdb_catalog_metrics[metric if movie else "misses"] += 1
+    return movie
+
+
+# Define function to get catalog lookup counters
+def tmdb_catalog_get_metrics():
+    with tmdb_catalog_metrics_lock:
+        return dict(tmdb_catalog_metrics)
+
+
+# Define main function to import TMDB daily id export from command line
+def run():
+    parser = argparse.ArgumentParser(description="Import TMDB daily id export into local movie catalog")
+    parser.add_argument("export_path", help="path to gzip JSON-lines export, e.g. movie_ids_10_18_2026.json.gz")
+    parser.add_argument("--catalog", default=TMDB_CATALOG_PATH or "tmdb_catalog.sqlite3",
+                        help="path to catalog file to create or replace")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    movie_count = tmdb_catalog_import(args.export_path, args.catalog)
+    print(f"Imported {movie_count} movies into {args.catalog} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    run()
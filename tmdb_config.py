@@ -5,3 +5,41 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TMDB_BEARER_TOKEN = os.getenv("ENV_TMDB_BEARER_TOKEN")
+# Maximum number of TMDB calls in flight at once (1 runs calls serially)
+TMDB_MAX_WORKERS = int(os.getenv("ENV_TMDB_MAX_WORKERS", "1"))
+# Path to local movie catalog built by tmdb_catalog.py, searched before TMDB (empty searches TMDB only)
+TMDB_CATALOG_PATH = os.getenv("ENV_TMDB_CATALOG_PATH", "")
+# Minimum similarity, from 0 to 1, of movie name found in local catalog by fuzzy title index (0 disables fuzzy matching)
+TMDB_TITLE_MIN_SIMILARITY = float(os.getenv("ENV_TMDB_TITLE_MIN_SIMILARITY", "0.85"))
+# Seconds before cached movie name resolutions expire (0 keeps them indefinitely)
+TMDB_MOVIE_NAME_TTL = int(os.getenv("ENV_TMDB_MOVIE_NAME_TTL", "0"))
+# Maximum number of movie names that TMDB search did not resolve, and seconds to keep them cached in memory so they are
+# not searched for again (0 disables cache)
+TMDB_UNRESOLVED_MOVIE_NAME_CACHE_SIZE = int(os.getenv("ENV_TMDB_UNRESOLVED_MOVIE_NAME_CACHE_SIZE", "10000"))
+TMDB_UNRESOLVED_MOVIE_NAME_TTL = int(os.getenv("ENV_TMDB_UNRESOLVED_MOVIE_NAME_TTL", "3600"))
+# Number of pages of TMDB recommendations fetched for each movie, concurrently, to choose most popular from
+TMDB_RECOMMENDATIONS_PAGES = int(os.getenv("ENV_TMDB_RECOMMENDATIONS_PAGES", "1"))
+# Maximum number of movie_ids and seconds to keep recommendations cached in memory
+TMDB_RECOMMENDATIONS_CACHE_SIZE = int(os.getenv("ENV_TMDB_RECOMMENDATIONS_CACHE_SIZE", "1024"))
+TMDB_RECOMMENDATIONS_CACHE_TTL = int(os.getenv("ENV_TMDB_RECOMMENDATIONS_CACHE_TTL", "3600"))
+# Number of hosts and connections per host kept alive in shared TMDB session
+TMDB_POOL_CONNECTIONS = int(os.getenv("ENV_TMDB_POOL_CONNECTIONS", "1"))
+TMDB_POOL_MAXSIZE = int(os.getenv("ENV_TMDB_POOL_MAXSIZE", "10"))
+# Seconds to wait for TMDB to accept connection and to send response
+TMDB_CONNECT_TIMEOUT = float(os.getenv("ENV_TMDB_CONNECT_TIMEOUT", "3.05"))
+TMDB_READ_TIMEOUT = float(os.getenv("ENV_TMDB_READ_TIMEOUT", "10"))
+# Number of retries and backoff factor in seconds for TMDB calls failing with 429 or 5xx responses
+TMDB_MAX_RETRIES = int(os.getenv("ENV_TMDB_MAX_RETRIES", "3"))
+TMDB_RETRY_BACKOFF = float(os.getenv("ENV_TMDB_RETRY_BACKOFF", "0.5"))
+# Maximum TMDB calls per second and burst of calls allowed at once, shared by all threads (0 disables limit)
+TMDB_RATE_LIMIT = float(os.getenv("ENV_TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_LIMIT_BURST = int(os.getenv("ENV_TMDB_RATE_LIMIT_BURST", "20"))
+# Seconds TMDB calls wait for rate limit before failing
+TMDB_RATE_LIMIT_TIMEOUT = float(os.getenv("ENV_TMDB_RATE_LIMIT_TIMEOUT", "10"))
+# Path to file sharing rate limit between processes on same host (empty shares it within process only)
+TMDB_RATE_LIMIT_STATE_PATH = os.getenv("ENV_TMDB_RATE_LIMIT_STATE_PATH", "")
+# Number of consecutive failed or slow TMDB calls that open circuit, stopping calls to TMDB (0 disables circuit breaker)
+TMDB_CIRCUIT_FAILURES = int(os.getenv("ENV_TMDB_CIRCUIT_FAILURES", "5"))
+# Seconds after which TMDB call counts as failed, and seconds between probes of TMDB while circuit open
+TMDB_CIRCUIT_LATENCY_BUDGET = float(os.getenv("ENV_TMDB_CIRCUIT_LATENCY_BUDGET", "2"))
+TMDB_CIRCUIT_RESET_TIMEOUT = float(os.getenv("ENV_TMDB_CIRCUIT_RESET_TIMEOUT", "10"))
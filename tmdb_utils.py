@@ -1,10 +1,20 @@
-import itertools
-import re
-from operator import itemgetter
+import heapq
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 
-from tmdb_config import TMDB_BEARER_TOKEN
+from cache_utils import TtlLruCache, SingleFlight
+from http_utils import CircuitBreaker, CircuitOpenError, TokenBucket, http_create_session, http_get_session_metrics
+from tmdb_catalog import (tmdb_normalise_movie_name, tmdb_split_movie_name_year, tmdb_catalog_get_movie_for_movie_name,
+                          tmdb_catalog_get_metrics)
+from tmdb_config import (TMDB_BEARER_TOKEN, TMDB_CATALOG_PATH, TMDB_MAX_WORKERS, TMDB_UNRESOLVED_MOVIE_NAME_CACHE_SIZE,
+                         TMDB_UNRESOLVED_MOVIE_NAME_TTL, TMDB_RECOMMENDATIONS_PAGES, TMDB_RECOMMENDATIONS_CACHE_SIZE,
+                         TMDB_RECOMMENDATIONS_CACHE_TTL, TMDB_POOL_CONNECTIONS, TMDB_POOL_MAXSIZE, TMDB_CONNECT_TIMEOUT,
+                         TMDB_READ_TIMEOUT, TMDB_MAX_RETRIES, TMDB_RETRY_BACKOFF, TMDB_RATE_LIMIT,
+                         TMDB_RATE_LIMIT_BURST, TMDB_RATE_LIMIT_TIMEOUT, TMDB_RATE_LIMIT_STATE_PATH,
+                         TMDB_CIRCUIT_FAILURES, TMDB_CIRCUIT_LATENCY_BUDGET, TMDB_CIRCUIT_RESET_TIMEOUT)
 
 
 # Set variables used for all calls to TMDB API
@@ -13,22 +23,130 @@ tmdb_headers = {
     "accept": "application/json",
     "Authorization": f"Bearer {TMDB_BEARER_TOKEN}"
 }
+tmdb_timeout = (TMDB_CONNECT_TIMEOUT, TMDB_READ_TIMEOUT)
+# Set response status codes showing TMDB is throttling or failing, which count as failed calls for circuit breaker
+tmdb_failure_status_codes = (429, 500, 502, 503, 504)
+# Initialise rate limiter shared by all calls to TMDB, including retries
+tmdb_rate_limiter = TokenBucket(TMDB_RATE_LIMIT, TMDB_RATE_LIMIT_BURST, TMDB_RATE_LIMIT_TIMEOUT,
+                                TMDB_RATE_LIMIT_STATE_PATH or None)
+# Initialise shared session so calls to TMDB reuse kept-alive connections
+tmdb_session = http_create_session(TMDB_POOL_CONNECTIONS, TMDB_POOL_MAXSIZE, TMDB_MAX_RETRIES, TMDB_RETRY_BACKOFF,
+                                   tmdb_rate_limiter)
+# Initialise in-memory cache of movie names TMDB search found no results for, keyed by normalised movie name and year,
+# with movie name lookup counters
+tmdb_unresolved_movie_names_cache = TtlLruCache(TMDB_UNRESOLVED_MOVIE_NAME_CACHE_SIZE, TMDB_UNRESOLVED_MOVIE_NAME_TTL)
+tmdb_movie_name_metrics = {"lookups": 0, "unresolved": 0}
+tmdb_movie_name_metrics_lock = threading.Lock()
+# Initialise circuit breaker stopping calls to TMDB while it is failing or slow, probing TMDB configuration endpoint
+# in background to find when it has recovered
+tmdb_circuit_breaker = CircuitBreaker(TMDB_CIRCUIT_FAILURES, TMDB_CIRCUIT_LATENCY_BUDGET, TMDB_CIRCUIT_RESET_TIMEOUT,
+                                      lambda: tmdb_get_response(f"{tmdb_base_url}/configuration"))
+# Initialise in-memory cache of recommendations for movie_ids, keeping expired recommendations to use while TMDB
+# unavailable
+tmdb_recommendations_cache = TtlLruCache(TMDB_RECOMMENDATIONS_CACHE_SIZE, TMDB_RECOMMENDATIONS_CACHE_TTL)
+# Initialise calls in flight to TMDB, shared by concurrent callers searching for the same movie name or getting
+# recommendations for the same movie_id
+tmdb_movie_name_flights = SingleFlight()
+tmdb_recommendations_flights = SingleFlight()
+# Initialise recommendations page counters
+tmdb_recommendations_page_metrics = {"fetched": 0, "skipped": 0}
+tmdb_recommendations_page_metrics_lock = threading.Lock()
+# Initialise counters of TMDB calls failed, answered with last known or no results
+tmdb_degraded_metrics = {"movie_names": 0, "recommendations": 0}
+tmdb_degraded_metrics_lock = threading.Lock()
+# Initialise shared thread pool used to bound number of TMDB calls in flight across all requests
+tmdb_executor = None
+tmdb_executor_lock = threading.Lock()
+# Initialise separate thread pool used to fetch pages of recommendations, as recommendations are themselves fetched
+# by shared thread pool, which could otherwise fill with calls waiting for pages queued behind them
+tmdb_page_executor = None
+
+
+# Define helper function to get shared thread pool, creating it on first use
+def tmdb_get_executor():
+    global tmdb_executor
+    with tmdb_executor_lock:
+        if tmdb_executor is None:
+            tmdb_executor = ThreadPoolExecutor(max_workers=TMDB_MAX_WORKERS, thread_name_prefix="tmdb")
+    return tmdb_executor
+
+
+# Define helper function to get thread pool for fetching pages of recommendations, creating it on first use
+def tmdb_get_page_executor():
+    global tmdb_page_executor
+    with tmdb_executor_lock:
+        if tmdb_page_executor is None:
+            tmdb_page_executor = ThreadPoolExecutor(max_workers=max(TMDB_MAX_WORKERS, 1),
+                                                    thread_name_prefix="tmdb-page")
+    return tmdb_page_executor
+
+
+# Define helper function to call function for each item, concurrently if configured, returning results in item order
+def tmdb_map_concurrently(function, items):
+    # Materialise items so they can be counted and iterated once
+    items = list(items)
+    # Test if concurrent execution configured and worthwhile
+    if TMDB_MAX_WORKERS > 1 and len(items) > 1:
+        # Submit all items to shared thread pool, which yields results in submission order
+        return list(tmdb_get_executor().map(function, items))
+    # Otherwise call function serially
+    return [function(item) for item in items]
+
+
+# Define helper function to call function for each item, concurrently if configured, yielding (index, result) tuples
+# for items in order results become available, so callers can act on fast results before slow ones return
+def tmdb_map_as_completed(function, items):
+    # Materialise items so they can be counted and iterated once
+    items = list(items)
+    # Test if concurrent execution configured and worthwhile
+    if TMDB_MAX_WORKERS > 1 and len(items) > 1:
+        # Submit all items to shared thread pool, remembering index of each item
+        futures = {tmdb_get_executor().submit(function, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    else:
+        # Otherwise call function serially
+        for index, item in enumerate(items):
+            yield index, function(item)
 
 
 # Define helper function to get unique movies from iterable
 def tmdb_get_unique_movies(movies):
-    # Initialise list of movie_ids to track uniqueness
-    movie_ids = []
+    # Initialise set of movie_ids to track uniqueness
+    movie_ids = set()
     # Iterate over movies
     for movie in movies:
-        # Test if movie_id not in unique list
+        # Test if movie_id not in unique set
         if not movie["movie_id"] in movie_ids:
-            # Append movie_id to unique list
-            movie_ids.append(movie["movie_id"])
+            # Add movie_id to unique set
+            movie_ids.add(movie["movie_id"])
             # Yield unique movie
             yield movie
 
 
+# Define helper function to add movies to dictionary of unique movies keyed by movie_id, keeping first occurrence of
+# each movie_id in insertion order
+def tmdb_add_unique_movies(unique_movies, movies):
+    # Iterate over movies
+    for movie in movies:
+        # Add movie if movie_id not already present
+        unique_movies.setdefault(movie["movie_id"], movie)
+    # Return dictionary of unique movies
+    return unique_movies
+
+
+# Define helper function to add movie results from page of results to heap of top count movie results, as
+# (popularity, -page, -position, movie result) tuples, so movie results with equal popularity rank in page and
+# position order, as when sorting all results, whatever order pages arrive in
+def tmdb_add_top_movie_results(top_movie_results, count, page, movie_results):
+    for position, movie in enumerate(movie_results):
+        entry = (movie["popularity"], -page, -position, movie)
+        if len(top_movie_results) < count:
+            heapq.heappush(top_movie_results, entry)
+        elif entry > top_movie_results[0]:
+            heapq.heapreplace(top_movie_results, entry)
+
+
 # Define helper function to filter movies from iterable
 def tmdb_get_filtered_movies(movies, movie_ids_to_exclude):
     # Iterate over movies
@@ -39,56 +157,160 @@ def tmdb_get_filtered_movies(movies, movie_ids_to_exclude):
             yield movie
 
 
-# Define function to get movie details for movie name
+# Define helper function to call TMDB endpoint, raising error for response showing TMDB throttling or failing
+def tmdb_get_response(url):
+    response = tmdb_session.get(url, headers=tmdb_headers, timeout=tmdb_timeout)
+    if response.status_code in tmdb_failure_status_codes:
+        response.raise_for_status()
+    return response
+
+
+# Define helper function to call TMDB endpoint through circuit breaker, returning JSON response. Raises
+# CircuitOpenError without calling TMDB while circuit open, and HTTPError for any 4xx or 5xx response
+def tmdb_get_json(url):
+    response = tmdb_circuit_breaker.call(tmdb_get_response, url)
+    response.raise_for_status()
+    return response.json()
+
+
+# Define function to get movie details for movie name, or None if movie name not resolved
 def tmdb_get_movie_for_movie_name(movie_name):
+    movie = tmdb_find_movie_for_movie_name(movie_name)
+    # Update counters
+    with tmdb_movie_name_metrics_lock:
+        tmdb_movie_name_metrics["lookups"] += 1
+        if not movie:
+            tmdb_movie_name_metrics["unresolved"] += 1
+    return movie
+
+
+# Define helper function to find movie details for movie name by TMDB search, skipping search for movie names TMDB
+# recently found no results for. Local catalog is not searched, so movies returned always have overview and full
+# release date and can be cached by callers
+def tmdb_find_movie_for_movie_name(movie_name):
+    name, year = tmdb_split_movie_name_year(movie_name)
+    movie_name_key = (tmdb_normalise_movie_name(name), year)
+    if tmdb_unresolved_movie_names_cache.get(movie_name_key):
+        return None
+    # Search TMDB, sharing search with concurrent callers searching for same normalised movie name and year
+    movie = tmdb_movie_name_flights.do(movie_name_key, tmdb_search_movie_for_movie_name, movie_name)
+    # Return copy of movie, so callers sharing search do not share movie dictionary item
+    return dict(movie) if movie else None
+
+
+# Define function to get movie details for movie name from local catalog, or None if catalog not configured, movie
+# name not found or catalog unreadable, without calling TMDB. Catalogs built from daily id exports hold each movie's
+# original title only, without year, overview or release date, so names with a bracketed year are never found, English
+# names of foreign language movies are not found or can match a different movie with that original title, and movies
+# found have no overview and should not be cached as if resolved by TMDB
+def tmdb_get_catalog_movie_for_movie_name(movie_name):
+    if not TMDB_CATALOG_PATH:
+        return None
+    try:
+        return tmdb_catalog_get_movie_for_movie_name(movie_name)
+    # Print error in event of catalog error
+    except (OSError, sqlite3.Error) as e:
+        print(f"An error occurred with the TMDB catalog: {e}")
+        return None
+
+
+# Define helper function to search TMDB for movie details for movie name, caching movie names TMDB finds no results
+# for, but not those unresolved because of an error
+def tmdb_search_movie_for_movie_name(movie_name):
     # Initialise movie dictionary item to return
     movie = None
     # Try to get movie details from TMDB search endpoint
     try:
         # Set URL for TMDB search endpoint
         url = f"{tmdb_base_url}/search/movie?include_adult=false&language=en-GB&page=1&query="
-        # Test if movie name ends with bracketed year
-        if re.search(r"\(\d{4}\)$", movie_name):
-            # Extract bracketed year and use stripped movie name in query parameter, with additional year parameter
-            url += f"{movie_name[:-6].strip()}&year={movie_name[-5:-1]}"
-        else:
-            # Use full movie name in query parameter
-            url += f"{movie_name}"
+        # Split bracketed year from end of movie name if present
+        movie_name, year = tmdb_split_movie_name_year(movie_name)
+        # Use movie name in query parameter, with additional year parameter if year supplied
+        url += f"{movie_name}"
+        if year is not None:
+            url += f"&year={year}"
         # Call TMDB endpoint and capture movie_results from JSON response
-        response = requests.get(url, headers=tmdb_headers)
-        movie_results = response.json()["results"]
+        movie_results = tmdb_get_json(url)["results"]
         # Test if movie_results populated
-        if movie_results[0]:
+        if movie_results:
             # Create movie dictionary item with required keys and values from first result
             movie = {"movie_id": movie_results[0]["id"],
                      "movie_name": movie_results[0]["title"],
                      "movie_overview": movie_results[0]["overview"],
                      "movie_popularity": movie_results[0]["popularity"],
                      "movie_release_date": movie_results[0]["release_date"]}
+        else:
+            tmdb_unresolved_movie_names_cache.put((tmdb_normalise_movie_name(movie_name), year), True)
+    # Return None without printing error while circuit open, as every call fails until TMDB recovers
+    except CircuitOpenError:
+        tmdb_add_degraded("movie_names")
     # Raise exception in event of requests error
     except requests.exceptions.RequestException as e:
         print(f"An error occurred with the TMDB API: {e}")
+        tmdb_add_degraded("movie_names")
     # Raise exception in event of any uncaught error
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+        tmdb_add_degraded("movie_names")
     # Return movie dictionary item or None if no results returned
     return movie
 
 
+# Define helper function to get page of recommendations for movie_id from TMDB, returning movie results and number of
+# pages available
+def tmdb_fetch_recommendations_page(movie_id, page):
+    url = f"{tmdb_base_url}/movie/{str(movie_id)}/recommendations?language=en-GB&page={page}"
+    response_json = tmdb_get_json(url)
+    return response_json["results"], response_json.get("total_pages", page)
+
+
+# Define helper function to get count most popular movie results from pages of recommendations for movie_id, in
+# descending order of popularity. First page is fetched alone to learn number of pages available, then remaining
+# pages up to number available are fetched concurrently and merged as they arrive, keeping only top count movie results
+def tmdb_get_top_movie_results_for_movie_id(movie_id, pages, count):
+    top_movie_results = []
+    # Fetch first page without thread pool
+    movie_results, total_pages = tmdb_fetch_recommendations_page(movie_id, 1)
+    tmdb_add_top_movie_results(top_movie_results, count, 1, movie_results)
+    pages_fetched = 1
+    # Fetch remaining pages, skipping pages beyond number available
+    remaining_pages = range(2, min(pages, total_pages) + 1)
+    if remaining_pages:
+        page_futures = {tmdb_get_page_executor().submit(tmdb_fetch_recommendations_page, movie_id, page): page
+                        for page in remaining_pages}
+        try:
+            for page_future in as_completed(page_futures):
+                pages_fetched += 1
+                tmdb_add_top_movie_results(top_movie_results, count, page_futures[page_future], page_future.result()[0])
+        # Cancel pages not yet started if any page fails
+        finally:
+            for pending_future in page_futures:
+                pending_future.cancel()
+    # Update counters
+    with tmdb_recommendations_page_metrics_lock:
+        tmdb_recommendations_page_metrics["fetched"] += pages_fetched
+        tmdb_recommendations_page_metrics["skipped"] += max(pages, 1) - pages_fetched
+    return [movie for *_, movie in sorted(top_movie_results, reverse=True)]
+
+
 # Define function to get movie recommendations for movie_id
 def tmdb_get_movie_recommendations_for_movie_id(movie_id):
+    # Return copy of cached recommendations if available
+    cached_movies = tmdb_recommendations_cache.get(movie_id)
+    if cached_movies is not None:
+        return list(cached_movies)
+    # Otherwise get recommendations from TMDB, sharing call with concurrent callers for same movie_id, and return copy
+    return list(tmdb_recommendations_flights.do(movie_id, tmdb_fetch_movie_recommendations_for_movie_id, movie_id))
+
+
+# Define helper function to get movie recommendations for movie_id from TMDB, caching recommendations retrieved
+def tmdb_fetch_movie_recommendations_for_movie_id(movie_id):
     # Initialise list of movie dictionary items to return
     movies = []
     # Try to get movie recommendations from TMDB recommendations endpoint
     try:
-        # Set URL for TMDB recommendations endpoint for specified movie_id
-        url = f"{tmdb_base_url}/movie/{str(movie_id)}/recommendations?language=en-GB&page=1"
-        # Call TMDB endpoint and capture movie_results from JSON response
-        response = requests.get(url, headers=tmdb_headers)
-        movie_results = response.json()["results"]
-        # Sort movie_results by descending popularity and slice top 10
-        sorted_movie_results = list(itertools.islice(
-            sorted(movie_results, key=itemgetter("popularity"), reverse=True), 10))
+        # Get top 10 movie results by descending popularity from configured number of pages
+        sorted_movie_results = tmdb_get_top_movie_results_for_movie_id(movie_id, TMDB_RECOMMENDATIONS_PAGES, 10)
         # Iterate over sorted_movie_results
         for movie in sorted_movie_results:
             # Append movie dictionary item with required keys and values to movies list
@@ -97,11 +319,76 @@ def tmdb_get_movie_recommendations_for_movie_id(movie_id):
                            "movie_overview": movie["overview"],
                            "movie_popularity": movie["popularity"],
                            "movie_release_date": movie["release_date"]})
-    # Raise exception in event of requests error
+        # Cache copy of recommendations retrieved successfully
+        tmdb_recommendations_cache.put(movie_id, list(movies))
+    # Use last recommendations retrieved, even if expired, without printing error while circuit open
+    except CircuitOpenError:
+        movies = tmdb_recommendations_cache.get_stale(movie_id, [])
+        tmdb_add_degraded("recommendations")
+    # Raise exception in event of requests error, using last recommendations retrieved if any
     except requests.exceptions.RequestException as e:
         print(f"An error occurred with the TMDB API: {e}")
+        movies = tmdb_recommendations_cache.get_stale(movie_id, [])
+        tmdb_add_degraded("recommendations")
     # Raise exception in event of any uncaught error
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-    # Return list of movie dictionary items or empty list if no results returned
+        tmdb_add_degraded("recommendations")
+    # Return list of movie dictionary items, last recommendations retrieved if TMDB unavailable, or empty list if no
+    # results returned
     return movies
+
+
+# Define helper function to count TMDB call failed, answered with last known or no results
+def tmdb_add_degraded(kind):
+    with tmdb_degraded_metrics_lock:
+        tmdb_degraded_metrics[kind] += 1
+
+
+# Define function to get number of TMDB calls failed so far, so callers can compare counts before and after building
+# results to tell if any lookup may have been answered with last known or no results
+def tmdb_get_degraded_count():
+    with tmdb_degraded_metrics_lock:
+        return sum(tmdb_degraded_metrics.values())
+
+
+# Define function to test if circuit open, so callers can use last known movie details while TMDB unavailable
+def tmdb_is_circuit_open():
+    return tmdb_circuit_breaker.get_metrics()["state"] == "open"
+
+
+# Define function to remove cached recommendations for movie_id, or all cached recommendations if no movie_id supplied
+def tmdb_invalidate_movie_recommendations(movie_id=None):
+    tmdb_recommendations_cache.invalidate(movie_id)
+
+
+# Define helper function to get recommendations page counters
+def tmdb_get_recommendations_page_metrics():
+    with tmdb_recommendations_page_metrics_lock:
+        return dict(tmdb_recommendations_page_metrics)
+
+
+# Define helper function to get counters of TMDB calls failed
+def tmdb_get_degraded_metrics():
+    with tmdb_degraded_metrics_lock:
+        return dict(tmdb_degraded_metrics)
+
+
+# Define function to get TMDB movie name, cache, call sharing, failure, rate limit, circuit breaker and connection
+# counters, where miss_rate is share of movie name lookups not resolved, including those answered by unresolved movie
+# names cache
+def tmdb_get_metrics():
+    with tmdb_movie_name_metrics_lock:
+        movie_name_metrics = dict(tmdb_movie_name_metrics)
+    movie_name_metrics["miss_rate"] = round(movie_name_metrics["unresolved"] / max(movie_name_metrics["lookups"], 1), 4)
+    return {"movie_names": movie_name_metrics,
+            "unresolved_movie_names_cache": tmdb_unresolved_movie_names_cache.get_metrics(),
+            "recommendations_cache": tmdb_recommendations_cache.get_metrics(),
+            "recommendations_pages": tmdb_get_recommendations_page_metrics(),
+            "degraded": tmdb_get_degraded_metrics(),
+            "single_flight": {"movie_names": tmdb_movie_name_flights.get_metrics(),
+                              "recommendations": tmdb_recommendations_flights.get_metrics()},
+            "catalog": tmdb_catalog_get_metrics(),
+            "rate_limit": tmdb_rate_limiter.get_metrics(),
+            "circuit_breaker": tmdb_circuit_breaker.get_metrics(),
+            "http": http_get_session_metrics(tmdb_session)}
@@ -16,6 +16,7 @@ CREATE TABLE user_movie_top_5 (
 	user_movie_top_5_id INT AUTO_INCREMENT PRIMARY KEY,
 	user_id INT NOT NULL,
 	movie_name VARCHAR(200) NOT NULL,
+	INDEX idx_user_movie_top_5_user_id_movie_name (user_id, movie_name), -- Read top 5 movies for users from index
 	CONSTRAINT fk_user_movie_top_5_user_id FOREIGN KEY (user_id) REFERENCES users(user_id)
 );
 
@@ -31,6 +32,7 @@ CREATE TABLE quiz_prompts (
 	quiz_id INT NOT NULL,
 	quiz_prompt_text VARCHAR(200) NOT NULL,
 	quiz_prompt_order INT, -- Order to display quiz prompts for quiz 
+	INDEX idx_quiz_prompts_quiz_id_order (quiz_id, quiz_prompt_order),
 	CONSTRAINT fk_quiz_prompts_quiz_id FOREIGN KEY (quiz_id) REFERENCES quizzes(quiz_id)
 );
 
@@ -41,6 +43,7 @@ CREATE TABLE quiz_prompt_options (
 	quiz_prompt_option_text VARCHAR(200) NOT NULL,
 	quiz_prompt_option_vibe VARCHAR(1), -- Vibe associated with quiz prompt option
 	quiz_prompt_option_order INT, -- Order to display quiz prompt options for quiz prompt
+	INDEX idx_quiz_prompt_options_quiz_prompt_id_order (quiz_prompt_id, quiz_prompt_option_order),
 	CONSTRAINT fk_quiz_prompt_options_quiz_prompt_id FOREIGN KEY (quiz_prompt_id) REFERENCES quiz_prompts(quiz_prompt_id)
 );
 
@@ -50,6 +53,7 @@ CREATE TABLE quiz_response_vibes (
 	quiz_id INT NOT NULL,
 	vibe_name VARCHAR(50),
 	quiz_prompt_option_vibe_mode VARCHAR(1), -- Dominant quiz prompt option vibe
+	INDEX idx_quiz_response_vibes_quiz_id_vibe_mode (quiz_id, quiz_prompt_option_vibe_mode),
 	CONSTRAINT fk_quiz_response_vibes_quiz_id FOREIGN KEY (quiz_id) REFERENCES quizzes(quiz_id)
 );
 
@@ -59,11 +63,117 @@ CREATE TABLE user_quiz_responses (
 	user_id INT NOT NULL,
 	quiz_id INT NOT NULL,
 	quiz_prompt_option_id INT NOT NULL,
+	INDEX idx_user_quiz_responses_user_id_quiz_id (user_id, quiz_id, quiz_prompt_option_id),
 	CONSTRAINT fk_user_quiz_responses_user_id FOREIGN KEY (user_id) REFERENCES users(user_id),
 	CONSTRAINT fk_user_quiz_responses_quiz_id FOREIGN KEY (quiz_id) REFERENCES quizzes(quiz_id),
 	CONSTRAINT fk_user_quiz_responses_quiz_prompt_option_id FOREIGN KEY (quiz_prompt_option_id) REFERENCES quiz_prompt_options(quiz_prompt_option_id)
 );
 
+-- Create table to store dominant vibe for each user for each quiz, maintained by sp_add_user_quiz_responses
+CREATE TABLE user_vibes (
+	user_id INT NOT NULL,
+	quiz_id INT NOT NULL,
+	vibe_id INT NOT NULL,
+	PRIMARY KEY (user_id, quiz_id),
+	INDEX idx_user_vibes_vibe_id_user_id (vibe_id, user_id), -- Look up users with same vibe without scanning all users
+	CONSTRAINT fk_user_vibes_user_id FOREIGN KEY (user_id) REFERENCES users(user_id),
+	CONSTRAINT fk_user_vibes_quiz_id FOREIGN KEY (quiz_id) REFERENCES quizzes(quiz_id),
+	CONSTRAINT fk_user_vibes_vibe_id FOREIGN KEY (vibe_id) REFERENCES quiz_response_vibes(vibe_id)
+);
+
+-- Create table to cache TMDB movie details resolved for normalised movie names
+CREATE TABLE tmdb_movie_names (
+	movie_name_key VARCHAR(200) PRIMARY KEY, -- Normalised movie name
+	movie_id INT NOT NULL,
+	movie_name VARCHAR(200),
+	movie_overview TEXT,
+	movie_popularity DOUBLE,
+	movie_release_date VARCHAR(10),
+	resolved_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP -- Time movie name resolved
+);
+
+-- Create table to store precomputed movie recommendations for users
+CREATE TABLE user_movie_recommendations (
+	user_id INT PRIMARY KEY,
+	movie_recommendations JSON NOT NULL, -- List of recommended movie dictionary items
+	is_stale TINYINT NOT NULL DEFAULT 0, -- Set to 1 when top 5 movies or quiz responses change for user or similar users
+	stale_version INT NOT NULL DEFAULT 0, -- Incremented every time recommendations marked stale
+	computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+	CONSTRAINT fk_user_movie_recommendations_user_id FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+-- Create table to hold top neighbours of each normalised movie name, most similar first, rebuilt by cooccurrence.py
+CREATE TABLE movie_neighbours (
+	movie_name_key VARCHAR(200) NOT NULL, -- Normalised movie name
+	neighbour_rank SMALLINT NOT NULL, -- 1 for most similar movie
+	neighbour_movie_name_key VARCHAR(200) NOT NULL, -- Normalised movie name of neighbour
+	neighbour_movie_name VARCHAR(200) NOT NULL, -- Movie name of neighbour as first added by a user
+	similarity DOUBLE NOT NULL, -- Cosine or Jaccard similarity of users listing both movies
+	co_occurrence_count INT NOT NULL, -- Number of users listing both movies
+	PRIMARY KEY (movie_name_key, neighbour_rank)
+);
+
+-- Create table to hold single row with quiz catalog version, incremented by triggers below whenever quizzes, quiz
+-- prompts or quiz prompt options change
+CREATE TABLE quiz_catalog_version (
+	quiz_catalog_version_id TINYINT PRIMARY KEY DEFAULT 1,
+	version INT NOT NULL DEFAULT 1,
+	updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+	CONSTRAINT chk_quiz_catalog_version_single_row CHECK (quiz_catalog_version_id = 1)
+);
+
+INSERT INTO
+	quiz_catalog_version (quiz_catalog_version_id, version)
+VALUES
+	(1, 1);
+
+-- Create table recording migrations applied by migrate.py, marking every migration in the migrations folder as
+-- applied, as this script already creates the schema they bring older databases up to
+CREATE TABLE schema_migrations (
+	version INT PRIMARY KEY,
+	name VARCHAR(200) NOT NULL,
+	applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO
+	schema_migrations (version, name)
+VALUES
+	(1, 'add_covering_indexes'),
+	(2, 'add_quiz_catalog_version'),
+	(3, 'add_movie_neighbours'),
+	(4, 'add_user_vibes_and_recommendations'),
+	(5, 'backfill_user_vibes'),
+	(6, 'clear_tmdb_movie_names'),
+	(7, 'clear_catalog_tmdb_movie_names');
+
+-- Create triggers to increment quiz catalog version when rows in quiz tables are added, changed or deleted
+CREATE TRIGGER trg_quizzes_after_insert AFTER INSERT ON quizzes
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quizzes_after_update AFTER UPDATE ON quizzes
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quizzes_after_delete AFTER DELETE ON quizzes
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompts_after_insert AFTER INSERT ON quiz_prompts
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompts_after_update AFTER UPDATE ON quiz_prompts
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompts_after_delete AFTER DELETE ON quiz_prompts
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompt_options_after_insert AFTER INSERT ON quiz_prompt_options
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompt_options_after_update AFTER UPDATE ON quiz_prompt_options
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
+CREATE TRIGGER trg_quiz_prompt_options_after_delete AFTER DELETE ON quiz_prompt_options
+FOR EACH ROW UPDATE quiz_catalog_version SET version = version + 1;
+
 -- Create view to join all quiz, quiz prompt and quiz prompt option details
 CREATE OR REPLACE VIEW vw_quiz_prompt_options AS
 SELECT
@@ -82,78 +192,58 @@ ORDER BY
 	qp.quiz_prompt_order,
 	qpo.quiz_prompt_option_order;
 
--- Create view to extrapolate users' vibes
+-- Create view to get users' vibes from dominant vibes stored for each quiz
 CREATE OR REPLACE VIEW vw_user_vibes AS
 SELECT
-	qpov.user_id AS user_id,
+	uv.user_id AS user_id,
 	qrv.vibe_id AS vibe_id,
 	qrv.vibe_name AS vibe_name
-FROM (
-	-- Select row 1 as dominant vibe for each user for each quiz
-	SELECT 
-		user_id,
-		quiz_id,
-		quiz_prompt_option_vibe
-	FROM (
-		-- Sort vibe counts for each user for each quiz in descending order and allocate row number
-		SELECT
-			user_id,
-			quiz_id,
-			quiz_prompt_option_vibe,
-			ROW_NUMBER() OVER(PARTITION BY user_id, quiz_id ORDER BY vibe_count DESC) AS rn
-		FROM (
-			-- Calculate number of responses for each vibe for each user for each quiz
-			SELECT
-				uqr.user_id,
-				uqr.quiz_id,
-				qpo.quiz_prompt_option_vibe,
-				COUNT(*) AS vibe_count
-			FROM
-				user_quiz_responses uqr
-			INNER JOIN
-				quiz_prompt_options qpo
-				ON qpo.quiz_prompt_option_id = uqr.quiz_prompt_option_id
-			GROUP BY
-				uqr.user_id,
-				uqr.quiz_id,
-				qpo.quiz_prompt_option_vibe
-		) t1
-	) t2
-	WHERE
-		rn = 1
-) qpov
--- Join dominant vibe for each user for each quiz to quiz_response_vibes to get vibe details
+FROM
+	user_vibes uv
 INNER JOIN
 	quiz_response_vibes qrv
-	ON qrv.quiz_id = qpov.quiz_id
-	AND qrv.quiz_prompt_option_vibe_mode = qpov.quiz_prompt_option_vibe;
+	ON qrv.vibe_id = uv.vibe_id;
 
 -- Create view to get top 5 movies for user and users with same vibe
 CREATE OR REPLACE VIEW vw_user_similar_vibe_movies AS
 SELECT 
-	vuv1.user_id AS user_id,
+	vibe_groups.user_id AS user_id,
 	umt5.movie_name AS movie_name,
 	-- Determine if movie in user's top 5
-	MAX(CASE WHEN vuv1.user_id = umt5.user_id THEN 1 ELSE 0 END) AS user_top_5_count,
+	MAX(CASE WHEN umt5.user_id = vibe_groups.user_id THEN 1 ELSE 0 END) AS user_top_5_count,
 	-- Calculate number of other users with movie in their top 5
-	COUNT(DISTINCT CASE WHEN vuv1.user_id <> umt5.user_id THEN vuv2.user_id END) AS others_top_5_count
-FROM
-	vw_user_vibes vuv1
--- Inner join to vw_user_vibes again to select other users with same vibe
-INNER JOIN
-	vw_user_vibes vuv2
-	ON vuv2.vibe_id = vuv1.vibe_id
-	AND vuv2.user_id <> vuv1.user_id
--- Inner join to user_movie_top_5 to get top 5 movies for user and users with same vibe
+	COUNT(DISTINCT CASE WHEN umt5.user_id <> vibe_groups.user_id THEN umt5.user_id END) AS others_top_5_count
+FROM (
+	-- Select each user paired with every user in same vibe group, including themselves, where at least one other
+	-- user has same vibe
+	SELECT DISTINCT
+		uv1.user_id AS user_id,
+		uv2.user_id AS group_user_id
+	FROM
+		user_vibes uv1
+	INNER JOIN
+		user_vibes uv2
+		ON uv2.vibe_id = uv1.vibe_id
+	WHERE
+		EXISTS (
+			SELECT
+				1
+			FROM
+				user_vibes uv3
+			WHERE
+				uv3.vibe_id = uv1.vibe_id
+				AND uv3.user_id <> uv1.user_id
+		)
+) vibe_groups
+-- Inner join to user_movie_top_5 on single indexed column to get top 5 movies for user and users with same vibe
 INNER JOIN
 	user_movie_top_5 umt5
-	ON umt5.user_id = vuv1.user_id
-	OR umt5.user_id = vuv2.user_id
+	ON umt5.user_id = vibe_groups.group_user_id
 GROUP BY
-	vuv1.user_id,
+	vibe_groups.user_id,
 	umt5.movie_name
 ORDER BY
-	vuv1.user_id,
+	vibe_groups.user_id,
 	umt5.movie_name;
 
 DELIMITER //
@@ -182,6 +272,98 @@ BEGIN
 	COMMIT;
 END //
 
+DELIMITER //
+-- Create stored procedure to store dominant vibe for user for quiz, recomputed from that user's quiz responses only
+CREATE PROCEDURE sp_refresh_user_vibe (
+	IN in_user_id INT,
+	IN in_quiz_id INT
+)
+BEGIN
+	-- Delete any previous vibe for user for quiz
+	DELETE FROM
+		user_vibes
+	WHERE
+		user_id = in_user_id
+		AND quiz_id = in_quiz_id;
+	-- Add vibe for row 1 as dominant vibe
+	INSERT INTO
+		user_vibes (user_id, quiz_id, vibe_id)
+	SELECT
+		t2.user_id,
+		t2.quiz_id,
+		qrv.vibe_id
+	FROM (
+		-- Sort vibe counts in descending order and allocate row number
+		SELECT
+			user_id,
+			quiz_id,
+			quiz_prompt_option_vibe,
+			ROW_NUMBER() OVER(ORDER BY vibe_count DESC) AS rn
+		FROM (
+			-- Calculate number of responses for each vibe for user for quiz
+			SELECT
+				uqr.user_id,
+				uqr.quiz_id,
+				qpo.quiz_prompt_option_vibe,
+				COUNT(*) AS vibe_count
+			FROM
+				user_quiz_responses uqr
+			INNER JOIN
+				quiz_prompt_options qpo
+				ON qpo.quiz_prompt_option_id = uqr.quiz_prompt_option_id
+			WHERE
+				uqr.user_id = in_user_id
+				AND uqr.quiz_id = in_quiz_id
+			GROUP BY
+				uqr.user_id,
+				uqr.quiz_id,
+				qpo.quiz_prompt_option_vibe
+		) t1
+	) t2
+	-- Join dominant vibe to quiz_response_vibes to get vibe_id
+	INNER JOIN
+		quiz_response_vibes qrv
+		ON qrv.quiz_id = t2.quiz_id
+		AND qrv.quiz_prompt_option_vibe_mode = t2.quiz_prompt_option_vibe
+	WHERE
+		t2.rn = 1;
+END //
+
+DELIMITER //
+-- Create stored procedure to mark recommendations stale for user and all users with same vibe, adding placeholder rows
+-- for users without recommendations so changes made while recommendations are being computed are not lost
+CREATE PROCEDURE sp_mark_user_movie_recommendations_stale (
+	IN in_user_id INT
+)
+BEGIN
+	INSERT INTO
+		user_movie_recommendations (user_id, movie_recommendations, is_stale, stale_version)
+	SELECT
+		stale_users.user_id,
+		JSON_ARRAY(),
+		1,
+		1
+	FROM (
+		-- Select user and all other users with same vibe
+		SELECT
+			in_user_id AS user_id
+		UNION
+		SELECT
+			uv2.user_id
+		FROM
+			user_vibes uv1
+		INNER JOIN
+			user_vibes uv2
+			ON uv2.vibe_id = uv1.vibe_id
+			AND uv2.user_id <> uv1.user_id
+		WHERE
+			uv1.user_id = in_user_id
+	) stale_users
+	ON DUPLICATE KEY UPDATE
+		is_stale = 1,
+		stale_version = stale_version + 1;
+END //
+
 DELIMITER //
 -- Create stored procedure to add user's top 5 movies and set output parameter to number of movies added
 CREATE PROCEDURE sp_add_user_movie_top_5 (
@@ -232,6 +414,8 @@ BEGIN
 	END WHILE;
 	-- Commit changes if expected number of movies added, otherwise roll back and set output number of movies added to 0
 	IF out_movies_added = number_of_movies_to_add THEN
+		-- Mark recommendations stale for user and users with same vibe, as their top 5 movies have changed
+		CALL sp_mark_user_movie_recommendations_stale(in_user_id);
 		COMMIT;
 	ELSE
 		ROLLBACK;
@@ -264,6 +448,8 @@ BEGIN
 	SET number_of_responses_to_add = CHAR_LENGTH(in_quiz_responses) - CHAR_LENGTH(REPLACE(in_quiz_responses,',','')) + 1;
 	-- Start transaction block to remove any previous quiz responses for user, add supplied responses, set output parameter and commit change
 	START TRANSACTION;
+		-- Mark recommendations stale for user and users with same vibe before responses change
+		CALL sp_mark_user_movie_recommendations_stale(in_user_id);
 		-- Delete any previous quiz responses for user
 		DELETE FROM
 			user_quiz_responses
@@ -292,6 +478,10 @@ BEGIN
 		DEALLOCATE PREPARE statement;
 		-- Commit changes if expected number of responses added, otherwise roll back and set output number of responses added to 0
 		IF out_responses_added = number_of_responses_to_add THEN
+			-- Store user's new dominant vibe for quiz
+			CALL sp_refresh_user_vibe(in_user_id, in_quiz_id);
+			-- Mark recommendations stale for users with same vibe after responses change
+			CALL sp_mark_user_movie_recommendations_stale(in_user_id);
 			COMMIT;
 		ELSE
 			ROLLBACK;
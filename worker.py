@@ -0,0 +1,51 @@
+import time
+
+from app import app_build_user_movie_recommendations_to_store
+from db_utils import db_get_stale_user_movie_recommendations, db_add_user_movie_recommendations, DbConnectionError
+from worker_config import WORKER_BATCH_SIZE, WORKER_POLL_INTERVAL
+
+
+# Define function to recompute next batch of stale recommendations after specified user_id
+def worker_refresh_user_movie_recommendations(after_user_id, batch_size):
+    # Initialise number of users refreshed to return
+    refresh_count = 0
+    # Set stale_users to next batch of users whose recommendations are stale or not yet computed
+    stale_users = db_get_stale_user_movie_recommendations(after_user_id, batch_size)
+    # Iterate over stale users
+    for user_id, stale_version in stale_users:
+        # Try to recompute and store recommendations, continuing with next user in event of error, and leaving
+        # recommendations stale to retry on next pass if any TMDB call failed
+        try:
+            movies, is_degraded = app_build_user_movie_recommendations_to_store(user_id)
+            if is_degraded:
+                print(f"Unable to refresh movie recommendations for user {user_id}: TMDB unavailable")
+                continue
+            db_add_user_movie_recommendations(user_id, movies, stale_version)
+            refresh_count += 1
+        except Exception as e:
+            print(f"Unable to refresh movie recommendations for user {user_id}: {e}")
+    # Set user_id to continue after, restarting from first user once all users checked
+    next_user_id = stale_users[-1][0] if len(stale_users) == batch_size else 0
+    # Return number of users refreshed and user_id to continue after
+    return refresh_count, next_user_id
+
+
+# Define main function to refresh stale recommendations until interrupted
+def run():
+    print("Refreshing stale movie recommendations. Press CTRL+C to quit.")
+    # Initialise user_id to continue after
+    after_user_id = 0
+    while True:
+        # Try to refresh next batch, waiting before retrying in event of DB error
+        try:
+            refresh_count, after_user_id = worker_refresh_user_movie_recommendations(after_user_id, WORKER_BATCH_SIZE)
+        except DbConnectionError as e:
+            print(f"An error occurred with the database: {e}")
+            refresh_count, after_user_id = 0, 0
+        # Wait before polling again if nothing to refresh and all users checked
+        if refresh_count == 0 and after_user_id == 0:
+            time.sleep(WORKER_POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,9 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of users to refresh per batch and seconds to wait between polls when no recommendations are stale
+WORKER_BATCH_SIZE = int(os.getenv("ENV_WORKER_BATCH_SIZE", "50"))
+WORKER_POLL_INTERVAL = float(os.getenv("ENV_WORKER_POLL_INTERVAL", "5"))